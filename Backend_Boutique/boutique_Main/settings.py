@@ -134,6 +134,82 @@ else:
             'NAME': BASE_DIR / 'db.sqlite3',
         }
     }
+    # SQLite no admite UNIQUE NULLS NOT DISTINCT: la restricción de celda de DailySalesFact
+    # solo se crea en PostgreSQL
+    SILENCED_SYSTEM_CHECKS = ['models.W047']
+
+
+# Cache
+# LocMem por defecto; CACHE_BACKEND/CACHE_LOCATION permiten usar una caché compartida entre instancias
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'boutique-default'),
+    }
+}
+
+# Dashboard de insights (ml_predictions): segundos que el resultado se considera fresco,
+# segundos que se sigue sirviendo mientras se recalcula en segundo plano, e hilos de consulta
+INSIGHTS_DASHBOARD_CACHE_TTL = int(os.getenv('INSIGHTS_DASHBOARD_CACHE_TTL') or 300)
+INSIGHTS_DASHBOARD_STALE_TTL = int(os.getenv('INSIGHTS_DASHBOARD_STALE_TTL') or 86400)
+INSIGHTS_DASHBOARD_WORKERS = int(os.getenv('INSIGHTS_DASHBOARD_WORKERS') or 4)
+
+# Artefactos de modelos ML a partir de este tamaño se cargan con memory-map (joblib mmap_mode='r')
+ML_MODEL_MMAP_MIN_BYTES = int(os.getenv('ML_MODEL_MMAP_MIN_BYTES') or 50 * 1024 * 1024)
+
+# Segundos sin progreso tras los cuales run_ml_worker da por fallido un entrenamiento
+ML_TRAINING_JOB_TIMEOUT = int(os.getenv('ML_TRAINING_JOB_TIMEOUT') or 3600)
+
+# Segundos en cola sin que un worker lo tome tras los cuales un entrenamiento se da por fallido
+# (p. ej. sin run_ml_worker desplegado); debe superar el intervalo del Cloud Run Job programado
+ML_TRAINING_PENDING_TIMEOUT = int(os.getenv('ML_TRAINING_PENDING_TIMEOUT') or 1800)
+
+# Procesos para cálculos ML en paralelo: pronóstico por categoría/producto y selección de modelos
+# (default: núcleos disponibles)
+ML_FORECAST_WORKERS = int(os.getenv('ML_FORECAST_WORKERS') or os.cpu_count() or 1)
+
+# Segundos máximos de la selección automática de modelo (model_type='auto'); 0 = sin límite
+ML_MODEL_SELECTION_BUDGET = int(os.getenv('ML_MODEL_SELECTION_BUDGET') or 300)
+
+# Segundos entre precálculos del pronóstico de 30 días en run_ml_worker (0 = desactivado)
+ML_FORECAST_PRECOMPUTE_INTERVAL = int(os.getenv('ML_FORECAST_PRECOMPUTE_INTERVAL') or 3600)
+
+# Segundos entre reconstrucciones incrementales de "comprados juntos" en run_ml_worker (0 = desactivado)
+ML_RECOMMENDATIONS_REFRESH_INTERVAL = int(os.getenv('ML_RECOMMENDATIONS_REFRESH_INTERVAL') or 600)
+
+# Cada cuántos segundos el índice de recomendaciones en memoria verifica si hubo una reconstrucción
+ML_RECOMMENDATION_INDEX_TTL = int(os.getenv('ML_RECOMMENDATION_INDEX_TTL') or 30)
+
+# Detección de anomalías de ventas (EWMA estacional por serie, ver ml_predictions/services/sales_anomalies.py)
+# Peso de cada bucket nuevo en la media/varianza de su franja (hora del día o día de la semana)
+ML_ANOMALY_ALPHA = float(os.getenv('ML_ANOMALY_ALPHA') or 0.2)
+# |z| a partir del cual un bucket cerrado es anómalo
+ML_ANOMALY_Z_THRESHOLD = float(os.getenv('ML_ANOMALY_Z_THRESHOLD') or 3.0)
+# Observaciones por franja antes de empezar a alertar
+ML_ANOMALY_MIN_OBSERVATIONS = int(os.getenv('ML_ANOMALY_MIN_OBSERVATIONS') or 4)
+# Segundos entre cierres de buckets sin ventas en run_ml_worker (0 = desactivado)
+ML_ANOMALY_TICK_INTERVAL = int(os.getenv('ML_ANOMALY_TICK_INTERVAL') or 300)
+
+# Trabajos de reportes (ver reports/job_service.py y el comando run_report_worker)
+# Horas que se conserva el archivo de un reporte generado antes de borrarlo
+REPORT_ARTIFACT_TTL_HOURS = int(os.getenv('REPORT_ARTIFACT_TTL_HOURS') or 24)
+# Segundos sin progreso tras los cuales un reporte en curso se marca como fallido
+REPORT_JOB_TIMEOUT = int(os.getenv('REPORT_JOB_TIMEOUT') or 600)
+# Hilos de run_report_worker (las etapas esperan sobre todo al LLM y a la BD)
+REPORT_WORKERS = int(os.getenv('REPORT_WORKERS') or 2)
+# Segundos que se reutiliza el resumen de IA de un reporte con los mismos resultados
+REPORT_SUMMARY_CACHE_TTL = int(os.getenv('REPORT_SUMMARY_CACHE_TTL') or 86400)
+# Minutos que el resultado de una vista previa queda disponible para exportarlo
+REPORT_HANDLE_TTL_MINUTES = int(os.getenv('REPORT_HANDLE_TTL_MINUTES') or 30)
+# Filas máximas que guarda una vista previa; si la consulta tiene más, la exportación la repite
+REPORT_HANDLE_MAX_ROWS = int(os.getenv('REPORT_HANDLE_MAX_ROWS') or 10000)
+# Tope de filas por consulta de reporte (el resultado se marca como truncado), segundos
+# máximos por consulta y filas por lote al leer del cursor (ver reports/query_service.py)
+REPORT_MAX_ROWS = int(os.getenv('REPORT_MAX_ROWS') or 50000)
+REPORT_QUERY_TIMEOUT = int(os.getenv('REPORT_QUERY_TIMEOUT') or 30)
+REPORT_FETCH_BATCH = int(os.getenv('REPORT_FETCH_BATCH') or 2000)
+# Filas que se incluyen en la tabla de un PDF (el resto se descarga en Excel/CSV)
+REPORT_PDF_MAX_ROWS = int(os.getenv('REPORT_PDF_MAX_ROWS') or 10000)
 
 
 # Password validation
@@ -18,6 +18,19 @@ if [ -n "$DJANGO_SUPERUSER_USERNAME" ] && [ -n "$DJANGO_SUPERUSER_PASSWORD" ]; t
     python manage.py createsuperuser --noinput || true
 fi
 
+# Worker de entrenamientos ML en segundo plano (ML_WORKER_ENABLED=true). En Cloud Run se
+# ejecuta como servicio aparte (ver CLOUD_RUN_DEPLOYMENT.md): python manage.py run_ml_worker
+if [ "${ML_WORKER_ENABLED:-false}" = "true" ]; then
+    echo "🧠 Iniciando worker de entrenamientos ML..."
+    python manage.py run_ml_worker &
+fi
+
+# Worker de reportes en segundo plano (REPORT_WORKER_ENABLED=true). Sin worker, el
+# frontend cancela el trabajo que sigue en cola y genera el reporte en /reports/generate/
+if [ "${REPORT_WORKER_ENABLED:-false}" = "true" ]; then
+    echo "📄 Iniciando worker de reportes..."
+    python manage.py run_report_worker &
+fi
 echo "✅ Preparación completada. Iniciando servidor..."
 
 # Ejecutar el comando pasado al contenedor (por defecto gunicorn)
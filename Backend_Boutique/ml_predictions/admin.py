@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import MLModel, Prediction, SalesForecast, MLTrainingLog
+from .models import MLModel, Prediction, SalesForecast, MLTrainingLog, DailySalesFeature, InventoryRecommendation, ProductRecommendation, CustomerSegment, SalesAnomaly, SalesSeriesState
 
 
 @admin.register(MLModel)
@@ -26,6 +26,54 @@ class SalesForecastAdmin(admin.ModelAdmin):
 
 @admin.register(MLTrainingLog)
 class MLTrainingLogAdmin(admin.ModelAdmin):
-    list_display = ('model_type', 'status', 'records_processed', 'training_duration_seconds', 'started_at')
+    list_display = ('model_type', 'status', 'stage', 'progress', 'records_processed', 'training_duration_seconds', 'started_at')
     list_filter = ('model_type', 'status', 'started_at')
-    readonly_fields = ('id', 'started_at', 'completed_at')
+    readonly_fields = ('id', 'started_at', 'completed_at', 'claimed_at', 'heartbeat_at', 'stage_timings')
+
+
+@admin.register(DailySalesFeature)
+class DailySalesFeatureAdmin(admin.ModelAdmin):
+    list_display = ('date', 'total_sales', 'num_orders', 'sales_7d_avg', 'sales_30d_avg', 'computed_at')
+    date_hierarchy = 'date'
+    readonly_fields = ('computed_at',)
+
+
+@admin.register(InventoryRecommendation)
+class InventoryRecommendationAdmin(admin.ModelAdmin):
+    list_display = ('product', 'variant', 'avg_daily_demand', 'safety_stock', 'reorder_point', 'order_up_to', 'stock_at_computation', 'computed_at')
+    list_filter = ('product__category',)
+    search_fields = ('product__name', 'product__sku', 'variant__sku')
+    readonly_fields = ('computed_at',)
+
+
+@admin.register(ProductRecommendation)
+class ProductRecommendationAdmin(admin.ModelAdmin):
+    list_display = ('product', 'rank', 'recommended', 'score', 'support', 'method', 'computed_at')
+    list_filter = ('method',)
+    search_fields = ('product__name', 'product__sku')
+    raw_id_fields = ('product', 'recommended')
+    readonly_fields = ('computed_at',)
+
+
+@admin.register(CustomerSegment)
+class CustomerSegmentAdmin(admin.ModelAdmin):
+    list_display = ('user', 'segment', 'label', 'recency_days', 'frequency', 'monetary', 'computed_at')
+    list_filter = ('segment', 'label')
+    search_fields = ('user__username', 'user__email')
+    raw_id_fields = ('user',)
+    readonly_fields = ('computed_at',)
+
+
+@admin.register(SalesAnomaly)
+class SalesAnomalyAdmin(admin.ModelAdmin):
+    list_display = ('started_at', 'scope', 'key', 'granularity', 'direction', 'buckets', 'observed_orders', 'expected_orders', 'z_score')
+    list_filter = ('direction', 'scope', 'granularity')
+    date_hierarchy = 'started_at'
+    readonly_fields = ('detected_at', 'updated_at')
+
+
+@admin.register(SalesSeriesState)
+class SalesSeriesStateAdmin(admin.ModelAdmin):
+    list_display = ('scope', 'key', 'granularity', 'bucket_start', 'bucket_orders', 'bucket_revenue', 'updated_at')
+    list_filter = ('scope', 'granularity')
+    readonly_fields = ('updated_at',)
@@ -5,3 +5,6 @@ class MlPredictionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ml_predictions'
     verbose_name = 'Predicciones ML'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,115 @@
+"""
+Comando para medir la latencia de predict_future_sales sobre datos sintéticos
+Compara el bucle anterior (un predict por día) con el modo por lotes y el recursivo,
+y mide el costo de agregar intervalos de predicción a cada modo
+"""
+from django.core.management.base import BaseCommand
+from datetime import date, timedelta
+import time
+
+import numpy as np
+import pandas as pd
+
+from ml_predictions.services.sales_forecast import SalesForecastService, FEATURE_COLUMNS
+
+
+class Command(BaseCommand):
+    help = 'Benchmark de latencia del pronóstico de ventas (datos sintéticos, no usa la BD)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days-ahead', type=int, default=365, help='Horizonte a predecir (default: 365)')
+        parser.add_argument('--history-days', type=int, default=365, help='Días de historial sintético (default: 365)')
+        parser.add_argument('--repeat', type=int, default=3, help='Repeticiones por modo; se reporta la mejor (default: 3)')
+        parser.add_argument(
+            '--model-type',
+            default='random_forest',
+            choices=['random_forest', 'gradient_boosting', 'linear'],
+            help='Modelo a entrenar para el benchmark'
+        )
+
+    def handle(self, *args, **options):
+        days_ahead = options['days_ahead']
+        service = SalesForecastService()
+        history = service.build_features(self.synthetic_history(options['history_days']))
+
+        self.stdout.write(f"Entrenando {options['model_type']} con {len(history)} días sintéticos...")
+        result = service.train_model(df=history, model_type=options['model_type'], save=False)
+        if not result['success']:
+            self.stdout.write(self.style.ERROR(f"  ✗ {result['error']}"))
+            return
+
+        modes = [
+            ('loop (anterior)', lambda: self.legacy_forecast(service, history, days_ahead)),
+            ('batch', lambda: service.forecast_from_history(history, days_ahead, intervals=False)),
+            ('recursive', lambda: service.forecast_from_history(history, days_ahead, recursive=True, intervals=False)),
+            ('batch+int', lambda: service.forecast_from_history(history, days_ahead)),
+            ('recursive+int', lambda: service.forecast_from_history(history, days_ahead, recursive=True)),
+        ]
+        self.stdout.write(f'Horizonte: {days_ahead} días, mejor de {options["repeat"]} repeticiones')
+        baseline = None
+        timings = {}
+        for name, run in modes:
+            best = min(self.timed(run) for _ in range(options['repeat']))
+            baseline = baseline or best
+            timings[name] = best
+            self.stdout.write(self.style.SUCCESS(
+                f'  ✓ {name:<16} {best * 1000:10.1f} ms   x{baseline / best:6.1f}'
+            ))
+
+        # Objetivo: con intervalos, menos del doble de la latencia del pronóstico puntual
+        self.stdout.write(f'Intervalos ({service.interval_method()}):')
+        for mode in ('batch', 'recursive'):
+            ratio = timings[f'{mode}+int'] / timings[mode]
+            style = self.style.SUCCESS if ratio < 2 else self.style.ERROR
+            mark = '✓' if ratio < 2 else '✗'
+            self.stdout.write(style(f'  {mark} {mode:<16} x{ratio:5.2f} sobre el pronóstico puntual'))
+
+    @staticmethod
+    def timed(run):
+        start = time.perf_counter()
+        run()
+        return time.perf_counter() - start
+
+    @staticmethod
+    def synthetic_history(days):
+        """Serie diaria con tendencia, estacionalidad semanal y ruido"""
+        rng = np.random.default_rng(42)
+        dates = pd.date_range(end=date.today() - timedelta(days=1), periods=days, freq='D')
+        weekly = np.where(dates.dayofweek >= 5, 1.4, 1.0)
+        num_orders = rng.poisson(8 * weekly) + 1
+        total_sales = num_orders * rng.normal(120, 15, size=days).clip(min=20)
+        return pd.DataFrame({
+            'date': dates,
+            'total_sales': total_sales,
+            'total_quantity': num_orders * 2,
+            'num_orders': num_orders,
+        })
+
+    @staticmethod
+    def legacy_forecast(service, recent_data, days_ahead):
+        """Implementación previa: un DataFrame de una fila y un predict por día"""
+        last_date = recent_data['date'].max()
+        future_dates = pd.date_range(start=last_date + timedelta(days=1), periods=days_ahead, freq='D')
+        predictions = []
+        for future_date in future_dates:
+            features = {
+                'month': future_date.month,
+                'day': future_date.day,
+                'day_of_week': future_date.dayofweek,
+                'day_of_year': future_date.dayofyear,
+                'week_of_year': future_date.isocalendar().week,
+                'is_weekend': 1 if future_date.dayofweek >= 5 else 0,
+                'quarter': (future_date.month - 1) // 3 + 1,
+                'num_orders': recent_data['num_orders'].iloc[-7:].mean(),
+                'avg_order_value': recent_data['avg_order_value'].iloc[-7:].mean(),
+                'sales_7d_avg': recent_data['total_sales'].iloc[-7:].mean(),
+                'sales_30d_avg': recent_data['total_sales'].iloc[-30:].mean(),
+                'sales_7d_std': recent_data['total_sales'].iloc[-7:].std(),
+                'sales_lag_1': recent_data['total_sales'].iloc[-1],
+                'sales_lag_7': recent_data['total_sales'].iloc[-7],
+                'sales_lag_30': recent_data['total_sales'].iloc[-30],
+                'sales_pct_change_1d': 0,
+                'sales_pct_change_7d': 0
+            }
+            predictions.append(max(0, service.model.predict(pd.DataFrame([features])[FEATURE_COLUMNS])[0]))
+        return predictions
@@ -0,0 +1,44 @@
+"""
+Comando para construir/actualizar las recomendaciones "comprados juntos" y "similares"
+"""
+from django.core.management.base import BaseCommand
+
+from ml_predictions.services.product_recommendations import CoPurchaseRecommender, TOP_K
+from ml_predictions.services.product_similarity import ContentSimilarity
+
+
+class Command(BaseCommand):
+    help = 'Actualiza los top-k vecinos por producto (ProductRecommendation): co-compra y/o atributos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--method', choices=['co_purchase', 'content', 'all'], default='all',
+            help='co_purchase (comprados juntos), content (similares por atributos) o all (default)'
+        )
+        parser.add_argument('--full', action='store_true', help='Reconstruir desde cero en lugar de incrementalmente')
+        parser.add_argument('--top-k', type=int, default=TOP_K, help=f'Vecinos por producto (default: {TOP_K})')
+        parser.add_argument('--min-support', type=int, default=1, help='Órdenes en común mínimas por par, solo co_purchase (default: 1)')
+
+    def handle(self, *args, **options):
+        if options['method'] in ('co_purchase', 'all'):
+            recommender = CoPurchaseRecommender(top_k=options['top_k'], min_support=options['min_support'])
+            result = recommender.build(full=options['full'])
+            if not result['products_updated'] and not result['full']:
+                self.stdout.write('  - Comprados juntos: sin órdenes nuevas desde la última actualización')
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f"  ✓ Comprados juntos, {'reconstrucción completa' if result['full'] else 'actualización incremental'}: "
+                    f"+{result['orders_added']}/-{result['orders_removed']} órdenes, "
+                    f"{result['products_updated']} productos en {result['seconds']}s"
+                ))
+
+        if options['method'] in ('content', 'all'):
+            result = ContentSimilarity(top_k=options['top_k']).build(full=options['full'])
+            if not result['products_updated'] and not result['full']:
+                self.stdout.write('  - Similares: sin productos modificados desde la última actualización')
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f"  ✓ Similares, {'reconstrucción completa' if result['full'] else 'actualización incremental'}: "
+                    f"{result['products_updated']}/{result['products']} productos, "
+                    f"{result['features']} atributos en {result['seconds']}s"
+                ))
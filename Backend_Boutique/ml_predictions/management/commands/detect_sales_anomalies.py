@@ -0,0 +1,28 @@
+"""
+Comando para cerrar los buckets vencidos de las series de ventas (detección de anomalías)
+Con --warm-up reinicia los estados a partir de las ventas recientes
+"""
+from django.core.management.base import BaseCommand
+
+from ml_predictions.services.sales_anomalies import StreamingAnomalyDetector
+
+
+class Command(BaseCommand):
+    help = 'Cierra los buckets horarios/diarios vencidos y registra anomalías de ventas (SalesAnomaly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--warm-up', type=int, default=None, metavar='DAYS',
+            help='Reiniciar los estados reproduciendo las ventas de los últimos DAYS días (no registra anomalías)'
+        )
+
+    def handle(self, *args, **options):
+        detector = StreamingAnomalyDetector()
+        if options['warm_up']:
+            series = detector.warm_up(days=options['warm_up'])
+            self.stdout.write(self.style.SUCCESS(f"  ✓ {series} series inicializadas con {options['warm_up']} días de ventas"))
+        anomalies = detector.tick()
+        if anomalies:
+            self.stdout.write(self.style.WARNING(f'  ! {anomalies} bucket(s) de ventas anómalos'))
+        else:
+            self.stdout.write(self.style.SUCCESS('  ✓ Sin anomalías nuevas'))
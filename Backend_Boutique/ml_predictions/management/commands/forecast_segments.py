@@ -0,0 +1,33 @@
+"""
+Comando para pronosticar ventas por categoría y por producto (top-N)
+"""
+from django.core.management.base import BaseCommand
+
+from ml_predictions.services.segment_forecast import SegmentForecastService
+
+
+class Command(BaseCommand):
+    help = 'Entrena y predice una serie por categoría/producto en paralelo y guarda los SalesForecast'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scope', choices=['category', 'product', 'all'], default='all')
+        parser.add_argument('--horizon', type=int, default=30, help='Días a pronosticar (default: 30)')
+        parser.add_argument('--history-days', type=int, default=365, help='Días de historial (default: 365)')
+        parser.add_argument('--top-n', type=int, default=100, help='Productos más vendidos a pronosticar (default: 100)')
+        parser.add_argument('--workers', type=int, default=None, help='Procesos (default: ML_FORECAST_WORKERS)')
+
+    def handle(self, *args, **options):
+        scopes = ['category', 'product'] if options['scope'] == 'all' else [options['scope']]
+        service = SegmentForecastService(
+            horizon=options['horizon'],
+            history_days=options['history_days'],
+            top_n=options['top_n'],
+            workers=options['workers'],
+        )
+        for scope, result in service.run(scopes=scopes).items():
+            if result['success']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"  ✓ {scope}: {result['series']} series, {result['rows']} pronósticos en {result['seconds']}s"
+                ))
+            else:
+                self.stdout.write(self.style.WARNING(f"  ! {scope}: {result['error']}"))
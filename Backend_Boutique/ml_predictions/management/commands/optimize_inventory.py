@@ -0,0 +1,32 @@
+"""
+Comando para recalcular los puntos de reorden de todo el catálogo
+"""
+from django.core.management.base import BaseCommand
+
+from ml_predictions.services.inventory_optimization import InventoryOptimizationService
+
+
+class Command(BaseCommand):
+    help = 'Calcula demanda, stock de seguridad y punto de reorden por variante (InventoryRecommendation)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--history-days', type=int, default=90, help='Días de historial de ventas (default: 90)')
+        parser.add_argument('--lead-time', type=int, default=7, help='Días de reposición del proveedor (default: 7)')
+        parser.add_argument('--service-level', type=float, default=0.95, help='Nivel de servicio objetivo (default: 0.95)')
+        parser.add_argument('--review-days', type=int, default=14, help='Días que debe cubrir cada pedido (default: 14)')
+
+    def handle(self, *args, **options):
+        service = InventoryOptimizationService(
+            history_days=options['history_days'],
+            lead_time_days=options['lead_time'],
+            service_level=options['service_level'],
+            review_days=options['review_days'],
+        )
+        result = service.run()
+        if not result['success']:
+            self.stdout.write(self.style.ERROR(f"  ✗ {result['error']}"))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"  ✓ {result['items']} ítems en {result['seconds']}s: {result['to_reorder']} a reponer "
+            f"({result['units_to_order']} unidades)"
+        ))
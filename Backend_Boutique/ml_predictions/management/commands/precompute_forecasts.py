@@ -0,0 +1,30 @@
+"""
+Comando para precalcular los pronósticos de ventas del modelo activo
+Pensado para cron/worker: los requests posteriores con el mismo horizonte leen el resultado guardado
+"""
+from django.core.management.base import BaseCommand
+
+from ml_predictions.services.sales_forecast import DEFAULT_FORECAST_DAYS, precompute_forecast
+
+
+class Command(BaseCommand):
+    help = 'Precalcula y guarda los pronósticos de ventas para los datos actuales'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days-ahead', type=int, nargs='+', default=[DEFAULT_FORECAST_DAYS],
+            help=f'Horizontes a precalcular (default: {DEFAULT_FORECAST_DAYS})'
+        )
+        parser.add_argument('--recursive', action='store_true', help='Modo recursivo (lags con predicciones previas)')
+
+    def handle(self, *args, **options):
+        for days_ahead in options['days_ahead']:
+            result = precompute_forecast(days_ahead=days_ahead, recursive=options['recursive'])
+            if not result['success']:
+                self.stdout.write(self.style.ERROR(f"  ✗ {days_ahead} días: {result.get('error')}"))
+            elif result['cached']:
+                self.stdout.write(f'  - {days_ahead} días: ya estaba precalculado')
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f"  ✓ {days_ahead} días precalculados en {result['execution_time_ms']}ms"
+                ))
@@ -0,0 +1,118 @@
+"""
+Worker de entrenamientos ML
+Ejecuta los trabajos encolados en MLTrainingLog (ver services/training_jobs.py)
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+import time
+
+from ml_predictions.services.product_recommendations import CoPurchaseRecommender
+from ml_predictions.services.product_similarity import ContentSimilarity
+from ml_predictions.services.sales_anomalies import StreamingAnomalyDetector
+from ml_predictions.services.sales_forecast import precompute_forecast
+from ml_predictions.services.training_jobs import claim_next_job, fail_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta los entrenamientos de modelos ML encolados'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Procesar la cola actual, ejecutar una vez las tareas periódicas y terminar'
+        )
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Segundos entre consultas a la cola (default: 2)')
+        parser.add_argument('--max-jobs', type=int, default=None, help='Terminar después de N trabajos')
+        parser.add_argument(
+            '--precompute-interval', type=float, default=settings.ML_FORECAST_PRECOMPUTE_INTERVAL,
+            help='Segundos entre precálculos del pronóstico de 30 días cuando la cola está vacía (0 = nunca)'
+        )
+        parser.add_argument(
+            '--recommendations-interval', type=float, default=settings.ML_RECOMMENDATIONS_REFRESH_INTERVAL,
+            help='Segundos entre actualizaciones incrementales de "comprados juntos" y "similares" (0 = nunca)'
+        )
+        parser.add_argument(
+            '--anomaly-interval', type=float, default=settings.ML_ANOMALY_TICK_INTERVAL,
+            help='Segundos entre cierres de buckets de las series de anomalías de ventas (0 = nunca)'
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        # Tareas periódicas con la cola vacía: (intervalo, función, próxima ejecución)
+        periodic = [
+            [options['precompute_interval'], self._precompute, 0],
+            [options['recommendations_interval'], self._refresh_recommendations, 0],
+            [options['anomaly_interval'], self._tick_anomalies, 0],
+        ]
+        self.stdout.write(self.style.SUCCESS('🚀 Worker de entrenamientos ML iniciado'))
+        try:
+            while options['max_jobs'] is None or processed < options['max_jobs']:
+                close_old_connections()
+                stale = fail_stale_jobs(settings.ML_TRAINING_JOB_TIMEOUT)
+                if stale:
+                    self.stdout.write(self.style.WARNING(f'  ! {stale} trabajo(s) sin progreso marcados como fallidos'))
+
+                job = claim_next_job()
+                if job is None:
+                    if options['once']:
+                        # Con la cola vacía, las tareas periódicas corren una vez antes de terminar
+                        # (un Cloud Run Job programado no llega a la próxima vuelta del bucle)
+                        for interval, run, _ in periodic:
+                            if interval > 0:
+                                run()
+                        break
+                    for task in periodic:
+                        interval, run, next_run = task
+                        if interval > 0 and time.monotonic() >= next_run:
+                            task[2] = time.monotonic() + interval
+                            run()
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                self.stdout.write(f'Entrenando {job.model_type} ({job.id})...')
+                job = run_job(job)
+                processed += 1
+                if job.status == 'completed':
+                    self.stdout.write(self.style.SUCCESS(
+                        f'  ✓ {job.model_type} completado en {job.training_duration_seconds}s {job.stage_timings}'
+                    ))
+                elif job.status == 'canceled':
+                    self.stdout.write(self.style.WARNING(f'  ! {job.model_type} cancelado en la etapa {job.stage}'))
+                else:
+                    self.stdout.write(self.style.ERROR(f'  ✗ {job.model_type} falló: {job.error_message}'))
+        except KeyboardInterrupt:
+            self.stdout.write('Worker detenido')
+        self.stdout.write(self.style.SUCCESS(f'✅ Trabajos procesados: {processed}'))
+
+    def _precompute(self):
+        try:
+            result = precompute_forecast()
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'  ✗ Precálculo de pronóstico falló: {e}'))
+            return
+        if result['success'] and not result['cached']:
+            self.stdout.write(self.style.SUCCESS(
+                f"  ✓ Pronóstico de {len(result['predictions'])} días precalculado en {result['execution_time_ms']}ms"
+            ))
+
+    def _refresh_recommendations(self):
+        for label, builder in (('Recomendaciones', CoPurchaseRecommender()), ('Similares', ContentSimilarity())):
+            try:
+                result = builder.build()
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'  ✗ Actualización de {label.lower()} falló: {e}'))
+                continue
+            if result['products_updated']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"  ✓ {label}: {result['products_updated']} productos actualizados en {result['seconds']}s"
+                ))
+
+    def _tick_anomalies(self):
+        try:
+            anomalies = StreamingAnomalyDetector().tick()
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'  ✗ Detección de anomalías falló: {e}'))
+            return
+        if anomalies:
+            self.stdout.write(self.style.WARNING(f'  ! {anomalies} bucket(s) de ventas anómalos'))
@@ -3,6 +3,7 @@ Comando para poblar datos de ventas optimizado para ML
 Usa bulk_create y SQL directo para fechas históricas
 """
 from django.core.management.base import BaseCommand
+from django.core.management import call_command
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.db import connection, transaction
@@ -56,6 +57,11 @@ class Command(BaseCommand):
                 payment_methods=payment_methods,
                 addresses=addresses
             )
+            
+            # 4. Las órdenes se insertan con SQL directo: reconstruir proyecciones
+            call_command('rebuild_customer_stats', stdout=self.stdout)
+            call_command('rebuild_sales_facts', stdout=self.stdout)
+            call_command('sync_sales_features', '--full', stdout=self.stdout)
         
         self.stdout.write(self.style.SUCCESS('✅ ¡Población de datos completada!'))
 
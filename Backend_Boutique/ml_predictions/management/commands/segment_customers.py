@@ -0,0 +1,30 @@
+"""
+Comando para recalcular los segmentos RFM de clientes
+"""
+from django.core.management.base import BaseCommand
+
+from ml_predictions.models import CustomerSegment
+from ml_predictions.services.customer_segmentation import CustomerSegmentationService
+
+
+class Command(BaseCommand):
+    help = 'Segmenta a los clientes por recencia, frecuencia y monto con KMeans (CustomerSegment)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clusters', type=int, default=4, help='Número de segmentos (default: 4)')
+
+    def handle(self, *args, **options):
+        result = CustomerSegmentationService(n_clusters=options['clusters']).run()
+        if not result['success']:
+            self.stdout.write(self.style.ERROR(f"  ✗ {result['error']}"))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"  ✓ {result['customers']} clientes en {result['n_clusters']} segmentos en {result['seconds']}s "
+            f"(silueta: {result['silhouette']})"
+        ))
+        labels = dict(CustomerSegment.LABEL_CHOICES)
+        for segment in result['segments']:
+            self.stdout.write(
+                f"    {segment['segment']}. {labels[segment['label']]:<24} {segment['size']:>6} clientes, "
+                f"{segment['avg_recency_days']} días, {segment['avg_frequency']} órdenes, Bs. {segment['avg_monetary']}"
+            )
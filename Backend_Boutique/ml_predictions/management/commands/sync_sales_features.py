@@ -0,0 +1,17 @@
+"""
+Comando para sincronizar el feature store diario del pronóstico de ventas
+"""
+from django.core.management.base import BaseCommand
+
+from ml_predictions.services.feature_store import sync_feature_store
+
+
+class Command(BaseCommand):
+    help = 'Agrega/recalcula los días cerrados del feature store (DailySalesFeature) desde DailySalesFact'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recalcular todo el historial')
+
+    def handle(self, *args, **options):
+        written = sync_feature_store(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f'  ✓ Feature store sincronizado: {written} día(s) escritos'))
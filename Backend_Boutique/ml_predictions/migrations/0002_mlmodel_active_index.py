@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_predictions', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mlmodel',
+            index=models.Index(fields=['model_type', 'is_active', '-trained_at'], name='ml_model_active_idx'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fail_orphan_trainings(apps, schema_editor):
+    """Los entrenamientos síncronos interrumpidos quedaron en 'training'; se cierran antes de la restricción"""
+    MLTrainingLog = apps.get_model('ml_predictions', 'MLTrainingLog')
+    MLTrainingLog.objects.filter(status__in=['pending', 'training']).update(
+        status='failed',
+        error_message='Entrenamiento interrumpido (anterior a la cola de trabajos)',
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_predictions', '0002_mlmodel_active_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mltraininglog',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mltraininglog',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mltraininglog',
+            name='parameters',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='mltraininglog',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Porcentaje de avance (0-100)'),
+        ),
+        migrations.AddField(
+            model_name='mltraininglog',
+            name='stage',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='mltraininglog',
+            name='stage_timings',
+            field=models.JSONField(blank=True, default=dict, help_text='Segundos por etapa'),
+        ),
+        migrations.AddIndex(
+            model_name='mltraininglog',
+            index=models.Index(fields=['status', 'started_at'], name='ml_training_queue_idx'),
+        ),
+        migrations.RunPython(fail_orphan_trainings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='mltraininglog',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'training'])), fields=('model_type',), name='ml_training_one_active_per_type'),
+        ),
+    ]
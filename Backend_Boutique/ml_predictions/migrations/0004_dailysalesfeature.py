@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_predictions', '0003_training_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesFeature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('total_sales', models.FloatField(default=0)),
+                ('total_quantity', models.FloatField(default=0)),
+                ('num_orders', models.FloatField(default=0)),
+                ('avg_order_value', models.FloatField(default=0)),
+                ('month', models.PositiveSmallIntegerField()),
+                ('day', models.PositiveSmallIntegerField()),
+                ('day_of_week', models.PositiveSmallIntegerField()),
+                ('day_of_year', models.PositiveSmallIntegerField()),
+                ('week_of_year', models.PositiveSmallIntegerField()),
+                ('is_weekend', models.PositiveSmallIntegerField()),
+                ('quarter', models.PositiveSmallIntegerField()),
+                ('sales_7d_avg', models.FloatField(default=0)),
+                ('sales_30d_avg', models.FloatField(default=0)),
+                ('sales_7d_std', models.FloatField(default=0)),
+                ('sales_lag_1', models.FloatField(default=0)),
+                ('sales_lag_7', models.FloatField(default=0)),
+                ('sales_lag_30', models.FloatField(default=0)),
+                ('sales_pct_change_1d', models.FloatField(default=0)),
+                ('sales_pct_change_7d', models.FloatField(default=0)),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Característica diaria de ventas',
+                'verbose_name_plural': 'Características diarias de ventas',
+                'ordering': ['date'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_predictions', '0004_dailysalesfeature'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prediction',
+            name='cache_key',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=200),
+        ),
+    ]
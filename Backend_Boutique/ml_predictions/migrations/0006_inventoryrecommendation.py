@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_siteconfiguration'),
+        ('ml_predictions', '0005_prediction_cache_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('avg_daily_demand', models.FloatField(default=0)),
+                ('demand_std', models.FloatField(default=0)),
+                ('lead_time_days', models.PositiveSmallIntegerField()),
+                ('lead_time_demand', models.FloatField(default=0)),
+                ('safety_stock', models.FloatField(default=0)),
+                ('reorder_point', models.FloatField(default=0)),
+                ('order_up_to', models.FloatField(default=0, help_text='Nivel objetivo al reponer: punto de reorden + demanda del período de revisión')),
+                ('stock_at_computation', models.IntegerField(default=0)),
+                ('computed_at', models.DateTimeField()),
+                ('ml_model', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='inventory_recommendations', to='ml_predictions.mlmodel')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_recommendations', to='inventory.product')),
+                ('variant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='inventory_recommendations', to='inventory.productvariant')),
+            ],
+            options={
+                'verbose_name': 'Recomendación de inventario',
+                'verbose_name_plural': 'Recomendaciones de inventario',
+                'ordering': ['product', 'variant'],
+            },
+        ),
+    ]
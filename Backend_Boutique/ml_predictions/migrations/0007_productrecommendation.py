@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_siteconfiguration'),
+        ('ml_predictions', '0006_inventoryrecommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(choices=[('co_purchase', 'Comprados juntos')], max_length=20)),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('support', models.IntegerField(default=0, help_text='Órdenes en que ambos productos aparecen juntos')),
+                ('computed_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='inventory.product')),
+                ('recommended', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='inventory.product')),
+            ],
+            options={
+                'verbose_name': 'Recomendación de producto',
+                'verbose_name_plural': 'Recomendaciones de productos',
+                'ordering': ['method', 'product', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('method', 'product', 'rank'), name='ml_product_rec_rank_unique')],
+            },
+        ),
+    ]
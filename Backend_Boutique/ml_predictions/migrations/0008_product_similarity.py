@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_predictions', '0007_productrecommendation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mlmodel',
+            name='model_type',
+            field=models.CharField(choices=[('sales_forecast', 'Predicción de Ventas'), ('product_recommendation', 'Recomendación de Productos'), ('customer_segmentation', 'Segmentación de Clientes'), ('inventory_optimization', 'Optimización de Inventario'), ('product_similarity', 'Productos Similares')], max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='productrecommendation',
+            name='method',
+            field=models.CharField(choices=[('co_purchase', 'Comprados juntos'), ('content', 'Similares por atributos')], max_length=20),
+        ),
+    ]
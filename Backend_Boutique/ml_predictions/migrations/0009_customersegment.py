@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_alter_customuser_user_type'),
+        ('ml_predictions', '0008_product_similarity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerSegment',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ml_segment', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('segment', models.PositiveSmallIntegerField(help_text='Cluster ordenado por valor: 0 es el de mejores clientes')),
+                ('label', models.CharField(choices=[('champions', 'Campeones'), ('promising', 'Recientes de bajo valor'), ('at_risk', 'En riesgo'), ('hibernating', 'Inactivos')], max_length=20)),
+                ('recency_days', models.IntegerField()),
+                ('frequency', models.IntegerField()),
+                ('monetary', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('computed_at', models.DateTimeField()),
+                ('ml_model', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='customer_segments', to='ml_predictions.mlmodel')),
+            ],
+            options={
+                'verbose_name': 'Segmento de cliente',
+                'verbose_name_plural': 'Segmentos de clientes',
+                'ordering': ['segment', '-monetary'],
+                'indexes': [models.Index(fields=['segment', '-monetary'], name='ml_cust_segment_idx'), models.Index(fields=['label', '-monetary'], name='ml_cust_segment_label_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_predictions', '0009_customersegment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesAnomaly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('store', 'Tienda'), ('category', 'Categoría'), ('payment_method', 'Método de pago')], max_length=20)),
+                ('key', models.CharField(blank=True, default='', help_text='Id de la categoría o método de pago; vacío para la tienda', max_length=32)),
+                ('granularity', models.CharField(choices=[('hour', 'Hora'), ('day', 'Día')], max_length=10)),
+                ('direction', models.CharField(choices=[('drop', 'Caída'), ('spike', 'Pico')], max_length=10)),
+                ('started_at', models.DateTimeField(help_text='Inicio del primer bucket anómalo')),
+                ('ended_at', models.DateTimeField(help_text='Fin del último bucket anómalo')),
+                ('buckets', models.PositiveIntegerField(default=1)),
+                ('observed_orders', models.IntegerField(default=0)),
+                ('expected_orders', models.FloatField(default=0)),
+                ('observed_revenue', models.FloatField(default=0)),
+                ('expected_revenue', models.FloatField(default=0)),
+                ('z_score', models.FloatField(help_text='z más extremo de la racha')),
+                ('detected_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Anomalía de ventas',
+                'verbose_name_plural': 'Anomalías de ventas',
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['-started_at'], name='ml_anomaly_started_idx'), models.Index(fields=['scope', 'key', '-started_at'], name='ml_anomaly_series_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesSeriesState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('store', 'Tienda'), ('category', 'Categoría'), ('payment_method', 'Método de pago')], max_length=20)),
+                ('key', models.CharField(blank=True, default='', max_length=32)),
+                ('granularity', models.CharField(choices=[('hour', 'Hora'), ('day', 'Día')], max_length=10)),
+                ('bucket_start', models.DateTimeField()),
+                ('bucket_orders', models.IntegerField(default=0)),
+                ('bucket_revenue', models.FloatField(default=0)),
+                ('seasonal', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('open_anomaly', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='ml_predictions.salesanomaly')),
+            ],
+            options={
+                'verbose_name': 'Estado de serie de ventas',
+                'verbose_name_plural': 'Estados de series de ventas',
+                'constraints': [models.UniqueConstraint(fields=('scope', 'key', 'granularity'), name='ml_sales_series_unique')],
+            },
+        ),
+    ]
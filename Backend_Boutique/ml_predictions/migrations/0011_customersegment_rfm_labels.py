@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_predictions', '0010_sales_anomalies'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customersegment',
+            name='label',
+            field=models.CharField(choices=[('champions', 'Campeones'), ('loyal', 'Leales'), ('potential_loyalists', 'Leales potenciales'), ('new_customers', 'Nuevos'), ('promising', 'Prometedores'), ('need_attention', 'Requieren atención'), ('about_to_sleep', 'Por dormirse'), ('at_risk', 'En riesgo'), ('cant_lose', 'No se pueden perder'), ('hibernating', 'Hibernando'), ('lost', 'Perdidos')], max_length=20),
+        ),
+    ]
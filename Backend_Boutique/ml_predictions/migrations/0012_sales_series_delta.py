@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_predictions', '0011_customersegment_rfm_labels'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesSeriesDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('store', 'Tienda'), ('category', 'Categoría'), ('payment_method', 'Método de pago')], max_length=20)),
+                ('key', models.CharField(blank=True, default='', max_length=32)),
+                ('granularity', models.CharField(choices=[('hour', 'Hora'), ('day', 'Día')], max_length=10)),
+                ('bucket_start', models.DateTimeField()),
+                ('orders', models.IntegerField()),
+                ('revenue', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Aporte pendiente a serie de ventas',
+                'verbose_name_plural': 'Aportes pendientes a series de ventas',
+            },
+        ),
+    ]
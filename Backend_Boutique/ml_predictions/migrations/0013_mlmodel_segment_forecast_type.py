@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:12
+
+from django.db import migrations, models
+
+
+def retag_segment_forecasts(apps, schema_editor):
+    """Las ejecuciones por segmento se guardaban como sales_forecast inactivos; se distinguen por parameters.scope"""
+    MLModel = apps.get_model('ml_predictions', 'MLModel')
+    MLModel.objects.filter(model_type='sales_forecast', parameters__has_key='scope').update(model_type='segment_forecast')
+
+
+def untag_segment_forecasts(apps, schema_editor):
+    MLModel = apps.get_model('ml_predictions', 'MLModel')
+    MLModel.objects.filter(model_type='segment_forecast').update(model_type='sales_forecast', is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_predictions', '0012_sales_series_delta'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mlmodel',
+            name='model_type',
+            field=models.CharField(choices=[('sales_forecast', 'Predicción de Ventas'), ('product_recommendation', 'Recomendación de Productos'), ('customer_segmentation', 'Segmentación de Clientes'), ('inventory_optimization', 'Optimización de Inventario'), ('product_similarity', 'Productos Similares'), ('segment_forecast', 'Pronóstico por Segmento')], max_length=50),
+        ),
+        migrations.RunPython(retag_segment_forecasts, untag_segment_forecasts),
+    ]
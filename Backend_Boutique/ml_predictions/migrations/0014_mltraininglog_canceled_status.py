@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_predictions', '0013_mlmodel_segment_forecast_type'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mltraininglog',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pendiente'), ('training', 'Entrenando'), ('completed', 'Completado'), ('failed', 'Fallido'), ('canceled', 'Cancelado')], default='pending', max_length=20),
+        ),
+    ]
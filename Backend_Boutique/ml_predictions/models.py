@@ -14,6 +14,8 @@ class MLModel(models.Model):
         ('product_recommendation', 'Recomendación de Productos'),
         ('customer_segmentation', 'Segmentación de Clientes'),
         ('inventory_optimization', 'Optimización de Inventario'),
+        ('product_similarity', 'Productos Similares'),
+        ('segment_forecast', 'Pronóstico por Segmento'),
     ]
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -35,6 +37,9 @@ class MLModel(models.Model):
         ordering = ['-trained_at']
         verbose_name = 'Modelo ML'
         verbose_name_plural = 'Modelos ML'
+        indexes = [
+            models.Index(fields=['model_type', 'is_active', '-trained_at'], name='ml_model_active_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} v{self.version}"
@@ -52,6 +57,8 @@ class Prediction(models.Model):
     requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     execution_time_ms = models.IntegerField(default=0)
+    # (modelo, versión, horizonte, modo, marca de agua de datos): permite reutilizar el resultado
+    cache_key = models.CharField(max_length=200, blank=True, default='', db_index=True)
     
     class Meta:
         ordering = ['-created_at']
@@ -95,6 +102,7 @@ class MLTrainingLog(models.Model):
         ('training', 'Entrenando'),
         ('completed', 'Completado'),
         ('failed', 'Fallido'),
+        ('canceled', 'Cancelado'),
     ]
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -110,11 +118,269 @@ class MLTrainingLog(models.Model):
     started_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     model_saved = models.ForeignKey(MLModel, on_delete=models.SET_NULL, null=True, blank=True)
+    # Ejecución como trabajo en segundo plano (ver services/training_jobs.py)
+    parameters = models.JSONField(default=dict, blank=True)
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Porcentaje de avance (0-100)")
+    stage = models.CharField(max_length=50, blank=True, default='')
+    stage_timings = models.JSONField(default=dict, blank=True, help_text="Segundos por etapa")
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    
+    ACTIVE_STATUSES = ('pending', 'training')
     
     class Meta:
         ordering = ['-started_at']
         verbose_name = 'Log de Entrenamiento'
         verbose_name_plural = 'Logs de Entrenamiento'
+        constraints = [
+            # Un solo entrenamiento en cola o en curso por tipo de modelo
+            models.UniqueConstraint(
+                fields=['model_type'],
+                condition=models.Q(status__in=['pending', 'training']),
+                name='ml_training_one_active_per_type',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'started_at'], name='ml_training_queue_idx'),
+        ]
     
     def __str__(self):
         return f"Entrenamiento {self.model_type} - {self.status}"
+
+
+class DailySalesFeature(models.Model):
+    """
+    Feature store diario para el pronóstico de ventas (ver services/feature_store.py).
+    Una fila por día calendario cerrado, incluidos los días sin ventas (en cero),
+    con las características ya derivadas de DailySalesFact.
+    """
+    date = models.DateField(unique=True)
+    total_sales = models.FloatField(default=0)
+    total_quantity = models.FloatField(default=0)
+    num_orders = models.FloatField(default=0)
+    avg_order_value = models.FloatField(default=0)
+    
+    month = models.PositiveSmallIntegerField()
+    day = models.PositiveSmallIntegerField()
+    day_of_week = models.PositiveSmallIntegerField()
+    day_of_year = models.PositiveSmallIntegerField()
+    week_of_year = models.PositiveSmallIntegerField()
+    is_weekend = models.PositiveSmallIntegerField()
+    quarter = models.PositiveSmallIntegerField()
+    
+    sales_7d_avg = models.FloatField(default=0)
+    sales_30d_avg = models.FloatField(default=0)
+    sales_7d_std = models.FloatField(default=0)
+    sales_lag_1 = models.FloatField(default=0)
+    sales_lag_7 = models.FloatField(default=0)
+    sales_lag_30 = models.FloatField(default=0)
+    sales_pct_change_1d = models.FloatField(default=0)
+    sales_pct_change_7d = models.FloatField(default=0)
+    
+    # Inicio de la sincronización que escribió la fila (marca de agua frente a DailySalesFact.updated_at)
+    computed_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['date']
+        verbose_name = 'Característica diaria de ventas'
+        verbose_name_plural = 'Características diarias de ventas'
+    
+    def __str__(self):
+        return f"{self.date}: Bs. {self.total_sales:.2f}"
+
+
+class InventoryRecommendation(models.Model):
+    """
+    Punto de reorden por ítem de inventario (ver services/inventory_optimization.py).
+    Un ítem es una variante, o el producto si no tiene variantes. Cada ejecución
+    reemplaza el conjunto completo; el stock se compara en vivo al consultar.
+    """
+    product = models.ForeignKey('inventory.Product', on_delete=models.CASCADE, related_name='inventory_recommendations')
+    variant = models.ForeignKey('inventory.ProductVariant', on_delete=models.CASCADE, null=True, blank=True, related_name='inventory_recommendations')
+    ml_model = models.ForeignKey(MLModel, on_delete=models.SET_NULL, null=True, blank=True, related_name='inventory_recommendations')
+    avg_daily_demand = models.FloatField(default=0)
+    demand_std = models.FloatField(default=0)
+    lead_time_days = models.PositiveSmallIntegerField()
+    lead_time_demand = models.FloatField(default=0)
+    safety_stock = models.FloatField(default=0)
+    reorder_point = models.FloatField(default=0)
+    order_up_to = models.FloatField(default=0, help_text="Nivel objetivo al reponer: punto de reorden + demanda del período de revisión")
+    stock_at_computation = models.IntegerField(default=0)
+    computed_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['product', 'variant']
+        verbose_name = 'Recomendación de inventario'
+        verbose_name_plural = 'Recomendaciones de inventario'
+    
+    def __str__(self):
+        item = self.variant or self.product
+        return f"{item}: reorden en {self.reorder_point:.1f}"
+
+
+class ProductRecommendation(models.Model):
+    """
+    Vecinos precalculados por producto (top-k), servidos desde el índice en memoria
+    de services/product_recommendations.py
+    """
+    METHOD_CHOICES = [
+        ('co_purchase', 'Comprados juntos'),
+        ('content', 'Similares por atributos'),
+    ]
+    
+    method = models.CharField(max_length=20, choices=METHOD_CHOICES)
+    product = models.ForeignKey('inventory.Product', on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey('inventory.Product', on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    support = models.IntegerField(default=0, help_text="Órdenes en que ambos productos aparecen juntos")
+    computed_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['method', 'product', 'rank']
+        verbose_name = 'Recomendación de producto'
+        verbose_name_plural = 'Recomendaciones de productos'
+        constraints = [
+            models.UniqueConstraint(fields=['method', 'product', 'rank'], name='ml_product_rec_rank_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id} → {self.recommended_id} ({self.score:.3f})"
+
+
+class CustomerSegment(models.Model):
+    """
+    Segmento RFM (recencia, frecuencia, monto) por cliente, asignado por KMeans
+    (ver services/customer_segmentation.py). Cada ejecución reemplaza el conjunto
+    completo; las listas de marketing se leen de aquí, sin agregar órdenes.
+    """
+    LABEL_CHOICES = [
+        ('champions', 'Campeones'),
+        ('loyal', 'Leales'),
+        ('potential_loyalists', 'Leales potenciales'),
+        ('new_customers', 'Nuevos'),
+        ('promising', 'Prometedores'),
+        ('need_attention', 'Requieren atención'),
+        ('about_to_sleep', 'Por dormirse'),
+        ('at_risk', 'En riesgo'),
+        ('cant_lose', 'No se pueden perder'),
+        ('hibernating', 'Hibernando'),
+        ('lost', 'Perdidos'),
+    ]
+    
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='ml_segment')
+    ml_model = models.ForeignKey(MLModel, on_delete=models.SET_NULL, null=True, blank=True, related_name='customer_segments')
+    segment = models.PositiveSmallIntegerField(help_text="Cluster ordenado por valor: 0 es el de mejores clientes")
+    label = models.CharField(max_length=20, choices=LABEL_CHOICES)
+    recency_days = models.IntegerField()
+    frequency = models.IntegerField()
+    monetary = models.DecimalField(max_digits=14, decimal_places=2)
+    computed_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['segment', '-monetary']
+        verbose_name = 'Segmento de cliente'
+        verbose_name_plural = 'Segmentos de clientes'
+        indexes = [
+            models.Index(fields=['segment', '-monetary'], name='ml_cust_segment_idx'),
+            models.Index(fields=['label', '-monetary'], name='ml_cust_segment_label_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id}: segmento {self.segment} ({self.label})"
+
+
+class SalesAnomaly(models.Model):
+    """
+    Racha de buckets (horas o días) con ventas anormalmente bajas o altas en una serie
+    (tienda, categoría o método de pago). Mientras la racha sigue, se extiende la misma fila.
+    """
+    SCOPE_CHOICES = [
+        ('store', 'Tienda'),
+        ('category', 'Categoría'),
+        ('payment_method', 'Método de pago'),
+    ]
+    GRANULARITY_CHOICES = [
+        ('hour', 'Hora'),
+        ('day', 'Día'),
+    ]
+    DIRECTION_CHOICES = [
+        ('drop', 'Caída'),
+        ('spike', 'Pico'),
+    ]
+    
+    scope = models.CharField(max_length=20, choices=SCOPE_CHOICES)
+    key = models.CharField(max_length=32, blank=True, default='', help_text="Id de la categoría o método de pago; vacío para la tienda")
+    granularity = models.CharField(max_length=10, choices=GRANULARITY_CHOICES)
+    direction = models.CharField(max_length=10, choices=DIRECTION_CHOICES)
+    started_at = models.DateTimeField(help_text="Inicio del primer bucket anómalo")
+    ended_at = models.DateTimeField(help_text="Fin del último bucket anómalo")
+    buckets = models.PositiveIntegerField(default=1)
+    observed_orders = models.IntegerField(default=0)
+    expected_orders = models.FloatField(default=0)
+    observed_revenue = models.FloatField(default=0)
+    expected_revenue = models.FloatField(default=0)
+    z_score = models.FloatField(help_text="z más extremo de la racha")
+    detected_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-started_at']
+        verbose_name = 'Anomalía de ventas'
+        verbose_name_plural = 'Anomalías de ventas'
+        indexes = [
+            models.Index(fields=['-started_at'], name='ml_anomaly_started_idx'),
+            models.Index(fields=['scope', 'key', '-started_at'], name='ml_anomaly_series_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.direction} {self.scope}:{self.key or '-'} ({self.granularity}) {self.started_at:%Y-%m-%d %H:%M}"
+
+
+class SalesSeriesState(models.Model):
+    """
+    Estado O(1) de una serie de ventas para la detección de anomalías en streaming:
+    el bucket abierto y, por franja estacional (hora del día o día de la semana),
+    [media de órdenes, varianza, observaciones, media de ingresos] con EWMA.
+    """
+    scope = models.CharField(max_length=20, choices=SalesAnomaly.SCOPE_CHOICES)
+    key = models.CharField(max_length=32, blank=True, default='')
+    granularity = models.CharField(max_length=10, choices=SalesAnomaly.GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+    bucket_orders = models.IntegerField(default=0)
+    bucket_revenue = models.FloatField(default=0)
+    seasonal = models.JSONField(default=list)
+    open_anomaly = models.ForeignKey(SalesAnomaly, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Estado de serie de ventas'
+        verbose_name_plural = 'Estados de series de ventas'
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key', 'granularity'], name='ml_sales_series_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.scope}:{self.key or '-'} ({self.granularity})"
+
+
+class SalesSeriesDelta(models.Model):
+    """
+    Aporte pendiente de una transición de orden al bucket de una serie. Las transiciones
+    solo insertan filas (sin bloquear SalesSeriesState); tick() las acumula en los
+    buckets, cierra los vencidos y las borra.
+    """
+    scope = models.CharField(max_length=20, choices=SalesAnomaly.SCOPE_CHOICES)
+    key = models.CharField(max_length=32, blank=True, default='')
+    granularity = models.CharField(max_length=10, choices=SalesAnomaly.GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+    orders = models.IntegerField()
+    revenue = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Aporte pendiente a serie de ventas'
+        verbose_name_plural = 'Aportes pendientes a series de ventas'
+    
+    def __str__(self):
+        return f"{self.scope}:{self.key or '-'} ({self.granularity}) {self.bucket_start}: {self.orders:+d}"
@@ -0,0 +1,225 @@
+"""
+Segmentación de clientes RFM (recencia, frecuencia, monto)
+Lee las métricas por cliente de la proyección CustomerStats en una sola consulta,
+agrupa con KMeans sobre log(1 + RFM) estandarizado y guarda el segmento de cada
+cliente en CustomerSegment; las listas de marketing se leen de esa tabla.
+"""
+import time
+import numpy as np
+from django.db import transaction
+from django.db.models import Avg, Count
+from django.utils import timezone
+from scipy.optimize import linear_sum_assignment
+from scipy.stats import rankdata
+from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score
+from sklearn.preprocessing import StandardScaler
+from orders.models import CustomerStats
+from ml_predictions.models import MLModel, CustomerSegment
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Muestra máxima para el coeficiente de silueta (O(n²) en memoria)
+SILHOUETTE_SAMPLE = 5000
+
+
+class CustomerSegmentationService:
+    """
+    KMeans sobre (recencia, frecuencia, monto). Los clusters se numeran por valor
+    (0 = mejores clientes) y se etiquetan con los puntajes RFM por percentil de sus
+    clientes: cada segmento recibe la etiqueta más cercana a su perfil, sin repetir.
+    """
+    MODEL_TYPE = 'customer_segmentation'
+
+    # Perfil típico de cada etiqueta: percentil (0-1) de recencia (1 = compró hace poco),
+    # frecuencia y monto. Hay más etiquetas que el máximo de segmentos.
+    LABEL_PROFILES = {
+        'champions': (0.90, 0.90, 0.90),
+        'loyal': (0.65, 0.85, 0.80),
+        'potential_loyalists': (0.85, 0.50, 0.50),
+        'new_customers': (0.95, 0.10, 0.20),
+        'promising': (0.75, 0.20, 0.30),
+        'need_attention': (0.50, 0.50, 0.50),
+        'about_to_sleep': (0.35, 0.25, 0.30),
+        'at_risk': (0.20, 0.75, 0.75),
+        'cant_lose': (0.08, 0.92, 0.92),
+        'hibernating': (0.15, 0.30, 0.30),
+        'lost': (0.05, 0.08, 0.08),
+    }
+
+    def __init__(self, n_clusters=4):
+        if not 2 <= n_clusters <= 10:
+            raise ValueError("n_clusters debe estar entre 2 y 10")
+        self.n_clusters = n_clusters
+
+    @staticmethod
+    def rfm():
+        """(user_ids, recencia en días, frecuencia, monto) de los clientes activos con compras"""
+        rows = list(CustomerStats.objects.filter(
+            order_count__gt=0,
+            last_order_at__isnull=False,
+            user__is_active=True
+        ).order_by('user_id').values_list('user_id', 'last_order_at', 'order_count', 'total_spent'))
+        now = timezone.now()
+        user_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        recency = np.array([(now - row[1]).days for row in rows], dtype=np.float64).clip(min=0)
+        frequency = np.array([row[2] for row in rows], dtype=np.float64)
+        monetary = np.array([row[3] for row in rows], dtype=np.float64)
+        return user_ids, recency, frequency, monetary
+
+    def cluster(self, recency, frequency, monetary):
+        """
+        Asigna segmentos; devuelve (segmento por cliente, etiqueta por segmento, inercia, silueta)
+        """
+        features = np.log1p(np.column_stack([recency, frequency, monetary]))
+        X = StandardScaler().fit_transform(features)
+        n_clusters = min(self.n_clusters, len(np.unique(X, axis=0)))
+        kmeans = KMeans(n_clusters=n_clusters, n_init=10, random_state=42).fit(X)
+
+        # Valor del centroide: más reciente, más frecuente y más monto es mejor
+        centers = kmeans.cluster_centers_
+        value = -centers[:, 0] + centers[:, 1] + centers[:, 2]
+        order = np.argsort(-value)
+        segment_of_cluster = np.empty(n_clusters, dtype=np.int64)
+        segment_of_cluster[order] = np.arange(n_clusters)
+        segments = segment_of_cluster[kmeans.labels_]
+
+        labels = self.label_segments(recency, frequency, monetary, segments, n_clusters)
+
+        silhouette = None
+        if 1 < n_clusters < len(X):
+            silhouette = float(silhouette_score(
+                X, segments, sample_size=min(len(X), SILHOUETTE_SAMPLE), random_state=42
+            ))
+        return segments, labels, float(kmeans.inertia_), silhouette
+
+    @staticmethod
+    def rfm_scores(recency, frequency, monetary):
+        """Percentil (0-1) de cada cliente en recencia (invertida), frecuencia y monto"""
+        n = len(recency)
+        return np.column_stack([
+            (rankdata(-recency) - 0.5) / n,
+            (rankdata(frequency) - 0.5) / n,
+            (rankdata(monetary) - 0.5) / n,
+        ])
+
+    def label_segments(self, recency, frequency, monetary, segments, n_clusters):
+        """
+        Etiqueta de cada segmento: asignación de costo mínimo (distancia entre el
+        percentil RFM medio del segmento y el perfil de la etiqueta), una por segmento
+        """
+        scores = self.rfm_scores(recency, frequency, monetary)
+        centers = np.array([scores[segments == segment].mean(axis=0) for segment in range(n_clusters)])
+        names = list(self.LABEL_PROFILES)
+        profiles = np.array([self.LABEL_PROFILES[name] for name in names])
+        cost = ((centers[:, None, :] - profiles[None, :, :]) ** 2).sum(axis=2)
+        rows, cols = linear_sum_assignment(cost)
+        labels = [None] * n_clusters
+        for segment, label in zip(rows, cols):
+            labels[segment] = names[label]
+        return labels
+
+    def run(self, requested_by=None):
+        """Recalcula todos los segmentos y reemplaza los guardados"""
+        start_time = time.time()
+        user_ids, recency, frequency, monetary = self.rfm()
+        if len(user_ids) < self.n_clusters:
+            return {'success': False, 'error': f'Se necesitan al menos {self.n_clusters} clientes con compras'}
+        segments, labels, inertia, silhouette = self.cluster(recency, frequency, monetary)
+
+        scores = self.rfm_scores(recency, frequency, monetary)
+        summary = []
+        for segment, label in enumerate(labels):
+            mask = segments == segment
+            r_score, f_score, m_score = (1 + 4 * scores[mask].mean(axis=0)).round(1).tolist()
+            summary.append({
+                'segment': segment,
+                'label': label,
+                'rfm_score': {'recency': r_score, 'frequency': f_score, 'monetary': m_score},
+                'size': int(mask.sum()),
+                'avg_recency_days': round(float(recency[mask].mean()), 1),
+                'avg_frequency': round(float(frequency[mask].mean()), 2),
+                'avg_monetary': round(float(monetary[mask].mean()), 2),
+            })
+        metrics = {
+            'customers': len(user_ids),
+            'n_clusters': len(labels),
+            'inertia': round(inertia, 3),
+            'silhouette': None if silhouette is None else round(silhouette, 4),
+            'segments': summary,
+        }
+
+        computed_at = timezone.now()
+        with transaction.atomic():
+            ml_model = MLModel.objects.create(
+                name='Segmentación de clientes (RFM + KMeans)',
+                model_type=self.MODEL_TYPE,
+                version=timezone.localtime(computed_at).strftime('%Y%m%d_%H%M%S'),
+                file_path='',
+                parameters={'n_clusters': self.n_clusters},
+                metrics=metrics,
+                training_data_size=len(user_ids),
+                trained_by=requested_by,
+            )
+            MLModel.objects.filter(
+                model_type=self.MODEL_TYPE, is_active=True
+            ).exclude(id=ml_model.id).update(is_active=False)
+            CustomerSegment.objects.all().delete()
+            CustomerSegment.objects.bulk_create(
+                (
+                    CustomerSegment(
+                        user_id=user_id,
+                        ml_model=ml_model,
+                        segment=segment,
+                        label=labels[segment],
+                        recency_days=int(days),
+                        frequency=int(orders),
+                        monetary=round(float(amount), 2),
+                        computed_at=computed_at,
+                    )
+                    for user_id, segment, days, orders, amount in zip(
+                        user_ids.tolist(), segments.tolist(), recency.tolist(), frequency.tolist(), monetary.tolist()
+                    )
+                ),
+                batch_size=2000,
+            )
+        seconds = round(time.time() - start_time, 2)
+        logger.info(f"Clientes segmentados: {len(user_ids)} en {len(labels)} segmentos en {seconds}s")
+        return {'success': True, 'model_id': str(ml_model.id), 'seconds': seconds, **metrics}
+
+
+def segment_sizes():
+    """Tamaño y promedios actuales de cada segmento guardado"""
+    return list(CustomerSegment.objects.values('segment', 'label').annotate(
+        size=Count('user_id'),
+        avg_recency_days=Avg('recency_days'),
+        avg_frequency=Avg('frequency'),
+        avg_monetary=Avg('monetary'),
+    ).order_by('segment'))
+
+
+def segment_members(segment=None, label=None):
+    """Clientes de un segmento o etiqueta, de mayor a menor monto"""
+    queryset = CustomerSegment.objects.select_related('user')
+    if segment is not None:
+        queryset = queryset.filter(segment=segment)
+    if label is not None:
+        queryset = queryset.filter(label=label)
+    return queryset.order_by('-monetary', 'user_id')
+
+
+def member_as_dict(member):
+    user = member.user
+    return {
+        'user_id': user.id,
+        'username': user.username,
+        'name': user.get_full_name() or user.username,
+        'email': user.email,
+        'phone': user.phone,
+        'segment': member.segment,
+        'label': member.label,
+        'recency_days': member.recency_days,
+        'frequency': member.frequency,
+        'monetary': float(member.monetary),
+    }
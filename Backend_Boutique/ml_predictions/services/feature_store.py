@@ -0,0 +1,163 @@
+"""
+Feature store diario para el pronóstico de ventas
+Deriva de DailySalesFact una fila por día cerrado (con relleno de días sin ventas)
+y la persiste en DailySalesFeature; cada sincronización solo recalcula los días
+nuevos o los que cambiaron desde la anterior
+"""
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Sum, Min, Max, Count
+from django.utils import timezone
+from orders.models import DailySalesFact
+from ml_predictions.models import DailySalesFeature
+import logging
+
+logger = logging.getLogger(__name__)
+
+FEATURE_COLUMNS = [
+    'month', 'day', 'day_of_week', 'day_of_year', 'week_of_year',
+    'is_weekend', 'quarter', 'num_orders', 'avg_order_value',
+    'sales_7d_avg', 'sales_30d_avg', 'sales_7d_std',
+    'sales_lag_1', 'sales_lag_7', 'sales_lag_30',
+    'sales_pct_change_1d', 'sales_pct_change_7d'
+]
+STORE_COLUMNS = list(dict.fromkeys(['total_sales', 'total_quantity', 'num_orders', 'avg_order_value'] + FEATURE_COLUMNS))
+
+# Ventana más larga usada por lags/promedios: días previos necesarios para recalcular un día
+CONTEXT_DAYS = 30
+
+
+def build_features(df):
+    """
+    Ingeniería de características sobre un DataFrame diario con columnas
+    date, total_sales, total_quantity y num_orders
+    """
+    # Convertir columnas Decimal a float para evitar errores de tipo
+    df['total_sales'] = pd.to_numeric(df['total_sales'], errors='coerce').fillna(0).astype(float)
+    df['total_quantity'] = pd.to_numeric(df['total_quantity'], errors='coerce').fillna(0).astype(float)
+    df['num_orders'] = pd.to_numeric(df['num_orders'], errors='coerce').fillna(0).astype(float)
+    df['avg_order_value'] = (df['total_sales'] / df['num_orders']).fillna(0)
+
+    # Ingeniería de características temporales
+    df['date'] = pd.to_datetime(df['date'])
+    df['year'] = df['date'].dt.year
+    df['month'] = df['date'].dt.month
+    df['day'] = df['date'].dt.day
+    df['day_of_week'] = df['date'].dt.dayofweek  # 0=Monday, 6=Sunday
+    df['day_of_year'] = df['date'].dt.dayofyear
+    df['week_of_year'] = df['date'].dt.isocalendar().week.astype(int)
+    df['is_weekend'] = df['day_of_week'].isin([5, 6]).astype(int)
+    df['quarter'] = df['date'].dt.quarter
+
+    # Características de tendencia (rolling averages)
+    df = df.sort_values('date')
+    df['sales_7d_avg'] = df['total_sales'].rolling(window=7, min_periods=1).mean()
+    df['sales_30d_avg'] = df['total_sales'].rolling(window=30, min_periods=1).mean()
+    df['sales_7d_std'] = df['total_sales'].rolling(window=7, min_periods=1).std().fillna(0)
+
+    # Características lag (ventas días anteriores)
+    df['sales_lag_1'] = df['total_sales'].shift(1).fillna(0)
+    df['sales_lag_7'] = df['total_sales'].shift(7).fillna(0)
+    df['sales_lag_30'] = df['total_sales'].shift(30).fillna(0)
+
+    # Características de momentum (cambio porcentual)
+    df['sales_pct_change_1d'] = df['total_sales'].pct_change(1).fillna(0).replace([np.inf, -np.inf], 0)
+    df['sales_pct_change_7d'] = df['total_sales'].pct_change(7).fillna(0).replace([np.inf, -np.inf], 0)
+
+    # Rellenar cualquier NaN restante
+    return df.fillna(0)
+
+
+def daily_totals(start_date, end_date):
+    """Totales diarios de venta efectiva entre dos fechas, con los días sin ventas en cero"""
+    rows = DailySalesFact.objects.filter(
+        status_class='sale',
+        date__gte=start_date,
+        date__lte=end_date
+    ).values('date').annotate(
+        total_sales=Sum('order_total'),
+        total_quantity=Sum('order_items'),
+        num_orders=Sum('order_count')
+    ).order_by('date')
+
+    df = pd.DataFrame(list(rows), columns=['date', 'total_sales', 'total_quantity', 'num_orders'])
+    df['date'] = pd.to_datetime(df['date'])
+    calendar = pd.date_range(start_date, end_date, freq='D', name='date')
+    return df.set_index('date').reindex(calendar, fill_value=0).reset_index()
+
+
+def sync_feature_store(full=False):
+    """
+    Agrega al feature store los días cerrados (hasta ayer) que falten y recalcula los
+    que cambiaron en DailySalesFact desde la última sincronización. Devuelve filas escritas.
+    """
+    sync_started = timezone.now()
+    last_closed = timezone.localdate() - timedelta(days=1)
+    first_sale = DailySalesFact.objects.filter(
+        status_class='sale', order_count__gt=0
+    ).aggregate(first=Min('date'))['first']
+    if first_sale is None or first_sale > last_closed:
+        DailySalesFeature.objects.all().delete()
+        return 0
+
+    store = DailySalesFeature.objects.aggregate(first=Min('date'), last=Max('date'), synced=Max('computed_at'))
+    if full or store['first'] != first_sale:
+        recompute_from = first_sale
+    else:
+        recompute_from = store['last'] + timedelta(days=1)
+        changed = DailySalesFact.objects.filter(
+            updated_at__gte=store['synced']
+        ).aggregate(first=Min('date'))['first']
+        if changed is not None:
+            recompute_from = max(first_sale, min(recompute_from, changed))
+    if recompute_from > last_closed:
+        return 0
+
+    context_start = max(first_sale, recompute_from - timedelta(days=CONTEXT_DAYS))
+    df = build_features(daily_totals(context_start, last_closed))
+    df = df[df['date'] >= pd.Timestamp(recompute_from)]
+
+    values = df[STORE_COLUMNS].to_numpy(dtype=float)
+    rows = [
+        DailySalesFeature(date=day.date(), computed_at=sync_started, **dict(zip(STORE_COLUMNS, row)))
+        for day, row in zip(df['date'], values.tolist())
+    ]
+    try:
+        with transaction.atomic():
+            DailySalesFeature.objects.filter(date__gte=recompute_from).delete()
+            DailySalesFeature.objects.filter(date__lt=first_sale).delete()
+            DailySalesFeature.objects.bulk_create(rows, batch_size=1000)
+    except IntegrityError:
+        # Otra sincronización concurrente escribió los mismos días
+        logger.info("Feature store sincronizado por otro proceso")
+        return 0
+    logger.info(f"Feature store: {len(rows)} días recalculados desde {recompute_from}")
+    return len(rows)
+
+
+def feature_watermark():
+    """Identifica el estado del feature store: último día, última sincronización con cambios y filas"""
+    state = DailySalesFeature.objects.aggregate(last=Max('date'), synced=Max('computed_at'), rows=Count('id'))
+    synced = state['synced'].isoformat() if state['synced'] else ''
+    return f"{state['last']}:{synced}:{state['rows']}"
+
+
+def load_feature_matrix(start_date=None, columns=STORE_COLUMNS):
+    """Devuelve (fechas, matriz float64) del feature store, ordenadas por fecha"""
+    qs = DailySalesFeature.objects.order_by('date')
+    if start_date:
+        qs = qs.filter(date__gte=start_date)
+    rows = list(qs.values_list('date', *columns))
+    dates = pd.to_datetime([row[0] for row in rows])
+    matrix = np.array([row[1:] for row in rows], dtype=float).reshape(len(rows), len(columns))
+    return dates, matrix
+
+
+def load_feature_frame(start_date=None):
+    """El feature store como DataFrame (mismas columnas que ``build_features``)"""
+    dates, matrix = load_feature_matrix(start_date)
+    df = pd.DataFrame(matrix, columns=STORE_COLUMNS)
+    df.insert(0, 'date', dates)
+    return df
@@ -0,0 +1,197 @@
+"""
+Optimización de inventario: punto de reorden por variante
+Con la demanda diaria de DailySalesFact calcula, para todo el catálogo en una pasada
+NumPy, demanda media y desviación, demanda durante el tiempo de reposición, stock de
+seguridad y punto de reorden; el resultado queda en InventoryRecommendation
+"""
+import math
+import time
+import numpy as np
+from datetime import timedelta
+from statistics import NormalDist
+from django.db import transaction
+from django.db.models import Case, ExpressionWrapper, F, FloatField, Sum, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from orders.models import DailySalesFact
+from inventory.models import Product, ProductVariant
+from ml_predictions.models import MLModel, InventoryRecommendation
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Resultados de ``compute`` que se guardan en InventoryRecommendation
+STORED_COLUMNS = ['avg_daily_demand', 'demand_std', 'lead_time_demand', 'safety_stock', 'reorder_point', 'order_up_to']
+
+
+class InventoryOptimizationService:
+    """
+    Punto de reorden = demanda media × tiempo de reposición + z × desviación × √tiempo de reposición.
+    Si el stock está en o bajo ese punto, se sugiere pedir hasta cubrir además ``review_days``.
+    """
+    MODEL_TYPE = 'inventory_optimization'
+
+    def __init__(self, history_days=90, lead_time_days=7, service_level=0.95, review_days=14):
+        if not 0.5 <= service_level < 1:
+            raise ValueError("service_level debe estar entre 0.5 y 1")
+        self.history_days = history_days
+        self.lead_time_days = lead_time_days
+        self.service_level = service_level
+        self.review_days = review_days
+
+    def catalog(self):
+        """Ítems activos: (product_id, variant_id, stock); variant_id es None si el producto no tiene variantes"""
+        variants = ProductVariant.objects.filter(product__is_active=True).values_list('product_id', 'id', 'stock')
+        plain = Product.objects.filter(is_active=True, variants__isnull=True).values_list('id', 'stock')
+        return list(variants) + [(product_id, None, stock) for product_id, stock in plain]
+
+    def demand_matrix(self, items):
+        """Unidades vendidas por ítem y día (ítems × días), con los días sin ventas en cero"""
+        end_date = timezone.localdate() - timedelta(days=1)
+        start_date = end_date - timedelta(days=self.history_days - 1)
+        position = {(product_id, variant_id): i for i, (product_id, variant_id, _) in enumerate(items)}
+        rows = DailySalesFact.objects.filter(
+            status_class='sale',
+            date__gte=start_date,
+            date__lte=end_date,
+            product__isnull=False
+        ).values('date', 'product_id', 'variant_id').annotate(
+            units=Sum('quantity')
+        ).order_by().values_list('date', 'product_id', 'variant_id', 'units')
+
+        matrix = np.zeros((len(items), self.history_days), dtype=np.float64)
+        # Ventas de ítems fuera del catálogo actual (inactivos o eliminados) no cuentan
+        hits = [(position[(product_id, variant_id)], (day - start_date).days, units)
+                for day, product_id, variant_id, units in rows
+                if (product_id, variant_id) in position]
+        if hits:
+            item_idx, day_idx, units = (np.array(column) for column in zip(*hits))
+            np.add.at(matrix, (item_idx, day_idx), units.astype(np.float64))
+        return matrix
+
+    def compute(self, demand, stock):
+        """Cálculo vectorizado sobre la matriz de demanda; devuelve un dict de arreglos por ítem"""
+        z = NormalDist().inv_cdf(self.service_level)
+        mean = demand.mean(axis=1)
+        std = demand.std(axis=1, ddof=1) if demand.shape[1] > 1 else np.zeros(len(demand))
+        lead_time_demand = mean * self.lead_time_days
+        safety_stock = z * std * np.sqrt(self.lead_time_days)
+        reorder_point = lead_time_demand + safety_stock
+        order_up_to = reorder_point + mean * self.review_days
+        needs_reorder = (mean > 0) & (stock <= reorder_point)
+        return {
+            'avg_daily_demand': mean,
+            'demand_std': std,
+            'lead_time_demand': lead_time_demand,
+            'safety_stock': safety_stock,
+            'reorder_point': reorder_point,
+            'order_up_to': order_up_to,
+            'needs_reorder': needs_reorder,
+            'suggested_order_qty': np.where(needs_reorder, np.ceil(np.maximum(order_up_to - stock, 0)), 0),
+        }
+
+    def run(self, requested_by=None):
+        """Recalcula todo el catálogo y reemplaza las recomendaciones guardadas"""
+        start_time = time.time()
+        items = self.catalog()
+        if not items:
+            return {'success': False, 'error': 'No hay productos activos'}
+        stock = np.array([max(item[2], 0) for item in items], dtype=np.float64)
+        result = self.compute(self.demand_matrix(items), stock)
+        computed_at = timezone.now()
+        parameters = {
+            'history_days': self.history_days,
+            'lead_time_days': self.lead_time_days,
+            'service_level': self.service_level,
+            'review_days': self.review_days,
+        }
+        # Situación al momento del cálculo; las consultas comparan contra el stock en vivo
+        metrics = {
+            'items': len(items),
+            'items_with_demand': int((result['avg_daily_demand'] > 0).sum()),
+            'to_reorder': int(result['needs_reorder'].sum()),
+            'units_to_order': int(result['suggested_order_qty'].sum()),
+        }
+
+        columns = {name: result[name].tolist() for name in STORED_COLUMNS}
+        with transaction.atomic():
+            ml_model = MLModel.objects.create(
+                name='Optimización de inventario (punto de reorden)',
+                model_type=self.MODEL_TYPE,
+                version=timezone.localtime(computed_at).strftime('%Y%m%d_%H%M%S'),
+                file_path='',
+                parameters=parameters,
+                metrics=metrics,
+                training_data_size=len(items),
+                trained_by=requested_by,
+            )
+            MLModel.objects.filter(
+                model_type=self.MODEL_TYPE, is_active=True
+            ).exclude(id=ml_model.id).update(is_active=False)
+            InventoryRecommendation.objects.all().delete()
+            InventoryRecommendation.objects.bulk_create(
+                (
+                    InventoryRecommendation(
+                        product_id=product_id,
+                        variant_id=variant_id,
+                        ml_model=ml_model,
+                        lead_time_days=self.lead_time_days,
+                        stock_at_computation=item_stock,
+                        computed_at=computed_at,
+                        **{name: columns[name][i] for name in STORED_COLUMNS}
+                    )
+                    for i, (product_id, variant_id, item_stock) in enumerate(items)
+                ),
+                batch_size=2000,
+            )
+        seconds = round(time.time() - start_time, 2)
+        logger.info(f"Inventario optimizado: {metrics['to_reorder']}/{len(items)} ítems a reponer en {seconds}s")
+        return {'success': True, 'model_id': str(ml_model.id), 'seconds': seconds, **metrics}
+
+
+def reorder_list(limit=50, include_all=False):
+    """
+    Ítems cuyo stock actual está en o bajo su punto de reorden (o todos), primero los
+    que menos días de stock tienen. Anota ``live_stock`` y ``days_of_cover``.
+    """
+    queryset = InventoryRecommendation.objects.select_related('product__category', 'variant').annotate(
+        live_stock=Coalesce('variant__stock', 'product__stock')
+    ).annotate(
+        days_of_cover=Case(
+            When(avg_daily_demand__gt=0, then=ExpressionWrapper(
+                F('live_stock') / F('avg_daily_demand'), output_field=FloatField()
+            )),
+            default=None,
+            output_field=FloatField()
+        )
+    )
+    if not include_all:
+        queryset = queryset.filter(avg_daily_demand__gt=0, live_stock__lte=F('reorder_point'))
+    # Sin demanda (days_of_cover vacío) al final
+    return list(queryset.order_by(F('days_of_cover').asc(nulls_last=True), 'product__name')[:limit])
+
+
+def recommendation_as_dict(rec):
+    """Fila de InventoryRecommendation (anotada por ``reorder_list``) para las respuestas de la API"""
+    product = rec.product
+    stock = max(rec.live_stock, 0)
+    needs_reorder = rec.avg_daily_demand > 0 and stock <= rec.reorder_point
+    return {
+        'id': product.id,
+        'name': product.name,
+        'sku': (rec.variant.sku or f"{product.sku}-{rec.variant.size}") if rec.variant else product.sku,
+        'variant_id': rec.variant_id,
+        'size': rec.variant.size if rec.variant else None,
+        'stock': rec.live_stock,
+        'category__name': product.category.name if product.category else None,
+        'price': product.price,
+        'avg_daily_demand': round(rec.avg_daily_demand, 3),
+        'demand_std': round(rec.demand_std, 3),
+        'lead_time_days': rec.lead_time_days,
+        'lead_time_demand': round(rec.lead_time_demand, 2),
+        'safety_stock': round(rec.safety_stock, 2),
+        'reorder_point': round(rec.reorder_point, 2),
+        'suggested_order_qty': math.ceil(max(rec.order_up_to - stock, 0)) if needs_reorder else 0,
+        'days_of_cover': None if rec.days_of_cover is None else round(rec.days_of_cover, 1),
+        'needs_reorder': needs_reorder,
+    }
@@ -0,0 +1,167 @@
+"""
+Registro de modelos ML en memoria del proceso
+Mantiene deserializado el estimador del MLModel activo de cada tipo y solo
+vuelve a cargar cuando cambia el modelo activo.
+
+Los artefactos se guardan en el storage por defecto (GCS en producción): el worker que
+entrena y el servicio web que predice no comparten disco. Cada proceso guarda una copia
+local por versión en MODELS_DIR y solo descarga las versiones que no tiene.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import joblib
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from ml_predictions.models import MLModel
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Copia local de los artefactos (caché por versión)
+MODELS_DIR = os.path.join(settings.BASE_DIR, 'ml_predictions', 'ml_models')
+
+
+def artifact_name(model_type, version):
+    """Nombre del artefacto de una versión en el storage: ml_models/<model_type>/<version>.joblib"""
+    return f'ml_models/{model_type}/{version}.joblib'
+
+
+def _storage_path(name):
+    """Ruta en disco si el storage es local (FileSystemStorage); None si es remoto"""
+    try:
+        return default_storage.path(name)
+    except NotImplementedError:
+        return None
+
+
+def save_artifact(obj, model_type, version):
+    """
+    Serializa ``obj`` con joblib y lo sube al storage. Devuelve el nombre guardado,
+    que va en MLModel.file_path.
+    """
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=MODELS_DIR, suffix='.joblib')
+    os.close(fd)
+    try:
+        joblib.dump(obj, temp_path)
+        with open(temp_path, 'rb') as artifact:
+            name = default_storage.save(artifact_name(model_type, version), File(artifact))
+        if _storage_path(name) is None:
+            # Storage remoto: el archivo recién escrito queda como copia local de la versión
+            cached = os.path.join(MODELS_DIR, name)
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+            os.replace(temp_path, cached)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return name
+
+
+def local_artifact(name):
+    """Ruta local del artefacto, descargándolo del storage si esta versión no está en caché"""
+    if not name:
+        raise FileNotFoundError("El modelo no tiene artefacto")
+    if os.path.isabs(name):
+        # Artefactos anteriores: ruta en el disco del proceso que entrenó
+        if not os.path.exists(name):
+            raise FileNotFoundError(f"No se encontró el artefacto del modelo: {name}")
+        return name
+    path = _storage_path(name)
+    if path is not None:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No se encontró el artefacto del modelo: {name}")
+        return path
+    cached = os.path.join(MODELS_DIR, name)
+    if not os.path.exists(cached):
+        directory = os.path.dirname(cached)
+        os.makedirs(directory, exist_ok=True)
+        if not default_storage.exists(name):
+            raise FileNotFoundError(f"No se encontró el artefacto del modelo: {name}")
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as target, default_storage.open(name, 'rb') as source:
+                shutil.copyfileobj(source, target)
+            os.replace(temp_path, cached)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        logger.info(f"Artefacto {name} descargado del storage")
+    return cached
+
+
+def delete_artifact(name):
+    """Borra un artefacto del storage y su copia local (o la ruta absoluta de los anteriores)"""
+    if not name:
+        return
+    if os.path.isabs(name):
+        if os.path.exists(name):
+            os.remove(name)
+        return
+    default_storage.delete(name)
+    cached = os.path.join(MODELS_DIR, name)
+    if os.path.exists(cached):
+        os.remove(cached)
+
+
+class ModelRegistry:
+    """
+    Caché de estimadores por tipo de modelo, indexada por (id, versión) del MLModel.
+    Cada consulta verifica con una lectura ligera cuál es el modelo activo; si coincide
+    con el cargado se devuelve el de memoria.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get_active(self, model_type):
+        """Devuelve (MLModel, estimador) del modelo activo más reciente, o (None, None)"""
+        ml_model = MLModel.objects.filter(
+            model_type=model_type,
+            is_active=True
+        ).order_by('-trained_at').first()
+        if ml_model is None:
+            return None, None
+        return ml_model, self.get(ml_model)
+
+    def get(self, ml_model):
+        """Estimador de un MLModel concreto, cargándolo solo si no está en memoria"""
+        key = (str(ml_model.id), ml_model.version)
+        entry = self._entries.get(ml_model.model_type)
+        if entry and entry[0] == key:
+            return entry[1]
+        with self._lock:
+            entry = self._entries.get(ml_model.model_type)
+            if entry and entry[0] == key:
+                return entry[1]
+            estimator = self._load(ml_model.file_path)
+            self._entries[ml_model.model_type] = (key, estimator)
+            return estimator
+
+    def register(self, ml_model, estimator):
+        """Publica un estimador recién entrenado sin volver a leerlo de disco"""
+        with self._lock:
+            self._entries[ml_model.model_type] = ((str(ml_model.id), ml_model.version), estimator)
+
+    def invalidate(self, model_type=None):
+        with self._lock:
+            if model_type is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(model_type, None)
+
+    @staticmethod
+    def _load(name):
+        path = local_artifact(name)
+        # Artefactos grandes: los arrays de numpy se mapean en memoria (solo lectura)
+        # en lugar de copiarse, y el SO comparte esas páginas entre procesos
+        mmap_mode = 'r' if os.path.getsize(path) >= settings.ML_MODEL_MMAP_MIN_BYTES else None
+        estimator = joblib.load(path, mmap_mode=mmap_mode)
+        logger.info(f"Modelo cargado desde {name}" + (" (memory-mapped)" if mmap_mode else ""))
+        return estimator
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,116 @@
+"""
+Selección automática del modelo de pronóstico de ventas
+Evalúa una grilla pequeña de RandomForest, GradientBoosting y modelos lineales con
+validación temporal (TimeSeriesSplit: cada fold entrena con el pasado y evalúa con
+los días siguientes), en paralelo con joblib y dentro de un presupuesto de tiempo.
+No importa Django: los workers de joblib solo cargan este módulo.
+"""
+import time
+from itertools import product
+import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
+from sklearn.model_selection import TimeSeriesSplit
+
+# (tipo, estimador base, grilla) de más barato a más caro: si se agota el presupuesto
+# quedan evaluadas al menos las opciones rápidas. Los árboles usan n_jobs=1 porque el
+# paralelismo es entre candidatos.
+SEARCH_SPACE = [
+    ('linear', LinearRegression(), {}),
+    ('linear', Ridge(), {'alpha': [1.0, 10.0, 100.0]}),
+    ('gradient_boosting', GradientBoostingRegressor(random_state=42), {
+        'n_estimators': [100, 200],
+        'max_depth': [3, 5],
+        'learning_rate': [0.05, 0.1],
+    }),
+    ('random_forest', RandomForestRegressor(min_samples_split=5, random_state=42, n_jobs=1), {
+        'n_estimators': [100, 200],
+        'max_depth': [6, 10],
+        'min_samples_leaf': [1, 2],
+    }),
+]
+
+
+def candidates():
+    """Lista de (tipo, estimador sin entrenar, parámetros) con la grilla expandida"""
+    expanded = []
+    for model_type, base, grid in SEARCH_SPACE:
+        keys = list(grid)
+        for values in product(*(grid[key] for key in keys)):
+            params = dict(zip(keys, values))
+            expanded.append((model_type, clone(base).set_params(**params), params))
+    return expanded
+
+
+def time_series_splits(n_samples, n_splits=5):
+    """Folds temporales; con pocas filas se reduce el número de folds (mínimo 2)"""
+    n_splits = max(2, min(n_splits, n_samples // 10))
+    return list(TimeSeriesSplit(n_splits=n_splits).split(np.arange(n_samples)))
+
+
+def evaluate_candidate(index, model_type, estimator, params, X, y, splits):
+    """Métricas promedio de un candidato sobre los folds temporales"""
+    started = time.perf_counter()
+    rmse, mae, r2 = [], [], []
+    for train_idx, test_idx in splits:
+        model = clone(estimator).fit(X[train_idx], y[train_idx])
+        y_pred = model.predict(X[test_idx])
+        rmse.append(np.sqrt(mean_squared_error(y[test_idx], y_pred)))
+        mae.append(mean_absolute_error(y[test_idx], y_pred))
+        r2.append(r2_score(y[test_idx], y_pred) if len(test_idx) > 1 else 0.0)
+    return {
+        'index': index,
+        'model_type': model_type,
+        'estimator': type(estimator).__name__,
+        'params': params,
+        'cv_rmse': float(np.mean(rmse)),
+        'cv_rmse_std': float(np.std(rmse)),
+        'cv_mae': float(np.mean(mae)),
+        'cv_r2': float(np.nan_to_num(np.mean(r2))),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+def select_model(X, y, n_splits=5, time_budget=None, n_jobs=-1):
+    """
+    Evalúa todos los candidatos y devuelve el ganador (menor RMSE temporal) sin entrenar,
+    junto con el leaderboard. Cuando se supera ``time_budget`` (segundos) no se lanzan
+    más tandas; los candidatos restantes quedan en ``skipped``.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    splits = time_series_splits(len(X), n_splits)
+    pending = candidates()
+    workers = effective_n_jobs(n_jobs)
+
+    started = time.perf_counter()
+    results, skipped = [], []
+    with Parallel(n_jobs=workers) as parallel:
+        for offset in range(0, len(pending), workers):
+            if time_budget and results and time.perf_counter() - started >= time_budget:
+                skipped = pending[offset:]
+                break
+            batch = pending[offset:offset + workers]
+            results += parallel(
+                delayed(evaluate_candidate)(offset + i, model_type, estimator, params, X, y, splits)
+                for i, (model_type, estimator, params) in enumerate(batch)
+            )
+
+    leaderboard = sorted(results, key=lambda result: (result['cv_rmse'], result['seconds']))
+    for rank, result in enumerate(leaderboard, start=1):
+        result['rank'] = rank
+    best = leaderboard[0]
+    return {
+        'estimator': clone(pending[best.pop('index')][1]),
+        'best': best,
+        'leaderboard': [{k: v for k, v in result.items() if k != 'index'} for result in leaderboard],
+        'n_splits': len(splits),
+        'n_jobs': workers,
+        'evaluated': len(results),
+        'skipped': [f"{type(estimator).__name__} {params}" for _, estimator, params in skipped],
+        'time_budget_seconds': time_budget,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
@@ -0,0 +1,378 @@
+"""
+Recomendaciones "comprados juntos" por co-ocurrencia en canastas
+Las órdenes con venta efectiva forman una matriz dispersa canasta × producto; su
+producto B^T·B da cuántas órdenes comparten cada par de productos. Se guardan los
+top-k vecinos por producto (ProductRecommendation) y se sirven desde un índice en
+memoria que se llena bajo demanda, sin consultar el historial de órdenes por request.
+
+La matriz de co-ocurrencia y las órdenes ya contadas se guardan como artefacto del
+MLModel activo, de modo que una reconstrucción incremental solo suma/resta las
+canastas de las órdenes que entraron o salieron de un estado de venta.
+"""
+import threading
+from collections import OrderedDict
+import time
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from orders.models import Order, OrderItem
+from inventory.models import Product
+from ml_predictions.models import MLModel, ProductRecommendation
+from .model_registry import delete_artifact, local_artifact, save_artifact
+import logging
+
+logger = logging.getLogger(__name__)
+
+TOP_K = 20
+# Productos cuyos vecinos se mantienen en memoria por proceso (los menos usados se descartan)
+INDEX_MAX_PRODUCTS = 5000
+# Órdenes por consulta al leer canastas de una lista de órdenes
+ORDER_CHUNK = 500
+
+
+class NeighborModelBuilder:
+    """
+    Persistencia común de los modelos de vecinos por producto: artefacto joblib con el
+    estado para reconstrucciones incrementales, filas de ProductRecommendation y MLModel activo
+    """
+    MODEL_TYPE = None
+    METHOD = None
+    MODEL_NAME = None
+    # Métrica que se registra como training_data_size del MLModel
+    SIZE_METRIC = None
+
+    def parameters(self):
+        return {'method': self.METHOD, 'top_k': self.top_k}
+
+    def active_model(self):
+        return MLModel.objects.filter(model_type=self.MODEL_TYPE, is_active=True).order_by('-trained_at').first()
+
+    def load_state(self, ml_model):
+        if ml_model is None or not ml_model.file_path:
+            return None
+        try:
+            return joblib.load(local_artifact(ml_model.file_path))
+        except Exception as e:
+            logger.warning(f"Artefacto de {self.MODEL_TYPE} ilegible, se reconstruye completo: {str(e)}")
+            return None
+
+    def save(self, ml_model, state, neighbors, metrics, requested_by, full):
+        """
+        ``neighbors``: {product_id: [(recommended_id, score, support), ...]} de los productos
+        recalculados. Con ``full`` reemplaza todas las filas del método; si no, solo las de esos productos.
+        El MLModel dado se actualiza en su lugar (versión y artefacto nuevos); sin él se crea uno activo.
+        """
+        computed_at = timezone.now()
+        version = timezone.localtime(computed_at).strftime('%Y%m%d_%H%M%S_%f')
+        path = save_artifact(state, self.MODEL_TYPE, version)
+
+        existing = set(Product.objects.values_list('id', flat=True))
+        rows = [
+            ProductRecommendation(
+                method=self.METHOD,
+                product_id=product_id,
+                recommended_id=recommended_id,
+                rank=rank,
+                score=score,
+                support=support,
+                computed_at=computed_at,
+            )
+            for product_id, items in neighbors.items() if product_id in existing
+            for rank, (recommended_id, score, support) in enumerate(
+                (item for item in items if item[0] in existing), start=1
+            )
+        ]
+        previous_path = ml_model.file_path if ml_model else None
+        with transaction.atomic():
+            stale = ProductRecommendation.objects.filter(method=self.METHOD)
+            if full:
+                stale.delete()
+            else:
+                updated = list(neighbors)
+                for start in range(0, len(updated), ORDER_CHUNK):
+                    stale.filter(product_id__in=updated[start:start + ORDER_CHUNK]).delete()
+            ProductRecommendation.objects.bulk_create(rows, batch_size=2000)
+
+            if ml_model is None:
+                ml_model = MLModel.objects.create(
+                    name=self.MODEL_NAME,
+                    model_type=self.MODEL_TYPE,
+                    version=version,
+                    file_path=path,
+                    parameters=self.parameters(),
+                    metrics=metrics,
+                    training_data_size=metrics[self.SIZE_METRIC],
+                    trained_by=requested_by,
+                )
+                MLModel.objects.filter(
+                    model_type=self.MODEL_TYPE, is_active=True
+                ).exclude(id=ml_model.id).update(is_active=False)
+            else:
+                ml_model.version, ml_model.file_path = version, path
+                ml_model.metrics, ml_model.training_data_size = metrics, metrics[self.SIZE_METRIC]
+                ml_model.save(update_fields=['version', 'file_path', 'metrics', 'training_data_size'])
+        # El artefacto anterior del mismo modelo queda reemplazado
+        if previous_path and previous_path != path:
+            try:
+                delete_artifact(previous_path)
+            except Exception as e:
+                logger.warning(f"No se pudo borrar el artefacto anterior {previous_path}: {str(e)}")
+        return ml_model
+
+
+class CoPurchaseRecommender(NeighborModelBuilder):
+    """
+    Similitud coseno entre productos según las órdenes en que aparecen:
+    score(i, j) = órdenes con i y j / √(órdenes con i × órdenes con j)
+    """
+    MODEL_TYPE = 'product_recommendation'
+    METHOD = 'co_purchase'
+    MODEL_NAME = 'Comprados juntos (co-ocurrencia)'
+    SIZE_METRIC = 'orders'
+
+    def __init__(self, top_k=TOP_K, min_support=1):
+        self.top_k = top_k
+        self.min_support = min_support
+
+    def parameters(self):
+        return {**super().parameters(), 'min_support': self.min_support}
+
+    @staticmethod
+    def sale_order_ids():
+        return np.fromiter(
+            Order.objects.filter(status__in=Order.SALE_STATUSES).order_by('id').values_list('id', flat=True),
+            dtype=np.int64
+        )
+
+    def basket_matrix(self, order_ids, position, full=False):
+        """
+        Matriz binaria (órdenes × productos) de las órdenes dadas. Los productos nuevos
+        se agregan a ``position`` (producto → columna).
+        """
+        if full:
+            pairs = list(OrderItem.objects.filter(
+                order__status__in=Order.SALE_STATUSES, product__isnull=False
+            ).values_list('order_id', 'product_id'))
+        else:
+            pairs = []
+            for start in range(0, len(order_ids), ORDER_CHUNK):
+                chunk = order_ids[start:start + ORDER_CHUNK].tolist()
+                pairs += OrderItem.objects.filter(
+                    order_id__in=chunk, product__isnull=False
+                ).values_list('order_id', 'product_id')
+        for _, product_id in pairs:
+            position.setdefault(product_id, len(position))
+
+        shape = (len(order_ids), len(position))
+        if not pairs or not len(order_ids):
+            return sp.csr_matrix(shape, dtype=np.int32)
+        orders = np.fromiter((pair[0] for pair in pairs), dtype=np.int64, count=len(pairs))
+        columns = np.fromiter((position[pair[1]] for pair in pairs), dtype=np.int64, count=len(pairs))
+        rows = np.minimum(np.searchsorted(order_ids, orders), max(len(order_ids) - 1, 0))
+        # Órdenes que cambiaron de estado entre ambas consultas quedan fuera
+        valid = order_ids[rows] == orders
+        rows, columns = rows[valid], columns[valid]
+        baskets = sp.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, columns)), shape=shape)
+        # Un producto cuenta una vez por orden aunque tenga varias líneas (tallas)
+        baskets.data[:] = 1
+        return baskets
+
+    def top_neighbors(self, co_counts, product_ids, rows):
+        """
+        Top-k por fila de la matriz de co-ocurrencia: {fila: [(columna, score, soporte), ...]}.
+        Los empates se ordenan por id de producto para que el resultado no dependa del orden de columnas.
+        """
+        co_counts = co_counts.tocsr()
+        # La diagonal es el número de órdenes de cada producto
+        counts = co_counts.diagonal().astype(np.float64)
+        inv_sqrt = np.zeros_like(counts)
+        np.divide(1.0, np.sqrt(counts), out=inv_sqrt, where=counts > 0)
+
+        neighbors = {}
+        for row in rows:
+            start, end = co_counts.indptr[row], co_counts.indptr[row + 1]
+            columns = co_counts.indices[start:end]
+            support = co_counts.data[start:end]
+            row_scores = support * inv_sqrt[row] * inv_sqrt[columns]
+            keep = (columns != row) & (support >= self.min_support)
+            columns, support, row_scores = columns[keep], support[keep], row_scores[keep]
+            if len(columns) > self.top_k:
+                best = np.argpartition(-row_scores, self.top_k)[:self.top_k]
+                columns, support, row_scores = columns[best], support[best], row_scores[best]
+            order = np.lexsort((product_ids[columns], -support, -row_scores))
+            neighbors[row] = list(zip(columns[order].tolist(), row_scores[order].tolist(), support[order].tolist()))
+        return neighbors
+
+    def build(self, full=False, requested_by=None):
+        """
+        Actualiza la co-ocurrencia y los vecinos. Sin ``full`` parte del artefacto del
+        modelo activo y procesa solo las órdenes que cambiaron desde la última vez.
+        """
+        start_time = time.time()
+        ml_model = None if full else self.active_model()
+        state = self.load_state(ml_model)
+        current = self.sale_order_ids()
+
+        if state is None:
+            ml_model = None
+            product_ids, co_counts = np.empty(0, dtype=np.int64), sp.csr_matrix((0, 0), dtype=np.int32)
+            added, removed = current, np.empty(0, dtype=np.int64)
+        else:
+            product_ids, co_counts = state['product_ids'], state['co_counts']
+            added = np.setdiff1d(current, state['order_ids'], assume_unique=True)
+            removed = np.setdiff1d(state['order_ids'], current, assume_unique=True)
+            if not len(added) and not len(removed):
+                return {'success': True, 'full': False, 'orders_added': 0, 'orders_removed': 0, 'products_updated': 0}
+
+        position = {product_id: i for i, product_id in enumerate(product_ids.tolist())}
+        plus = self.basket_matrix(added, position, full=state is None)
+        minus = self.basket_matrix(removed, position)
+        size = len(position)
+        plus.resize((plus.shape[0], size))
+        minus.resize((minus.shape[0], size))
+        co_counts = co_counts.tocsr()
+        co_counts.resize((size, size))
+        co_counts = (co_counts + plus.T @ plus - minus.T @ minus).tocsr()
+        co_counts.eliminate_zeros()
+        product_ids = np.array(sorted(position, key=position.get), dtype=np.int64)
+
+        # Cambian las filas de los productos en canastas nuevas/quitadas y las de sus vecinos
+        # (su score depende del total de órdenes de esos productos)
+        if state is None:
+            affected = np.arange(size)
+        else:
+            touched = np.union1d(plus.indices, minus.indices)
+            affected = np.union1d(touched, co_counts[touched].indices) if len(touched) else touched
+        neighbors = self.top_neighbors(co_counts, product_ids, affected.tolist())
+
+        metrics = {
+            'orders': int(len(current)),
+            'products': int(size),
+            'pairs': int((co_counts.nnz - np.count_nonzero(co_counts.diagonal())) // 2),
+            'orders_added': int(len(added)),
+            'orders_removed': int(len(removed)),
+            'products_updated': int(len(affected)),
+        }
+        ids = product_ids.tolist()
+        ml_model = self.save(
+            ml_model,
+            {'product_ids': product_ids, 'co_counts': co_counts, 'order_ids': current},
+            {ids[row]: [(ids[column], score, support) for column, score, support in items]
+             for row, items in neighbors.items()},
+            metrics, requested_by, full=state is None
+        )
+        recommendation_index.invalidate()
+        seconds = round(time.time() - start_time, 2)
+        logger.info(f"Recomendaciones co-compra: {metrics['products_updated']} productos actualizados en {seconds}s")
+        return {'success': True, 'full': state is None, 'model_id': str(ml_model.id), 'seconds': seconds, **metrics}
+
+
+class RecommendationIndex:
+    """
+    Vecinos por producto en memoria del proceso, cargados bajo demanda: la primera vez
+    que se pide un producto se leen sus filas de ProductRecommendation (una consulta
+    indexada) y se guardan como tuplas (id, score, soporte); los datos de cada producto
+    recomendado se guardan una sola vez. Cada ``ML_RECOMMENDATION_INDEX_TTL`` segundos
+    verifica (una lectura del MLModel activo) si hubo una reconstrucción y, si la hubo,
+    descarta lo cargado.
+    """
+
+    def __init__(self, model_type, method):
+        self.model_type = model_type
+        self.method = method
+        self._lock = threading.Lock()
+        self._key = None
+        self._neighbors = OrderedDict()
+        self._products = {}
+        self._checked_at = None
+
+    def neighbors(self, product_id, limit=10):
+        self._refresh()
+        neighbors, products = self._get([product_id])
+        return [
+            dict(products[recommended_id], score=round(score, 4), support=support)
+            for recommended_id, score, support in neighbors[product_id][:limit]
+        ]
+
+    def for_basket(self, product_ids, limit=10):
+        """Vecinos de varios productos (carrito): suma de scores, sin los productos de entrada"""
+        self._refresh()
+        neighbors, products = self._get(product_ids)
+        merged = {}
+        for product_id in product_ids:
+            for recommended_id, score, support in neighbors[product_id]:
+                if recommended_id in product_ids:
+                    continue
+                total_score, total_support = merged.get(recommended_id, (0.0, 0))
+                merged[recommended_id] = (total_score + score, total_support + support)
+        best = sorted(merged.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+        return [
+            dict(products[recommended_id], score=round(score, 4), support=support)
+            for recommended_id, (score, support) in best
+        ]
+
+    def invalidate(self):
+        self._checked_at = None
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < settings.ML_RECOMMENDATION_INDEX_TTL:
+            return
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < settings.ML_RECOMMENDATION_INDEX_TTL:
+                return
+            key = MLModel.objects.filter(
+                model_type=self.model_type, is_active=True
+            ).order_by('-trained_at').values_list('id', 'version').first()
+            if key != self._key:
+                # Se reemplazan (no se vacían): una lectura en curso conserva los anteriores
+                self._neighbors = OrderedDict()
+                self._products = {}
+                self._key = key
+            self._checked_at = time.monotonic()
+
+    def _get(self, product_ids):
+        """({producto: vecinos}, datos de productos) cargando de la BD los que faltan"""
+        with self._lock:
+            cached, products = self._neighbors, self._products
+            found = {}
+            for product_id in product_ids:
+                if product_id in cached:
+                    cached.move_to_end(product_id)
+                    found[product_id] = cached[product_id]
+            missing = [product_id for product_id in product_ids if product_id not in found]
+            active = self._key is not None
+        if not missing:
+            return found, products
+
+        loaded = {product_id: [] for product_id in missing}
+        if active:
+            rows = ProductRecommendation.objects.filter(
+                method=self.method, product_id__in=missing, recommended__is_active=True
+            ).order_by('product_id', 'rank').values_list(
+                'product_id', 'recommended_id', 'score', 'support',
+                'recommended__name', 'recommended__sku', 'recommended__price', 'recommended__image',
+            )
+            for product_id, recommended_id, score, support, name, sku, price, image in rows:
+                loaded[product_id].append((recommended_id, score, support))
+                if recommended_id not in products:
+                    products[recommended_id] = {
+                        'id': recommended_id,
+                        'name': name,
+                        'sku': sku,
+                        'price': float(price),
+                        'image': f"{settings.MEDIA_URL}{image}" if image else None,
+                    }
+        with self._lock:
+            for product_id, items in loaded.items():
+                cached[product_id] = tuple(items)
+            while len(cached) > INDEX_MAX_PRODUCTS:
+                cached.popitem(last=False)
+        found.update((product_id, tuple(items)) for product_id, items in loaded.items())
+        return found, products
+
+
+recommendation_index = RecommendationIndex(CoPurchaseRecommender.MODEL_TYPE, CoPurchaseRecommender.METHOD)
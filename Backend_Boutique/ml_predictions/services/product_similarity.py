@@ -0,0 +1,242 @@
+"""
+Productos similares por atributos (sirve también para productos sin ventas)
+Cada producto activo es un vector con bloques one-hot/multi-hot de categoría, género,
+tipo (vestir/calzado), colores, tallas y banda de precio. La similitud es el coseno
+entre vectores; los top-k vecinos se calculan por bloques de filas con NumPy (float32)
+y se sirven desde el mismo índice en memoria que "comprados juntos".
+"""
+import math
+import time
+import numpy as np
+import scipy.sparse as sp
+from django.utils import timezone
+from inventory.models import Product
+from .product_recommendations import NeighborModelBuilder, RecommendationIndex, TOP_K
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Peso de cada bloque de atributos en el coseno (cada bloque se normaliza antes de ponderar)
+BLOCK_WEIGHTS = {
+    'category': 3.0,
+    'gender': 2.0,
+    'kind': 1.0,
+    'colors': 1.0,
+    'sizes': 0.5,
+    'price': 1.5,
+}
+# Bandas de precio geométricas: cada banda es 1.5× la anterior; las bandas vecinas suman medio punto
+PRICE_BAND_RATIO = 1.5
+# Memoria máxima de la matriz de similitud de un bloque de filas
+BLOCK_BYTES = 64 * 1024 * 1024
+# Decimales de los scores (empates estables entre cálculos completos e incrementales)
+SCORE_DECIMALS = 5
+# Si cambió más que esta fracción del catálogo se recalcula todo
+INCREMENTAL_MAX_FRACTION = 0.2
+
+CATALOG_FIELDS = (
+    'id', 'category_id', 'gender', 'category__gender', 'category__kind',
+    'color', 'colors', 'sizes', 'price', 'updated_at', 'category__updated_at',
+)
+
+
+def _tokens(row):
+    """Atributos de un producto por bloque: {bloque: {token: peso}}"""
+    _, category_id, gender, category_gender, kind, color, colors, sizes, price = row[:9]
+    tokens = {
+        'category': {category_id: 1.0} if category_id else {},
+        'gender': {gender or category_gender: 1.0} if (gender or category_gender) else {},
+        'kind': {kind: 1.0} if kind else {},
+        'colors': {str(value).strip().lower(): 1.0 for value in [*(colors or []), color or ''] if str(value).strip()},
+        'sizes': {str(value).strip().upper(): 1.0 for value in (sizes or []) if str(value).strip()},
+        'price': {},
+    }
+    if price and price > 0:
+        band = math.floor(math.log(float(price)) / math.log(PRICE_BAND_RATIO))
+        tokens['price'] = {band: 1.0, band - 1: 0.5, band + 1: 0.5}
+    return tokens
+
+
+def feature_matrix(rows):
+    """Matriz densa float32 (productos × atributos) con filas de norma 1"""
+    vocabulary = {block: {} for block in BLOCK_WEIGHTS}
+    data, row_idx, col_keys = [], [], []
+    for i, row in enumerate(rows):
+        for block, tokens in _tokens(row).items():
+            if not tokens:
+                continue
+            norm = math.sqrt(sum(weight * weight for weight in tokens.values()))
+            for token, weight in tokens.items():
+                column = vocabulary[block].setdefault(token, len(vocabulary[block]))
+                data.append(BLOCK_WEIGHTS[block] * weight / norm)
+                row_idx.append(i)
+                col_keys.append((block, column))
+
+    offsets, width = {}, 0
+    for block, tokens in vocabulary.items():
+        offsets[block] = width
+        width += len(tokens)
+    columns = [offsets[block] + column for block, column in col_keys]
+    X = sp.csr_matrix(
+        (np.array(data, dtype=np.float32), (row_idx, columns)), shape=(len(rows), max(width, 1))
+    ).toarray()
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    np.divide(X, norms, out=X, where=norms > 0)
+    return X
+
+
+def top_k_cosine(X, ids, rows, k):
+    """
+    Top-k vecinos (coseno > 0) de las filas indicadas contra todo el catálogo.
+    Devuelve (ids de vecinos, scores), ambos (len(rows) × k), con -1 / 0 de relleno.
+    """
+    n = len(X)
+    neighbor_ids = np.full((len(rows), k), -1, dtype=np.int64)
+    neighbor_scores = np.zeros((len(rows), k), dtype=np.float32)
+    k_eff = min(k, n - 1)
+    if k_eff <= 0:
+        return neighbor_ids, neighbor_scores
+    block = max(1, BLOCK_BYTES // (4 * n))
+    for start in range(0, len(rows), block):
+        idx = rows[start:start + block]
+        S = X[idx] @ X.T
+        # Redondeo: el mismo par da el mismo score sin importar el bloque en que se calculó
+        np.round(S, SCORE_DECIMALS, out=S)
+        S[np.arange(len(idx)), idx] = -1.0
+        if k_eff < n:
+            # Sin negar S: evita copiar el bloque completo
+            part = np.argpartition(S, n - k_eff, axis=1)[:, n - k_eff:]
+        else:
+            part = np.tile(np.arange(n), (len(idx), 1))
+        scores = np.take_along_axis(S, part, axis=1)
+        # Empates en el k-ésimo puesto: entran los de menor id, igual que en el orden final
+        kth = scores.min(axis=1)
+        for row in np.flatnonzero((kth > 0) & ((S >= kth[:, None]).sum(axis=1) > k_eff)):
+            tied = np.flatnonzero(S[row] >= kth[row])
+            tied = tied[np.lexsort((ids[tied], -S[row, tied]))[:k_eff]]
+            part[row], scores[row] = tied, S[row, tied]
+        # Mayor score primero; empates por id de producto
+        order = np.lexsort((ids[part], -scores))
+        part = np.take_along_axis(part, order, axis=1)
+        scores = np.take_along_axis(scores, order, axis=1)
+        valid = scores > 1e-6
+        neighbor_ids[start:start + len(idx), :k_eff] = np.where(valid, ids[part], -1)
+        neighbor_scores[start:start + len(idx), :k_eff] = np.where(valid, scores, 0)
+    return neighbor_ids, neighbor_scores
+
+
+class ContentSimilarity(NeighborModelBuilder):
+    """Vecinos por similitud de atributos; la reconstrucción incremental usa Product/Category.updated_at"""
+    MODEL_TYPE = 'product_similarity'
+    METHOD = 'content'
+    MODEL_NAME = 'Productos similares (atributos)'
+    SIZE_METRIC = 'products'
+
+    def __init__(self, top_k=TOP_K):
+        self.top_k = top_k
+
+    @staticmethod
+    def catalog():
+        return list(Product.objects.filter(is_active=True).order_by('id').values_list(*CATALOG_FIELDS))
+
+    def build(self, full=False, requested_by=None):
+        """
+        Recalcula los vecinos. Sin ``full`` parte del artefacto del modelo activo y solo
+        recalcula los productos nuevos/modificados y los que podrían verse afectados.
+        """
+        start_time = time.time()
+        watermark = timezone.now()
+        ml_model = None if full else self.active_model()
+        state = self.load_state(ml_model)
+
+        rows = self.catalog()
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        X = feature_matrix(rows)
+
+        affected = self._affected_rows(state, rows, ids, X) if state is not None else None
+        if affected is not None and not len(affected):
+            return {'success': True, 'full': False, 'products': len(ids), 'products_updated': 0}
+        full_run = affected is None
+        if full_run:
+            ml_model = None if state is None else ml_model
+            affected = np.arange(len(ids))
+
+        new_ids, new_scores = top_k_cosine(X, ids, affected, self.top_k)
+        neighbor_ids = np.full((len(ids), self.top_k), -1, dtype=np.int64)
+        neighbor_scores = np.zeros((len(ids), self.top_k), dtype=np.float32)
+        if not full_run:
+            # Filas no afectadas: se conservan del artefacto anterior
+            old_position = {product_id: i for i, product_id in enumerate(state['product_ids'].tolist())}
+            kept = np.array([i for i, product_id in enumerate(ids.tolist()) if product_id in old_position], dtype=np.int64)
+            source = np.array([old_position[product_id] for product_id in ids[kept].tolist()], dtype=np.int64)
+            neighbor_ids[kept] = state['neighbor_ids'][source]
+            neighbor_scores[kept] = state['neighbor_scores'][source]
+        neighbor_ids[affected] = new_ids
+        neighbor_scores[affected] = new_scores
+
+        metrics = {
+            'products': int(len(ids)),
+            'features': int(X.shape[1]),
+            'products_updated': int(len(affected)),
+        }
+        neighbors = {
+            int(ids[row]): [
+                (int(neighbor), float(score), 0)
+                for neighbor, score in zip(new_ids[i].tolist(), new_scores[i].tolist()) if neighbor >= 0
+            ]
+            for i, row in enumerate(affected.tolist())
+        }
+        if not full_run:
+            # Productos desactivados o eliminados: se borran sus filas
+            neighbors.update({product_id: [] for product_id in np.setdiff1d(state['product_ids'], ids).tolist()})
+        ml_model = self.save(
+            ml_model,
+            {'product_ids': ids, 'neighbor_ids': neighbor_ids, 'neighbor_scores': neighbor_scores, 'watermark': watermark},
+            neighbors, metrics, requested_by, full=full_run
+        )
+        similarity_index.invalidate()
+        seconds = round(time.time() - start_time, 2)
+        logger.info(f"Productos similares: {metrics['products_updated']} productos actualizados en {seconds}s")
+        return {'success': True, 'full': full_run, 'model_id': str(ml_model.id), 'seconds': seconds, **metrics}
+
+    def _affected_rows(self, state, rows, ids, X):
+        """
+        Filas a recalcular, o None si conviene recalcular todo. Son los productos nuevos
+        o modificados, los que tenían como vecino a uno modificado o eliminado, y aquellos
+        para los que un producto modificado ahora supera a su k-ésimo vecino.
+        """
+        watermark = state['watermark']
+        old_ids = state['product_ids']
+        old_position = {product_id: i for i, product_id in enumerate(old_ids.tolist())}
+        changed = np.array([
+            i for i, row in enumerate(rows)
+            if row[0] not in old_position or row[9] >= watermark or (row[10] and row[10] >= watermark)
+        ], dtype=np.int64)
+        removed = np.setdiff1d(old_ids, ids, assume_unique=True)
+        if not len(changed) and not len(removed):
+            return changed
+        if len(changed) > INCREMENTAL_MAX_FRACTION * len(ids):
+            return None
+
+        # Vecindarios anteriores que incluyen productos modificados o eliminados
+        stale_targets = np.union1d(ids[changed], removed)
+        hit_old = np.isin(state['neighbor_ids'], stale_targets).any(axis=1)
+        hit_ids = old_ids[hit_old]
+
+        # Productos modificados que ahora entran al top-k de otros
+        current_position = np.array([old_position.get(product_id, -1) for product_id in ids.tolist()])
+        kth = np.zeros(len(ids), dtype=np.float32)
+        known = current_position >= 0
+        kth[known] = state['neighbor_scores'][current_position[known], -1]
+        enters = np.zeros(len(ids), dtype=bool)
+        block = max(1, BLOCK_BYTES // (4 * len(ids)))
+        for start in range(0, len(changed), block):
+            S = np.round(X[changed[start:start + block]] @ X.T, SCORE_DECIMALS)
+            enters |= ((S >= kth) & (S > 1e-6)).any(axis=0)
+        enters[changed] = True
+
+        affected = enters | np.isin(ids, hit_ids)
+        return np.flatnonzero(affected)
+
+
+similarity_index = RecommendationIndex(ContentSimilarity.MODEL_TYPE, ContentSimilarity.METHOD)
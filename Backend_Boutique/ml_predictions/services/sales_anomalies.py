@@ -0,0 +1,276 @@
+"""
+Detección de anomalías de ventas en streaming
+Cada serie (tienda, categoría, método de pago) × granularidad (hora, día) guarda en
+SalesSeriesState el bucket abierto y una media/varianza EWMA por franja estacional
+(hora del día o día de la semana). Cada transición de orden inserta su aporte en
+SalesSeriesDelta y el worker (tick) lo suma al bucket; al cerrar un bucket se compara
+con su franja y, si |z| supera el umbral, se registra o extiende una SalesAnomaly.
+Nunca se vuelve a leer el historial de órdenes.
+
+La métrica es la cantidad de órdenes que entran (o salen) de un estado de venta en
+el bucket; los ingresos se acompañan como contexto. Los buckets se asignan por el
+momento de la transición, de modo que un método de pago caído se ve como una caída.
+"""
+import math
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+from orders.models import Order, OrderItem
+from ml_predictions.models import SalesAnomaly, SalesSeriesDelta, SalesSeriesState
+import logging
+
+logger = logging.getLogger(__name__)
+
+# granularidad: (duración del bucket, franjas estacionales)
+GRANULARITIES = {
+    'hour': (timedelta(hours=1), 24),
+    'day': (timedelta(days=1), 7),
+}
+# Buckets vacíos que se procesan como máximo al retomar una serie inactiva (temporadas completas)
+MAX_GAP_SEASONS = 4
+
+
+def bucket_of(moment, granularity):
+    """Inicio (hora local) del bucket que contiene ``moment``"""
+    local = timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+    return local if granularity == 'hour' else local.replace(hour=0)
+
+
+def season_slot(bucket, granularity):
+    local = timezone.localtime(bucket)
+    return local.hour if granularity == 'hour' else local.weekday()
+
+
+def order_contributions(order):
+    """[(scope, key, ingresos)] de las series a las que aporta una orden"""
+    series = [('store', '', float(order.grand_total or 0))]
+    if order.payment_method_id:
+        series.append(('payment_method', str(order.payment_method_id), float(order.grand_total or 0)))
+    categories = OrderItem.objects.filter(
+        order_id=order.pk, product__category__isnull=False
+    ).values('product__category_id').annotate(revenue=Sum('line_subtotal')).order_by()
+    series += [('category', str(row['product__category_id']), float(row['revenue'] or 0)) for row in categories]
+    return series
+
+
+class StreamingAnomalyDetector:
+    """
+    EWMA estacional: para cada bucket cerrado con x órdenes en la franja s,
+    z = (x - media_s) / max(desv_s, √media_s, 1). La cota inferior de Poisson evita
+    alertas en series con pocas órdenes. Mientras dura una racha anómala la franja
+    no aprende (para no absorber la caída), salvo que dure una temporada completa.
+    """
+
+    def __init__(self, alpha=None, z_threshold=None, min_observations=None):
+        self.alpha = settings.ML_ANOMALY_ALPHA if alpha is None else alpha
+        self.z_threshold = settings.ML_ANOMALY_Z_THRESHOLD if z_threshold is None else z_threshold
+        self.min_observations = settings.ML_ANOMALY_MIN_OBSERVATIONS if min_observations is None else min_observations
+
+    @staticmethod
+    def new_state(scope, key, granularity, bucket):
+        seasons = GRANULARITIES[granularity][1]
+        return SalesSeriesState(
+            scope=scope, key=key, granularity=granularity, bucket_start=bucket,
+            seasonal=[[0.0, 0.0, 0, 0.0] for _ in range(seasons)],
+        )
+
+    def advance(self, state, bucket, record=True):
+        """
+        Cierra los buckets de ``state`` anteriores a ``bucket`` (los vacíos cuentan como
+        cero ventas) y deja abierto ``bucket``. Devuelve cuántos buckets fueron anómalos.
+        """
+        step, seasons = GRANULARITIES[state.granularity]
+        anomalies = 0
+        closed = 0
+        while state.bucket_start < bucket:
+            if closed >= seasons * MAX_GAP_SEASONS:
+                # Serie inactiva por mucho tiempo: se salta al bucket actual
+                state.bucket_start = bucket
+                state.open_anomaly = None
+                break
+            anomalies += self._close_bucket(state, record)
+            closed += 1
+            state.bucket_start += step
+            state.bucket_orders, state.bucket_revenue = 0, 0.0
+        return anomalies
+
+    def _close_bucket(self, state, record):
+        seasons = GRANULARITIES[state.granularity][1]
+        slot = season_slot(state.bucket_start, state.granularity)
+        mean, var, observations, revenue_mean = state.seasonal[slot]
+        x = state.bucket_orders
+
+        direction, z = None, 0.0
+        if observations >= self.min_observations:
+            std = max(math.sqrt(var), math.sqrt(max(mean, 0.0)), 1.0)
+            z = (x - mean) / std
+            if z <= -self.z_threshold:
+                direction = 'drop'
+            elif z >= self.z_threshold:
+                direction = 'spike'
+
+        anomaly = state.open_anomaly if direction else None
+        if direction and record:
+            if anomaly is not None and anomaly.direction == direction:
+                anomaly.ended_at = state.bucket_start + GRANULARITIES[state.granularity][0]
+                anomaly.buckets += 1
+                anomaly.observed_orders += x
+                anomaly.expected_orders += mean
+                anomaly.observed_revenue += state.bucket_revenue
+                anomaly.expected_revenue += revenue_mean
+                anomaly.z_score = min(anomaly.z_score, z) if direction == 'drop' else max(anomaly.z_score, z)
+                anomaly.save()
+            else:
+                anomaly = SalesAnomaly.objects.create(
+                    scope=state.scope,
+                    key=state.key,
+                    granularity=state.granularity,
+                    direction=direction,
+                    started_at=state.bucket_start,
+                    ended_at=state.bucket_start + GRANULARITIES[state.granularity][0],
+                    observed_orders=x,
+                    expected_orders=mean,
+                    observed_revenue=state.bucket_revenue,
+                    expected_revenue=revenue_mean,
+                    z_score=z,
+                )
+                logger.warning(
+                    f"Anomalía de ventas ({direction}) en {state.scope}:{state.key or '-'} "
+                    f"[{state.granularity}] {state.bucket_start}: {x} órdenes vs {mean:.1f} esperadas (z={z:.1f})"
+                )
+        state.open_anomaly = anomaly if direction and record else None
+
+        if direction is None or not record or anomaly.buckets >= seasons:
+            if observations == 0:
+                mean, var, revenue_mean = float(x), 0.0, state.bucket_revenue
+            else:
+                diff = x - mean
+                increment = self.alpha * diff
+                mean += increment
+                var = (1 - self.alpha) * (var + diff * increment)
+                revenue_mean += self.alpha * (state.bucket_revenue - revenue_mean)
+            state.seasonal[slot] = [mean, var, observations + 1, revenue_mean]
+        return 1 if direction else 0
+
+    def apply_transition(self, order, old_status, new_status, moment=None):
+        """
+        Registra el aporte (o la resta, si la orden deja de ser venta) al bucket de sus
+        series como filas SalesSeriesDelta: solo inserta, sin bloquear los estados, que
+        tick() actualiza desde el worker
+        """
+        was_sale = old_status in Order.SALE_STATUSES
+        is_sale = new_status in Order.SALE_STATUSES
+        if was_sale == is_sale:
+            return
+        sign = 1 if is_sale else -1
+        moment = moment or timezone.now()
+        SalesSeriesDelta.objects.bulk_create([
+            SalesSeriesDelta(
+                scope=scope, key=key, granularity=granularity, bucket_start=bucket_of(moment, granularity),
+                orders=sign, revenue=sign * revenue,
+            )
+            for scope, key, revenue in order_contributions(order)
+            for granularity in GRANULARITIES
+        ])
+
+    def tick(self, moment=None):
+        """
+        Acumula los aportes pendientes en sus buckets y cierra los buckets vencidos de
+        todas las series: sin esto, una serie que deja de vender nunca recibiría el evento
+        que revela la caída. Devuelve los buckets anómalos. Lo ejecuta un solo worker.
+        """
+        moment = moment or timezone.now()
+        anomalies = 0
+        with transaction.atomic():
+            last_id = SalesSeriesDelta.objects.aggregate(last=Max('id'))['last']
+            pending = {}
+            if last_id is not None:
+                rows = SalesSeriesDelta.objects.filter(id__lte=last_id).values(
+                    'scope', 'key', 'granularity', 'bucket_start'
+                ).annotate(orders=Sum('orders'), revenue=Sum('revenue')).order_by('bucket_start')
+                for row in rows:
+                    pending.setdefault((row['scope'], row['key'], row['granularity']), []).append(
+                        (row['bucket_start'], row['orders'], row['revenue'])
+                    )
+
+            for granularity in GRANULARITIES:
+                bucket = bucket_of(moment, granularity)
+                series = set(SalesSeriesState.objects.filter(
+                    granularity=granularity, bucket_start__lt=bucket
+                ).values_list('scope', 'key'))
+                series.update((scope, key) for scope, key, series_granularity in pending if series_granularity == granularity)
+                for scope, key in series:
+                    deltas = pending.get((scope, key, granularity), [])
+                    state = SalesSeriesState.objects.select_for_update().filter(
+                        scope=scope, key=key, granularity=granularity
+                    ).first() or self.new_state(scope, key, granularity, bucket_of(deltas[0][0], granularity))
+                    for bucket_start, orders, revenue in deltas:
+                        # Un aporte de un bucket ya cerrado se suma al abierto
+                        anomalies += self.advance(state, bucket_start)
+                        state.bucket_orders += orders
+                        state.bucket_revenue += revenue
+                    anomalies += self.advance(state, bucket)
+                    state.save()
+
+            if last_id is not None:
+                SalesSeriesDelta.objects.filter(id__lte=last_id).delete()
+        return anomalies
+
+    def warm_up(self, days=28, moment=None):
+        """
+        Reinicia los estados reproduciendo las ventas de los últimos ``days`` días (por
+        fecha de creación de la orden), sin registrar anomalías. Es la única operación
+        que lee el historial; después todo se mantiene con ``apply_transition``/``tick``.
+        """
+        moment = moment or timezone.now()
+        orders = Order.objects.filter(
+            status__in=Order.SALE_STATUSES, created_at__gte=moment - timedelta(days=days)
+        )
+        categories = {}
+        for order_id, category_id, revenue in OrderItem.objects.filter(
+            order__in=orders, product__category__isnull=False
+        ).values('order_id', 'product__category_id').annotate(
+            revenue=Sum('line_subtotal')
+        ).order_by().values_list('order_id', 'product__category_id', 'revenue'):
+            categories.setdefault(order_id, []).append(('category', str(category_id), float(revenue or 0)))
+
+        states = {}
+        for order_id, created_at, payment_method_id, grand_total in orders.order_by('created_at').values_list(
+            'id', 'created_at', 'payment_method_id', 'grand_total'
+        ):
+            total = float(grand_total or 0)
+            series = [('store', '', total)] + categories.get(order_id, [])
+            if payment_method_id:
+                series.append(('payment_method', str(payment_method_id), total))
+            for granularity in GRANULARITIES:
+                bucket = bucket_of(created_at, granularity)
+                for scope, key, revenue in series:
+                    state = states.get((scope, key, granularity))
+                    if state is None:
+                        state = states[(scope, key, granularity)] = self.new_state(scope, key, granularity, bucket)
+                    self.advance(state, bucket, record=False)
+                    state.bucket_orders += 1
+                    state.bucket_revenue += revenue
+
+        for (_, _, granularity), state in states.items():
+            self.advance(state, bucket_of(moment, granularity), record=False)
+        with transaction.atomic():
+            # Los aportes pendientes ya están en las órdenes reproducidas
+            SalesSeriesDelta.objects.filter(created_at__lte=moment).delete()
+            SalesSeriesState.objects.all().delete()
+            SalesSeriesState.objects.bulk_create(states.values(), batch_size=1000)
+        return len(states)
+
+
+def recent_anomalies(days=7, scope=None, direction=None, granularity=None, limit=50):
+    """Anomalías iniciadas en los últimos ``days`` días, más recientes primero"""
+    queryset = SalesAnomaly.objects.filter(started_at__gte=timezone.now() - timedelta(days=days))
+    if scope:
+        queryset = queryset.filter(scope=scope)
+    if direction:
+        queryset = queryset.filter(direction=direction)
+    if granularity:
+        queryset = queryset.filter(granularity=granularity)
+    return list(queryset.order_by('-started_at')[:limit])
@@ -8,100 +8,70 @@ from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.linear_model import LinearRegression
 from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
-from datetime import datetime, timedelta
+from datetime import timedelta
 import joblib
 import os
+import threading
+import time
 from django.conf import settings
-from django.db.models import Sum, Count, Avg, F
-from django.db.models.functions import TruncDate
-from orders.models import Order, OrderItem
-from inventory.models import Product, Category
+from django.db import transaction
+from django.db.models import Sum, Count, F, Max
+from django.utils import timezone
+from orders.models import DailySalesFact
+from ml_predictions.models import MLModel, Prediction, SalesForecast
+from .model_registry import model_registry, save_artifact
+from .model_selection import select_model, time_series_splits
+from .feature_store import FEATURE_COLUMNS, build_features, sync_feature_store, load_feature_frame, feature_watermark
 import logging
+import warnings
 
 logger = logging.getLogger(__name__)
 
+# Historial reciente con características, por proceso; se invalida cuando cambian los hechos de venta
+_history_cache = {}
+_history_lock = threading.Lock()
+
+# Horizonte que el panel pide por defecto y que el worker deja precalculado
+DEFAULT_FORECAST_DAYS = 30
+
 
 class SalesForecastService:
     """
     Servicio para predicción de ventas basado en el historial de órdenes
     """
     
+    MODEL_TYPE = 'sales_forecast'
+    # Cobertura de los intervalos de predicción (percentiles 10 y 90)
+    INTERVAL_LEVEL = 0.8
+    
     def __init__(self):
         self.model = None
+        self.ml_model = None
+        self.version = None
+        # Percentiles de los residuos en el tramo de prueba (intervalos de modelos no RandomForest)
+        self.residual_quantiles = None
+        # Ruta previa al versionado; solo se usa como respaldo si no hay MLModel activo
         self.model_path = os.path.join(settings.BASE_DIR, 'ml_predictions', 'ml_models', 'sales_forecast.pkl')
         self.scaler_path = os.path.join(settings.BASE_DIR, 'ml_predictions', 'ml_models', 'sales_scaler.pkl')
         
     def prepare_training_data(self, months_back=12):
         """
-        Prepara datos de entrenamiento desde la base de datos de órdenes
-        Analiza órdenes completadas (DELIVERED, PAID, AWAITING_DISPATCH)
+        Prepara datos de entrenamiento desde el feature store diario (DailySalesFeature),
+        sincronizándolo antes con DailySalesFact. Un registro por día cerrado, incluidos
+        los días sin ventas; solo cuentan órdenes con venta efectiva.
         """
         try:
             from django.utils import timezone
             
-            end_date = timezone.now()
-            start_date = end_date - timedelta(days=months_back * 30)
-            
-            # Obtener ventas históricas agregadas por día
-            # Solo órdenes que representan ventas reales (no borradores ni canceladas)
-            valid_statuses = ['PAID', 'AWAITING_DISPATCH', 'SHIPPED', 'DELIVERED']
-            
-            orders = Order.objects.filter(
-                created_at__gte=start_date,
-                status__in=valid_statuses
-            ).annotate(
-                date=TruncDate('created_at')
-            ).values('date').annotate(
-                total_sales=Sum('grand_total'),
-                total_quantity=Sum('total_items'),
-                num_orders=Count('id'),
-                avg_order_value=Avg('grand_total')
-            ).order_by('date')
+            sync_feature_store()
+            start_date = timezone.localdate() - timedelta(days=months_back * 30)
+            df = load_feature_frame(start_date)
             
-            orders_list = list(orders)
-            
-            if len(orders_list) < 7:
-                logger.warning(f"Datos insuficientes: solo {len(orders_list)} días con ventas")
+            days_with_sales = int((df['num_orders'] > 0).sum())
+            if days_with_sales < 7:
+                logger.warning(f"Datos insuficientes: solo {days_with_sales} días con ventas")
                 return None
             
-            # Convertir a DataFrame
-            df = pd.DataFrame(orders_list)
-            
-            # Convertir columnas Decimal a float para evitar errores de tipo
-            df['total_sales'] = pd.to_numeric(df['total_sales'], errors='coerce').fillna(0).astype(float)
-            df['total_quantity'] = pd.to_numeric(df['total_quantity'], errors='coerce').fillna(0).astype(float)
-            df['num_orders'] = pd.to_numeric(df['num_orders'], errors='coerce').fillna(0).astype(float)
-            df['avg_order_value'] = pd.to_numeric(df['avg_order_value'], errors='coerce').fillna(0).astype(float)
-            
-            # Ingeniería de características temporales
-            df['date'] = pd.to_datetime(df['date'])
-            df['year'] = df['date'].dt.year
-            df['month'] = df['date'].dt.month
-            df['day'] = df['date'].dt.day
-            df['day_of_week'] = df['date'].dt.dayofweek  # 0=Monday, 6=Sunday
-            df['day_of_year'] = df['date'].dt.dayofyear
-            df['week_of_year'] = df['date'].dt.isocalendar().week.astype(int)
-            df['is_weekend'] = df['day_of_week'].isin([5, 6]).astype(int)
-            df['quarter'] = df['date'].dt.quarter
-            
-            # Características de tendencia (rolling averages)
-            df = df.sort_values('date')
-            df['sales_7d_avg'] = df['total_sales'].rolling(window=7, min_periods=1).mean()
-            df['sales_30d_avg'] = df['total_sales'].rolling(window=30, min_periods=1).mean()
-            df['sales_7d_std'] = df['total_sales'].rolling(window=7, min_periods=1).std().fillna(0)
-            
-            # Características lag (ventas días anteriores)
-            df['sales_lag_1'] = df['total_sales'].shift(1).fillna(0)
-            df['sales_lag_7'] = df['total_sales'].shift(7).fillna(0)
-            df['sales_lag_30'] = df['total_sales'].shift(30).fillna(0)
-            
-            # Características de momentum (cambio porcentual)
-            df['sales_pct_change_1d'] = df['total_sales'].pct_change(1).fillna(0).replace([np.inf, -np.inf], 0)
-            df['sales_pct_change_7d'] = df['total_sales'].pct_change(7).fillna(0).replace([np.inf, -np.inf], 0)
-            
-            # Rellenar cualquier NaN restante
-            df = df.fillna(0)
-            
             logger.info(f"Datos preparados: {len(df)} registros desde {df['date'].min()} hasta {df['date'].max()}")
             logger.info(f"Total ventas en período: Bs. {df['total_sales'].sum():.2f}")
             logger.info(f"Promedio ventas diarias: Bs. {df['total_sales'].mean():.2f}")
@@ -112,11 +82,18 @@ class SalesForecastService:
             logger.error(f"Error preparando datos de entrenamiento: {str(e)}")
             return None
     
-    def train_model(self, df=None, model_type='random_forest'):
+    build_features = staticmethod(build_features)
+    
+    def train_model(self, df=None, model_type='random_forest', save=True, on_stage=None):
         """
-        Entrena el modelo de predicción de ventas
+        Entrena el modelo de predicción de ventas.
+        Con ``model_type='auto'`` elige tipo e hiperparámetros con validación temporal
+        sobre el tramo de entrenamiento (ver model_selection).
+        ``on_stage(nombre, progreso)`` se invoca al iniciar cada etapa (ver training_jobs).
         """
+        on_stage = on_stage or (lambda stage, progress: None)
         try:
+            on_stage('prepare_data', 5)
             if df is None:
                 df = self.prepare_training_data()
             
@@ -124,13 +101,7 @@ class SalesForecastService:
                 raise ValueError("Datos insuficientes para entrenar el modelo (mínimo 7 registros)")
             
             # Seleccionar características
-            feature_columns = [
-                'month', 'day', 'day_of_week', 'day_of_year', 'week_of_year',
-                'is_weekend', 'quarter', 'num_orders', 'avg_order_value',
-                'sales_7d_avg', 'sales_30d_avg', 'sales_7d_std',
-                'sales_lag_1', 'sales_lag_7', 'sales_lag_30',
-                'sales_pct_change_1d', 'sales_pct_change_7d'
-            ]
+            feature_columns = FEATURE_COLUMNS
             
             X = df[feature_columns]
             y = df['total_sales']
@@ -141,7 +112,21 @@ class SalesForecastService:
             )
             
             # Seleccionar modelo
-            if model_type == 'random_forest':
+            selection = None
+            if model_type == 'auto':
+                on_stage('model_selection', 10)
+                selection = select_model(
+                    X_train, y_train,
+                    time_budget=settings.ML_MODEL_SELECTION_BUDGET,
+                    n_jobs=settings.ML_FORECAST_WORKERS
+                )
+                self.model = selection.pop('estimator')
+                model_type = selection['best']['model_type']
+                logger.info(
+                    f"Modelo seleccionado: {selection['best']['estimator']} {selection['best']['params']} "
+                    f"({selection['evaluated']} candidatos en {selection['seconds']}s)"
+                )
+            elif model_type == 'random_forest':
                 self.model = RandomForestRegressor(
                     n_estimators=100,
                     max_depth=10,
@@ -161,10 +146,12 @@ class SalesForecastService:
                 self.model = LinearRegression()
             
             # Entrenar
+            on_stage('fit', 20)
             logger.info(f"Entrenando modelo {model_type} con {len(X_train)} registros...")
             self.model.fit(X_train, y_train)
             
             # Evaluar
+            on_stage('evaluate', 55)
             y_pred_train = self.model.predict(X_train)
             y_pred_test = self.model.predict(X_test)
             
@@ -174,9 +161,12 @@ class SalesForecastService:
             test_rmse = np.sqrt(mean_squared_error(y_test, y_pred_test))
             train_mae = mean_absolute_error(y_train, y_pred_train)
             test_mae = mean_absolute_error(y_test, y_pred_test)
+            lower_q, upper_q = np.percentile(y_test - y_pred_test, self._interval_percentiles())
+            self.residual_quantiles = {'lower': float(lower_q), 'upper': float(upper_q)}
             
-            # Cross-validation
-            cv_scores = cross_val_score(self.model, X, y, cv=min(5, len(X)//10), scoring='r2')
+            # Cross-validation temporal (cada fold evalúa con días posteriores a los de entrenamiento)
+            on_stage('cross_validation', 65)
+            cv_scores = cross_val_score(self.model, X, y, cv=time_series_splits(len(X)), scoring='r2')
             
             metrics = {
                 'train_r2': float(train_r2),
@@ -189,8 +179,11 @@ class SalesForecastService:
                 'cv_r2_std': float(cv_scores.std()),
                 'training_samples': len(X_train),
                 'test_samples': len(X_test),
+                'residual_quantiles': self.residual_quantiles,
                 'feature_importances': {}
             }
+            if selection:
+                metrics['model_selection'] = selection
             
             # Feature importances (solo para modelos basados en árboles)
             if hasattr(self.model, 'feature_importances_'):
@@ -200,12 +193,17 @@ class SalesForecastService:
             
             logger.info(f"✓ Modelo entrenado - R²: {test_r2:.4f}, RMSE: {test_rmse:.2f} Bs.")
             
-            # Guardar modelo
-            self.save_model()
+            # Guardar modelo (un artefacto por versión)
+            if save:
+                on_stage('save', 90)
+                from django.utils import timezone
+                self.version = timezone.localtime().strftime('%Y%m%d_%H%M%S')
+                self.save_model()
             
             return {
                 'success': True,
                 'model_type': model_type,
+                'parameters': selection['best']['params'] if selection else {},
                 'metrics': metrics,
                 'training_data_size': len(df)
             }
@@ -218,17 +216,22 @@ class SalesForecastService:
             }
     
     def save_model(self):
-        """Guarda el modelo entrenado en disco"""
-        try:
-            os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
-            joblib.dump(self.model, self.model_path)
-            logger.info(f"Modelo guardado en {self.model_path}")
-        except Exception as e:
-            logger.error(f"Error guardando modelo: {str(e)}")
+        """
+        Guarda el modelo entrenado en el storage (lo lee el servicio web, no solo el worker).
+        Si falla, el entrenamiento falla: no se registra un MLModel sin artefacto.
+        """
+        self.model_path = save_artifact(self.model, self.MODEL_TYPE, self.version)
+        logger.info(f"Modelo guardado en {self.model_path}")
     
     def load_model(self):
-        """Carga el modelo desde disco"""
+        """Obtiene el modelo activo desde el registro en memoria (o desde disco si no hay MLModel)"""
         try:
+            ml_model, estimator = model_registry.get_active(self.MODEL_TYPE)
+            if ml_model is not None:
+                self.ml_model, self.model = ml_model, estimator
+                self.version, self.model_path = ml_model.version, ml_model.file_path
+                self.residual_quantiles = (ml_model.metrics or {}).get('residual_quantiles')
+                return True
             if os.path.exists(self.model_path):
                 self.model = joblib.load(self.model_path)
                 logger.info("Modelo cargado exitosamente")
@@ -240,9 +243,67 @@ class SalesForecastService:
             logger.error(f"Error cargando modelo: {str(e)}")
             return False
     
-    def predict_future_sales(self, days_ahead=30):
+    def get_forecast(self, days_ahead=30, recursive=False, requested_by=None):
+        """
+        Pronóstico persistido. Si ya hay una Prediction para (modelo, versión, horizonte,
+        modo, marca de agua del feature store) se devuelve tal cual; si no, se calcula y se
+        guarda (SalesForecast con bulk_create). El resultado indica ``cached``.
+        """
+        start_time = time.time()
+        if self.model is None and not self.load_model():
+            return {'success': False, 'error': 'No hay modelo entrenado disponible'}
+        
+        cache_key = ''
+        if self.ml_model is not None:
+            sync_feature_store()
+            cache_key = ':'.join([
+                str(self.ml_model.id), self.ml_model.version, str(days_ahead),
+                'recursive' if recursive else 'batch', feature_watermark()
+            ])
+            cached = Prediction.objects.filter(cache_key=cache_key).order_by('-created_at').first()
+            if cached is not None:
+                MLModel.objects.filter(id=self.ml_model.id).update(last_used_at=timezone.now())
+                return {
+                    **cached.prediction_result,
+                    'cached': True,
+                    'prediction_id': str(cached.id),
+                    'execution_time_ms': int((time.time() - start_time) * 1000)
+                }
+        
+        result = self.predict_future_sales(days_ahead=days_ahead, recursive=recursive)
+        execution_time = int((time.time() - start_time) * 1000)
+        if not result['success'] or self.ml_model is None:
+            return {**result, 'cached': False, 'execution_time_ms': execution_time}
+        
+        with transaction.atomic():
+            prediction = Prediction.objects.create(
+                model=self.ml_model,
+                input_data={'days_ahead': days_ahead, 'recursive': recursive},
+                prediction_result=result,
+                requested_by=requested_by,
+                execution_time_ms=execution_time,
+                cache_key=cache_key
+            )
+            SalesForecast.objects.bulk_create([
+                SalesForecast(
+                    prediction=prediction,
+                    forecast_date=pred['date'],
+                    predicted_sales=round(pred['predicted_sales'], 2),
+                    predicted_quantity=pred['predicted_quantity'],
+                    confidence_interval_lower=None if pred.get('lower_bound') is None else round(pred['lower_bound'], 2),
+                    confidence_interval_upper=None if pred.get('upper_bound') is None else round(pred['upper_bound'], 2)
+                )
+                for pred in result['predictions']
+            ])
+        MLModel.objects.filter(id=self.ml_model.id).update(last_used_at=timezone.now())
+        return {**result, 'cached': False, 'prediction_id': str(prediction.id), 'execution_time_ms': execution_time}
+    
+    def predict_future_sales(self, days_ahead=30, recursive=False):
         """
-        Predice ventas futuras
+        Predice ventas futuras.
+        Por defecto arma la matriz de características de todo el horizonte de una vez
+        y llama a ``model.predict`` una sola vez; con ``recursive=True`` los lags y
+        promedios móviles se alimentan de las predicciones de los días anteriores.
         """
         print("---------------------------------------------------")
         print(f"model_path: {self.model_path}   ")
@@ -255,54 +316,11 @@ class SalesForecastService:
             print("Modelo cargado para predicción")
             print("---------------------------------------------------")
             # Obtener últimos datos para generar características
-            recent_data = self.prepare_training_data(months_back=3)
+            recent_data = self.get_recent_history(months_back=3)
             if recent_data is None or len(recent_data) == 0:
                 raise ValueError("No hay datos recientes para generar predicciones")
             
-            # Generar fechas futuras
-            from django.utils import timezone
-            last_date = recent_data['date'].max()
-            # Convertir a datetime si es pandas Timestamp
-            if hasattr(last_date, 'to_pydatetime'):
-                last_date = last_date.to_pydatetime()
-            future_dates = pd.date_range(start=last_date + timedelta(days=1), periods=days_ahead, freq='D')
-            
-            predictions = []
-            
-            # Para cada día futuro, generar características y predecir
-            for future_date in future_dates:
-                features = {
-                    'month': future_date.month,
-                    'day': future_date.day,
-                    'day_of_week': future_date.dayofweek,
-                    'day_of_year': future_date.dayofyear,
-                    'week_of_year': future_date.isocalendar().week,
-                    'is_weekend': 1 if future_date.dayofweek >= 5 else 0,
-                    'quarter': (future_date.month - 1) // 3 + 1,
-                    'num_orders': recent_data['num_orders'].iloc[-7:].mean(),
-                    'avg_order_value': recent_data['avg_order_value'].iloc[-7:].mean(),
-                    'sales_7d_avg': recent_data['total_sales'].iloc[-7:].mean(),
-                    'sales_30d_avg': recent_data['total_sales'].iloc[-30:].mean(),
-                    'sales_7d_std': recent_data['total_sales'].iloc[-7:].std(),
-                    'sales_lag_1': recent_data['total_sales'].iloc[-1],
-                    'sales_lag_7': recent_data['total_sales'].iloc[-7] if len(recent_data) >= 7 else recent_data['total_sales'].iloc[0],
-                    'sales_lag_30': recent_data['total_sales'].iloc[-30] if len(recent_data) >= 30 else recent_data['total_sales'].iloc[0],
-                    'sales_pct_change_1d': 0,
-                    'sales_pct_change_7d': 0
-                }
-                
-                X_pred = pd.DataFrame([features])
-                pred_value = self.model.predict(X_pred)[0]
-                
-                # Asegurar que la predicción sea positiva
-                pred_value = max(0, pred_value)
-                
-                avg_order_value = float(recent_data['avg_order_value'].mean())
-                predictions.append({
-                    'date': future_date.strftime('%Y-%m-%d'),
-                    'predicted_sales': float(pred_value),
-                    'predicted_quantity': int(float(pred_value) / avg_order_value) if avg_order_value > 0 else 0
-                })
+            predictions = self.forecast_from_history(recent_data, days_ahead, recursive=recursive)
             
             logger.info(f"Predicciones generadas para {days_ahead} días")
             return {
@@ -311,7 +329,10 @@ class SalesForecastService:
                 'summary': {
                     'total_predicted_sales': float(sum(float(p['predicted_sales']) for p in predictions)),
                     'avg_daily_sales': float(sum(float(p['predicted_sales']) for p in predictions)) / len(predictions),
-                    'days_predicted': len(predictions)
+                    'days_predicted': len(predictions),
+                    'mode': 'recursive' if recursive else 'batch',
+                    'interval_level': self.INTERVAL_LEVEL,
+                    'interval_method': self.interval_method()
                 }
             }
             
@@ -322,6 +343,193 @@ class SalesForecastService:
                 'error': str(e)
             }
     
+    def get_recent_history(self, months_back=3):
+        """
+        ``prepare_training_data`` cacheado por proceso. La clave incluye el día y la marca
+        de agua de DailySalesFact (última modificación y número de filas).
+        """
+        from django.utils import timezone
+        
+        watermark = DailySalesFact.objects.aggregate(last=Max('updated_at'), rows=Count('id'))
+        key = (months_back, timezone.localdate(), watermark['last'], watermark['rows'])
+        cached = _history_cache.get(months_back)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        df = self.prepare_training_data(months_back=months_back)
+        if df is not None:
+            with _history_lock:
+                _history_cache[months_back] = (key, df)
+        return df
+    
+    def forecast_from_history(self, recent_data, days_ahead, recursive=False, intervals=True):
+        """
+        Genera ``days_ahead`` predicciones diarias a partir del historial con características
+        (salida de ``build_features``). No consulta la base de datos.
+        Con ``intervals`` cada día incluye ``lower_bound``/``upper_bound`` (ver ``prediction_intervals``).
+        """
+        last_date = pd.Timestamp(recent_data['date'].max())
+        future_dates = pd.date_range(start=last_date + timedelta(days=1), periods=days_ahead, freq='D')
+        sales = recent_data['total_sales'].to_numpy(dtype=float)
+        
+        X = np.empty((days_ahead, len(FEATURE_COLUMNS)), dtype=float)
+        col = {name: i for i, name in enumerate(FEATURE_COLUMNS)}
+        
+        # Calendario: vectorizado sobre todo el horizonte
+        X[:, col['month']] = future_dates.month
+        X[:, col['day']] = future_dates.day
+        X[:, col['day_of_week']] = future_dates.dayofweek
+        X[:, col['day_of_year']] = future_dates.dayofyear
+        X[:, col['week_of_year']] = future_dates.isocalendar().week.to_numpy()
+        X[:, col['is_weekend']] = future_dates.dayofweek >= 5
+        X[:, col['quarter']] = future_dates.quarter
+        
+        # Variables exógenas desconocidas a futuro: promedio de la última semana
+        X[:, col['num_orders']] = recent_data['num_orders'].iloc[-7:].mean()
+        X[:, col['avg_order_value']] = recent_data['avg_order_value'].iloc[-7:].mean()
+        
+        if recursive:
+            pred_values = self._predict_recursive(X, col, sales)
+        else:
+            # Lags y promedios fijos en el último estado conocido
+            X[:, col['sales_7d_avg']] = sales[-7:].mean()
+            X[:, col['sales_30d_avg']] = sales[-30:].mean()
+            X[:, col['sales_7d_std']] = sales[-7:].std(ddof=1) if len(sales) > 1 else 0
+            X[:, col['sales_lag_1']] = sales[-1]
+            X[:, col['sales_lag_7']] = sales[-7] if len(sales) >= 7 else sales[0]
+            X[:, col['sales_lag_30']] = sales[-30] if len(sales) >= 30 else sales[0]
+            X[:, col['sales_pct_change_1d']] = 0
+            X[:, col['sales_pct_change_7d']] = 0
+            pred_values = self.model.predict(pd.DataFrame(X, columns=FEATURE_COLUMNS))
+        
+        # Asegurar que las predicciones sean positivas
+        pred_values = np.maximum(pred_values, 0)
+        lower, upper = self.prediction_intervals(X, pred_values) if intervals else (None, None)
+        if lower is None:
+            lower = upper = [None] * days_ahead
+        else:
+            lower, upper = lower.tolist(), upper.tolist()
+        
+        # Ticket promedio de los días con ventas (el historial incluye días en cero)
+        sale_days = recent_data['num_orders'] > 0
+        avg_order_value = float(recent_data.loc[sale_days, 'avg_order_value'].mean()) if sale_days.any() else 0.0
+        quantities = (pred_values / avg_order_value).astype(int) if avg_order_value > 0 else np.zeros(days_ahead, dtype=int)
+        return [
+            {
+                'date': date,
+                'predicted_sales': float(value),
+                'predicted_quantity': int(qty),
+                'lower_bound': low,
+                'upper_bound': high
+            }
+            for date, value, qty, low, high in zip(
+                future_dates.strftime('%Y-%m-%d'), pred_values, quantities, lower, upper
+            )
+        ]
+    
+    def _interval_percentiles(self):
+        tail = (1 - self.INTERVAL_LEVEL) / 2 * 100
+        return [tail, 100 - tail]
+    
+    def interval_method(self):
+        if isinstance(self.model, RandomForestRegressor):
+            return 'tree_spread'
+        return 'residual_quantiles' if self.residual_quantiles else None
+    
+    def prediction_intervals(self, X, point):
+        """
+        Límites inferior/superior para todo el horizonte de una vez.
+        RandomForest: percentiles de las predicciones de cada árbol sobre la matriz (árboles × días).
+        Otros modelos: predicción puntual más los percentiles de los residuos de prueba.
+        Devuelve (None, None) si el modelo no tiene con qué estimarlos.
+        """
+        method = self.interval_method()
+        if method == 'tree_spread':
+            X32 = np.ascontiguousarray(X, dtype=np.float32)
+            per_tree = np.stack([estimator.tree_.predict(X32)[:, 0] for estimator in self.model.estimators_])
+            lower, upper = np.percentile(per_tree, self._interval_percentiles(), axis=0)
+        elif method == 'residual_quantiles':
+            lower = point + self.residual_quantiles['lower']
+            upper = point + self.residual_quantiles['upper']
+        else:
+            return None, None
+        # El intervalo siempre contiene a la predicción puntual y no baja de cero
+        return np.maximum(np.minimum(lower, point), 0), np.maximum(upper, point)
+    
+    def _predict_recursive(self, X, col, sales):
+        """
+        Predicción día a día: cada predicción entra al historial y actualiza lags,
+        sumas móviles de 7/30 días y la varianza de 7 días en O(1) por paso.
+        """
+        days_ahead = X.shape[0]
+        history = np.empty(len(sales) + days_ahead, dtype=float)
+        history[:len(sales)] = sales
+        n = len(sales)
+        
+        w7, w30 = min(7, n), min(30, n)
+        sum7 = history[n - w7:n].sum()
+        sumsq7 = np.square(history[n - w7:n]).sum()
+        sum30 = history[n - w30:n].sum()
+        
+        def lag(k):
+            return history[n - k] if n >= k else history[0]
+        
+        # El estimador puede estar compartido entre hilos (model_registry): no se modifica
+        predict_row = self._single_row_predictor()
+        row = X[:1].copy()
+        predictions = np.empty(days_ahead, dtype=float)
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', message='X does not have valid feature names')
+            for t in range(days_ahead):
+                row[0] = X[t]
+                row[0, col['sales_7d_avg']] = sum7 / w7
+                row[0, col['sales_30d_avg']] = sum30 / w30
+                var7 = (sumsq7 - sum7 * sum7 / w7) / (w7 - 1) if w7 > 1 else 0.0
+                row[0, col['sales_7d_std']] = np.sqrt(max(var7, 0.0))
+                row[0, col['sales_lag_1']] = lag(1)
+                row[0, col['sales_lag_7']] = lag(7)
+                row[0, col['sales_lag_30']] = lag(30)
+                prev = lag(2)
+                row[0, col['sales_pct_change_1d']] = (lag(1) - prev) / prev if n >= 2 and prev else 0
+                prev7 = lag(8)
+                row[0, col['sales_pct_change_7d']] = (lag(1) - prev7) / prev7 if n >= 8 and prev7 else 0
+                
+                value = max(predict_row(row), 0.0)
+                predictions[t] = value
+                # La fila usada queda en X para calcular los intervalos sobre todo el horizonte
+                X[t] = row[0]
+                
+                # Desplazar ventanas: entra la predicción, sale el valor más antiguo
+                history[n] = value
+                n += 1
+                if w7 == 7:
+                    out = history[n - 8]
+                    sum7 -= out
+                    sumsq7 -= out * out
+                else:
+                    w7 += 1
+                sum7 += value
+                sumsq7 += value * value
+                if w30 == 30:
+                    sum30 -= history[n - 31]
+                else:
+                    w30 += 1
+                sum30 += value
+        return predictions
+    
+    def _single_row_predictor(self):
+        """
+        Función que predice una sola fila. Para RandomForest promedia los árboles
+        directamente y evita el despacho de joblib que ``predict`` hace en cada llamada.
+        """
+        if isinstance(self.model, RandomForestRegressor):
+            trees = [estimator.tree_ for estimator in self.model.estimators_]
+            
+            def predict_row(row):
+                row32 = row.astype(np.float32)
+                return sum(float(tree.predict(row32)[0, 0]) for tree in trees) / len(trees)
+            return predict_row
+        return lambda row: float(self.model.predict(row)[0])
+    
     def get_sales_analytics(self):
         """
         Obtiene analytics básicos de ventas históricas
@@ -329,39 +537,30 @@ class SalesForecastService:
         try:
             from django.utils import timezone
             
-            now = timezone.now()
-            thirty_days_ago = now - timedelta(days=30)
-            seven_days_ago = now - timedelta(days=7)
-            
-            valid_statuses = ['PAID', 'AWAITING_DISPATCH', 'SHIPPED', 'DELIVERED']
+            today = timezone.localdate()
+            facts = DailySalesFact.objects.filter(status_class='sale')
             
             # Ventas últimos 30 días
-            sales_30d = Order.objects.filter(
-                created_at__gte=thirty_days_ago,
-                status__in=valid_statuses
-            ).aggregate(
-                total=Sum('grand_total'),
-                count=Count('id'),
-                avg=Avg('grand_total')
+            sales_30d = facts.filter(date__gte=today - timedelta(days=30)).aggregate(
+                total=Sum('order_total'),
+                count=Sum('order_count')
             )
             
             # Ventas últimos 7 días
-            sales_7d = Order.objects.filter(
-                created_at__gte=seven_days_ago,
-                status__in=valid_statuses
-            ).aggregate(
-                total=Sum('grand_total'),
-                count=Count('id'),
-                avg=Avg('grand_total')
+            sales_7d = facts.filter(date__gte=today - timedelta(days=7)).aggregate(
+                total=Sum('order_total'),
+                count=Sum('order_count')
             )
+            for period in (sales_30d, sales_7d):
+                period['avg'] = period['total'] / period['count'] if period['count'] else 0
             
             # Top productos vendidos (últimos 30 días)
-            top_products = OrderItem.objects.filter(
-                order__created_at__gte=thirty_days_ago,
-                order__status__in=valid_statuses
+            top_products = facts.filter(
+                date__gte=today - timedelta(days=30),
+                product__isnull=False
             ).values('product__name', 'product__id').annotate(
                 total_quantity=Sum('quantity'),
-                total_revenue=Sum('line_subtotal')
+                total_revenue=Sum('revenue')
             ).order_by('-total_quantity')[:10]
             
             return {
@@ -385,3 +584,8 @@ class SalesForecastService:
                 'success': False,
                 'error': str(e)
             }
+
+
+def precompute_forecast(days_ahead=DEFAULT_FORECAST_DAYS, recursive=False):
+    """Deja guardado el pronóstico del modelo activo para los datos actuales (no-op si ya existe)"""
+    return SalesForecastService().get_forecast(days_ahead=days_ahead, recursive=recursive)
@@ -2,19 +2,46 @@
 Servicio de análisis de ventas con ML
 Proporciona insights avanzados para el dueño del negocio
 """
-import numpy as np
-import pandas as pd
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
 from django.utils import timezone
 from django.db.models import Sum, Count, Avg, F, Q
-from django.db.models.functions import TruncDate, TruncWeek, TruncMonth
-from orders.models import Order, OrderItem
+from django.db.models.functions import TruncWeek, TruncMonth, ExtractIsoWeekDay, ExtractHour
+from orders.models import Order, CustomerStats, DailySalesFact
 from inventory.models import Product, Category
 from accounts.models import CustomUser
+from ml_predictions.models import InventoryRecommendation
+from .inventory_optimization import reorder_list, recommendation_as_dict
 import logging
 
 logger = logging.getLogger(__name__)
 
+DASHBOARD_CACHE_KEY = 'ml_predictions:insights:comprehensive'
+DASHBOARD_REFRESH_LOCK_KEY = f'{DASHBOARD_CACHE_KEY}:refreshing'
+
+
+def _run_with_own_connection(func, **kwargs):
+    """Ejecuta ``func`` en un hilo del pool y cierra al final la conexión a BD que abrió ese hilo"""
+    try:
+        return func(**kwargs)
+    finally:
+        connections.close_all()
+
+
+def _revalidate_dashboard():
+    try:
+        SalesInsightsService().refresh_comprehensive_dashboard()
+    except Exception as e:
+        logger.error(f"Error revalidando dashboard completo: {str(e)}")
+    finally:
+        cache.delete(DASHBOARD_REFRESH_LOCK_KEY)
+        connections.close_all()
+
 
 class SalesInsightsService:
     """
@@ -22,18 +49,20 @@ class SalesInsightsService:
     """
     
     def __init__(self):
-        self.valid_statuses = ['PAID', 'AWAITING_DISPATCH', 'SHIPPED', 'DELIVERED']
+        self.valid_statuses = list(Order.SALE_STATUSES)
+    
+    def _sales_facts(self, days):
+        """Hechos diarios de ventas efectivas desde hace ``days`` días (ver orders.DailySalesFact)"""
+        start_date = timezone.localdate() - timedelta(days=days)
+        return DailySalesFact.objects.filter(status_class='sale', date__gte=start_date)
     
     def get_top_selling_products(self, days=30, limit=10):
         """
         Productos más vendidos en el período
         """
         try:
-            start_date = timezone.now() - timedelta(days=days)
-            
-            top_products = OrderItem.objects.filter(
-                order__created_at__gte=start_date,
-                order__status__in=self.valid_statuses
+            top_products = self._sales_facts(days).filter(
+                product__isnull=False
             ).values(
                 'product__id',
                 'product__name',
@@ -41,8 +70,8 @@ class SalesInsightsService:
                 'product__category__name'
             ).annotate(
                 total_quantity=Sum('quantity'),
-                total_revenue=Sum('line_subtotal'),
-                num_orders=Count('order__id', distinct=True)
+                total_revenue=Sum('revenue'),
+                num_orders=Sum('product_orders')
             ).order_by('-total_quantity')[:limit]
             
             return {
@@ -59,108 +88,129 @@ class SalesInsightsService:
         Rendimiento de ventas por categoría
         """
         try:
-            start_date = timezone.now() - timedelta(days=days)
-            
-            category_stats = OrderItem.objects.filter(
-                order__created_at__gte=start_date,
-                order__status__in=self.valid_statuses,
-                product__category__isnull=False
+            category_stats = list(self._sales_facts(days).filter(
+                category__isnull=False
             ).values(
-                'product__category__id',
-                'product__category__name',
-                'product__category__gender',
-                'product__category__kind'
+                'category__id',
+                'category__name',
+                'category__gender',
+                'category__kind'
             ).annotate(
                 total_quantity=Sum('quantity'),
-                total_revenue=Sum('line_subtotal'),
-                num_orders=Count('order__id', distinct=True),
-                avg_price=Avg('unit_price'),
-                num_products=Count('product__id', distinct=True)
-            ).order_by('-total_revenue')
+                total_revenue=Sum('revenue'),
+                num_orders=Sum('category_orders'),
+                num_products=Count('product', distinct=True)
+            ).order_by('-total_revenue'))
+            
+            categories = []
+            for row in category_stats:
+                quantity = row['total_quantity'] or 0
+                categories.append({
+                    'product__category__id': row['category__id'],
+                    'product__category__name': row['category__name'],
+                    'product__category__gender': row['category__gender'],
+                    'product__category__kind': row['category__kind'],
+                    'total_quantity': quantity,
+                    'total_revenue': row['total_revenue'],
+                    'num_orders': row['num_orders'],
+                    'avg_price': row['total_revenue'] / quantity if quantity else 0,
+                    'num_products': row['num_products'],
+                })
             
             return {
                 'success': True,
-                'categories': list(category_stats),
+                'categories': categories,
                 'period_days': days
             }
         except Exception as e:
             logger.error(f"Error obteniendo rendimiento de categorías: {str(e)}")
             return {'success': False, 'error': str(e)}
     
+    DAY_NAMES_ES = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+    
     def get_sales_by_day_of_week(self, days=90):
         """
-        Análisis de ventas por día de la semana
+        Análisis de ventas por día de la semana (agregado en la BD sobre DailySalesFact)
         """
         try:
-            start_date = timezone.now() - timedelta(days=days)
+            dow_rows = self._sales_facts(days).annotate(
+                iso_weekday=ExtractIsoWeekDay('date')
+            ).values('iso_weekday').annotate(
+                total_revenue=Sum('order_total'),
+                num_orders=Sum('order_count'),
+                total_items=Sum('order_items')
+            ).filter(num_orders__gt=0).order_by('iso_weekday')
             
-            orders = Order.objects.filter(
-                created_at__gte=start_date,
-                status__in=self.valid_statuses
-            ).annotate(
-                date=TruncDate('created_at')
-            )
-            
-            # Crear DataFrame para análisis
-            orders_data = list(orders.values('date', 'grand_total', 'total_items'))
-            if not orders_data:
+            dow_stats = [
+                {
+                    'day_of_week': row['iso_weekday'] - 1,
+                    'day_name': self.DAY_NAMES_ES[row['iso_weekday'] - 1],
+                    'total_revenue': float(row['total_revenue'] or 0),
+                    'avg_order_value': float(row['total_revenue'] or 0) / row['num_orders'],
+                    'num_orders': row['num_orders'],
+                    'total_items': row['total_items'] or 0,
+                }
+                for row in dow_rows
+            ]
+            if not dow_stats:
                 return {'success': False, 'error': 'No hay datos suficientes'}
             
-            df = pd.DataFrame(orders_data)
-            df['date'] = pd.to_datetime(df['date'])
-            df['day_of_week'] = df['date'].dt.dayofweek
-            df['day_name'] = df['date'].dt.day_name()
-            
-            # Agrupar por día de semana
-            dow_stats = df.groupby(['day_of_week', 'day_name']).agg({
-                'grand_total': ['sum', 'mean', 'count'],
-                'total_items': 'sum'
-            }).reset_index()
-            
-            dow_stats.columns = ['day_of_week', 'day_name', 'total_revenue', 'avg_order_value', 'num_orders', 'total_items']
-            dow_stats = dow_stats.sort_values('day_of_week')
-            
-            # Traducir nombres al español
-            day_names_es = {
-                'Monday': 'Lunes',
-                'Tuesday': 'Martes',
-                'Wednesday': 'Miércoles',
-                'Thursday': 'Jueves',
-                'Friday': 'Viernes',
-                'Saturday': 'Sábado',
-                'Sunday': 'Domingo'
-            }
-            dow_stats['day_name'] = dow_stats['day_name'].map(day_names_es)
-            
             return {
                 'success': True,
-                'day_of_week_stats': dow_stats.to_dict('records'),
+                'day_of_week_stats': dow_stats,
+                'hourly_heatmap': self.get_hourly_heatmap(days=days),
                 'period_days': days
             }
         except Exception as e:
             logger.error(f"Error analizando ventas por día: {str(e)}")
             return {'success': False, 'error': str(e)}
     
+    def get_hourly_heatmap(self, days=90):
+        """
+        Mapa de calor hora del día × día de la semana (hora local de la tienda).
+        Devuelve matrices 7x24 (fila 0 = lunes) con ingresos y número de órdenes.
+        """
+        start_date = timezone.now() - timedelta(days=days)
+        cells = Order.objects.filter(
+            created_at__gte=start_date,
+            status__in=self.valid_statuses
+        ).annotate(
+            iso_weekday=ExtractIsoWeekDay('created_at'),
+            hour=ExtractHour('created_at')
+        ).values('iso_weekday', 'hour').annotate(
+            total_revenue=Sum('grand_total'),
+            num_orders=Count('id')
+        ).order_by()
+        
+        revenue = [[0.0] * 24 for _ in range(7)]
+        orders = [[0] * 24 for _ in range(7)]
+        for cell in cells:
+            revenue[cell['iso_weekday'] - 1][cell['hour']] = float(cell['total_revenue'] or 0)
+            orders[cell['iso_weekday'] - 1][cell['hour']] = cell['num_orders']
+        
+        return {
+            'days': self.DAY_NAMES_ES,
+            'hours': list(range(24)),
+            'revenue': revenue,
+            'num_orders': orders,
+        }
+    
     def get_monthly_trends(self, months=6):
         """
         Tendencias mensuales de ventas
         """
         try:
-            start_date = timezone.now() - timedelta(days=months * 30)
-            
-            monthly_stats = Order.objects.filter(
-                created_at__gte=start_date,
-                status__in=self.valid_statuses
-            ).annotate(
-                month=TruncMonth('created_at')
+            monthly_stats = self._sales_facts(months * 30).annotate(
+                month=TruncMonth('date')
             ).values('month').annotate(
-                total_revenue=Sum('grand_total'),
-                num_orders=Count('id'),
-                avg_order_value=Avg('grand_total'),
-                total_items=Sum('total_items')
+                total_revenue=Sum('order_total'),
+                num_orders=Sum('order_count'),
+                total_items=Sum('order_items')
             ).order_by('month')
             
             monthly_data = list(monthly_stats)
+            for row in monthly_data:
+                row['avg_order_value'] = row['total_revenue'] / row['num_orders'] if row['num_orders'] else 0
             
             # Calcular crecimiento mes a mes
             for i in range(1, len(monthly_data)):
@@ -186,13 +236,15 @@ class SalesInsightsService:
     
     def get_customer_insights(self, days=90):
         """
-        Insights sobre clientes y comportamiento de compra
+        Insights sobre clientes y comportamiento de compra.
+        El ranking usa las órdenes del período; lifetime_spent / lifetime_orders
+        son los totales históricos de la proyección CustomerStats.
         """
         try:
             start_date = timezone.now() - timedelta(days=days)
             
-            # Clientes más frecuentes
-            top_customers = Order.objects.filter(
+            # Clientes más frecuentes (índice de órdenes por estado y fecha)
+            top_customers = list(Order.objects.filter(
                 created_at__gte=start_date,
                 status__in=self.valid_statuses
             ).values(
@@ -205,13 +257,22 @@ class SalesInsightsService:
                 total_spent=Sum('grand_total'),
                 avg_order_value=Avg('grand_total'),
                 total_items=Sum('total_items')
-            ).order_by('-total_spent')[:10]
+            ).order_by('-total_spent')[:10])
+            lifetime = {
+                user_id: (spent, orders) for user_id, spent, orders in CustomerStats.objects.filter(
+                    user_id__in=[customer['user__id'] for customer in top_customers]
+                ).values_list('user_id', 'total_spent', 'order_count')
+            }
+            for customer in top_customers:
+                customer['lifetime_spent'], customer['lifetime_orders'] = lifetime.get(customer['user__id'], (None, None))
+            
+            active_stats = CustomerStats.objects.filter(
+                last_order_at__gte=start_date,
+                order_count__gt=0
+            )
             
             # Estadísticas generales
-            total_customers = Order.objects.filter(
-                created_at__gte=start_date,
-                status__in=self.valid_statuses
-            ).values('user').distinct().count()
+            total_customers = active_stats.count()
             
             # Clientes nuevos vs recurrentes
             new_customers = CustomUser.objects.filter(
@@ -221,7 +282,7 @@ class SalesInsightsService:
             
             return {
                 'success': True,
-                'top_customers': list(top_customers),
+                'top_customers': top_customers,
                 'total_customers': total_customers,
                 'new_customers': new_customers,
                 'period_days': days
@@ -230,11 +291,32 @@ class SalesInsightsService:
             logger.error(f"Error obteniendo insights de clientes: {str(e)}")
             return {'success': False, 'error': str(e)}
     
-    def get_low_stock_alerts(self, threshold=10):
+    LOW_STOCK_METHODS = ('reorder_point', 'threshold')
+    DEFAULT_LOW_STOCK_THRESHOLD = 10
+    
+    def get_low_stock_alerts(self, threshold=None, method=None):
         """
-        Productos con stock bajo que necesitan reabastecimiento
+        Productos con stock bajo que necesitan reabastecimiento.
+        ``method='reorder_point'`` usa los puntos de reorden calculados (ver inventory_optimization)
+        y ``method='threshold'`` el umbral fijo ``threshold``. Sin ``method``, un umbral explícito
+        manda; si no, se usan los puntos de reorden cuando ya se calcularon.
+        La respuesta siempre incluye ``method`` y ``threshold`` (None con puntos de reorden).
         """
         try:
+            if method is None:
+                use_reorder_point = threshold is None and InventoryRecommendation.objects.exists()
+                method = 'reorder_point' if use_reorder_point else 'threshold'
+            
+            if method == 'reorder_point':
+                return {
+                    'success': True,
+                    'low_stock_products': [recommendation_as_dict(rec) for rec in reorder_list(limit=20)],
+                    'threshold': None,
+                    'method': 'reorder_point'
+                }
+            
+            if threshold is None:
+                threshold = self.DEFAULT_LOW_STOCK_THRESHOLD
             low_stock_products = Product.objects.filter(
                 is_active=True,
                 stock__lte=threshold
@@ -250,7 +332,8 @@ class SalesInsightsService:
             return {
                 'success': True,
                 'low_stock_products': list(low_stock_products),
-                'threshold': threshold
+                'threshold': threshold,
+                'method': 'threshold'
             }
         except Exception as e:
             logger.error(f"Error obteniendo alertas de stock: {str(e)}")
@@ -261,45 +344,81 @@ class SalesInsightsService:
         Ingresos por método de pago
         """
         try:
-            start_date = timezone.now() - timedelta(days=days)
-            
-            payment_stats = Order.objects.filter(
-                created_at__gte=start_date,
-                status__in=self.valid_statuses,
+            payment_stats = list(self._sales_facts(days).filter(
                 payment_method__isnull=False
             ).values(
                 'payment_method__name',
                 'payment_method__type'
             ).annotate(
-                total_revenue=Sum('grand_total'),
-                num_orders=Count('id'),
-                avg_order_value=Avg('grand_total')
-            ).order_by('-total_revenue')
+                total_revenue=Sum('order_total'),
+                num_orders=Sum('order_count')
+            ).filter(num_orders__gt=0).order_by('-total_revenue'))
+            for row in payment_stats:
+                row['avg_order_value'] = row['total_revenue'] / row['num_orders']
             
             return {
                 'success': True,
-                'payment_method_stats': list(payment_stats),
+                'payment_method_stats': payment_stats,
                 'period_days': days
             }
         except Exception as e:
             logger.error(f"Error obteniendo stats por método de pago: {str(e)}")
             return {'success': False, 'error': str(e)}
     
-    def get_comprehensive_dashboard(self):
+    def _dashboard_sections(self):
+        return {
+            'top_products_30d': (self.get_top_selling_products, {'days': 30, 'limit': 5}),
+            'category_performance': (self.get_category_performance, {'days': 30}),
+            'sales_by_day': (self.get_sales_by_day_of_week, {'days': 90}),
+            'monthly_trends': (self.get_monthly_trends, {'months': 6}),
+            'customer_insights': (self.get_customer_insights, {'days': 90}),
+            'low_stock_alerts': (self.get_low_stock_alerts, {}),
+            'payment_methods': (self.get_revenue_by_payment_method, {'days': 30}),
+        }
+    
+    def build_comprehensive_dashboard(self):
+        """
+        Calcula todas las secciones del dashboard sin caché.
+        Las consultas son independientes, así que se lanzan en paralelo (una conexión por hilo).
+        """
+        sections = self._dashboard_sections()
+        workers = max(1, min(settings.INSIGHTS_DASHBOARD_WORKERS, len(sections)))
+        if workers == 1:
+            results = {name: func(**kwargs) for name, (func, kwargs) in sections.items()}
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='insights') as pool:
+                futures = {
+                    name: pool.submit(_run_with_own_connection, func, **kwargs)
+                    for name, (func, kwargs) in sections.items()
+                }
+                results = {name: future.result() for name, future in futures.items()}
+        return {'success': True, **results, 'generated_at': timezone.now().isoformat()}
+    
+    def refresh_comprehensive_dashboard(self):
+        """Recalcula el dashboard y lo guarda en caché (solo si todas las secciones salieron bien)"""
+        data = self.build_comprehensive_dashboard()
+        if all(section.get('success') for section in data.values() if isinstance(section, dict)):
+            timeout = settings.INSIGHTS_DASHBOARD_CACHE_TTL + settings.INSIGHTS_DASHBOARD_STALE_TTL
+            cache.set(DASHBOARD_CACHE_KEY, {'data': data, 'cached_at': time.time()}, timeout=timeout)
+        return data
+    
+    def get_comprehensive_dashboard(self, force_refresh=False):
         """
-        Dashboard completo con todos los insights clave
+        Dashboard completo con todos los insights clave.
+        Stale-while-revalidate: dentro del TTL se devuelve la caché; vencido el TTL se
+        devuelve el valor anterior y se recalcula en segundo plano (un solo hilo a la vez).
         """
         try:
-            return {
-                'success': True,
-                'top_products_30d': self.get_top_selling_products(days=30, limit=5),
-                'category_performance': self.get_category_performance(days=30),
-                'sales_by_day': self.get_sales_by_day_of_week(days=90),
-                'monthly_trends': self.get_monthly_trends(months=6),
-                'customer_insights': self.get_customer_insights(days=90),
-                'low_stock_alerts': self.get_low_stock_alerts(threshold=10),
-                'payment_methods': self.get_revenue_by_payment_method(days=30)
-            }
+            entry = None if force_refresh else cache.get(DASHBOARD_CACHE_KEY)
+            if entry is None:
+                return {**self.refresh_comprehensive_dashboard(), 'cache_status': 'miss'}
+            
+            if time.time() - entry['cached_at'] < settings.INSIGHTS_DASHBOARD_CACHE_TTL:
+                return {**entry['data'], 'cache_status': 'hit'}
+            
+            if cache.add(DASHBOARD_REFRESH_LOCK_KEY, True, timeout=max(60, settings.INSIGHTS_DASHBOARD_CACHE_TTL)):
+                threading.Thread(target=_revalidate_dashboard, name='insights-revalidate', daemon=True).start()
+            return {**entry['data'], 'cache_status': 'stale'}
         except Exception as e:
             logger.error(f"Error generando dashboard completo: {str(e)}")
             return {'success': False, 'error': str(e)}
@@ -0,0 +1,209 @@
+"""
+Pronóstico de ventas por categoría y por producto (top-N)
+Arma una matriz de demanda (series × días × [ingresos, unidades]) desde DailySalesFact,
+la comparte con un pool de procesos mediante memoria compartida y guarda los
+resultados en SalesForecast con bulk_create
+"""
+import multiprocessing
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from multiprocessing import shared_memory
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from orders.models import DailySalesFact
+from ml_predictions.models import MLModel, Prediction, SalesForecast
+from . import segment_kernels
+import logging
+
+logger = logging.getLogger(__name__)
+
+SCOPE_FIELDS = {
+    'category': 'category_id',
+    'product': 'product_id',
+}
+
+# Series por tarea del pool; bloques más chicos reparten mejor, más grandes reducen overhead
+CHUNK_SIZE = 64
+# Cada serie toma ~1 ms y levantar el pool (spawn + imports) ~1-2 s: por debajo de esto se calcula en el proceso
+PARALLEL_MIN_SERIES = 1000
+
+
+class SegmentForecastService:
+    """
+    Entrena y predice una serie por categoría o por producto (los top-N por unidades)
+    """
+    MODEL_TYPE = 'segment_forecast'
+
+    def __init__(self, horizon=30, history_days=365, top_n=100, workers=None, alpha=1.0):
+        self.horizon = horizon
+        self.history_days = history_days
+        self.top_n = top_n
+        self.workers = workers or settings.ML_FORECAST_WORKERS
+        self.alpha = alpha
+
+    def build_demand_matrix(self, scope):
+        """
+        Devuelve (ids, fechas, matriz float64 de forma (series, días, 2)) con los días
+        sin ventas en cero. Los días van hasta ayer (último día cerrado).
+        """
+        field = SCOPE_FIELDS[scope]
+        end_date = timezone.localdate() - timedelta(days=1)
+        start_date = end_date - timedelta(days=self.history_days - 1)
+        facts = DailySalesFact.objects.filter(
+            status_class='sale',
+            date__gte=start_date,
+            date__lte=end_date,
+            **{f'{field}__isnull': False}
+        )
+        if scope == 'product' and self.top_n:
+            top_ids = facts.values(field).annotate(
+                units=Sum('quantity')
+            ).order_by('-units').values_list(field, flat=True)[:self.top_n]
+            facts = facts.filter(**{f'{field}__in': list(top_ids)})
+
+        rows = facts.values('date', field).annotate(
+            revenue=Sum('revenue'),
+            units=Sum('quantity')
+        ).order_by().values_list('date', field, 'revenue', 'units')
+
+        dates = pd.date_range(start_date, end_date, freq='D')
+        rows = list(rows)
+        ids = sorted({row[1] for row in rows})
+        position = {key: i for i, key in enumerate(ids)}
+        matrix = np.zeros((len(ids), len(dates), 2), dtype=np.float64)
+        if rows:
+            series_idx = np.fromiter((position[row[1]] for row in rows), dtype=np.int64, count=len(rows))
+            day_idx = np.fromiter(((row[0] - start_date).days for row in rows), dtype=np.int64, count=len(rows))
+            matrix[series_idx, day_idx, 0] = [float(row[2] or 0) for row in rows]
+            matrix[series_idx, day_idx, 1] = [row[3] or 0 for row in rows]
+        return ids, dates, matrix
+
+    def forecast_matrix(self, matrix, dates):
+        """Pronóstico de todas las series; en paralelo si hay más de un bloque y más de un worker"""
+        weekdays = np.asarray(dates.dayofweek, dtype=np.int64)
+        future = pd.date_range(dates[-1] + timedelta(days=1), periods=self.horizon, freq='D')
+        future_weekdays = np.asarray(future.dayofweek, dtype=np.int64)
+        n_series = matrix.shape[0]
+        out = np.zeros((n_series, self.horizon, matrix.shape[2]), dtype=np.float64)
+
+        workers = min(self.workers, -(-n_series // CHUNK_SIZE)) if n_series >= PARALLEL_MIN_SERIES else 1
+        if workers <= 1:
+            segment_kernels.forecast_block(matrix, out, 0, n_series, weekdays, future_weekdays, self.alpha)
+            return future, out
+
+        shm_in = shared_memory.SharedMemory(create=True, size=matrix.nbytes)
+        shm_out = shared_memory.SharedMemory(create=True, size=out.nbytes)
+        try:
+            np.ndarray(matrix.shape, dtype=np.float64, buffer=shm_in.buf)[:] = matrix
+            tasks = [
+                (shm_in.name, shm_out.name, matrix.shape, start, min(start + CHUNK_SIZE, n_series),
+                 weekdays, future_weekdays, self.alpha)
+                for start in range(0, n_series, CHUNK_SIZE)
+            ]
+            # spawn: los hijos no heredan conexiones a la BD ni hilos del servidor
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                done = sum(pool.map(segment_kernels.run_chunk, tasks))
+            if done != n_series:
+                raise RuntimeError(f"Pronóstico incompleto: {done}/{n_series} series")
+            out[:] = np.ndarray(out.shape, dtype=np.float64, buffer=shm_out.buf)
+        finally:
+            shm_in.close()
+            shm_in.unlink()
+            shm_out.close()
+            shm_out.unlink()
+        return future, out
+
+    def run(self, scopes=('category', 'product'), requested_by=None):
+        """Pronostica los alcances indicados y guarda una Prediction + SalesForecast por alcance"""
+        results = {}
+        for scope in scopes:
+            start_time = time.time()
+            ids, dates, matrix = self.build_demand_matrix(scope)
+            if not ids:
+                results[scope] = {'success': False, 'error': 'No hay ventas en el período'}
+                continue
+            future, out = self.forecast_matrix(matrix, dates)
+            prediction = self._save(scope, ids, future, out, matrix, requested_by, start_time)
+            results[scope] = {
+                'success': True,
+                'prediction_id': str(prediction.id),
+                'series': len(ids),
+                'rows': len(ids) * self.horizon,
+                'seconds': round(time.time() - start_time, 2),
+            }
+            logger.info(f"Pronóstico por {scope}: {len(ids)} series en {results[scope]['seconds']}s")
+        return results
+
+    def _save(self, scope, ids, future, out, matrix, requested_by, start_time):
+        field = SCOPE_FIELDS[scope]
+        parameters = {
+            'scope': scope,
+            'horizon': self.horizon,
+            'history_days': self.history_days,
+            'top_n': self.top_n if scope == 'product' else None,
+            'alpha': self.alpha,
+        }
+        with transaction.atomic():
+            # Modelos por serie efímeros: cada ejecución queda registrada con su propio tipo, sin artefacto
+            ml_model = MLModel.objects.create(
+                name=f"Pronóstico por {'categoría' if scope == 'category' else 'producto'} (Ridge)",
+                model_type=self.MODEL_TYPE,
+                version=timezone.localtime().strftime('%Y%m%d_%H%M%S'),
+                file_path='',
+                parameters=parameters,
+                training_data_size=int(matrix.shape[0] * matrix.shape[1]),
+                is_active=False,
+                trained_by=requested_by,
+                notes='Un modelo por serie, entrenado y descartado en cada ejecución',
+            )
+            prediction = Prediction.objects.create(
+                model=ml_model,
+                input_data=parameters,
+                prediction_result={
+                    'series': len(ids),
+                    'total_predicted_sales': float(out[:, :, 0].sum()),
+                    'total_predicted_quantity': float(out[:, :, 1].sum()),
+                },
+                requested_by=requested_by,
+                execution_time_ms=int((time.time() - start_time) * 1000),
+            )
+            forecast_dates = [day.date() for day in future]
+            revenue = np.round(out[:, :, 0], 2).tolist()
+            units = np.rint(out[:, :, 1]).astype(int).tolist()
+            SalesForecast.objects.bulk_create(
+                (
+                    SalesForecast(
+                        prediction=prediction,
+                        forecast_date=forecast_dates[h],
+                        predicted_sales=revenue[i][h],
+                        predicted_quantity=units[i][h],
+                        **{field: key}
+                    )
+                    for i, key in enumerate(ids)
+                    for h in range(self.horizon)
+                ),
+                batch_size=2000,
+            )
+        return prediction
+
+
+def latest_segment_forecast(scope, limit=50):
+    """Último pronóstico guardado de un alcance, totalizado por serie sobre el horizonte"""
+    field = SCOPE_FIELDS[scope]
+    prediction = Prediction.objects.filter(
+        model__model_type=SegmentForecastService.MODEL_TYPE,
+        input_data__scope=scope
+    ).order_by('-created_at').first()
+    if prediction is None:
+        return None
+    totals = prediction.sales_forecasts.values(field).annotate(
+        predicted_sales=Sum('predicted_sales'),
+        predicted_quantity=Sum('predicted_quantity')
+    ).order_by('-predicted_quantity')[:limit]
+    return prediction, list(totals)
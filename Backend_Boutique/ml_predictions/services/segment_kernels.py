@@ -0,0 +1,90 @@
+"""
+Núcleo numérico del pronóstico por categoría/producto
+Se ejecuta en procesos hijos (spawn) del pool: no debe importar Django ni modelos.
+
+Cada serie es una matriz (días, 2) con [ingresos, unidades] por día. El modelo por
+serie es una regresión Ridge multi-salida sobre lags (1 y 7 días), medias móviles
+(7 y 28 días) y día de la semana; las series cortas o casi sin ventas usan la media
+por día de la semana de las últimas 4 semanas.
+"""
+import numpy as np
+from multiprocessing import shared_memory
+from sklearn.linear_model import Ridge
+
+WINDOW = 28
+MIN_HISTORY = WINDOW + 7
+MIN_ACTIVE_DAYS = 5
+WEEKDAYS = np.eye(7)
+
+
+def _design_matrix(series, weekdays):
+    """Características de todos los días con 28 días previos, vectorizadas con sumas acumuladas"""
+    csum = np.vstack([np.zeros((1, series.shape[1])), np.cumsum(series, axis=0)])
+    t = np.arange(WINDOW, len(series))
+    X = np.hstack([
+        series[t - 1],
+        series[t - 7],
+        (csum[t] - csum[t - 7]) / 7,
+        (csum[t] - csum[t - WINDOW]) / WINDOW,
+        WEEKDAYS[weekdays[t]],
+    ])
+    return X, series[t]
+
+
+def _seasonal_naive(series, weekdays, future_weekdays):
+    window, days = series[-WINDOW:], weekdays[-WINDOW:]
+    means = np.zeros((7, series.shape[1]))
+    for day in range(7):
+        selected = days == day
+        if selected.any():
+            means[day] = window[selected].mean(axis=0)
+    return means[future_weekdays]
+
+
+def forecast_series(series, weekdays, future_weekdays, alpha=1.0):
+    """Pronóstico recursivo de una serie; devuelve (horizonte, 2) no negativo"""
+    horizon = len(future_weekdays)
+    if len(series) < MIN_HISTORY or np.count_nonzero(series[:, 0]) < MIN_ACTIVE_DAYS:
+        return _seasonal_naive(series, weekdays, future_weekdays)
+
+    X, Y = _design_matrix(series, weekdays)
+    model = Ridge(alpha=alpha).fit(X, Y)
+    coef, intercept = model.coef_, model.intercept_
+
+    history = np.empty((len(series) + horizon, series.shape[1]))
+    history[:len(series)] = series
+    out = history[len(series):]
+    for h in range(horizon):
+        t = len(series) + h
+        x = np.concatenate([
+            history[t - 1],
+            history[t - 7],
+            history[t - 7:t].mean(axis=0),
+            history[t - WINDOW:t].mean(axis=0),
+            WEEKDAYS[future_weekdays[h]],
+        ])
+        history[t] = np.maximum(coef @ x + intercept, 0)
+    return out.copy()
+
+
+def forecast_block(data, out, start, stop, weekdays, future_weekdays, alpha=1.0):
+    for i in range(start, stop):
+        out[i] = forecast_series(data[i], weekdays, future_weekdays, alpha)
+    return stop - start
+
+
+def run_chunk(task):
+    """Tarea del pool: lee la matriz de demanda y escribe los pronósticos en memoria compartida"""
+    (in_name, out_name, shape, start, stop, weekdays, future_weekdays, alpha) = task
+    # Los hijos comparten el resource tracker del padre, que es quien libera los segmentos
+    shm_in = shared_memory.SharedMemory(name=in_name)
+    shm_out = shared_memory.SharedMemory(name=out_name)
+    try:
+        data = np.ndarray(shape, dtype=np.float64, buffer=shm_in.buf)
+        out = np.ndarray((shape[0], len(future_weekdays), shape[2]), dtype=np.float64, buffer=shm_out.buf)
+        done = forecast_block(data, out, start, stop, weekdays, future_weekdays, alpha)
+        del data, out
+        return done
+    finally:
+        shm_in.close()
+        shm_out.close()
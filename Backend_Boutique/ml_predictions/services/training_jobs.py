@@ -0,0 +1,308 @@
+"""
+Cola de entrenamientos de modelos ML sobre MLTrainingLog
+La API encola el trabajo (status='pending') y el comando run_ml_worker lo ejecuta
+fuera del ciclo request/response, registrando etapa, progreso y tiempos por etapa
+"""
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from ml_predictions.models import MLModel, MLTrainingLog
+from .model_registry import model_registry
+from .sales_forecast import SalesForecastService, precompute_forecast
+from .segment_forecast import SegmentForecastService
+from .inventory_optimization import InventoryOptimizationService
+from .product_recommendations import CoPurchaseRecommender
+from .product_similarity import ContentSimilarity
+from .customer_segmentation import CustomerSegmentationService
+import logging
+
+logger = logging.getLogger(__name__)
+
+# model_type -> función(job, on_stage) que entrena y completa los campos del log
+JOB_HANDLERS = {}
+
+
+class TrainingJobConflict(Exception):
+    """Ya existe un entrenamiento en cola o en curso para ese tipo de modelo"""
+
+    def __init__(self, job):
+        self.job = job
+        super().__init__(f"Ya hay un entrenamiento de {job.model_type} en curso ({job.id})" if job else "Entrenamiento en curso")
+
+
+class TrainingJobCanceled(Exception):
+    """El entrenamiento se canceló (o se dio por caído) mientras se ejecutaba"""
+
+
+def job_handler(model_type):
+    """Registra la función que ejecuta los entrenamientos de ``model_type``"""
+    def decorator(func):
+        JOB_HANDLERS[model_type] = func
+        return func
+    return decorator
+
+
+def submit_training_job(model_type, started_by=None, parameters=None):
+    """Encola un entrenamiento. La restricción única de MLTrainingLog impide duplicados activos."""
+    if model_type not in JOB_HANDLERS:
+        raise ValueError(f"Tipo de modelo no soportado: {model_type}")
+    # Sin worker activo un trabajo en cola bloquearía su tipo de modelo para siempre
+    expire_pending_jobs(model_type=model_type)
+    try:
+        with transaction.atomic():
+            return MLTrainingLog.objects.create(
+                model_type=model_type,
+                status='pending',
+                stage='queued',
+                started_by=started_by,
+                parameters=parameters or {},
+            )
+    except IntegrityError:
+        active = MLTrainingLog.objects.filter(
+            model_type=model_type,
+            status__in=MLTrainingLog.ACTIVE_STATUSES
+        ).first()
+        raise TrainingJobConflict(active)
+
+
+def claim_next_job():
+    """Toma el trabajo pendiente más antiguo; el UPDATE condicional evita que dos workers tomen el mismo"""
+    for job_id in MLTrainingLog.objects.filter(status='pending').order_by('started_at').values_list('id', flat=True)[:10]:
+        now = timezone.now()
+        claimed = MLTrainingLog.objects.filter(id=job_id, status='pending').update(
+            status='training', claimed_at=now, heartbeat_at=now
+        )
+        if claimed:
+            return MLTrainingLog.objects.get(id=job_id)
+    return None
+
+
+def fail_stale_jobs(timeout_seconds):
+    """Marca como fallidos los trabajos sin señal de vida (worker caído) para liberar su tipo de modelo"""
+    now = timezone.now()
+    return MLTrainingLog.objects.filter(
+        status='training',
+        heartbeat_at__lt=now - timedelta(seconds=timeout_seconds)
+    ).update(
+        status='failed',
+        error_message='El worker dejó de reportar progreso',
+        completed_at=now
+    )
+
+
+def expire_pending_jobs(timeout_seconds=None, model_type=None):
+    """Marca como fallidos los trabajos que ningún worker tomó dentro del plazo"""
+    timeout_seconds = timeout_seconds or settings.ML_TRAINING_PENDING_TIMEOUT
+    now = timezone.now()
+    jobs = MLTrainingLog.objects.filter(status='pending', started_at__lt=now - timedelta(seconds=timeout_seconds))
+    if model_type:
+        jobs = jobs.filter(model_type=model_type)
+    return jobs.update(
+        status='failed',
+        error_message='Ningún worker ML tomó el entrenamiento',
+        completed_at=now
+    )
+
+
+def cancel_training_job(job):
+    """Cancela un entrenamiento en cola o en curso; el worker lo nota al pasar a la siguiente etapa"""
+    canceled = MLTrainingLog.objects.filter(id=job.id, status__in=MLTrainingLog.ACTIVE_STATUSES).update(
+        status='canceled', error_message='Cancelado por el usuario', completed_at=timezone.now()
+    )
+    return bool(canceled)
+
+
+class JobReporter:
+    """Callback ``on_stage(nombre, progreso)``: cierra la etapa anterior y persiste el avance"""
+
+    def __init__(self, job):
+        self.job = job
+        self._stage = None
+        self._stage_started = None
+
+    def __call__(self, stage, progress):
+        now = time.monotonic()
+        self._close_stage(now)
+        self._stage, self._stage_started = stage, now
+        self.job.stage = stage
+        self.job.progress = progress
+        self.job.heartbeat_at = timezone.now()
+        updated = MLTrainingLog.objects.filter(id=self.job.id, status='training').update(
+            stage=self.job.stage,
+            progress=self.job.progress,
+            stage_timings=self.job.stage_timings,
+            heartbeat_at=self.job.heartbeat_at,
+        )
+        if not updated:
+            raise TrainingJobCanceled(f"Entrenamiento {self.job.id} cancelado")
+
+    def finish(self):
+        self._close_stage(time.monotonic())
+        self._stage = None
+
+    def _close_stage(self, now):
+        if self._stage:
+            self.job.stage_timings[self._stage] = round(now - self._stage_started, 3)
+
+
+def run_job(job):
+    """Ejecuta un trabajo ya tomado (status='training') y deja el resultado en el log"""
+    reporter = JobReporter(job)
+    start_time = time.time()
+    try:
+        handler = JOB_HANDLERS.get(job.model_type)
+        if handler is None:
+            raise ValueError(f"Tipo de modelo no soportado: {job.model_type}")
+        handler(job, reporter)
+        reporter.finish()
+        job.status = 'completed'
+        job.stage = 'done'
+        job.progress = 100
+    except TrainingJobCanceled:
+        # El estado ya lo dejó quien canceló; solo se guardan los tiempos medidos
+        reporter.finish()
+        logger.info(f"Entrenamiento {job.id} cancelado en la etapa {job.stage}")
+        job.refresh_from_db(fields=['status', 'error_message', 'completed_at'])
+        job.training_duration_seconds = int(time.time() - start_time)
+        job.save(update_fields=['stage_timings', 'training_duration_seconds'])
+        return job
+    except Exception as e:
+        reporter.finish()
+        logger.error(f"Error en entrenamiento {job.id}: {str(e)}")
+        job.status = 'failed'
+        job.error_message = str(e)
+    job.training_duration_seconds = int(time.time() - start_time)
+    job.completed_at = timezone.now()
+    job.save()
+    return job
+
+
+def run_pending_jobs(max_jobs=None):
+    """Procesa la cola hasta vaciarla (o hasta ``max_jobs``). Devuelve los trabajos ejecutados."""
+    done = []
+    while max_jobs is None or len(done) < max_jobs:
+        job = claim_next_job()
+        if job is None:
+            break
+        done.append(run_job(job))
+    return done
+
+
+@job_handler('sales_forecast')
+def train_sales_forecast(job, on_stage):
+    model_type = job.parameters.get('model_type', 'auto')
+    service = SalesForecastService()
+    result = service.train_model(model_type=model_type, on_stage=on_stage)
+    if not result['success']:
+        raise ValueError(result.get('error', 'Error desconocido'))
+
+    on_stage('register', 95)
+    ml_model = MLModel.objects.create(
+        name=f"Pronóstico de Ventas {result['model_type']}",
+        model_type='sales_forecast',
+        version=service.version,
+        file_path=service.model_path,
+        accuracy_score=result['metrics'].get('test_r2', 0),
+        metrics=result['metrics'],
+        parameters=result['parameters'],
+        training_data_size=result['training_data_size'],
+        trained_by=job.started_by
+    )
+    # El nuevo modelo pasa a ser el único activo de su tipo
+    MLModel.objects.filter(
+        model_type='sales_forecast', is_active=True
+    ).exclude(id=ml_model.id).update(is_active=False)
+    model_registry.register(ml_model, service.model)
+
+    # El pronóstico por defecto queda listo para el panel; si falla, el modelo igual es válido
+    on_stage('precompute', 97)
+    try:
+        precompute_forecast()
+    except Exception as e:
+        logger.warning(f"No se pudo precalcular el pronóstico del modelo {ml_model.id}: {str(e)}")
+
+    job.metrics = result['metrics']
+    job.records_processed = result['training_data_size']
+    job.model_saved = ml_model
+
+
+@job_handler('segment_forecast')
+def run_segment_forecast(job, on_stage):
+    params = job.parameters
+    service = SegmentForecastService(
+        horizon=int(params.get('horizon', 30)),
+        history_days=int(params.get('history_days', 365)),
+        top_n=int(params.get('top_n', 100)),
+    )
+    scopes = params.get('scopes') or ['category', 'product']
+    results = {}
+    for i, scope in enumerate(scopes):
+        on_stage(f'forecast_{scope}', int(100 * i / len(scopes)))
+        results.update(service.run(scopes=[scope], requested_by=job.started_by))
+    failed = [scope for scope, result in results.items() if not result['success']]
+    if len(failed) == len(scopes):
+        raise ValueError(results[failed[0]]['error'])
+
+    job.metrics = results
+    job.records_processed = sum(result.get('rows', 0) for result in results.values())
+
+
+@job_handler('inventory_optimization')
+def run_inventory_optimization(job, on_stage):
+    params = job.parameters
+    service = InventoryOptimizationService(
+        history_days=int(params.get('history_days', 90)),
+        lead_time_days=int(params.get('lead_time_days', 7)),
+        service_level=float(params.get('service_level', 0.95)),
+        review_days=int(params.get('review_days', 14)),
+    )
+    on_stage('compute', 10)
+    result = service.run(requested_by=job.started_by)
+    if not result['success']:
+        raise ValueError(result['error'])
+
+    job.metrics = result
+    job.records_processed = result['items']
+    job.model_saved_id = result['model_id']
+
+
+@job_handler('product_recommendation')
+def build_product_recommendations(job, on_stage):
+    params = job.parameters
+    recommender = CoPurchaseRecommender(
+        top_k=int(params.get('top_k', 20)),
+        min_support=int(params.get('min_support', 1)),
+    )
+    on_stage('co_occurrence', 10)
+    result = recommender.build(full=bool(params.get('full', False)), requested_by=job.started_by)
+
+    job.metrics = result
+    job.records_processed = result['orders_added'] + result['orders_removed']
+    job.model_saved_id = result.get('model_id')
+
+
+@job_handler('product_similarity')
+def build_product_similarity(job, on_stage):
+    params = job.parameters
+    builder = ContentSimilarity(top_k=int(params.get('top_k', 20)))
+    on_stage('similarity', 10)
+    result = builder.build(full=bool(params.get('full', False)), requested_by=job.started_by)
+
+    job.metrics = result
+    job.records_processed = result['products_updated']
+    job.model_saved_id = result.get('model_id')
+
+
+@job_handler('customer_segmentation')
+def segment_customers(job, on_stage):
+    service = CustomerSegmentationService(n_clusters=int(job.parameters.get('n_clusters', 4)))
+    on_stage('clustering', 10)
+    result = service.run(requested_by=job.started_by)
+    if not result['success']:
+        raise ValueError(result['error'])
+
+    job.metrics = result
+    job.records_processed = result['customers']
+    job.model_saved_id = result['model_id']
@@ -0,0 +1,18 @@
+"""
+Receptores de señales de otras apps que alimentan los modelos en streaming
+"""
+from django.dispatch import receiver
+from orders.signals import order_status_changed
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(order_status_changed, dispatch_uid='ml_predictions.sales_anomalies')
+def update_sales_anomaly_series(sender, order, old_status, new_status, **kwargs):
+    from .services.sales_anomalies import StreamingAnomalyDetector
+    # La detección es auxiliar: un error aquí no debe impedir la transición de la orden
+    try:
+        StreamingAnomalyDetector().apply_transition(order, old_status, new_status)
+    except Exception as e:
+        logger.error(f"Error actualizando series de anomalías de ventas: {str(e)}")
@@ -0,0 +1,298 @@
+import io
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+import joblib
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from inventory.models import Category, Product
+from orders.models import Order, OrderItem, PaymentMethod
+from orders.projections import rebuild_customer_stats
+from orders.signals import order_status_changed
+
+from .models import MLTrainingLog, ProductRecommendation, SalesSeriesDelta
+from .services.model_registry import local_artifact, save_artifact
+from .services.product_recommendations import CoPurchaseRecommender, RecommendationIndex
+from .services.product_similarity import ContentSimilarity
+from .services.sales_insights import SalesInsightsService
+from .services.training_jobs import JobReporter, TrainingJobCanceled, claim_next_job, submit_training_job
+
+User = get_user_model()
+
+
+class ArtifactDirMixin:
+    """Los artefactos joblib (storage y caché local) se escriben en directorios temporales"""
+
+    def setUp(self):
+        super().setUp()
+        self.models_dir, media_root = tempfile.mkdtemp(), tempfile.mkdtemp()
+        for directory in (self.models_dir, media_root):
+            self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        patcher = mock.patch('ml_predictions.services.model_registry.MODELS_DIR', self.models_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+
+class ModelArtifactTests(ArtifactDirMixin, SimpleTestCase):
+
+    def test_remote_artifact_is_downloaded_once_per_version(self):
+        with mock.patch('ml_predictions.services.model_registry._storage_path', return_value=None):
+            name = save_artifact({'coef': [1, 2]}, 'sales_forecast', '20250301_100000')
+            self.assertEqual(name, 'ml_models/sales_forecast/20250301_100000.joblib')
+            # Otro proceso (servicio web) sin copia local
+            shutil.rmtree(os.path.join(self.models_dir, 'ml_models'))
+
+            with mock.patch('ml_predictions.services.model_registry.default_storage.open', wraps=default_storage.open) as opened:
+                path = local_artifact(name)
+                self.assertEqual(local_artifact(name), path)
+            self.assertEqual(opened.call_count, 1)
+            self.assertEqual(joblib.load(path), {'coef': [1, 2]})
+
+            with self.assertRaises(FileNotFoundError):
+                local_artifact('ml_models/sales_forecast/missing.joblib')
+
+
+def recommendation_rows(method):
+    return sorted(ProductRecommendation.objects.filter(method=method).values_list(
+        'product_id', 'rank', 'recommended_id', 'support'
+    ))
+
+
+def recommendation_scores(method):
+    return [score for *_, score in sorted(ProductRecommendation.objects.filter(method=method).values_list(
+        'product_id', 'rank', 'score'
+    ))]
+
+
+class CoPurchaseRecommenderTests(ArtifactDirMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Camisas', gender='M', kind='V')
+        cls.products = [
+            Product.objects.create(sku=f'P{i}', name=f'Producto {i}', category=category, price=Decimal('10'), stock=10)
+            for i in range(12)
+        ]
+        cls.payment_method = PaymentMethod.objects.create(code='cash', name='Efectivo')
+        cls.customer = User.objects.create(username='cliente', identification_number='C1')
+
+    def make_orders(self, count, seed):
+        rng = random.Random(seed)
+        orders = []
+        for _ in range(count):
+            order = Order.objects.create(user=self.customer, status='PAID', payment_method=self.payment_method)
+            for product in rng.sample(self.products, rng.randint(1, 4)):
+                OrderItem.objects.create(
+                    order=order, product=product, product_name_cache=product.name, sku_cache=product.sku,
+                    unit_price=product.price, quantity=1, line_subtotal=product.price,
+                )
+            orders.append(order)
+        return orders
+
+    def test_incremental_build_matches_full_build(self):
+        orders = self.make_orders(50, seed=1)
+        first = CoPurchaseRecommender().build()
+        self.assertTrue(first['full'])
+
+        self.make_orders(15, seed=2)
+        Order.objects.filter(pk__in=[orders[0].pk, orders[7].pk]).update(status='CANCELED')
+        incremental = CoPurchaseRecommender().build()
+        self.assertFalse(incremental['full'])
+        self.assertEqual((incremental['orders_added'], incremental['orders_removed']), (15, 2))
+        rows, scores = recommendation_rows('co_purchase'), recommendation_scores('co_purchase')
+
+        self.assertTrue(CoPurchaseRecommender().build(full=True)['full'])
+        self.assertEqual(rows, recommendation_rows('co_purchase'))
+        for score, expected in zip(scores, recommendation_scores('co_purchase')):
+            self.assertAlmostEqual(score, expected, places=6)
+
+    def test_build_without_changes_is_noop(self):
+        self.make_orders(20, seed=3)
+        CoPurchaseRecommender().build()
+        result = CoPurchaseRecommender().build()
+        self.assertEqual((result['orders_added'], result['orders_removed'], result['products_updated']), (0, 0, 0))
+
+    def test_index_serves_neighbors_on_demand(self):
+        self.make_orders(40, seed=4)
+        CoPurchaseRecommender().build()
+        index = RecommendationIndex(CoPurchaseRecommender.MODEL_TYPE, CoPurchaseRecommender.METHOD)
+        product = self.products[0]
+        expected = list(ProductRecommendation.objects.filter(
+            method='co_purchase', product=product
+        ).order_by('rank').values_list('recommended_id', flat=True)[:3])
+
+        neighbors = index.neighbors(product.id, limit=3)
+        self.assertEqual([item['id'] for item in neighbors], expected)
+        self.assertEqual(set(neighbors[0]), {'id', 'name', 'sku', 'price', 'image', 'score', 'support'})
+        with self.assertNumQueries(0):
+            index.neighbors(product.id, limit=3)
+
+        basket = [self.products[0].id, self.products[1].id]
+        self.assertFalse({item['id'] for item in index.for_basket(basket)} & set(basket))
+        self.assertEqual(index.neighbors(-1), [])
+
+    def test_view_clamps_limit(self):
+        self.make_orders(40, seed=5)
+        CoPurchaseRecommender().build()
+        product_id = self.products[0].id
+        for limit, expected in (('0', 1), ('-5', 1), ('2', 2)):
+            response = self.client.get(
+                '/api/ml/recommendations/frequently-bought-together/', {'product_id': product_id, 'limit': limit}
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['recommendations']), expected)
+
+        response = self.client.get('/api/ml/recommendations/frequently-bought-together/', {'product_id': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ContentSimilarityTests(ArtifactDirMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(3)
+        cls.categories = [
+            Category.objects.create(name='Camisas', gender='M', kind='V'),
+            Category.objects.create(name='Zapatos', gender='F', kind='Z'),
+        ]
+        colors, sizes = ['Negro', 'Azul', 'Rojo', 'Verde'], ['S', 'M', 'L', '38', '40']
+        cls.products = [
+            Product.objects.create(
+                sku=f'S{i}', name=f'Producto {i}', category=rng.choice(cls.categories),
+                price=Decimal(rng.choice(['10', '25', '60', '150'])),
+                colors=rng.sample(colors, 2), sizes=rng.sample(sizes, 2),
+            )
+            for i in range(60)
+        ]
+
+    def test_incremental_build_matches_full_build(self):
+        self.assertTrue(ContentSimilarity(top_k=5).build()['full'])
+
+        # updated_at posterior a la marca de agua de la construcción anterior
+        time.sleep(0.01)
+        edited = self.products[5]
+        edited.category = self.categories[1]
+        edited.colors = ['Rojo']
+        edited.price = Decimal('150')
+        edited.save()
+        Product.objects.create(
+            sku='NEW', name='Nuevo', category=self.categories[0], price=Decimal('25'), colors=['Negro'], sizes=['M']
+        )
+        self.products[7].is_active = False
+        self.products[7].save()
+
+        incremental = ContentSimilarity(top_k=5).build()
+        self.assertFalse(incremental['full'])
+        self.assertLess(incremental['products_updated'], incremental['products'])
+        rows, scores = recommendation_rows('content'), recommendation_scores('content')
+        self.assertFalse(ProductRecommendation.objects.filter(method='content', product=self.products[7]).exists())
+
+        self.assertTrue(ContentSimilarity(top_k=5).build(full=True)['full'])
+        self.assertEqual(rows, recommendation_rows('content'))
+        for score, expected in zip(scores, recommendation_scores('content')):
+            self.assertAlmostEqual(score, expected, places=5)
+
+    def test_build_without_changes_is_noop(self):
+        ContentSimilarity(top_k=5).build()
+        self.assertEqual(ContentSimilarity(top_k=5).build()['products_updated'], 0)
+
+    def test_view_clamps_limit(self):
+        ContentSimilarity(top_k=5).build()
+        product_id = self.products[0].id
+        for limit, expected in (('0', 1), ('-3', 1), ('100', 5)):
+            response = self.client.get('/api/ml/recommendations/similar/', {'product_id': product_id, 'limit': limit})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['recommendations']), expected)
+
+
+class CustomerInsightsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.loyal = User.objects.create(username='fiel', identification_number='C1')
+        cls.recent = User.objects.create(username='reciente', identification_number='C2')
+        for user, total, days_ago in ((cls.loyal, '500', 200), (cls.loyal, '20', 5), (cls.recent, '80', 3)):
+            order = Order.objects.create(user=user, status='PAID', grand_total=Decimal(total), total_items=1)
+            Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        rebuild_customer_stats()
+
+    def test_ranking_uses_period_orders(self):
+        result = SalesInsightsService().get_customer_insights(days=30)
+        self.assertEqual(
+            [(c['user__id'], c['total_spent'], c['num_orders']) for c in result['top_customers']],
+            [(self.recent.id, Decimal('80'), 1), (self.loyal.id, Decimal('20'), 1)],
+        )
+        loyal = result['top_customers'][1]
+        self.assertEqual((loyal['lifetime_spent'], loyal['lifetime_orders']), (Decimal('520'), 2))
+        self.assertEqual(result['total_customers'], 2)
+
+
+class MLWorkerOnceTests(TestCase):
+
+    def test_once_runs_periodic_tasks_before_exiting(self):
+        customer = User.objects.create(username='cliente', identification_number='C1')
+        order = Order.objects.create(user=customer, status='PAID', grand_total=Decimal('10'))
+        order_status_changed.send(sender=Order, order=order, old_status='DRAFT', new_status='PAID')
+        self.assertTrue(SalesSeriesDelta.objects.exists())
+
+        command = 'ml_predictions.management.commands.run_ml_worker.Command'
+        with mock.patch(f'{command}._precompute') as precompute, \
+                mock.patch(f'{command}._refresh_recommendations') as refresh:
+            call_command('run_ml_worker', '--once', stdout=io.StringIO())
+        self.assertTrue(precompute.called and refresh.called)
+        self.assertFalse(SalesSeriesDelta.objects.exists())
+
+
+class TrainingJobTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', identification_number='A1', user_type='admin')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_unclaimed_job_expires_on_next_submit(self):
+        stale = submit_training_job('sales_forecast')
+        MLTrainingLog.objects.filter(pk=stale.pk).update(started_at=timezone.now() - timedelta(hours=1))
+
+        with override_settings(ML_TRAINING_PENDING_TIMEOUT=600):
+            job = submit_training_job('sales_forecast')
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, 'failed')
+        self.assertEqual(job.status, 'pending')
+
+    def test_cancel_endpoint(self):
+        job = submit_training_job('sales_forecast')
+        url = f'/api/ml/training-jobs/{job.id}/cancel/'
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['job']['status'], 'canceled')
+        self.assertEqual(self.client.post(url).status_code, 409)
+        # El tipo de modelo queda libre
+        self.assertEqual(submit_training_job('sales_forecast').status, 'pending')
+
+    def test_running_job_stops_at_next_stage(self):
+        submit_training_job('sales_forecast')
+        job = claim_next_job()
+        reporter = JobReporter(job)
+        reporter('load', 10)
+        self.client.post(f'/api/ml/training-jobs/{job.id}/cancel/')
+        with self.assertRaises(TrainingJobCanceled):
+            reporter('train', 50)
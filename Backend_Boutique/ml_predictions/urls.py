@@ -15,8 +15,17 @@ urlpatterns = [
     
     # Sales Forecast
     path('train-sales-forecast/', views.train_sales_forecast_model, name='train-sales-forecast'),
+    path('training-jobs/<uuid:job_id>/', views.training_job_status, name='training-job-status'),
+    path('training-jobs/<uuid:job_id>/cancel/', views.cancel_training, name='cancel-training-job'),
     path('predict-sales/', views.predict_sales, name='predict-sales'),
     path('sales-analytics/', views.sales_analytics, name='sales-analytics'),
+    path('segment-forecasts/', views.segment_forecasts, name='segment-forecasts'),
+    path('inventory/reorder/', views.inventory_reorder, name='inventory-reorder'),
+    path('customers/segments/', views.customer_segments, name='customer-segments'),
+    path('customers/segments/members/', views.customer_segment_members, name='customer-segment-members'),
+    path('anomalies/', views.sales_anomalies, name='sales-anomalies'),
+    path('recommendations/frequently-bought-together/', views.frequently_bought_together, name='frequently-bought-together'),
+    path('recommendations/similar/', views.similar_products, name='similar-products'),
     
     # Sales Insights
     path('insights/top-products/', views.get_top_products, name='top-products'),
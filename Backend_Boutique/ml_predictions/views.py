@@ -1,20 +1,28 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.utils import timezone
 from datetime import datetime, timedelta
-import time
 import logging
 
-from .models import MLModel, Prediction, SalesForecast, MLTrainingLog
+from .models import MLModel, Prediction, MLTrainingLog, CustomerSegment, SalesAnomaly, SalesSeriesState
 from .serializers import (
     MLModelSerializer, PredictionSerializer, SalesForecastSerializer,
     MLTrainingLogSerializer
 )
 from .services.sales_forecast import SalesForecastService
+from .services.training_jobs import submit_training_job, cancel_training_job, TrainingJobConflict
+from .services.segment_forecast import SCOPE_FIELDS, latest_segment_forecast
+from .services.inventory_optimization import reorder_list, recommendation_as_dict
+from .services.product_recommendations import recommendation_index
+from .services.product_similarity import similarity_index
+from .services.customer_segmentation import segment_sizes, segment_members, member_as_dict
+from .services.sales_anomalies import recent_anomalies
 from .services.sales_insights import SalesInsightsService
 from accounts.permissions import RequirePermission
+from inventory.models import Category, Product
+from orders.models import PaymentMethod
 
 logger = logging.getLogger(__name__)
 
@@ -78,79 +86,82 @@ class MLTrainingLogViewSet(viewsets.ReadOnlyModelViewSet):
 @permission_classes([IsPanelUser])
 def train_sales_forecast_model(request):
     """
-    Entrena el modelo de predicción de ventas
+    Encola el entrenamiento del modelo de predicción de ventas (lo ejecuta run_ml_worker)
     POST /api/ml/train-sales-forecast/
     Body: {
-        "model_type": "random_forest" (opcional: random_forest, gradient_boosting, linear)
+        "model_type": "auto" (opcional: auto, random_forest, gradient_boosting, linear;
+                      auto elige tipo e hiperparámetros con validación temporal)
     }
+    Respuesta 202 con job_id; consultar el avance en GET /api/ml/training-jobs/<job_id>/
     """
     try:
-        # Crear log de entrenamiento
-        training_log = MLTrainingLog.objects.create(
-            model_type='sales_forecast',
-            status='training',
-            started_by=request.user
-        )
-        
-        start_time = time.time()
-        
-        # Entrenar modelo
-        model_type = request.data.get('model_type', 'random_forest')
-        service = SalesForecastService()
-        result = service.train_model(model_type=model_type)
-        
-        duration = int(time.time() - start_time)
+        model_type = request.data.get('model_type', 'auto')
+        if model_type not in ('auto', 'random_forest', 'gradient_boosting', 'linear'):
+            return Response({
+                'success': False,
+                'error': 'model_type debe ser auto, random_forest, gradient_boosting o linear'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        if result['success']:
-            # Guardar modelo en DB
-            ml_model = MLModel.objects.create(
-                name=f"Pronóstico de Ventas {model_type}",
-                model_type='sales_forecast',
-                version=datetime.now().strftime('%Y%m%d_%H%M%S'),
-                file_path=service.model_path,
-                accuracy_score=result['metrics'].get('test_r2', 0),
-                metrics=result['metrics'],
-                training_data_size=result['training_data_size'],
-                trained_by=request.user
+        try:
+            training_log = submit_training_job(
+                'sales_forecast',
+                started_by=request.user,
+                parameters={'model_type': model_type}
             )
-            
-            # Actualizar log
-            training_log.status = 'completed'
-            training_log.training_duration_seconds = duration
-            training_log.metrics = result['metrics']
-            training_log.records_processed = result['training_data_size']
-            training_log.completed_at = timezone.now()
-            training_log.model_saved = ml_model
-            training_log.save()
-            
-            return Response({
-                'success': True,
-                'message': 'Modelo entrenado exitosamente',
-                'model_id': str(ml_model.id),
-                'metrics': result['metrics'],
-                'duration_seconds': duration
-            }, status=status.HTTP_201_CREATED)
-        else:
-            # Error en entrenamiento
-            training_log.status = 'failed'
-            training_log.error_message = result.get('error', 'Unknown error')
-            training_log.training_duration_seconds = duration
-            training_log.completed_at = timezone.now()
-            training_log.save()
-            
+        except TrainingJobConflict as e:
             return Response({
                 'success': False,
-                'error': result.get('error', 'Error desconocido')
-            }, status=status.HTTP_400_BAD_REQUEST)
+                'error': 'Ya hay un entrenamiento de este modelo en curso',
+                'job_id': str(e.job.id) if e.job else None
+            }, status=status.HTTP_409_CONFLICT)
+        
+        return Response({
+            'success': True,
+            'message': 'Entrenamiento encolado',
+            'job_id': str(training_log.id),
+            'status': training_log.status
+        }, status=status.HTTP_202_ACCEPTED)
         
     except Exception as e:
-        logger.error(f"Error entrenando modelo: {str(e)}")
+        logger.error(f"Error encolando entrenamiento: {str(e)}")
         return Response({
             'success': False,
             'error': str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+@permission_classes([IsPanelUser])
+def training_job_status(request, job_id):
+    """
+    Estado, etapa y progreso de un entrenamiento encolado
+    GET /api/ml/training-jobs/<job_id>/
+    """
+    training_log = MLTrainingLog.objects.select_related('model_saved', 'started_by').filter(id=job_id).first()
+    if training_log is None:
+        return Response({'success': False, 'error': 'Entrenamiento no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({'success': True, 'job': MLTrainingLogSerializer(training_log).data})
+
+
+@api_view(['POST'])
+@permission_classes([IsPanelUser])
+def cancel_training(request, job_id):
+    """
+    Cancela un entrenamiento en cola o en curso
+    POST /api/ml/training-jobs/<job_id>/cancel/
+    """
+    training_log = MLTrainingLog.objects.filter(id=job_id).first()
+    if training_log is None:
+        return Response({'success': False, 'error': 'Entrenamiento no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+    if not cancel_training_job(training_log):
+        return Response({
+            'success': False,
+            'error': f'El entrenamiento ya no está en curso ({training_log.status})'
+        }, status=status.HTTP_409_CONFLICT)
+    training_log.refresh_from_db()
+    return Response({'success': True, 'job': MLTrainingLogSerializer(training_log).data})
+
+
 @api_view(['POST'])
 @permission_classes([IsPanelUser])
 def predict_sales(request):
@@ -158,67 +169,33 @@ def predict_sales(request):
     Predice ventas futuras
     POST /api/ml/predict-sales/
     Body: {
-        "days_ahead": 30 (opcional, default: 30)
+        "days_ahead": 30 (opcional, default: 30),
+        "recursive": false (opcional, lags alimentados con predicciones previas)
     }
     """
     try:
         days_ahead = int(request.data.get('days_ahead', 30))
-        print("---------------------------------------------------")
-
-        print(f"Días a predecir: {days_ahead}")
-        print("---------------------------------------------------")
+        recursive = str(request.data.get('recursive', 'false')).lower() == 'true'
         if days_ahead < 1 or days_ahead > 365:
             return Response({
                 'error': 'days_ahead debe estar entre 1 y 365'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        start_time = time.time()
-        
-        # Generar predicciones
+        # Reutiliza el pronóstico guardado si el modelo y los datos no cambiaron
         service = SalesForecastService()
-        result = service.predict_future_sales(days_ahead=days_ahead)
-        print("---------------------------------------------------")
-        print(f"Resultado de la predicción: {result}")
-        print("---------------------------------------------------")        
+        result = service.get_forecast(days_ahead=days_ahead, recursive=recursive, requested_by=request.user)
         if not result['success']:
             return Response({
                 'success': False,
                 'error': result.get('error', 'Error generando predicciones')
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        execution_time = int((time.time() - start_time) * 1000)
-        
-        # Buscar el modelo activo más reciente
-        ml_model = MLModel.objects.filter(model_type='sales_forecast', is_active=True).order_by('-trained_at').first()
-        
-        if ml_model:
-            # Guardar predicción en DB
-            prediction = Prediction.objects.create(
-                model=ml_model,
-                input_data={'days_ahead': days_ahead},
-                prediction_result=result,
-                requested_by=request.user,
-                execution_time_ms=execution_time
-            )
-            
-            # Guardar pronósticos individuales
-            for pred in result['predictions']:
-                SalesForecast.objects.create(
-                    prediction=prediction,
-                    forecast_date=pred['date'],
-                    predicted_sales=pred['predicted_sales'],
-                    predicted_quantity=pred['predicted_quantity']
-                )
-            
-            # Actualizar last_used_at del modelo
-            ml_model.last_used_at = timezone.now()
-            ml_model.save()
-        
         return Response({
             'success': True,
             'predictions': result['predictions'],
             'summary': result['summary'],
-            'execution_time_ms': execution_time
+            'cached': result['cached'],
+            'execution_time_ms': result['execution_time_ms']
         })
         
     except Exception as e:
@@ -229,6 +206,317 @@ def predict_sales(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET', 'POST'])
+@permission_classes([IsPanelUser])
+def segment_forecasts(request):
+    """
+    Pronósticos por categoría y por producto
+    GET  /api/ml/segment-forecasts/?scope=category|product&limit=50
+         Último pronóstico del alcance, totalizado por serie sobre el horizonte
+    POST /api/ml/segment-forecasts/
+         Body: {"horizon": 30, "history_days": 365, "top_n": 100, "scopes": ["category", "product"]}
+         Encola el cálculo (lo ejecuta run_ml_worker); devuelve job_id
+    """
+    try:
+        if request.method == 'POST':
+            horizon = int(request.data.get('horizon', 30))
+            if horizon < 1 or horizon > 365:
+                return Response({'error': 'horizon debe estar entre 1 y 365'}, status=status.HTTP_400_BAD_REQUEST)
+            scopes = request.data.get('scopes') or ['category', 'product']
+            if not set(scopes) <= set(SCOPE_FIELDS):
+                return Response({'error': 'scopes admite category y product'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                job = submit_training_job('segment_forecast', started_by=request.user, parameters={
+                    'horizon': horizon,
+                    'history_days': int(request.data.get('history_days', 365)),
+                    'top_n': int(request.data.get('top_n', 100)),
+                    'scopes': scopes,
+                })
+            except TrainingJobConflict as e:
+                return Response({
+                    'success': False,
+                    'error': 'Ya hay un pronóstico por segmento en curso',
+                    'job_id': str(e.job.id) if e.job else None
+                }, status=status.HTTP_409_CONFLICT)
+            return Response({'success': True, 'job_id': str(job.id), 'status': job.status}, status=status.HTTP_202_ACCEPTED)
+        
+        scope = request.query_params.get('scope', 'category')
+        if scope not in SCOPE_FIELDS:
+            return Response({'error': 'scope debe ser category o product'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = int(request.query_params.get('limit', 50))
+        latest = latest_segment_forecast(scope, limit=limit)
+        if latest is None:
+            return Response({'success': False, 'error': 'Aún no hay pronósticos para este alcance'}, status=status.HTTP_404_NOT_FOUND)
+        
+        prediction, totals = latest
+        field = SCOPE_FIELDS[scope]
+        model = Category if scope == 'category' else Product
+        names = dict(model.objects.filter(id__in=[row[field] for row in totals]).values_list('id', 'name'))
+        return Response({
+            'success': True,
+            'scope': scope,
+            'prediction_id': str(prediction.id),
+            'created_at': prediction.created_at,
+            'parameters': prediction.input_data,
+            'forecasts': [
+                {
+                    'id': row[field],
+                    'name': names.get(row[field]),
+                    'predicted_sales': float(row['predicted_sales'] or 0),
+                    'predicted_quantity': row['predicted_quantity'] or 0,
+                }
+                for row in totals
+            ]
+        })
+    except Exception as e:
+        logger.error(f"Error en pronóstico por segmento: {str(e)}")
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsPanelUser])
+def inventory_reorder(request):
+    """
+    Qué reponer según el punto de reorden de cada variante
+    GET  /api/ml/inventory/reorder/?limit=50&all=false
+         Ítems con stock en o bajo su punto de reorden (all=true: todo el catálogo)
+    POST /api/ml/inventory/reorder/
+         Body: {"lead_time_days": 7, "service_level": 0.95, "history_days": 90, "review_days": 14}
+         Encola el recálculo (lo ejecuta run_ml_worker); devuelve job_id
+    """
+    try:
+        if request.method == 'POST':
+            service_level = float(request.data.get('service_level', 0.95))
+            if not 0.5 <= service_level < 1:
+                return Response({'error': 'service_level debe estar entre 0.5 y 1'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                job = submit_training_job('inventory_optimization', started_by=request.user, parameters={
+                    'lead_time_days': int(request.data.get('lead_time_days', 7)),
+                    'service_level': service_level,
+                    'history_days': int(request.data.get('history_days', 90)),
+                    'review_days': int(request.data.get('review_days', 14)),
+                })
+            except TrainingJobConflict as e:
+                return Response({
+                    'success': False,
+                    'error': 'Ya hay un cálculo de inventario en curso',
+                    'job_id': str(e.job.id) if e.job else None
+                }, status=status.HTTP_409_CONFLICT)
+            return Response({'success': True, 'job_id': str(job.id), 'status': job.status}, status=status.HTTP_202_ACCEPTED)
+        
+        ml_model = MLModel.objects.filter(model_type='inventory_optimization', is_active=True).first()
+        if ml_model is None:
+            return Response({'success': False, 'error': 'Aún no se calcularon puntos de reorden'}, status=status.HTTP_404_NOT_FOUND)
+        limit = int(request.query_params.get('limit', 50))
+        include_all = request.query_params.get('all', 'false').lower() == 'true'
+        return Response({
+            'success': True,
+            'computed_at': ml_model.trained_at,
+            'parameters': ml_model.parameters,
+            'summary': ml_model.metrics,
+            'items': [recommendation_as_dict(rec) for rec in reorder_list(limit=limit, include_all=include_all)]
+        })
+    except Exception as e:
+        logger.error(f"Error obteniendo recomendaciones de inventario: {str(e)}")
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsPanelUser])
+def customer_segments(request):
+    """
+    Segmentos de clientes RFM
+    GET  /api/ml/customers/segments/
+         Tamaño y promedios de cada segmento guardado
+    POST /api/ml/customers/segments/
+         Body: {"n_clusters": 4}
+         Encola la segmentación (la ejecuta run_ml_worker); devuelve job_id
+    """
+    try:
+        if request.method == 'POST':
+            n_clusters = int(request.data.get('n_clusters', 4))
+            if not 2 <= n_clusters <= 10:
+                return Response({'error': 'n_clusters debe estar entre 2 y 10'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                job = submit_training_job('customer_segmentation', started_by=request.user, parameters={
+                    'n_clusters': n_clusters,
+                })
+            except TrainingJobConflict as e:
+                return Response({
+                    'success': False,
+                    'error': 'Ya hay una segmentación en curso',
+                    'job_id': str(e.job.id) if e.job else None
+                }, status=status.HTTP_409_CONFLICT)
+            return Response({'success': True, 'job_id': str(job.id), 'status': job.status}, status=status.HTTP_202_ACCEPTED)
+        
+        ml_model = MLModel.objects.filter(model_type='customer_segmentation', is_active=True).first()
+        if ml_model is None:
+            return Response({'success': False, 'error': 'Aún no se segmentaron los clientes'}, status=status.HTTP_404_NOT_FOUND)
+        labels = dict(CustomerSegment.LABEL_CHOICES)
+        segments = segment_sizes()
+        for segment in segments:
+            segment['label_display'] = labels.get(segment['label'], segment['label'])
+            segment['avg_recency_days'] = round(segment['avg_recency_days'], 1)
+            segment['avg_frequency'] = round(segment['avg_frequency'], 2)
+            segment['avg_monetary'] = round(float(segment['avg_monetary']), 2)
+        return Response({
+            'success': True,
+            'computed_at': ml_model.trained_at,
+            'parameters': ml_model.parameters,
+            'silhouette': ml_model.metrics.get('silhouette'),
+            'customers': sum(segment['size'] for segment in segments),
+            'segments': segments
+        })
+    except Exception as e:
+        logger.error(f"Error obteniendo segmentos de clientes: {str(e)}")
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([IsPanelUser])
+def customer_segment_members(request):
+    """
+    Clientes de un segmento (listas de marketing), paginado
+    GET /api/ml/customers/segments/members/?segment=0&page=1&page_size=50
+    GET /api/ml/customers/segments/members/?label=at_risk
+    """
+    try:
+        segment = request.query_params.get('segment')
+        segment = int(segment) if segment not in (None, '') else None
+        page = max(int(request.query_params.get('page', 1)), 1)
+        page_size = min(max(int(request.query_params.get('page_size', 50)), 1), 500)
+    except ValueError:
+        return Response({'error': 'segment, page y page_size deben ser números'}, status=status.HTTP_400_BAD_REQUEST)
+    label = request.query_params.get('label') or None
+    if label is not None and label not in dict(CustomerSegment.LABEL_CHOICES):
+        return Response({'error': f'label inválido: {label}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    members = segment_members(segment=segment, label=label)
+    start = (page - 1) * page_size
+    return Response({
+        'success': True,
+        'total': members.count(),
+        'page': page,
+        'page_size': page_size,
+        'results': [member_as_dict(member) for member in members[start:start + page_size]]
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsPanelUser])
+def sales_anomalies(request):
+    """
+    Anomalías de ventas detectadas en streaming (caídas y picos)
+    GET /api/ml/anomalies/?days=7&scope=payment_method&direction=drop&granularity=hour&limit=50
+    """
+    try:
+        days = int(request.query_params.get('days', 7))
+        limit = min(int(request.query_params.get('limit', 50)), 500)
+    except ValueError:
+        return Response({'error': 'days y limit deben ser números'}, status=status.HTTP_400_BAD_REQUEST)
+    filters = {}
+    for name, choices in (
+        ('scope', SalesAnomaly.SCOPE_CHOICES),
+        ('direction', SalesAnomaly.DIRECTION_CHOICES),
+        ('granularity', SalesAnomaly.GRANULARITY_CHOICES),
+    ):
+        value = request.query_params.get(name) or None
+        if value is not None and value not in dict(choices):
+            return Response({'error': f'{name} inválido: {value}'}, status=status.HTTP_400_BAD_REQUEST)
+        filters[name] = value
+    
+    try:
+        anomalies = recent_anomalies(days=days, limit=limit, **filters)
+        names = {
+            'category': dict(Category.objects.filter(
+                id__in=[a.key for a in anomalies if a.scope == 'category']
+            ).values_list('id', 'name')),
+            'payment_method': dict(PaymentMethod.objects.filter(
+                id__in=[a.key for a in anomalies if a.scope == 'payment_method']
+            ).values_list('id', 'name')),
+        }
+        ongoing = set(SalesSeriesState.objects.filter(
+            open_anomaly__in=anomalies
+        ).values_list('open_anomaly_id', flat=True))
+        return Response({
+            'success': True,
+            'anomalies': [
+                {
+                    'id': anomaly.id,
+                    'scope': anomaly.scope,
+                    'key': anomaly.key,
+                    'series': names[anomaly.scope].get(int(anomaly.key)) if anomaly.key else 'Tienda',
+                    'granularity': anomaly.granularity,
+                    'direction': anomaly.direction,
+                    'started_at': anomaly.started_at,
+                    'ended_at': anomaly.ended_at,
+                    'buckets': anomaly.buckets,
+                    'observed_orders': anomaly.observed_orders,
+                    'expected_orders': round(anomaly.expected_orders, 2),
+                    'observed_revenue': round(anomaly.observed_revenue, 2),
+                    'expected_revenue': round(anomaly.expected_revenue, 2),
+                    'z_score': round(anomaly.z_score, 2),
+                    'ongoing': anomaly.id in ongoing,
+                }
+                for anomaly in anomalies
+            ]
+        })
+    except Exception as e:
+        logger.error(f"Error obteniendo anomalías de ventas: {str(e)}")
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def frequently_bought_together(request):
+    """
+    Productos comprados junto con uno (página de producto) o con varios (carrito)
+    GET /api/ml/recommendations/frequently-bought-together/?product_id=12&limit=6
+    GET /api/ml/recommendations/frequently-bought-together/?product_ids=12,40,41&limit=6
+    Se sirve del índice en memoria (ver services/product_recommendations.py)
+    """
+    try:
+        raw_ids = request.query_params.get('product_ids') or request.query_params.get('product_id') or ''
+        product_ids = [int(value) for value in raw_ids.split(',') if value.strip()]
+        limit = max(1, min(int(request.query_params.get('limit', 6)), 20))
+    except ValueError:
+        return Response({'error': 'product_id(s) y limit deben ser números'}, status=status.HTTP_400_BAD_REQUEST)
+    if not product_ids:
+        return Response({'error': 'Indique product_id o product_ids'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if len(product_ids) == 1:
+        recommendations = recommendation_index.neighbors(product_ids[0], limit=limit)
+    else:
+        recommendations = recommendation_index.for_basket(product_ids, limit=limit)
+    return Response({
+        'success': True,
+        'product_ids': product_ids,
+        'recommendations': recommendations
+    })
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def similar_products(request):
+    """
+    Productos similares por atributos (categoría, género, colores, tallas, precio);
+    funciona también con productos nuevos sin ventas
+    GET /api/ml/recommendations/similar/?product_id=12&limit=6
+    Se sirve del índice en memoria (ver services/product_similarity.py)
+    """
+    try:
+        product_id = int(request.query_params.get('product_id', ''))
+        limit = max(1, min(int(request.query_params.get('limit', 6)), 20))
+    except ValueError:
+        return Response({'error': 'product_id y limit deben ser números'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'success': True,
+        'product_id': product_id,
+        'recommendations': similarity_index.neighbors(product_id, limit=limit)
+    })
+
+
 @api_view(['GET'])
 @permission_classes([IsPanelUser])
 def sales_analytics(request):
@@ -403,14 +691,27 @@ def get_customer_insights(request):
 @permission_classes([IsPanelUser])
 def get_low_stock_alerts(request):
     """
-    Alertas de stock bajo
-    GET /api/ml/insights/low-stock/?threshold=10
+    Alertas de stock bajo (por punto de reorden si ya se calculó; si no, por umbral fijo)
+    GET /api/ml/insights/low-stock/?threshold=10&method=threshold
+    
+    Con ``threshold`` se filtra por umbral fijo; ``method`` (reorder_point | threshold) fuerza el criterio.
     """
     try:
-        threshold = int(request.query_params.get('threshold', 10))
+        method = request.query_params.get('method') or None
+        if method is not None and method not in SalesInsightsService.LOW_STOCK_METHODS:
+            return Response({
+                'success': False,
+                'error': f"method debe ser uno de: {', '.join(SalesInsightsService.LOW_STOCK_METHODS)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        threshold = request.query_params.get('threshold')
+        try:
+            threshold = int(threshold) if threshold not in (None, '') else None
+        except ValueError:
+            return Response({'success': False, 'error': 'threshold debe ser un entero'}, status=status.HTTP_400_BAD_REQUEST)
         
         service = SalesInsightsService()
-        result = service.get_low_stock_alerts(threshold=threshold)
+        result = service.get_low_stock_alerts(threshold=threshold, method=method)
         
         return Response(result)
     except Exception as e:
@@ -441,12 +742,13 @@ def get_payment_methods_stats(request):
 @permission_classes([IsPanelUser])
 def get_comprehensive_insights(request):
     """
-    Dashboard completo con todos los insights
-    GET /api/ml/insights/comprehensive/
+    Dashboard completo con todos los insights (cacheado, ver INSIGHTS_DASHBOARD_CACHE_TTL)
+    GET /api/ml/insights/comprehensive/?refresh=true
     """
     try:
+        force_refresh = request.query_params.get('refresh', 'false').lower() == 'true'
         service = SalesInsightsService()
-        result = service.get_comprehensive_dashboard()
+        result = service.get_comprehensive_dashboard(force_refresh=force_refresh)
         
         return Response(result)
     except Exception as e:
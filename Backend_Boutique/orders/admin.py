@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Address, ShippingMethod, PaymentMethod, Order, OrderItem, OrderStatusHistory
+from .models import Address, ShippingMethod, PaymentMethod, Order, OrderItem, OrderStatusHistory, CustomerStats, DailySalesFact
 
 @admin.register(Address)
 class AddressAdmin(admin.ModelAdmin):
@@ -35,3 +35,15 @@ class OrderStatusHistoryAdmin(admin.ModelAdmin):
     list_display = ('order','old_status','new_status','changed_at','changed_by')
     list_filter = ('old_status','new_status','changed_at')
     search_fields = ('order__id','changed_by__email')
+
+@admin.register(CustomerStats)
+class CustomerStatsAdmin(admin.ModelAdmin):
+    list_display = ('user','order_count','total_spent','total_items','first_order_at','last_order_at')
+    search_fields = ('user__email','user__username')
+    readonly_fields = ('updated_at',)
+
+@admin.register(DailySalesFact)
+class DailySalesFactAdmin(admin.ModelAdmin):
+    list_display = ('date','status_class','product','variant','category','payment_method','quantity','revenue','order_count','order_total')
+    list_filter = ('status_class','date')
+    readonly_fields = ('updated_at',)
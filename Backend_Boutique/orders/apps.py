@@ -4,3 +4,6 @@ class OrdersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'orders'
     verbose_name = 'Orders & Checkout'
+
+    def ready(self):
+        from . import signals  # noqa: F401 - registra receptores de proyecciones
@@ -0,0 +1,24 @@
+"""
+Reconstruye la proyección CustomerStats desde el historial de órdenes.
+Útil tras cargas masivas (seed_sales_data) o si la proyección se desincroniza.
+"""
+from django.core.management.base import BaseCommand
+
+from orders.projections import rebuild_customer_stats
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye las estadísticas por cliente (CustomerStats) desde las órdenes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Tamaño de lote para bulk_create (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Reconstruyendo estadísticas de clientes...')
+        total = rebuild_customer_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'  ✓ {total} clientes actualizados'))
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Q, Sum
+
+SALE_STATUSES = ('PAID', 'AWAITING_DISPATCH', 'SHIPPED', 'DELIVERED')
+
+
+def backfill_customer_stats(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    CustomerStats = apps.get_model('orders', 'CustomerStats')
+    sale = Q(status__in=SALE_STATUSES)
+    rows = Order.objects.exclude(status='DRAFT').values('user_id').annotate(
+        order_count=Count('id', filter=sale),
+        total_spent=Sum('grand_total', filter=sale),
+        total_items=Sum('total_items', filter=sale),
+        first_order_at=Min('created_at', filter=sale),
+        last_order_at=Max('created_at', filter=sale),
+    ).order_by()
+    CustomerStats.objects.bulk_create([
+        CustomerStats(
+            user_id=row['user_id'],
+            order_count=row['order_count'] or 0,
+            total_spent=row['total_spent'] or 0,
+            total_items=row['total_items'] or 0,
+            first_order_at=row['first_order_at'],
+            last_order_at=row['last_order_at'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_alter_customuser_user_type'),
+        ('orders', '0014_orderitem_size_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='customer_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('order_count', models.IntegerField(default=0)),
+                ('total_spent', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_items', models.IntegerField(default=0)),
+                ('first_order_at', models.DateTimeField(blank=True, null=True)),
+                ('last_order_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Estadística de cliente',
+                'verbose_name_plural': 'Estadísticas de clientes',
+                'indexes': [models.Index(fields=['-total_spent'], name='orders_cstats_spent_idx'), models.Index(fields=['-last_order_at'], name='orders_cstats_last_idx'), models.Index(fields=['-order_count'], name='orders_cstats_count_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_customer_stats, migrations.RunPython.noop),
+    ]
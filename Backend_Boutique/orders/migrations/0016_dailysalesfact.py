@@ -0,0 +1,99 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:30
+
+import django.db.models.deletion
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Case, CharField, Count, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import TruncDate
+
+STATUS_CLASSES = {
+    'sale': ['PAID', 'AWAITING_DISPATCH', 'SHIPPED', 'DELIVERED'],
+    'pending': ['PENDING_PAYMENT'],
+    'void': ['CANCELED', 'REFUNDED'],
+}
+MEASURES = ('quantity', 'revenue', 'line_count', 'product_orders', 'order_count', 'order_total', 'order_items')
+
+
+def _status_class(field):
+    return Case(
+        *[When(**{f'{field}__in': statuses}, then=Value(cls)) for cls, statuses in STATUS_CLASSES.items()],
+        default=Value(None), output_field=CharField(),
+    )
+
+
+def backfill_sales_facts(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    DailySalesFact = apps.get_model('orders', 'DailySalesFact')
+    tracked = [s for statuses in STATUS_CLASSES.values() for s in statuses]
+    cells = defaultdict(lambda: dict.fromkeys(MEASURES, 0))
+
+    lines = OrderItem.objects.filter(order__status__in=tracked).annotate(
+        d=TruncDate('order__created_at'), c=F('product__category_id'),
+        pm=F('order__payment_method_id'), sc=_status_class('order__status'),
+    ).values('d', 'product_id', 'variant_id', 'c', 'pm', 'sc').annotate(
+        q=Sum('quantity'), r=Sum('line_subtotal'), n=Count('id'), o=Count('order_id', distinct=True),
+    ).order_by()
+    for row in lines:
+        cell = cells[(row['d'], row['product_id'], row['variant_id'], row['c'], row['pm'], row['sc'])]
+        cell.update(quantity=row['q'] or 0, revenue=row['r'] or 0, line_count=row['n'], product_orders=row['o'])
+
+    first_item = OrderItem.objects.filter(order=OuterRef('pk')).order_by('id')
+    headers = Order.objects.filter(status__in=tracked).annotate(
+        d=TruncDate('created_at'),
+        p=Subquery(first_item.values('product_id')[:1]),
+        v=Subquery(first_item.values('variant_id')[:1]),
+        c=Subquery(first_item.values('product__category_id')[:1]),
+        sc=_status_class('status'),
+    ).values('d', 'p', 'v', 'c', 'payment_method_id', 'sc').annotate(
+        n=Count('id'), t=Sum('grand_total'), i=Sum('total_items'),
+    ).order_by()
+    for row in headers:
+        cell = cells[(row['d'], row['p'], row['v'], row['c'], row['payment_method_id'], row['sc'])]
+        cell.update(order_count=row['n'], order_total=row['t'] or 0, order_items=row['i'] or 0)
+
+    DailySalesFact.objects.bulk_create([
+        DailySalesFact(
+            date=d, product_id=p, variant_id=v, category_id=c, payment_method_id=pm, status_class=sc, **measures
+        )
+        for (d, p, v, c, pm, sc), measures in cells.items()
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_siteconfiguration'),
+        ('orders', '0015_customerstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status_class', models.CharField(choices=[('sale', 'Venta'), ('pending', 'Pendiente de pago'), ('void', 'Anulada')], max_length=10)),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('line_count', models.IntegerField(default=0)),
+                ('product_orders', models.IntegerField(default=0)),
+                ('order_count', models.IntegerField(default=0)),
+                ('order_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('order_items', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventory.category')),
+                ('payment_method', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='orders.paymentmethod')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventory.product')),
+                ('variant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventory.productvariant')),
+            ],
+            options={
+                'verbose_name': 'Hecho de venta diario',
+                'verbose_name_plural': 'Hechos de venta diarios',
+                'ordering': ['date'],
+                'indexes': [models.Index(fields=['status_class', 'date'], name='orders_fact_class_date_idx'), models.Index(fields=['date', 'product'], name='orders_fact_date_prod_idx'), models.Index(fields=['date', 'category'], name='orders_fact_date_cat_idx'), models.Index(fields=['date', 'payment_method'], name='orders_fact_date_pm_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_sales_facts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0016_dailysalesfact'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'created_at'], name='orders_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:01
+
+from django.db import migrations, models
+from django.db.models import Count
+
+CELL = ('date', 'product_id', 'variant_id', 'category_id', 'payment_method_id', 'status_class')
+MEASURES = ('quantity', 'revenue', 'line_count', 'product_orders', 'order_count', 'order_total', 'order_items')
+
+
+def merge_duplicate_cells(apps, schema_editor):
+    """Suma en una sola fila las celdas duplicadas por inserciones concurrentes, antes de la restricción"""
+    DailySalesFact = apps.get_model('orders', 'DailySalesFact')
+    duplicates = DailySalesFact.objects.values(*CELL).annotate(rows=Count('id')).filter(rows__gt=1).order_by()
+    for cell in duplicates:
+        lookup = {name: cell[name] for name in CELL}
+        facts = list(DailySalesFact.objects.filter(**lookup).order_by('id'))
+        keep = facts[0]
+        for fact in facts[1:]:
+            for name in MEASURES:
+                setattr(keep, name, getattr(keep, name) + getattr(fact, name))
+        keep.save()
+        DailySalesFact.objects.filter(id__in=[fact.id for fact in facts[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_siteconfiguration'),
+        ('orders', '0017_order_status_created_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_cells, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='dailysalesfact',
+            constraint=models.UniqueConstraint(fields=('date', 'product', 'variant', 'category', 'payment_method', 'status_class'), name='orders_fact_cell_unique', nulls_distinct=False),
+        ),
+    ]
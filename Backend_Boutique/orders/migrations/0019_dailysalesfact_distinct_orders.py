@@ -0,0 +1,63 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:22
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+STATUS_CLASSES = {
+    'PENDING_PAYMENT': 'pending',
+    'PAID': 'sale',
+    'AWAITING_DISPATCH': 'sale',
+    'SHIPPED': 'sale',
+    'DELIVERED': 'sale',
+    'CANCELED': 'void',
+    'REFUNDED': 'void',
+}
+CELL = ('date', 'product_id', 'variant_id', 'category_id', 'payment_method_id', 'status_class')
+
+
+def recount_distinct_orders(apps, schema_editor):
+    """product_orders contaba 1 por celda; se atribuye cada orden a su primera línea del producto / la categoría"""
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    DailySalesFact = apps.get_model('orders', 'DailySalesFact')
+    counts = defaultdict(lambda: [0, 0])
+    lines = OrderItem.objects.filter(order__status__in=list(STATUS_CLASSES)).annotate(
+        fact_date=TruncDate('order__created_at'),
+    ).values_list(
+        'order_id', 'fact_date', 'product_id', 'variant_id', 'product__category_id',
+        'order__payment_method_id', 'order__status',
+    ).order_by('order_id', 'id')
+    current_order, seen_products, seen_categories = None, set(), set()
+    for order_id, day, product_id, variant_id, category_id, payment_method_id, status in lines.iterator():
+        if order_id != current_order:
+            current_order, seen_products, seen_categories = order_id, set(), set()
+        key = (day, product_id, variant_id, category_id, payment_method_id, STATUS_CLASSES[status])
+        if product_id is not None and product_id not in seen_products:
+            seen_products.add(product_id)
+            counts[key][0] += 1
+        if category_id is not None and category_id not in seen_categories:
+            seen_categories.add(category_id)
+            counts[key][1] += 1
+
+    DailySalesFact.objects.update(product_orders=0, category_orders=0)
+    for key, (product_orders, category_orders) in counts.items():
+        DailySalesFact.objects.filter(**dict(zip(CELL, key))).update(
+            product_orders=product_orders, category_orders=category_orders
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0018_dailysalesfact_unique_cell'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailysalesfact',
+            name='category_orders',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(recount_distinct_orders, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,6 @@
 from django.db import models
 from django.conf import settings
-from inventory.models import Product, ProductVariant
+from inventory.models import Product, ProductVariant, Category
 
 
 class Address(models.Model):
@@ -82,6 +82,8 @@ class Order(models.Model):
         ('CANCELED', 'Cancelada'),
         ('REFUNDED', 'Reembolsada'),
     ]
+    # Estados que representan una venta efectiva (usados por analytics y proyecciones)
+    SALE_STATUSES = ('PAID', 'AWAITING_DISPATCH', 'SHIPPED', 'DELIVERED')
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='orders')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='DRAFT', db_index=True)
@@ -120,6 +122,9 @@ class Order(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Venta'
         verbose_name_plural = 'Ventas'
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='orders_status_created_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.pk} - {self.user} - {self.status}"
@@ -185,6 +190,113 @@ class CartItem(models.Model):
         return f"{self.product} x{self.quantity}"
 
 
+class CustomerStats(models.Model):
+    """
+    Proyección de compras por cliente, mantenida incrementalmente en cada
+    transición de estado de sus órdenes (ver orders/projections.py).
+    Solo cuenta órdenes con venta efectiva (Order.SALE_STATUSES); la fila existe
+    para todo cliente que haya confirmado al menos una orden.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='customer_stats')
+    order_count = models.IntegerField(default=0)
+    total_spent = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_items = models.IntegerField(default=0)
+    first_order_at = models.DateTimeField(blank=True, null=True)
+    last_order_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Estadística de cliente'
+        verbose_name_plural = 'Estadísticas de clientes'
+        indexes = [
+            models.Index(fields=['-total_spent'], name='orders_cstats_spent_idx'),
+            models.Index(fields=['-last_order_at'], name='orders_cstats_last_idx'),
+            models.Index(fields=['-order_count'], name='orders_cstats_count_idx'),
+        ]
+
+    def __str__(self):
+        return f"Stats of {self.user_id}: {self.order_count} órdenes"
+
+
+class DailySalesFact(models.Model):
+    """
+    Tabla de hechos diaria para analytics, mantenida incrementalmente en cada
+    transición de estado (ver orders/projections.py).
+
+    Grano: (fecha, producto, variante, categoría, método de pago, clase de estado).
+    - quantity / revenue / line_count: medidas por línea de orden.
+    - product_orders / category_orders: órdenes distintas con el producto / la categoría;
+      cada orden se atribuye a la celda de su primera línea de ese producto (o de esa
+      categoría), así que sumarlas por producto o por categoría da conteos exactos.
+    - order_count / order_total / order_items: medidas de cabecera (grand_total,
+      total_items); cada orden se atribuye una sola vez, a la celda de su primera
+      línea, de modo que sumarlas por fecha, método de pago o clase de estado da
+      totales exactos de órdenes.
+    """
+    STATUS_CLASS_CHOICES = [
+        ('sale', 'Venta'),
+        ('pending', 'Pendiente de pago'),
+        ('void', 'Anulada'),
+    ]
+    STATUS_CLASS_BY_STATUS = {
+        'PENDING_PAYMENT': 'pending',
+        'PAID': 'sale',
+        'AWAITING_DISPATCH': 'sale',
+        'SHIPPED': 'sale',
+        'DELIVERED': 'sale',
+        'CANCELED': 'void',
+        'REFUNDED': 'void',
+    }
+
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    variant = models.ForeignKey(ProductVariant, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    payment_method = models.ForeignKey(PaymentMethod, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    status_class = models.CharField(max_length=10, choices=STATUS_CLASS_CHOICES)
+
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    line_count = models.IntegerField(default=0)
+    product_orders = models.IntegerField(default=0)
+    category_orders = models.IntegerField(default=0)
+
+    order_count = models.IntegerField(default=0)
+    order_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    order_items = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        ordering = ['date']
+        verbose_name = 'Hecho de venta diario'
+        verbose_name_plural = 'Hechos de venta diarios'
+        indexes = [
+            models.Index(fields=['status_class', 'date'], name='orders_fact_class_date_idx'),
+            models.Index(fields=['date', 'product'], name='orders_fact_date_prod_idx'),
+            models.Index(fields=['date', 'category'], name='orders_fact_date_cat_idx'),
+            models.Index(fields=['date', 'payment_method'], name='orders_fact_date_pm_idx'),
+        ]
+        constraints = [
+            # Una fila por celda (NULL cuenta como valor: celdas sin producto o sin método de pago).
+            # Requiere PostgreSQL 15+; en SQLite (desarrollo) no se crea (models.W047 silenciado).
+            # Borrar una dimensión no deja celdas repetidas: sus días se reconstruyen (orders/signals.py)
+            models.UniqueConstraint(
+                fields=['date', 'product', 'variant', 'category', 'payment_method', 'status_class'],
+                name='orders_fact_cell_unique',
+                nulls_distinct=False,
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.status_class} p={self.product_id} v={self.variant_id}: {self.quantity}"
+
+    @classmethod
+    def status_class_for(cls, status):
+        """Clase de estado de una orden; None para borradores (no se registran)."""
+        return cls.STATUS_CLASS_BY_STATUS.get(status)
+
+
 class UserPreferences(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='preferences')
     default_address = models.ForeignKey(Address, on_delete=models.SET_NULL, null=True, blank=True)
@@ -0,0 +1,333 @@
+"""
+Proyecciones de lectura derivadas de las órdenes.
+
+Se actualizan incrementalmente al recibir la señal ``order_status_changed``
+(ver orders/signals.py) y pueden reconstruirse por completo con los comandos
+de management correspondientes.
+"""
+from collections import defaultdict
+from datetime import datetime, time as dt_time, timedelta
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import Sum, Count, Min, Max, Q, F, Case, When, Value, CharField, Exists, OuterRef, Subquery
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Order, OrderItem, CustomerStats, DailySalesFact
+
+logger = logging.getLogger(__name__)
+
+
+def _stats_aggregates():
+    """Agregados de CustomerStats calculados sobre órdenes agrupadas por usuario."""
+    sale = Q(orders__status__in=Order.SALE_STATUSES)
+    return {
+        'order_count': Count('orders__id', filter=sale),
+        'total_spent': Sum('orders__grand_total', filter=sale),
+        'total_items': Sum('orders__total_items', filter=sale),
+        'first_order_at': Min('orders__created_at', filter=sale),
+        'last_order_at': Max('orders__created_at', filter=sale),
+    }
+
+
+def _placed_orders_users(user_ids=None):
+    from django.contrib.auth import get_user_model
+    User = get_user_model()
+    placed = [code for code, _ in Order.STATUS_CHOICES if code != 'DRAFT']
+    qs = User.objects.filter(orders__status__in=placed)
+    if user_ids is not None:
+        qs = qs.filter(id__in=user_ids)
+    return qs.values('id').annotate(**_stats_aggregates()).order_by()
+
+
+def _stats_from_row(row):
+    return CustomerStats(
+        user_id=row['id'],
+        order_count=row['order_count'] or 0,
+        total_spent=row['total_spent'] or 0,
+        total_items=row['total_items'] or 0,
+        first_order_at=row['first_order_at'],
+        last_order_at=row['last_order_at'],
+    )
+
+
+def refresh_customer_stats(user_ids):
+    """Recalcula la fila de CustomerStats de los usuarios indicados (consulta indexada por user_id)."""
+    user_ids = [uid for uid in set(user_ids) if uid]
+    if not user_ids:
+        return
+    with transaction.atomic():
+        rows = {row['id']: row for row in _placed_orders_users(user_ids)}
+        CustomerStats.objects.filter(user_id__in=user_ids).exclude(user_id__in=rows.keys()).delete()
+        for row in rows.values():
+            stats = _stats_from_row(row)
+            CustomerStats.objects.update_or_create(
+                user_id=stats.user_id,
+                defaults={
+                    'order_count': stats.order_count,
+                    'total_spent': stats.total_spent,
+                    'total_items': stats.total_items,
+                    'first_order_at': stats.first_order_at,
+                    'last_order_at': stats.last_order_at,
+                },
+            )
+
+
+def apply_customer_stats_transition(order, old_status, new_status):
+    """
+    Aplica a CustomerStats el efecto de una transición de estado.
+    Entrar a un estado de venta suma la orden; salir de él recalcula al cliente
+    (no se puede restar first/last_order_at en O(1)).
+    """
+    was_sale = old_status in Order.SALE_STATUSES
+    is_sale = new_status in Order.SALE_STATUSES
+    if was_sale and not is_sale:
+        refresh_customer_stats([order.user_id])
+        return
+    with transaction.atomic():
+        stats, _ = CustomerStats.objects.select_for_update().get_or_create(user_id=order.user_id)
+        if is_sale and not was_sale:
+            stats.order_count += 1
+            stats.total_spent += order.grand_total or 0
+            stats.total_items += order.total_items or 0
+            if stats.first_order_at is None or order.created_at < stats.first_order_at:
+                stats.first_order_at = order.created_at
+            if stats.last_order_at is None or order.created_at > stats.last_order_at:
+                stats.last_order_at = order.created_at
+        stats.save()
+
+
+def rebuild_customer_stats(batch_size=1000):
+    """Reconstruye CustomerStats desde cero con una sola consulta agrupada. Devuelve filas creadas."""
+    with transaction.atomic():
+        CustomerStats.objects.all().delete()
+        batch, total = [], 0
+        for row in _placed_orders_users().iterator(chunk_size=batch_size):
+            batch.append(_stats_from_row(row))
+            if len(batch) >= batch_size:
+                CustomerStats.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            CustomerStats.objects.bulk_create(batch)
+            total += len(batch)
+    return total
+
+
+# --- DailySalesFact ---
+
+FACT_DIMENSIONS = ('date', 'product_id', 'variant_id', 'category_id', 'payment_method_id', 'status_class')
+LINE_MEASURES = ('quantity', 'revenue', 'line_count', 'product_orders', 'category_orders')
+HEADER_MEASURES = ('order_count', 'order_total', 'order_items')
+
+
+def _order_fact_contributions(order, status_class):
+    """Celdas (dimensiones -> medidas) que aporta una orden a DailySalesFact."""
+    date = timezone.localdate(order.created_at)
+    items = list(
+        OrderItem.objects.filter(order_id=order.pk)
+        .values('id', 'product_id', 'variant_id', 'product__category_id', 'quantity', 'line_subtotal')
+        .order_by('id')
+    )
+    cells = {}
+    seen_products, seen_categories = set(), set()
+    for it in items:
+        product_id, category_id = it['product_id'], it['product__category_id']
+        key = (date, product_id, it['variant_id'], category_id, order.payment_method_id, status_class)
+        cell = cells.setdefault(key, dict.fromkeys(LINE_MEASURES + HEADER_MEASURES, 0))
+        cell['quantity'] += it['quantity']
+        cell['revenue'] += it['line_subtotal']
+        cell['line_count'] += 1
+        # La orden cuenta una vez por producto y por categoría: en la celda de su primera línea
+        if product_id is not None and product_id not in seen_products:
+            seen_products.add(product_id)
+            cell['product_orders'] = 1
+        if category_id is not None and category_id not in seen_categories:
+            seen_categories.add(category_id)
+            cell['category_orders'] = 1
+    header_key = next(iter(cells)) if cells else (date, None, None, None, order.payment_method_id, status_class)
+    header = cells.setdefault(header_key, dict.fromkeys(LINE_MEASURES + HEADER_MEASURES, 0))
+    header['order_count'] = 1
+    header['order_total'] = order.grand_total or 0
+    header['order_items'] = order.total_items or 0
+    return cells
+
+
+def _apply_fact_cells(cells, sign):
+    """
+    Suma (sign=+1) o resta (sign=-1) las celdas con UPDATE atómicos (F()), sin leer la fila.
+    La celda nueva se inserta en un savepoint; si otra transacción la creó antes, la
+    restricción única lo rechaza y se repite el UPDATE.
+    """
+    now = timezone.now()
+    for key, measures in cells.items():
+        lookup = dict(zip(FACT_DIMENSIONS, key))
+        increments = {name: F(name) + sign * value for name, value in measures.items()}
+        cell = DailySalesFact.objects.filter(**lookup)
+        if cell.update(**increments, updated_at=now):
+            if sign < 0:
+                cell.filter(line_count=0, order_count=0).delete()
+            continue
+        if sign < 0:
+            # Celda inexistente (proyección desincronizada): rebuild_sales_facts la corrige
+            logger.warning('DailySalesFact sin la celda %s al restar una orden', key)
+            continue
+        try:
+            with transaction.atomic():
+                DailySalesFact.objects.create(**lookup, **measures)
+        except IntegrityError:
+            cell.update(**increments, updated_at=now)
+
+
+def apply_sales_fact_transition(order, old_status, new_status):
+    """
+    Mueve el aporte de la orden desde la clase de estado anterior a la nueva.
+
+    El aporte que se resta se recalcula con las líneas y el método de pago actuales
+    de la orden: si cambiaron desde que se sumó, la proyección se desvía. Por eso
+    rebuild_sales_facts debe ejecutarse periódicamente (p. ej. ``--days 35`` a diario).
+    """
+    old_class = DailySalesFact.status_class_for(old_status)
+    new_class = DailySalesFact.status_class_for(new_status)
+    if old_class == new_class:
+        return
+    with transaction.atomic():
+        if old_class:
+            _apply_fact_cells(_order_fact_contributions(order, old_class), -1)
+        if new_class:
+            _apply_fact_cells(_order_fact_contributions(order, new_class), +1)
+
+
+def _status_class_case(field):
+    whens = [
+        When(**{f'{field}__in': [s for s, c in DailySalesFact.STATUS_CLASS_BY_STATUS.items() if c == status_class]}, then=Value(status_class))
+        for status_class, _ in DailySalesFact.STATUS_CLASS_CHOICES
+    ]
+    return Case(*whens, default=Value(None), output_field=CharField())
+
+
+def _fact_rows(since=None, until=None):
+    """Agrega OrderItem/Order al grano de DailySalesFact con dos consultas agrupadas."""
+    tracked = list(DailySalesFact.STATUS_CLASS_BY_STATUS)
+    items = OrderItem.objects.filter(order__status__in=tracked)
+    orders = Order.objects.filter(status__in=tracked)
+    if since:
+        start = timezone.make_aware(datetime.combine(since, dt_time.min))
+        items = items.filter(order__created_at__gte=start)
+        orders = orders.filter(created_at__gte=start)
+    if until:
+        end = timezone.make_aware(datetime.combine(until + timedelta(days=1), dt_time.min))
+        items = items.filter(order__created_at__lt=end)
+        orders = orders.filter(created_at__lt=end)
+
+    cells = defaultdict(lambda: dict.fromkeys(LINE_MEASURES + HEADER_MEASURES, 0))
+    # Primera línea de la orden para su producto / su categoría (misma atribución que la incremental)
+    earlier_lines = OrderItem.objects.filter(order_id=OuterRef('order_id'), id__lt=OuterRef('id'))
+    line_rows = items.annotate(
+        fact_date=TruncDate('order__created_at'),
+        fact_category=F('product__category_id'),
+        fact_payment_method=F('order__payment_method_id'),
+        fact_status_class=_status_class_case('order__status'),
+        repeats_product=Exists(earlier_lines.filter(product_id=OuterRef('product_id'))),
+        repeats_category=Exists(earlier_lines.filter(product__category_id=OuterRef('fact_category'))),
+    ).values(
+        'fact_date', 'product_id', 'variant_id', 'fact_category', 'fact_payment_method', 'fact_status_class'
+    ).annotate(
+        sum_quantity=Sum('quantity'),
+        sum_revenue=Sum('line_subtotal'),
+        num_lines=Count('id'),
+        num_product_orders=Count('id', filter=Q(product_id__isnull=False, repeats_product=False)),
+        num_category_orders=Count('id', filter=Q(fact_category__isnull=False, repeats_category=False)),
+    ).order_by()
+    for row in line_rows.iterator():
+        key = (row['fact_date'], row['product_id'], row['variant_id'], row['fact_category'], row['fact_payment_method'], row['fact_status_class'])
+        cell = cells[key]
+        cell['quantity'] = row['sum_quantity'] or 0
+        cell['revenue'] = row['sum_revenue'] or 0
+        cell['line_count'] = row['num_lines']
+        cell['product_orders'] = row['num_product_orders']
+        cell['category_orders'] = row['num_category_orders']
+
+    first_item = OrderItem.objects.filter(order=OuterRef('pk')).order_by('id')
+    header_rows = orders.annotate(
+        fact_date=TruncDate('created_at'),
+        fact_product=Subquery(first_item.values('product_id')[:1]),
+        fact_variant=Subquery(first_item.values('variant_id')[:1]),
+        fact_category=Subquery(first_item.values('product__category_id')[:1]),
+        fact_status_class=_status_class_case('status'),
+    ).values(
+        'fact_date', 'fact_product', 'fact_variant', 'fact_category', 'payment_method_id', 'fact_status_class'
+    ).annotate(
+        num_orders=Count('id'),
+        sum_total=Sum('grand_total'),
+        sum_items=Sum('total_items'),
+    ).order_by()
+    for row in header_rows.iterator():
+        key = (row['fact_date'], row['fact_product'], row['fact_variant'], row['fact_category'], row['payment_method_id'], row['fact_status_class'])
+        cell = cells[key]
+        cell['order_count'] = row['num_orders']
+        cell['order_total'] = row['sum_total'] or 0
+        cell['order_items'] = row['sum_items'] or 0
+
+    for key, measures in cells.items():
+        yield DailySalesFact(**dict(zip(FACT_DIMENSIONS, key)), **measures)
+
+
+def rebuild_sales_facts(since=None, until=None, batch_size=2000):
+    """
+    Reconstruye DailySalesFact en bloque (completo, o entre las fechas ``since`` y ``until``,
+    ambas incluidas). Devuelve el número de filas creadas.
+    """
+    with transaction.atomic():
+        stale = DailySalesFact.objects.all()
+        if since:
+            stale = stale.filter(date__gte=since)
+        if until:
+            stale = stale.filter(date__lte=until)
+        stale.delete()
+        batch, total = [], 0
+        for fact in _fact_rows(since=since, until=until):
+            batch.append(fact)
+            if len(batch) >= batch_size:
+                DailySalesFact.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            DailySalesFact.objects.bulk_create(batch)
+            total += len(batch)
+    return total
+
+
+# Campo de DailySalesFact que apunta a cada modelo de dimensión
+FACT_DIMENSION_FIELDS = {
+    'inventory.product': 'product',
+    'inventory.productvariant': 'variant',
+    'inventory.category': 'category',
+    'orders.paymentmethod': 'payment_method',
+}
+
+
+def release_fact_dimension(instance):
+    """
+    Antes de borrar un producto, variante, categoría o método de pago (pre_delete).
+
+    Poner en NULL la FK fundiría celdas distintas en la misma clave (p. ej. un producto
+    vendido en dos tallas el mismo día) y violaría la restricción única; además, al borrar
+    un producto las líneas pierden también su categoría. Se borran las celdas que lo
+    referencian y se guarda el rango de fechas, que restore_fact_dimension reconstruye.
+    """
+    field = FACT_DIMENSION_FIELDS[instance._meta.label_lower]
+    cells = DailySalesFact.objects.filter(**{field: instance.pk})
+    window = cells.aggregate(since=Min('date'), until=Max('date'))
+    if window['since'] is None:
+        return
+    cells.delete()
+    instance._sales_fact_window = (window['since'], window['until'])
+
+
+def restore_fact_dimension(instance):
+    """Después del borrado (post_delete, con las FK ya en NULL): reconstruye las fechas afectadas."""
+    window = getattr(instance, '_sales_fact_window', None)
+    if window:
+        rebuild_sales_facts(since=window[0], until=window[1])
@@ -0,0 +1,52 @@
+"""
+Señales del ciclo de vida de las órdenes.
+
+``order_status_changed`` se emite después de guardar cada transición de estado
+(checkout, cancelación y transiciones del panel de ventas) con los argumentos
+``order``, ``old_status`` y ``new_status``. Las proyecciones de lectura se
+conectan aquí para mantenerse al día sin volver a escanear el historial.
+
+Al borrar un producto, variante, categoría o método de pago, DailySalesFact
+reconstruye los días que lo referenciaban (ver projections.release_fact_dimension).
+"""
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import Signal, receiver
+
+from inventory.models import Category, Product, ProductVariant
+
+from .models import PaymentMethod
+
+order_status_changed = Signal()
+
+
+@receiver(order_status_changed, dispatch_uid='orders.customer_stats')
+def update_customer_stats(sender, order, old_status, new_status, **kwargs):
+    from .projections import apply_customer_stats_transition
+    apply_customer_stats_transition(order, old_status, new_status)
+
+
+@receiver(order_status_changed, dispatch_uid='orders.sales_facts')
+def update_sales_facts(sender, order, old_status, new_status, **kwargs):
+    from .projections import apply_sales_fact_transition
+    apply_sales_fact_transition(order, old_status, new_status)
+
+
+def release_sales_fact_dimension(sender, instance, **kwargs):
+    from .projections import release_fact_dimension
+    release_fact_dimension(instance)
+
+
+def restore_sales_fact_dimension(sender, instance, **kwargs):
+    from .projections import restore_fact_dimension
+    restore_fact_dimension(instance)
+
+
+for dimension in (Product, ProductVariant, Category, PaymentMethod):
+    pre_delete.connect(
+        release_sales_fact_dimension, sender=dimension,
+        dispatch_uid=f'orders.sales_facts.release.{dimension._meta.label_lower}',
+    )
+    post_delete.connect(
+        restore_sales_fact_dimension, sender=dimension,
+        dispatch_uid=f'orders.sales_facts.restore.{dimension._meta.label_lower}',
+    )
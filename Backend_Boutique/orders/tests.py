@@ -0,0 +1,235 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Sum
+from django.test import TestCase
+from django.utils import timezone
+
+from inventory.models import Category, Product, ProductVariant
+
+from .models import CustomerStats, DailySalesFact, Order, OrderItem, PaymentMethod
+from .projections import _apply_fact_cells, rebuild_customer_stats, rebuild_sales_facts
+from .signals import order_status_changed
+
+User = get_user_model()
+
+
+class ProjectionTestMixin:
+    """Catálogo mínimo y helpers para crear órdenes y emitir transiciones"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Camisas', gender='M', kind='V')
+        cls.shirt = Product.objects.create(sku='P1', name='Camisa', category=cls.category, price=Decimal('10'), stock=100)
+        cls.pants = Product.objects.create(sku='P2', name='Pantalón', category=cls.category, price=Decimal('20'), stock=100)
+        cls.shirt_m = ProductVariant.objects.create(product=cls.shirt, size='M', stock=50)
+        cls.cash = PaymentMethod.objects.create(code='cash', name='Efectivo')
+        cls.card = PaymentMethod.objects.create(code='card', name='Tarjeta')
+        cls.customer = User.objects.create(username='cliente', identification_number='C1')
+        cls.other = User.objects.create(username='otro', identification_number='C2')
+
+    def make_order(self, items, user=None, payment_method=None, days_ago=0):
+        order = Order.objects.create(
+            user=user or self.customer, status='PENDING_PAYMENT', payment_method=payment_method or self.cash
+        )
+        total, quantity = Decimal('0'), 0
+        for product, variant, qty in items:
+            OrderItem.objects.create(
+                order=order, product=product, variant=variant, product_name_cache=product.name,
+                sku_cache=product.sku, unit_price=product.price, quantity=qty, line_subtotal=product.price * qty,
+            )
+            total += product.price * qty
+            quantity += qty
+        Order.objects.filter(pk=order.pk).update(
+            subtotal=total, grand_total=total, total_items=quantity,
+            created_at=timezone.now() - timedelta(days=days_ago),
+        )
+        order.refresh_from_db()
+        order_status_changed.send(sender=Order, order=order, old_status='DRAFT', new_status='PENDING_PAYMENT')
+        return order
+
+    def transition(self, order, new_status):
+        old_status = order.status
+        order.status = new_status
+        order.save(update_fields=['status'])
+        order_status_changed.send(sender=Order, order=order, old_status=old_status, new_status=new_status)
+
+
+class CustomerStatsProjectionTests(ProjectionTestMixin, TestCase):
+
+    def snapshot(self):
+        return sorted(CustomerStats.objects.values_list(
+            'user_id', 'order_count', 'total_spent', 'total_items', 'first_order_at', 'last_order_at'
+        ))
+
+    def test_sale_transitions_update_stats(self):
+        first = self.make_order([(self.shirt, self.shirt_m, 2)], days_ago=3)
+        second = self.make_order([(self.pants, None, 1)])
+        self.transition(first, 'PAID')
+        self.transition(second, 'PAID')
+        self.transition(first, 'DELIVERED')
+
+        stats = CustomerStats.objects.get(user=self.customer)
+        self.assertEqual(stats.order_count, 2)
+        self.assertEqual(stats.total_spent, Decimal('40'))
+        self.assertEqual(stats.total_items, 3)
+        self.assertEqual(stats.first_order_at, first.created_at)
+        self.assertEqual(stats.last_order_at, second.created_at)
+
+    def test_leaving_sale_status_recomputes_customer(self):
+        first = self.make_order([(self.shirt, self.shirt_m, 2)], days_ago=3)
+        second = self.make_order([(self.pants, None, 1)])
+        self.transition(first, 'PAID')
+        self.transition(second, 'PAID')
+        self.transition(first, 'REFUNDED')
+
+        stats = CustomerStats.objects.get(user=self.customer)
+        self.assertEqual(stats.order_count, 1)
+        self.assertEqual(stats.total_spent, Decimal('20'))
+        self.assertEqual(stats.first_order_at, second.created_at)
+
+    def test_incremental_matches_rebuild(self):
+        for days_ago, user in enumerate([self.customer, self.other, self.customer, self.other]):
+            order = self.make_order([(self.shirt, self.shirt_m, 1), (self.pants, None, days_ago + 1)], user=user, days_ago=days_ago)
+            self.transition(order, 'PAID')
+            if days_ago == 2:
+                self.transition(order, 'CANCELED')
+        incremental = self.snapshot()
+
+        rebuild_customer_stats()
+        self.assertEqual(incremental, self.snapshot())
+
+
+class DailySalesFactProjectionTests(ProjectionTestMixin, TestCase):
+
+    def snapshot(self):
+        return sorted(DailySalesFact.objects.values_list(
+            'date', 'product_id', 'variant_id', 'category_id', 'payment_method_id', 'status_class',
+            'quantity', 'revenue', 'line_count', 'product_orders', 'category_orders',
+            'order_count', 'order_total', 'order_items',
+        ), key=str)
+
+    def test_transition_moves_order_between_status_classes(self):
+        order = self.make_order([(self.shirt, self.shirt_m, 2), (self.pants, None, 1)])
+        self.assertEqual(set(DailySalesFact.objects.values_list('status_class', flat=True)), {'pending'})
+
+        self.transition(order, 'PAID')
+        sale = DailySalesFact.objects.filter(status_class='sale')
+        self.assertFalse(DailySalesFact.objects.exclude(status_class='sale').exists())
+        self.assertEqual(sum(fact.quantity for fact in sale), 3)
+        self.assertEqual(sum(fact.revenue for fact in sale), Decimal('40'))
+        self.assertEqual(sum(fact.order_count for fact in sale), 1)
+
+        # Entre estados de venta no cambia la clase
+        self.transition(order, 'DELIVERED')
+        self.assertEqual(sale.count(), 2)
+
+        self.transition(order, 'CANCELED')
+        self.assertEqual(set(DailySalesFact.objects.values_list('status_class', flat=True)), {'void'})
+
+    def test_orders_in_same_cell_share_one_row(self):
+        for _ in range(3):
+            self.transition(self.make_order([(self.shirt, self.shirt_m, 2)]), 'PAID')
+
+        fact = DailySalesFact.objects.get()
+        self.assertEqual(fact.status_class, 'sale')
+        self.assertEqual((fact.quantity, fact.line_count, fact.product_orders, fact.order_count), (6, 3, 3, 3))
+        self.assertEqual(fact.order_total, Decimal('60'))
+
+    def test_order_counts_once_per_product_and_category(self):
+        shirt_l = ProductVariant.objects.create(product=self.shirt, size='L', stock=50)
+        for _ in range(2):
+            order = self.make_order([(self.shirt, self.shirt_m, 1), (self.shirt, shirt_l, 1), (self.pants, None, 1)])
+            self.transition(order, 'PAID')
+        sale = DailySalesFact.objects.filter(status_class='sale')
+
+        self.assertEqual(sale.filter(product=self.shirt).aggregate(n=Sum('product_orders'))['n'], 2)
+        self.assertEqual(sale.filter(product=self.pants).aggregate(n=Sum('product_orders'))['n'], 2)
+        self.assertEqual(sale.filter(category=self.category).aggregate(n=Sum('category_orders'))['n'], 2)
+
+        incremental = self.snapshot()
+        rebuild_sales_facts()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_incremental_matches_rebuild(self):
+        for days_ago in range(6):
+            order = self.make_order(
+                [(self.shirt, self.shirt_m, 2), (self.pants, None, 1), (self.shirt, self.shirt_m, 1)],
+                payment_method=self.card if days_ago % 2 else self.cash, days_ago=days_ago,
+            )
+            if days_ago != 5:
+                self.transition(order, 'PAID')
+            if days_ago in (1, 3):
+                self.transition(order, 'REFUNDED')
+        incremental = self.snapshot()
+
+        rebuild_sales_facts()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_partial_rebuild_keeps_older_days(self):
+        for days_ago in range(4):
+            self.transition(self.make_order([(self.pants, None, 1)], days_ago=days_ago), 'PAID')
+        incremental = self.snapshot()
+
+        rebuild_sales_facts(since=timezone.localdate() - timedelta(days=1))
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_subtracting_missing_cell_is_skipped(self):
+        order = self.make_order([(self.pants, None, 1)])
+        DailySalesFact.objects.all().delete()
+
+        with self.assertLogs('orders.projections', level='WARNING'):
+            self.transition(order, 'PAID')
+        self.assertEqual(set(DailySalesFact.objects.values_list('status_class', flat=True)), {'sale'})
+
+    def test_subtracting_last_contribution_deletes_cell(self):
+        order = self.make_order([(self.pants, None, 1)])
+        key = DailySalesFact.objects.values_list(
+            'date', 'product_id', 'variant_id', 'category_id', 'payment_method_id', 'status_class'
+        ).get()
+        measures = DailySalesFact.objects.values(
+            'quantity', 'revenue', 'line_count', 'product_orders', 'category_orders',
+            'order_count', 'order_total', 'order_items'
+        ).get()
+
+        _apply_fact_cells({key: measures}, -1)
+        self.assertFalse(DailySalesFact.objects.exists())
+
+    def assert_unique_cells(self):
+        duplicates = DailySalesFact.objects.values(
+            'date', 'product_id', 'variant_id', 'category_id', 'payment_method_id', 'status_class'
+        ).annotate(rows=Count('id')).filter(rows__gt=1)
+        self.assertFalse(duplicates.exists())
+
+    def test_deleting_product_with_variants_rebuilds_its_days(self):
+        shirt_l = ProductVariant.objects.create(product=self.shirt, size='L', stock=50)
+        for days_ago in (0, 0, 2):
+            order = self.make_order(
+                [(self.shirt, self.shirt_m, 1), (self.shirt, shirt_l, 2), (self.pants, None, 1)], days_ago=days_ago
+            )
+            self.transition(order, 'PAID')
+
+        self.shirt.delete()
+        self.assert_unique_cells()
+        self.assertFalse(DailySalesFact.objects.filter(variant__isnull=False).exists())
+        # Sin el producto, la categoría se atribuye a la siguiente línea (pants)
+        sale = DailySalesFact.objects.filter(status_class='sale', category=self.category)
+        self.assertEqual(sale.aggregate(n=Sum('category_orders'))['n'], 3)
+        incremental = self.snapshot()
+
+        rebuild_sales_facts()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_deleting_payment_methods_merges_cells(self):
+        for payment_method in (self.cash, self.card):
+            self.transition(self.make_order([(self.pants, None, 1)], payment_method=payment_method), 'PAID')
+
+        self.cash.delete()
+        self.card.delete()
+        self.assert_unique_cells()
+        self.assertEqual(DailySalesFact.objects.get().quantity, 2)
+        incremental = self.snapshot()
+
+        rebuild_sales_facts()
+        self.assertEqual(incremental, self.snapshot())
@@ -7,6 +7,8 @@ from decimal import Decimal
 from django.db import transaction
 
 from .models import Address, ShippingMethod, PaymentMethod, Order, OrderItem, OrderStatusHistory, Cart, CartItem, UserPreferences
+from .signals import order_status_changed
+from .projections import refresh_customer_stats
 from django.conf import settings
 import stripe
 stripe.api_key = settings.STRIPE_SECRET_KEY or None
@@ -122,9 +124,11 @@ class OrderViewSet(viewsets.ModelViewSet):
         order.save(update_fields=['subtotal','shipping_cost','payment_fee','tax_total','grand_total','total_items'])
 
     def _add_status_history(self, order: Order, new_status: str, reason: str = None):
-        OrderStatusHistory.objects.create(order=order, old_status=order.status, new_status=new_status, changed_by=self.request.user, reason=reason or '')
+        old_status = order.status
+        OrderStatusHistory.objects.create(order=order, old_status=old_status, new_status=new_status, changed_by=self.request.user, reason=reason or '')
         order.status = new_status
         order.save(update_fields=['status'])
+        order_status_changed.send(sender=Order, order=order, old_status=old_status, new_status=new_status)
 
     @action(detail=True, methods=['patch'])
     def set_address(self, request, pk=None):
@@ -401,7 +405,6 @@ class OrderViewSet(viewsets.ModelViewSet):
                 prod.save(update_fields=['stock'])
             order.inventory_restored = True
         
-        order.status = 'CANCELED'
         order.canceled_at = timezone.now()
         self._add_status_history(order, 'CANCELED')
         order.save(update_fields=['status', 'canceled_at', 'inventory_restored'])
@@ -421,8 +424,11 @@ class OrderViewSet(viewsets.ModelViewSet):
         new_user = User.objects.filter(id=user_id).first()
         if not new_user:
             return Response({'detail':'Usuario no encontrado'}, status=404)
+        previous_user_id = order.user_id
         order.user = new_user
         order.save(update_fields=['user'])
+        if order.status != 'DRAFT':
+            refresh_customer_stats([previous_user_id, new_user.id])
         return Response(OrderSerializer(order, context={'request':request}).data)
 
     @action(detail=False, methods=['get'], url_path='draft-latest')
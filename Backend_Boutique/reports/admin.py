@@ -1,13 +1,13 @@
 from django.contrib import admin
-from .models import ReportLog
+from .models import ReportLog, ReportHandle, PromptPlan
 
 
 @admin.register(ReportLog)
 class ReportLogAdmin(admin.ModelAdmin):
-    list_display = ['user', 'report_type', 'input_type', 'results_count', 'success', 'created_at']
-    list_filter = ['report_type', 'input_type', 'success', 'created_at']
+    list_display = ['user', 'report_type', 'input_type', 'status', 'stage', 'results_count', 'success', 'created_at']
+    list_filter = ['report_type', 'input_type', 'status', 'success', 'created_at']
     search_fields = ['user__email', 'original_prompt', 'transcription']
-    readonly_fields = ['created_at']
+    readonly_fields = ['created_at', 'claimed_at', 'heartbeat_at', 'completed_at', 'stage_timings']
     
     fieldsets = (
         ('Usuario', {
@@ -20,9 +20,27 @@ class ReportLogAdmin(admin.ModelAdmin):
             'fields': ('generated_sql', 'sql_params')
         }),
         ('Resultados', {
-            'fields': ('report_type', 'results_count', 'export_format', 'file_path')
+            'fields': ('report_type', 'results_count', 'export_format', 'file_path', 'file_name', 'content_type', 'expires_at')
+        }),
+        ('Trabajo', {
+            'fields': ('status', 'stage', 'stage_timings', 'parameters', 'claimed_at', 'heartbeat_at', 'completed_at')
         }),
         ('Metadata', {
             'fields': ('execution_time', 'tokens_used', 'success', 'error_message', 'created_at')
         }),
     )
+
+
+@admin.register(ReportHandle)
+class ReportHandleAdmin(admin.ModelAdmin):
+    list_display = ['user', 'prompt', 'results_count', 'created_at', 'expires_at']
+    search_fields = ['user__email', 'prompt']
+    readonly_fields = ['created_at', 'results_path']
+
+
+@admin.register(PromptPlan)
+class PromptPlanAdmin(admin.ModelAdmin):
+    list_display = ['normalized_prompt', 'schema_version', 'source', 'hits', 'last_used_at', 'created_at']
+    list_filter = ['source', 'schema_version']
+    search_fields = ['normalized_prompt', 'example_prompt']
+    readonly_fields = ['created_at', 'last_used_at', 'hits']
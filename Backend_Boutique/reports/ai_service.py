@@ -10,6 +10,8 @@ from groq import Groq
 from django.conf import settings
 import re
 
+from . import prompt_cache
+
 
 class AIReportService:
     """
@@ -17,12 +19,21 @@ class AIReportService:
     """
     
     def __init__(self):
-        # Inicialización compatible con Groq SDK moderno (sin argumentos obsoletos)
-        self.client = Groq(api_key=settings.GROQ_API_KEY)
+        # El cliente de Groq se crea recién al llamar al LLM (un plan en caché no lo necesita)
+        self._client = None
         # Modelo actualizado de Groq (LLaMA 3.3 70B es el más reciente y potente)
         self.model = "llama-3.3-70b-versatile"
         # Schema de la base de datos para contexto
         self.db_schema = self._load_db_schema()
+        # Versión de schema + instrucciones + modelo: clave de la caché de planes
+        self.schema_version = prompt_cache.schema_version(self.model, self._system_message())
+    
+    @property
+    def client(self):
+        if self._client is None:
+            # Inicialización compatible con Groq SDK moderno (sin argumentos obsoletos)
+            self._client = Groq(api_key=settings.GROQ_API_KEY)
+        return self._client
     
     def _load_db_schema(self) -> str:
         """
@@ -135,6 +146,29 @@ class AIReportService:
         - unit_price (DECIMAL) - Precio unitario al momento de la compra
         - total_price (DECIMAL) - Precio total del ítem (quantity * unit_price)
         
+        ## TABLA: orders_customerstats (Resumen de compras por cliente, mantenido automáticamente)
+        - user_id (INTEGER) PK, FK -> accounts_customuser
+        - order_count (INTEGER) - Órdenes con venta efectiva (PAID, AWAITING_DISPATCH, SHIPPED, DELIVERED)
+        - total_spent (DECIMAL) - Suma de grand_total de esas órdenes
+        - total_items (INTEGER) - Artículos comprados
+        - first_order_at (TIMESTAMP) - Primera compra
+        - last_order_at (TIMESTAMP) - Última compra
+        
+        ## TABLA: orders_dailysalesfact (Hechos de venta pre-agregados por día, mantenidos automáticamente)
+        - date (DATE) - Día de la orden
+        - product_id (INTEGER) FK -> inventory_product (nullable)
+        - variant_id (INTEGER) FK -> inventory_productvariant (nullable)
+        - category_id (INTEGER) FK -> inventory_category (nullable)
+        - payment_method_id (INTEGER) FK -> orders_paymentmethod (nullable)
+        - status_class (VARCHAR): 'sale' (venta efectiva), 'pending' (pendiente de pago), 'void' (cancelada/reembolsada)
+        - quantity (INTEGER) - Unidades vendidas en la celda
+        - revenue (DECIMAL) - Suma de subtotales de línea
+        - product_orders (INTEGER) - Órdenes distintas con el producto (SUM por producto = conteo exacto)
+        - category_orders (INTEGER) - Órdenes distintas con la categoría (SUM por categoría = conteo exacto)
+        - order_count (INTEGER) - Órdenes (cada orden se cuenta una sola vez en toda la tabla)
+        - order_total (DECIMAL) - Suma de grand_total de esas órdenes
+        - order_items (INTEGER) - Suma de total_items de esas órdenes
+        
         NOTAS IMPORTANTES:
         - Los productos tienen stock total (product.stock) y stock por talla (productvariant.stock)
         - Las categorías y productos tienen género: 'M'=Hombre, 'F'=Mujer, 'U'=Unisex
@@ -145,23 +179,15 @@ class AIReportService:
         - Para fechas usa DATE_TRUNC o intervalos como: created_at >= NOW() - INTERVAL '30 days'
         - Los JOIN deben usar los campos FK correctos
         - Usa LIMIT para limitar resultados grandes
+        - Para totales de ventas por día/mes/producto/categoría/método de pago usa orders_dailysalesfact con status_class = 'sale' (SUM(order_total), SUM(order_count) para totales de órdenes; SUM(quantity), SUM(revenue) por producto) en lugar de agrupar orders_order/orders_orderitem
+        - Para rankings o listados de clientes (mejores clientes, clientes inactivos) usa orders_customerstats en lugar de agrupar orders_order
         """
     
-    def interpret_prompt(self, user_prompt: str) -> Dict[str, Any]:
+    def _system_message(self) -> str:
         """
-        Interpreta el prompt del usuario y genera SQL
-        
-        Returns:
-            {
-                'report_type': str,
-                'sql_query': str,
-                'parameters': dict,
-                'explanation': str,
-                'suggested_chart_type': str
-            }
+        Instrucciones del sistema para interpretar prompts (incluye el schema)
         """
-        
-        system_message = f"""Eres un experto analista de datos para una tienda de ropa (e-commerce + tienda física).
+        return f"""Eres un experto analista de datos para una tienda de ropa (e-commerce + tienda física).
 
 {self.db_schema}
 
@@ -240,6 +266,28 @@ Respuesta:
     "filters_applied": ["últimos 7 días"]
 }}
 """
+    
+    def interpret_prompt(self, user_prompt: str) -> Dict[str, Any]:
+        """
+        Interpreta el prompt del usuario y genera SQL.
+        Si el prompt normalizado ya tiene un plan validado no se llama al LLM.
+        
+        Returns:
+            {
+                'report_type': str,
+                'sql_query': str,
+                'parameters': dict,
+                'explanation': str,
+                'suggested_chart_type': str,
+                'cached': bool
+            }
+        """
+        
+        plan = prompt_cache.get_plan(user_prompt, self.schema_version)
+        if plan is not None:
+            return {**plan, 'tokens_used': 0, 'cached': True}
+        
+        system_message = self._system_message()
         
         user_message = f"""Genera la consulta SQL para este reporte:
 
@@ -280,12 +328,27 @@ Responde SOLO con el JSON, sin texto adicional."""
             
             # Agregar metadata
             response_json['tokens_used'] = chat_completion.usage.total_tokens
+            response_json['cached'] = False
             
             return response_json
             
         except Exception as e:
             raise Exception(f"Error al interpretar prompt con IA: {str(e)}")
     
+    def remember_plan(self, user_prompt: str, ai_response: Dict[str, Any]) -> None:
+        """
+        Guarda en caché un plan recién generado, una vez que su SQL se ejecutó bien
+        """
+        if not ai_response.get('cached'):
+            prompt_cache.store_plan(user_prompt, self.schema_version, ai_response)
+    
+    def forget_plan(self, user_prompt: str, ai_response: Dict[str, Any]) -> None:
+        """
+        Descarta un plan en caché cuyo SQL falló (la próxima vez se consulta al LLM)
+        """
+        if ai_response.get('cached'):
+            prompt_cache.forget_plan(user_prompt, self.schema_version)
+    
     def validate_sql_safety(self, sql_query: str) -> bool:
         """
         Validación de seguridad SQL
@@ -337,6 +400,11 @@ Resultados (primeros {len(results_preview)} de {len(results)} total):
 
 Genera un resumen ejecutivo."""
         
+        # Mismo prompt y mismos resultados: se reutiliza el resumen anterior
+        summary = prompt_cache.get_summary(self.schema_version, prompt, user_message)
+        if summary is not None:
+            return summary
+        
         try:
             chat_completion = self.client.chat.completions.create(
                 messages=[
@@ -348,7 +416,9 @@ Genera un resumen ejecutivo."""
                 max_tokens=500,
             )
             
-            return chat_completion.choices[0].message.content
+            summary = chat_completion.choices[0].message.content
+            prompt_cache.store_summary(self.schema_version, prompt, user_message, summary)
+            return summary
             
         except Exception as e:
             return f"Reporte generado con {len(results)} resultados."
@@ -1,13 +1,22 @@
 """
-Servicios para exportar reportes a PDF y Excel
+Servicios para exportar reportes a PDF, Excel, CSV, NDJSON y Parquet
 """
 
+import csv
+import io
 import os
-from typing import List, Dict, Any
-from datetime import datetime
-import pandas as pd
+import tempfile
+from typing import List, Dict, Any, Iterable, Iterator
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import chain, islice
+from functools import lru_cache
 from io import BytesIO
 
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, A4, landscape
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -18,7 +27,156 @@ from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 
 import matplotlib
 matplotlib.use('Agg')  # Backend sin interfaz gráfica
-import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+
+# Filas usadas para estimar anchos y tipos de columna en Excel
+EXCEL_SAMPLE_ROWS = 200
+# Tamaño a partir del cual el archivo generado pasa de memoria a disco
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+# Bytes que se juntan antes de entregar un bloque de CSV/NDJSON a la respuesta
+STREAM_CHUNK_BYTES = 64 * 1024
+# Filas por row group de Parquet (lo único que se tiene en memoria a la vez)
+PARQUET_ROW_GROUP = 10000
+
+
+# Ancho medio de un carácter de Helvetica (fracción del tamaño de fuente), para recortar celdas
+PDF_CHAR_WIDTH = 0.5
+# Padding vertical del frame de SimpleDocTemplate (6 pt arriba y abajo)
+PDF_FRAME_PADDING = 12
+# Puntos que se grafican, tamaño de la figura (pulgadas) y gráficos que se guardan ya renderizados
+CHART_MAX_POINTS = 20
+CHART_SIZE = (10, 6)
+CHART_CACHE_SIZE = 32
+
+
+def _pdf_cell(value, max_chars):
+    """Texto de una celda en una sola línea (la fila tiene alto fijo)"""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        text = _naive_datetime(value).strftime('%d/%m/%Y %H:%M')
+    elif isinstance(value, date):
+        text = value.strftime('%d/%m/%Y')
+    else:
+        text = str(value).replace('\n', ' ')
+    return text if len(text) <= max_chars else text[:max_chars - 1] + '…'
+
+
+def _flowable_height(flowable, width, height):
+    _, flowable_height = flowable.wrap(width, height)
+    return flowable_height + flowable.getSpaceBefore() + flowable.getSpaceAfter()
+
+
+@lru_cache(maxsize=CHART_CACHE_SIZE)
+def _render_chart_png(chart_type, title, x_field, y_field, labels, values):
+    """
+    PNG del gráfico con el renderer Agg. Usa Figure directamente (sin el estado global
+    de pyplot, así que es seguro en los hilos del worker) y queda en caché: el mismo
+    reporte exportado otra vez no vuelve a dibujarse.
+    """
+    figure = Figure(figsize=CHART_SIZE)
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    
+    if chart_type == 'pie':
+        ax.pie(values, labels=labels, autopct='%1.1f%%')
+    else:
+        if chart_type == 'line':
+            ax.plot(labels, values, marker='o')
+        else:
+            ax.bar(labels, values)
+        ax.set_xlabel(x_field.replace('_', ' ').title())
+        ax.set_ylabel(y_field.replace('_', ' ').title())
+        ax.tick_params(axis='x', labelrotation=45)
+        for tick in ax.get_xticklabels():
+            tick.set_horizontalalignment('right')
+    
+    ax.set_title(title, fontsize=14, fontweight='bold')
+    figure.tight_layout()
+    
+    buffer = BytesIO()
+    figure.savefig(buffer, format='png', dpi=150, bbox_inches='tight')
+    return buffer.getvalue()
+
+
+def _naive_datetime(value):
+    return timezone.make_naive(value) if timezone.is_aware(value) else value
+
+
+class _ParquetSink(io.RawIOBase):
+    """Salida de pyarrow que no guarda nada: lo escrito se retira con drain()"""
+
+    def __init__(self):
+        super().__init__()
+        self._pending = bytearray()
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._pending += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = bytes(self._pending)
+        self._pending.clear()
+        return data
+
+
+def _arrow_type(pa, values):
+    """Tipo Arrow según el primer valor no nulo de la columna (string si son todos nulos)"""
+    sample = next((value for value in values if value is not None), None)
+    if isinstance(sample, bool):
+        return pa.bool_()
+    if isinstance(sample, int):
+        return pa.int64()
+    if isinstance(sample, (float, Decimal)):
+        return pa.float64()
+    if isinstance(sample, datetime):
+        return pa.timestamp('us', tz='UTC' if timezone.is_aware(sample) else None)
+    if isinstance(sample, date):
+        return pa.date32()
+    return pa.string()
+
+
+def _arrow_value(pa, arrow_type, value):
+    if value is None:
+        return None
+    if arrow_type == pa.float64():
+        return float(value)
+    if arrow_type == pa.int64():
+        return int(value)
+    if arrow_type == pa.string():
+        return str(value)
+    return value
+
+
+def _parquet_chunks(pa, pq, columns, rows):
+    rows = iter(rows)
+    group = list(islice(rows, PARQUET_ROW_GROUP))
+    types = [_arrow_type(pa, [row[index] for row in group]) for index in range(len(columns))]
+    schema = pa.schema([pa.field(str(name), arrow_type) for name, arrow_type in zip(columns, types)])
+    sink = _ParquetSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    while group:
+        arrays = [
+            pa.array([_arrow_value(pa, arrow_type, row[index]) for row in group], type=arrow_type)
+            for index, arrow_type in enumerate(types)
+        ]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        chunk = sink.drain()
+        if chunk:
+            yield chunk
+        group = list(islice(rows, PARQUET_ROW_GROUP))
+    writer.close()
+    yield sink.drain()
 
 
 class ReportExporter:
@@ -27,7 +185,7 @@ class ReportExporter:
     """
     
     @staticmethod
-    def to_excel(data: List[Dict], filename: str, report_metadata: Dict = None) -> BytesIO:
+    def to_excel(data: List[Dict], filename: str, report_metadata: Dict = None):
         """
         Exporta datos a Excel con formato profesional
         
@@ -37,95 +195,185 @@ class ReportExporter:
             report_metadata: Información adicional del reporte
             
         Returns:
-            BytesIO con el archivo Excel
+            Archivo temporal (posicionado al inicio) con el Excel
         """
+        columns = list(data[0].keys()) if data else []
+        rows = ([row.get(column) for column in columns] for row in data)
+        return ReportExporter.rows_to_excel(columns, rows, filename, report_metadata)
+    
+    @staticmethod
+    def rows_to_excel(columns: List[str], rows: Iterable, filename: str, report_metadata: Dict = None):
+        """
+        Excel en streaming: workbook write-only de openpyxl (cada fila se escribe y se
+        descarta) y salida en un archivo temporal que pasa a disco si crece, de modo
+        que la memoria no depende de la cantidad de filas.
         
-        # Crear DataFrame
-        df = pd.DataFrame(data)
+        Los anchos salen de una muestra de las primeras filas y los formatos se definen
+        por columna; el zebra y los bordes son formato condicional (sin estilo por celda).
+        """
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.formatting.rule import FormulaRule
+        from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+        from openpyxl.utils import get_column_letter
         
-        # Crear archivo en memoria
-        output = BytesIO()
+        header_fill = PatternFill(start_color="4A5568", end_color="4A5568", fill_type="solid")
+        header_font = Font(bold=True, color="FFFFFF", size=11)
+        header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
+        light_fill = PatternFill(start_color="F7FAFC", end_color="F7FAFC", fill_type="solid")
+        cell_border = Border(
+            left=Side(style='thin', color='CCCCCC'),
+            right=Side(style='thin', color='CCCCCC'),
+            top=Side(style='thin', color='CCCCCC'),
+            bottom=Side(style='thin', color='CCCCCC')
+        )
         
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            # Escribir datos
-            df.to_excel(writer, sheet_name='Datos', index=False, startrow=0)
-            
-            # Obtener workbook y worksheet para formato
-            workbook = writer.book
-            worksheet = writer.sheets['Datos']
-            
-            # Estilo del encabezado
-            from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-            
-            header_fill = PatternFill(start_color="4A5568", end_color="4A5568", fill_type="solid")
-            header_font = Font(bold=True, color="FFFFFF", size=11)
-            header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-            
-            # Estilo de celdas
-            cell_border = Border(
-                left=Side(style='thin', color='CCCCCC'),
-                right=Side(style='thin', color='CCCCCC'),
-                top=Side(style='thin', color='CCCCCC'),
-                bottom=Side(style='thin', color='CCCCCC')
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet('Datos')
+        
+        # Muestra para anchos y formatos (en write-only las columnas se definen antes de las filas)
+        rows = iter(rows)
+        sample = list(islice(rows, EXCEL_SAMPLE_ROWS))
+        number_formats = []
+        for index, column in enumerate(columns):
+            values = [row[index] for row in sample if row[index] is not None]
+            max_length = max([len(str(column))] + [len(str(value)) for value in values])
+            # Ancho mínimo de 12, máximo de 60
+            worksheet.column_dimensions[get_column_letter(index + 1)].width = min(max(max_length + 3, 12), 60)
+            first = values[0] if values else None
+            number_formats.append(
+                '#,##0.00' if isinstance(first, (Decimal, float)) and not isinstance(first, bool) else None
             )
-            
-            # Aplicar estilo al encabezado
-            for cell in worksheet[1]:
+        styled = any(number_formats)
+        worksheet.freeze_panes = 'A2'
+        
+        if columns:
+            header = []
+            for column in columns:
+                cell = WriteOnlyCell(worksheet, value=str(column))
                 cell.fill = header_fill
                 cell.font = header_font
                 cell.alignment = header_alignment
                 cell.border = cell_border
-            
-            # Ajustar ancho de columnas automáticamente
-            for column in worksheet.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if cell.value:
-                            cell.border = cell_border
-                            cell.alignment = Alignment(horizontal="left", vertical="center")
-                            max_length = max(max_length, len(str(cell.value)))
-                    except:
-                        pass
-                # Ancho mínimo de 12, máximo de 60
-                adjusted_width = min(max(max_length + 3, 12), 60)
-                worksheet.column_dimensions[column_letter].width = adjusted_width
-            
-            # Alternar colores de filas
-            light_fill = PatternFill(start_color="F7FAFC", end_color="F7FAFC", fill_type="solid")
-            for row_idx, row in enumerate(worksheet.iter_rows(min_row=2), start=2):
-                if row_idx % 2 == 0:
-                    for cell in row:
-                        if not cell.fill.start_color.rgb or cell.fill.start_color.rgb == '00000000':
-                            cell.fill = light_fill
-            
-            # Si hay metadata, crear hoja adicional
-            if report_metadata:
-                metadata_df = pd.DataFrame([
-                    ['Reporte', report_metadata.get('title', 'N/A')],
-                    ['Generado por', report_metadata.get('user', 'N/A')],
-                    ['Fecha', datetime.now().strftime('%Y-%m-%d %H:%M:%S')],
-                    ['Total registros', len(data)],
-                    ['Consulta', report_metadata.get('prompt', 'N/A')],
-                ])
-                metadata_df.to_excel(writer, sheet_name='Información', index=False, header=False)
-                
-                # Formato de la hoja de metadata
-                meta_worksheet = writer.sheets['Información']
-                for row in meta_worksheet.iter_rows():
-                    for cell in row:
-                        cell.alignment = Alignment(horizontal="left", vertical="center", wrap_text=True)
-                        if cell.column == 1:
-                            cell.font = Font(bold=True, size=11)
-                
-                # Ajustar ancho de columnas de metadata
-                meta_worksheet.column_dimensions['A'].width = 20
-                meta_worksheet.column_dimensions['B'].width = 60
+                header.append(cell)
+            worksheet.append(header)
+        
+        total = 0
+        for row in chain(sample, rows):
+            # Excel no admite zona horaria: se pasa a hora local (valor por valor, la muestra
+            # puede no tener fechas en una columna que las trae más adelante)
+            values = [
+                timezone.make_naive(value) if isinstance(value, datetime) and timezone.is_aware(value) else value
+                for value in row
+            ]
+            if styled:
+                for index, number_format in enumerate(number_formats):
+                    if number_format is not None:
+                        cell = WriteOnlyCell(worksheet, value=values[index])
+                        cell.number_format = number_format
+                        values[index] = cell
+            worksheet.append(values)
+            total += 1
+        
+        if columns and total:
+            data_range = f"A2:{get_column_letter(len(columns))}{total + 1}"
+            # Alternar colores de filas y bordes en las celdas con valor
+            worksheet.conditional_formatting.add(
+                data_range, FormulaRule(formula=['MOD(ROW(),2)=0'], fill=light_fill)
+            )
+            worksheet.conditional_formatting.add(
+                data_range, FormulaRule(formula=['LEN(A2)>0'], border=cell_border)
+            )
         
+        # Si hay metadata, crear hoja adicional
+        if report_metadata:
+            meta_worksheet = workbook.create_sheet('Información')
+            # Ajustar ancho de columnas de metadata
+            meta_worksheet.column_dimensions['A'].width = 20
+            meta_worksheet.column_dimensions['B'].width = 60
+            metadata_rows = [
+                ['Reporte', report_metadata.get('title', 'N/A')],
+                ['Generado por', report_metadata.get('user', 'N/A')],
+                ['Fecha', datetime.now().strftime('%Y-%m-%d %H:%M:%S')],
+                ['Total registros', total],
+                ['Consulta', report_metadata.get('prompt', 'N/A')],
+            ]
+            if report_metadata.get('truncated'):
+                metadata_rows.append(['Aviso', 'Resultado truncado: se exportan solo las primeras filas'])
+            for label, value in metadata_rows:
+                label_cell = WriteOnlyCell(meta_worksheet, value=label)
+                label_cell.font = Font(bold=True, size=11)
+                label_cell.alignment = Alignment(horizontal="left", vertical="center", wrap_text=True)
+                value_cell = WriteOnlyCell(meta_worksheet, value=value)
+                value_cell.alignment = Alignment(horizontal="left", vertical="center", wrap_text=True)
+                meta_worksheet.append([label_cell, value_cell])
+        
+        output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, suffix='.xlsx')
+        workbook.save(output)
         output.seek(0)
         return output
     
+    @staticmethod
+    def stream(export_format: str, columns: List[str], rows: Iterable) -> Iterator[bytes]:
+        """
+        Archivo como bloques de bytes que se producen a medida que se leen las filas
+        (tuplas en el orden de ``columns``): sirve para StreamingHttpResponse sin
+        juntar el resultado en memoria.
+        """
+        if export_format == 'csv':
+            return ReportExporter.stream_csv(columns, rows)
+        if export_format == 'ndjson':
+            return ReportExporter.stream_ndjson(columns, rows)
+        if export_format == 'parquet':
+            return ReportExporter.stream_parquet(columns, rows)
+        raise ValueError(f"Formato sin streaming: {export_format}")
+    
+    @staticmethod
+    def stream_csv(columns: List[str], rows: Iterable) -> Iterator[bytes]:
+        """CSV UTF-8 con BOM (Excel lo abre con las tildes correctas); el encabezado sale de inmediato"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        buffer.write('\ufeff')
+        writer.writerow(columns)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() >= STREAM_CHUNK_BYTES:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode('utf-8')
+    
+    @staticmethod
+    def stream_ndjson(columns: List[str], rows: Iterable) -> Iterator[bytes]:
+        """Un objeto JSON por línea (fechas en ISO 8601, decimales como texto)"""
+        encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+        lines, size = [], 0
+        for row in rows:
+            line = encoder.encode(dict(zip(columns, row)))
+            lines.append(line)
+            size += len(line) + 1
+            if size >= STREAM_CHUNK_BYTES:
+                yield ('\n'.join(lines) + '\n').encode('utf-8')
+                lines, size = [], 0
+        if lines:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+    
+    @staticmethod
+    def stream_parquet(columns: List[str], rows: Iterable) -> Iterator[bytes]:
+        """
+        Parquet por row groups de PARQUET_ROW_GROUP filas; los tipos de cada columna
+        salen del primer grupo. Requiere pyarrow (se valida antes de empezar a responder).
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("La exportación a Parquet requiere pyarrow (pip install pyarrow)") from e
+        return _parquet_chunks(pa, pq, columns, rows)
+    
     @staticmethod
     def to_pdf(
         data: List[Dict], 
@@ -136,11 +384,15 @@ class ReportExporter:
         """
         Exporta datos a PDF con formato profesional
         
+        La tabla se arma en bloques de una página (una Table por página, con alto de
+        fila fijo): reportlab no tiene que medir celdas ni partir una tabla gigante,
+        así que el tiempo crece linealmente con las filas (hasta REPORT_PDF_MAX_ROWS).
+        
         Args:
             data: Lista de diccionarios con los datos
             filename: Nombre sugerido para el archivo
             report_metadata: Información adicional del reporte
-            chart_data: Datos para generar gráficos
+            chart_data: Datos para generar gráficos (ver _generate_chart)
             
         Returns:
             BytesIO con el archivo PDF
@@ -148,9 +400,8 @@ class ReportExporter:
         
         output = BytesIO()
         
-        # Determinar orientación según número de columnas
-        df = pd.DataFrame(data)
-        num_columns = len(df.columns)
+        columns = list(data[0].keys()) if data else []
+        num_columns = len(columns)
         
         # Si hay más de 6 columnas, usar landscape
         pagesize = landscape(A4) if num_columns > 6 else A4
@@ -203,7 +454,7 @@ class ReportExporter:
             <b>Generado por:</b> {report_metadata.get('user', 'Sistema')}<br/>
             <b>Fecha:</b> {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}<br/>
             <b>Consulta:</b> {report_metadata.get('prompt', 'N/A')}<br/>
-            <b>Total de registros:</b> {len(data)}
+            <b>Total de registros:</b> {len(data)}{' (resultado truncado)' if report_metadata.get('truncated') else ''}
             """
             story.append(Paragraph(metadata_text, styles['Normal']))
             story.append(Spacer(1, 0.2 * inch))
@@ -214,35 +465,30 @@ class ReportExporter:
             story.append(Paragraph(report_metadata['summary'], styles['Normal']))
             story.append(Spacer(1, 0.2 * inch))
         
-        # Tabla de datos (SIN GRÁFICO - se quitó como solicitaste)
+        # Gráfico (solo si se pidió y se pudo generar)
+        chart_buffer = ReportExporter._generate_chart(chart_data, data) if chart_data and data else None
+        if chart_buffer:
+            chart_width = doc.width * 0.8
+            story.append(RLImage(chart_buffer, width=chart_width, height=chart_width * CHART_SIZE[1] / CHART_SIZE[0]))
+            story.append(Spacer(1, 0.2 * inch))
+        
+        # Tabla de datos
         if data:
             story.append(Paragraph('Datos Detallados', heading_style))
             story.append(Spacer(1, 0.1 * inch))
             
             # NO limitar columnas - mostrar TODAS
             # Limitar solo filas si son demasiadas (para PDF)
-            max_rows = 100  # Aumentado a 100 registros
-            show_all_message = False
-            
-            if len(df) > max_rows:
-                df_display = df.head(max_rows)
-                show_all_message = True
-            else:
-                df_display = df
-            
-            if show_all_message:
+            max_rows = settings.REPORT_PDF_MAX_ROWS
+            if len(data) > max_rows:
                 story.append(Paragraph(
-                    f'<i>Mostrando primeros {max_rows} registros de {len(data)} total. Descarga el Excel para ver todos.</i>',
+                    f'<i>Mostrando primeros {max_rows} registros de {len(data)} total. Descarga el Excel o el CSV para ver todos.</i>',
                     styles['Italic']
                 ))
                 story.append(Spacer(1, 0.1 * inch))
             
-            # Crear tabla con TODAS las columnas
-            table_data = [df_display.columns.tolist()] + df_display.values.tolist()
-            
             # Calcular ancho de columnas dinámicamente
-            page_width = pagesize[0] - 40  # Ancho disponible
-            col_widths = [page_width / len(df_display.columns)] * len(df_display.columns)
+            col_width = doc.width / num_columns
             
             # Ajustar tamaño de fuente según número de columnas
             if num_columns > 10:
@@ -255,10 +501,13 @@ class ReportExporter:
                 font_size = 8
                 header_font_size = 9
             
-            table = Table(table_data, colWidths=col_widths, repeatRows=1)
+            # Alto fijo: una línea de texto + padding (las celdas largas se recortan)
+            row_height = font_size * 1.2 + 10
+            header_height = header_font_size * 1.2 + 16
+            max_chars = max(int((col_width - 8) / (font_size * PDF_CHAR_WIDTH)), 3)
             
-            # Estilo de tabla mejorado
-            table.setStyle(TableStyle([
+            # Estilo de tabla mejorado (compartido por todas las páginas)
+            table_style = TableStyle([
                 # Encabezado
                 ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4a5568')),
                 ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
@@ -278,9 +527,32 @@ class ReportExporter:
                 ('RIGHTPADDING', (0, 0), (-1, -1), 4),
                 ('TOPPADDING', (0, 1), (-1, -1), 5),
                 ('BOTTOMPADDING', (0, 1), (-1, -1), 5),
-            ]))
+            ])
+            header = [_pdf_cell(column, max(int((col_width - 8) / (header_font_size * PDF_CHAR_WIDTH)), 3)) for column in columns]
+            
+            # Filas por página: la primera tabla ocupa lo que queda de la página del encabezado
+            frame_height = doc.height - PDF_FRAME_PADDING
+            rows_per_page = max(int((frame_height - header_height) // row_height), 1)
+            used = sum(_flowable_height(flowable, doc.width, frame_height) for flowable in story)
+            first_rows = int((frame_height - used - header_height) // row_height) - 1
+            if first_rows < 3:
+                story.append(PageBreak())
+                first_rows = rows_per_page
             
-            story.append(table)
+            rows = ([_pdf_cell(row.get(column), max_chars) for column in columns] for row in islice(data, max_rows))
+            chunk_size = first_rows
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                story.append(Table(
+                    [header] + chunk,
+                    colWidths=[col_width] * num_columns,
+                    rowHeights=[header_height] + [row_height] * len(chunk),
+                    repeatRows=1,
+                    style=table_style,
+                ))
+                chunk_size = rows_per_page
         
         # Construir PDF
         doc.build(story)
@@ -308,44 +580,17 @@ class ReportExporter:
         """
         
         try:
-            df = pd.DataFrame(data)
-            
             chart_type = chart_config.get('type', 'bar')
             x_field = chart_config.get('x_field')
             y_field = chart_config.get('y_field')
             title = chart_config.get('title', 'Gráfico')
             
             # Limitar datos si son muchos
-            if len(df) > 20:
-                df = df.head(20)
-            
-            fig, ax = plt.subplots(figsize=(10, 6))
-            
-            if chart_type == 'bar':
-                ax.bar(df[x_field].astype(str), df[y_field])
-                ax.set_xlabel(x_field.replace('_', ' ').title())
-                ax.set_ylabel(y_field.replace('_', ' ').title())
-                plt.xticks(rotation=45, ha='right')
-                
-            elif chart_type == 'line':
-                ax.plot(df[x_field], df[y_field], marker='o')
-                ax.set_xlabel(x_field.replace('_', ' ').title())
-                ax.set_ylabel(y_field.replace('_', ' ').title())
-                plt.xticks(rotation=45, ha='right')
-                
-            elif chart_type == 'pie':
-                ax.pie(df[y_field], labels=df[x_field].astype(str), autopct='%1.1f%%')
-            
-            ax.set_title(title, fontsize=14, fontweight='bold')
-            plt.tight_layout()
-            
-            # Guardar en buffer
-            buffer = BytesIO()
-            plt.savefig(buffer, format='png', dpi=150, bbox_inches='tight')
-            plt.close()
+            points = data[:CHART_MAX_POINTS]
+            labels = tuple(str(row.get(x_field)) for row in points)
+            values = tuple(float(row.get(y_field) or 0) for row in points)
             
-            buffer.seek(0)
-            return buffer
+            return BytesIO(_render_chart_png(chart_type, title, x_field, y_field, labels, values))
             
         except Exception as e:
             print(f"Error generando gráfico: {e}")
@@ -0,0 +1,170 @@
+"""
+Handles de vista previa (vista previa -> exportación)
+La vista previa guarda el plan y las filas consultadas en un ReportHandle; la
+exportación (síncrona o en segundo plano) recibe el handle y arma el archivo con esas
+filas, sin volver a llamar al LLM ni a la BD. Las filas se guardan como NDJSON (una
+línea de columnas y una por fila) en el storage por defecto, para que run_report_worker
+también pueda leerlas; se escriben y se leen fila a fila, sin juntarlas en memoria.
+Solo se guardan resultados de hasta REPORT_HANDLE_MAX_ROWS filas. Los vencidos los
+borra la propia vista previa (y run_report_worker, si está activo).
+"""
+import json
+import tempfile
+import uuid
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .export_service import SPOOL_MAX_BYTES
+from .models import ReportHandle
+from .prompt_cache import PLAN_FIELDS
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Handles vencidos que borra cada vista previa al crear el suyo
+HANDLE_EXPIRE_BATCH = 5
+
+
+class ReportHandleExpired(Exception):
+    """El resultado de la vista previa ya venció; hay que volver a generarla"""
+
+
+# Tipos que JSON no conserva: se guardan etiquetados para que Excel/PDF reciban el mismo valor
+def _encode(value):
+    if isinstance(value, Decimal):
+        return {'$decimal': str(value)}
+    if isinstance(value, datetime):
+        return {'$datetime': value.isoformat()}
+    if isinstance(value, date):
+        return {'$date': value.isoformat()}
+    if isinstance(value, dt_time):
+        return {'$time': value.isoformat()}
+    if isinstance(value, (uuid.UUID, bytes, memoryview)):
+        return str(value)
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict) and len(value) == 1:
+        (tag, raw), = value.items()
+        if tag == '$decimal':
+            return Decimal(raw)
+        if tag == '$datetime':
+            return datetime.fromisoformat(raw)
+        if tag == '$date':
+            return date.fromisoformat(raw)
+        if tag == '$time':
+            return dt_time.fromisoformat(raw)
+    return value
+
+
+def create_report_handle(user, prompt, plan, source, preview_rows=0):
+    """
+    Guarda el plan y las filas de ``source`` (ReportQueryStream o ReportQueryResult)
+    a medida que se leen. Devuelve (handle, primeras ``preview_rows`` filas). Si la
+    consulta se cortó antes de REPORT_MAX_ROWS (se abrió con el tope del handle) no
+    se guarda nada y handle es None: la exportación vuelve a ejecutarla.
+    """
+    # La limpieza no depende de run_report_worker (apagado por defecto): cada vista previa
+    # borra unos pocos handles vencidos, más de los que crea, así que el storage no crece
+    expire_report_handles(limit=HANDLE_EXPIRE_BATCH)
+    handle = ReportHandle(
+        user=user,
+        prompt=prompt,
+        plan={field: plan.get(field) for field in PLAN_FIELDS},
+        expires_at=timezone.now() + timedelta(minutes=settings.REPORT_HANDLE_TTL_MINUTES),
+    )
+    first_rows = []
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as spool:
+        spool.write(json.dumps({'columns': list(source.columns)}).encode('utf-8') + b'\n')
+        for row in source:
+            if len(first_rows) < preview_rows:
+                first_rows.append(row)
+            spool.write(json.dumps([_encode(value) for value in row], separators=(',', ':')).encode('utf-8') + b'\n')
+        if source.truncated and source.count < settings.REPORT_MAX_ROWS:
+            return None, first_rows
+        spool.seek(0)
+        handle.results_count = source.count
+        handle.truncated = source.truncated
+        handle.results_path = default_storage.save(f"reports/handles/{handle.id}.ndjson", File(spool))
+    handle.save()
+    return handle, first_rows
+
+
+def get_report_handle(user, handle_id):
+    """
+    Handle del usuario o None (si no existe, el id no es válido o es de otro usuario).
+    Lanza ReportHandleExpired si ya venció.
+    """
+    try:
+        handle_id = uuid.UUID(str(handle_id))
+    except ValueError:
+        return None
+    handle = ReportHandle.objects.filter(id=handle_id, user=user).first()
+    if handle is not None and handle.expires_at <= timezone.now():
+        raise ReportHandleExpired("La vista previa venció; vuelve a generarla")
+    return handle
+
+
+class ReportHandleRows:
+    """
+    Filas guardadas en un handle, leídas línea a línea del storage. Misma interfaz que
+    ReportQueryStream (columns, count, truncated, iteración y ``close()``).
+    """
+
+    def __init__(self, handle):
+        self.count = handle.results_count
+        self.truncated = handle.truncated
+        self._file = default_storage.open(handle.results_path, 'rb')
+        lines = iter(self._file)
+        try:
+            header = json.loads(next(lines))
+        except Exception:
+            self.close()
+            raise
+        self.columns = header['columns']
+        if 'rows' in header:
+            # Handle guardado como un solo documento JSON (antes del formato NDJSON)
+            self._rows = iter(header['rows'])
+        else:
+            self._rows = (json.loads(line) for line in lines if line.strip())
+
+    def __iter__(self):
+        try:
+            for row in self._rows:
+                yield tuple(_decode(value) for value in row)
+        finally:
+            self.close()
+
+    def close(self):
+        self._file.close()
+
+    def as_dicts(self):
+        return [dict(zip(self.columns, row)) for row in self]
+
+
+def load_handle_rows(handle):
+    """Filas guardadas como lista de dicts (igual que las devuelve la consulta)"""
+    return ReportHandleRows(handle).as_dicts()
+
+
+def expire_report_handles(now=None, limit=None):
+    """Borra los handles vencidos y sus archivos (los ``limit`` más antiguos, o todos)"""
+    now = now or timezone.now()
+    expired = 0
+    handles = ReportHandle.objects.filter(expires_at__lte=now).order_by('expires_at')
+    if limit:
+        handles = handles[:limit]
+    for handle in handles:
+        try:
+            default_storage.delete(handle.results_path)
+        except Exception as e:
+            logger.warning(f"No se pudo borrar el resultado del handle {handle.id}: {str(e)}")
+            continue
+        handle.delete()
+        expired += 1
+    return expired
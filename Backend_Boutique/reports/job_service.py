@@ -0,0 +1,379 @@
+"""
+Generación asíncrona de reportes con IA sobre ReportLog
+La API encola el reporte (status='pending') y el comando run_report_worker lo ejecuta
+en un pool de hilos: interpretación del prompt, consulta, resumen, render y guardado
+del archivo en el storage por defecto. Cada etapa deja su tiempo en ``stage_timings``;
+el archivo se descarga mientras no venza (REPORT_ARTIFACT_TTL_HOURS).
+
+CSV, NDJSON y Parquet no llevan resumen ni render: las filas pasan del cursor al
+archivo por bloques (open_report_stream), tanto en la API como en el worker.
+"""
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .ai_service import AIReportService
+from .export_service import SPOOL_MAX_BYTES, ReportExporter
+from .handle_service import ReportHandleExpired, ReportHandleRows, get_report_handle, load_handle_rows
+from .models import ReportLog
+from .query_service import ReportQueryStream, ReportQueryTimeout, run_report_query
+import logging
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {
+    'pdf': 'application/pdf',
+    'excel': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+EXTENSIONS = {
+    'pdf': 'pdf',
+    'excel': 'xlsx',
+    'csv': 'csv',
+    'ndjson': 'ndjson',
+    'parquet': 'parquet',
+}
+# Formatos que se escriben a medida que se leen las filas
+STREAMING_FORMATS = ('csv', 'ndjson', 'parquet')
+
+
+class ReportJobCanceled(Exception):
+    """El reporte se canceló (o se dio por caído) mientras se generaba"""
+
+
+def _filename(report_type, export_format):
+    return f'reporte_{report_type}_{timezone.now().strftime("%Y%m%d_%H%M%S")}.{EXTENSIONS[export_format]}'
+
+
+def _execute_plan(ai_service, prompt, ai_response, execute):
+    """Valida y ejecuta el SQL del plan; lo guarda en la caché si funcionó o lo descarta si no"""
+    try:
+        ai_service.validate_sql_safety(ai_response['sql_query'])
+        result = execute(ai_response['sql_query'])
+    except ReportQueryTimeout:
+        # El plan es válido; la consulta solo fue demasiado pesada
+        raise
+    except Exception:
+        ai_service.forget_plan(prompt, ai_response)
+        raise
+    ai_service.remember_plan(prompt, ai_response)
+    return result
+
+
+def open_report_stream(prompt, export_format, on_stage=None, handle=None):
+    """
+    Reporte con IA en csv/ndjson/parquet sin juntar las filas: ``chunks`` produce el
+    archivo por bloques mientras se lee la consulta (ReportQueryStream) o las filas del
+    ``handle``. ``source`` expone columns, count y truncated (definitivos al agotar los
+    bloques) y hay que cerrarlo con ``close()`` al terminar o si se corta la descarga.
+    """
+    on_stage = on_stage or (lambda stage: None)
+    if export_format not in STREAMING_FORMATS:
+        raise ValueError(f"Formato sin streaming: {export_format}")
+
+    if handle is not None:
+        on_stage('load')
+        ai_response = {**handle.plan, 'tokens_used': 0, 'cached': True}
+        source = ReportHandleRows(handle)
+    else:
+        ai_service = AIReportService()
+        on_stage('interpret')
+        ai_response = ai_service.interpret_prompt(prompt)
+        on_stage('query')
+        source = _execute_plan(ai_service, prompt, ai_response, ReportQueryStream)
+
+    try:
+        chunks = ReportExporter.stream(export_format, source.columns, source)
+    except Exception:
+        source.close()
+        raise
+    return {
+        'chunks': chunks,
+        'source': source,
+        'content_type': CONTENT_TYPES[export_format],
+        'filename': _filename(ai_response['report_type'], export_format),
+        'report_type': ai_response['report_type'],
+        'sql_query': ai_response['sql_query'],
+        'tokens_used': ai_response.get('tokens_used', 0),
+        'plan_cached': ai_response.get('cached', False),
+        'from_handle': handle is not None,
+    }
+
+
+def _spool_report_stream(prompt, export_format, on_stage, handle):
+    """open_report_stream volcado a un archivo temporal (para el worker)"""
+    report = open_report_stream(prompt, export_format, on_stage=on_stage, handle=handle)
+    source = report.pop('source')
+    on_stage('render')
+    file_content = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    try:
+        for chunk in report.pop('chunks'):
+            file_content.write(chunk)
+    except Exception:
+        file_content.close()
+        raise
+    finally:
+        source.close()
+    file_content.seek(0)
+    return {**report, 'file_content': file_content, 'results_count': source.count, 'truncated': source.truncated}
+
+
+def render_ai_report(prompt, export_format, include_chart, user, on_stage=None, handle=None):
+    """
+    Pipeline completo de un reporte con IA. ``on_stage(nombre)`` se llama al iniciar cada
+    etapa. Con ``handle`` (ReportHandle de una vista previa) se usan su plan y sus filas
+    en lugar de interpretar y consultar. Devuelve el archivo (BytesIO) y los datos para
+    ReportLog y la respuesta.
+    """
+    on_stage = on_stage or (lambda stage: None)
+    if export_format in STREAMING_FORMATS:
+        return _spool_report_stream(prompt, export_format, on_stage, handle)
+    ai_service = AIReportService()
+
+    if handle is not None:
+        # 1-3. Plan y filas ya guardados por la vista previa
+        on_stage('load')
+        ai_response = {**handle.plan, 'tokens_used': 0, 'cached': True}
+        results = load_handle_rows(handle)
+        truncated = handle.truncated
+    else:
+        # 1. Interpretar prompt con IA
+        on_stage('interpret')
+        ai_response = ai_service.interpret_prompt(prompt)
+
+        # 2. Validar seguridad SQL
+        # 3. Ejecutar query
+        on_stage('query')
+        result = _execute_plan(ai_service, prompt, ai_response, run_report_query)
+        results = result.as_dicts()
+        truncated = result.truncated
+
+    sql_query = ai_response['sql_query']
+    report_type = ai_response['report_type']
+    explanation = ai_response['explanation']
+    suggested_chart = ai_response.get('suggested_chart_type', 'bar')
+
+    # 4. Generar resumen con IA
+    on_stage('summary')
+    summary = ai_service.generate_report_summary(prompt, results)
+
+    # 5. Exportar según formato
+    on_stage('render')
+    report_metadata = {
+        'title': f"Reporte de {report_type.title()}",
+        'user': user.get_full_name() or user.email,
+        'prompt': prompt,
+        'explanation': explanation,
+        'summary': summary,
+        'generated_at': timezone.now().isoformat(),
+        'truncated': truncated,
+    }
+    if export_format == 'excel':
+        file_content = ReportExporter.to_excel(results, 'reporte', report_metadata)
+    else:  # PDF
+        export_format = 'pdf'
+        chart_data = None
+        if include_chart and len(results) > 0 and suggested_chart != 'none':
+            # Intentar detectar campos para gráfico
+            # Decimal: SUM/AVG de PostgreSQL (bool no es una medida)
+            numeric_fields = [k for k, v in results[0].items() if isinstance(v, (int, float, Decimal)) and not isinstance(v, bool)]
+            text_fields = [k for k, v in results[0].items() if isinstance(v, str)]
+
+            if numeric_fields and text_fields:
+                chart_data = {
+                    'type': suggested_chart,
+                    'x_field': text_fields[0],
+                    'y_field': numeric_fields[0],
+                    'title': explanation
+                }
+        file_content = ReportExporter.to_pdf(results, 'reporte', report_metadata, chart_data)
+
+    return {
+        'file_content': file_content,
+        'content_type': CONTENT_TYPES[export_format],
+        'filename': _filename(report_type, export_format),
+        'report_type': report_type,
+        'sql_query': sql_query,
+        'results_count': len(results),
+        'truncated': truncated,
+        'tokens_used': ai_response.get('tokens_used', 0),
+        'plan_cached': ai_response.get('cached', False),
+        'from_handle': handle is not None,
+    }
+
+
+def submit_report_job(user, prompt, export_format='pdf', include_chart=True, handle=None):
+    """Encola un reporte con IA (opcionalmente desde una vista previa); lo ejecuta run_report_worker"""
+    if export_format not in CONTENT_TYPES:
+        raise ValueError(f"Formato no soportado: {export_format}")
+    parameters = {'include_chart': bool(include_chart)}
+    if handle is not None:
+        parameters['report_handle'] = str(handle.id)
+    return ReportLog.objects.create(
+        user=user,
+        report_type='custom',
+        input_type='text',
+        original_prompt=prompt,
+        generated_sql='',
+        export_format=export_format,
+        status='pending',
+        stage='queued',
+        parameters=parameters,
+    )
+
+
+def claim_next_report_job():
+    """Toma el reporte pendiente más antiguo; el UPDATE condicional evita que dos hilos tomen el mismo"""
+    for job_id in ReportLog.objects.filter(status='pending').order_by('created_at').values_list('id', flat=True)[:10]:
+        now = timezone.now()
+        claimed = ReportLog.objects.filter(id=job_id, status='pending').update(
+            status='running', claimed_at=now, heartbeat_at=now
+        )
+        if claimed:
+            return ReportLog.objects.select_related('user').get(id=job_id)
+    return None
+
+
+def cancel_report_job(job):
+    """Cancela un reporte en cola o en curso; el worker lo nota al pasar a la siguiente etapa"""
+    canceled = ReportLog.objects.filter(id=job.id, status__in=ReportLog.ACTIVE_STATUSES).update(
+        status='canceled', success=False, error_message='Cancelado por el usuario', completed_at=timezone.now()
+    )
+    return bool(canceled)
+
+
+def fail_stale_report_jobs(timeout_seconds=None):
+    """Marca como fallidos los reportes en curso sin señal de vida (worker caído)"""
+    timeout_seconds = timeout_seconds or settings.REPORT_JOB_TIMEOUT
+    now = timezone.now()
+    return ReportLog.objects.filter(
+        status='running',
+        heartbeat_at__lt=now - timedelta(seconds=timeout_seconds)
+    ).update(
+        status='failed',
+        success=False,
+        error_message='El worker dejó de reportar progreso',
+        completed_at=now
+    )
+
+
+def expire_report_artifacts(now=None):
+    """Borra del storage los archivos vencidos y deja el reporte como 'expired'"""
+    now = now or timezone.now()
+    expired = 0
+    for job in ReportLog.objects.filter(status='completed', expires_at__lte=now).exclude(file_path=None):
+        try:
+            default_storage.delete(job.file_path)
+        except Exception as e:
+            logger.warning(f"No se pudo borrar el archivo del reporte {job.id}: {str(e)}")
+            continue
+        expired += ReportLog.objects.filter(id=job.id, status='completed').update(status='expired', file_path=None)
+    return expired
+
+
+class ReportStageReporter:
+    """
+    Callback ``on_stage(nombre)``: cierra la etapa anterior y persiste etapa y latido.
+    El UPDATE solo aplica si el reporte sigue en curso; si no, fue cancelado o dado por caído.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self._stage = None
+        self._stage_started = None
+
+    def __call__(self, stage):
+        now = time.monotonic()
+        self._close_stage(now)
+        self._stage, self._stage_started = stage, now
+        self.job.stage = stage
+        updated = ReportLog.objects.filter(id=self.job.id, status='running').update(
+            stage=stage,
+            stage_timings=self.job.stage_timings,
+            heartbeat_at=timezone.now(),
+        )
+        if not updated:
+            raise ReportJobCanceled(f"Reporte {self.job.id} cancelado")
+
+    def finish(self):
+        self._close_stage(time.monotonic())
+        self._stage = None
+
+    def _close_stage(self, now):
+        if self._stage:
+            self.job.stage_timings[self._stage] = round(now - self._stage_started, 3)
+
+
+def run_report_job(job):
+    """Ejecuta un reporte ya tomado (status='running') y guarda su archivo"""
+    reporter = ReportStageReporter(job)
+    start_time = time.time()
+    path = None
+    try:
+        handle = None
+        if job.parameters.get('report_handle'):
+            handle = get_report_handle(job.user, job.parameters['report_handle'])
+            if handle is None:
+                raise ReportHandleExpired("La vista previa ya no existe; vuelve a generarla")
+        report = render_ai_report(
+            job.original_prompt,
+            job.export_format,
+            job.parameters.get('include_chart', True),
+            job.user,
+            on_stage=reporter,
+            handle=handle,
+        )
+        reporter('store')
+        # El storage copia el archivo por bloques
+        with File(report['file_content'], name=report['filename']) as file_content:
+            path = default_storage.save(
+                f"reports/exports/{timezone.localdate():%Y/%m}/{job.id}/{report['filename']}",
+                file_content
+            )
+        reporter.finish()
+        now = timezone.now()
+        fields = {
+            'status': 'completed',
+            'stage': 'done',
+            'success': True,
+            'report_type': report['report_type'],
+            'generated_sql': report['sql_query'],
+            'results_count': report['results_count'],
+            'truncated': report['truncated'],
+            'tokens_used': report['tokens_used'],
+            'file_path': path,
+            'file_name': report['filename'],
+            'content_type': report['content_type'],
+            'completed_at': now,
+            'expires_at': now + timedelta(hours=settings.REPORT_ARTIFACT_TTL_HOURS),
+        }
+    except ReportJobCanceled:
+        reporter.finish()
+        logger.info(f"Reporte {job.id} cancelado en la etapa {job.stage}")
+        fields = {}
+    except Exception as e:
+        reporter.finish()
+        logger.error(f"Error generando reporte {job.id}: {str(e)}")
+        fields = {
+            'status': 'failed',
+            'success': False,
+            'error_message': str(e),
+            'completed_at': timezone.now(),
+        }
+    fields.update(stage_timings=job.stage_timings, execution_time=time.time() - start_time)
+    # Si entretanto se canceló, no se pisa el estado: solo se guardan los tiempos y se descarta el archivo
+    if not fields.get('status') or not ReportLog.objects.filter(id=job.id, status='running').update(**fields):
+        ReportLog.objects.filter(id=job.id).update(
+            stage_timings=fields['stage_timings'], execution_time=fields['execution_time']
+        )
+        if path:
+            default_storage.delete(path)
+    job.refresh_from_db()
+    return job
@@ -0,0 +1,110 @@
+"""
+Comando para medir el tiempo de armado del PDF de reportes según la cantidad de filas
+Compara ReportExporter.to_pdf (una tabla por página, alto de fila fijo) con la tabla
+única anterior, que reportlab mide celda por celda y parte página a página
+"""
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import BytesIO
+import re
+import time
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+
+from reports.export_service import ReportExporter
+
+PAGE_MARKER = re.compile(rb'/Type /Page\b')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark del PDF de reportes: tiempo de armado vs. filas (datos sintéticos, no usa la BD)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, nargs='+', default=[100, 500, 1000, 2000, 5000],
+            help='Cantidades de filas a medir (default: 100 500 1000 2000 5000)'
+        )
+        parser.add_argument('--columns', type=int, default=6, help='Columnas de la tabla (default: 6)')
+        parser.add_argument('--repeat', type=int, default=1, help='Repeticiones por medición; se reporta la mejor (default: 1)')
+        parser.add_argument(
+            '--legacy-max-rows', type=int, default=2000,
+            help='Filas máximas para medir la tabla única anterior, que crece de forma cuadrática (default: 2000)'
+        )
+        parser.add_argument('--chart', action='store_true', help='Incluir un gráfico de barras en el PDF')
+
+    def handle(self, *args, **options):
+        columns = options['columns']
+        chart_data = None
+        if options['chart']:
+            chart_data = {'type': 'bar', 'x_field': 'producto', 'y_field': 'total', 'title': 'Benchmark'}
+
+        self.stdout.write(f'{columns} columnas, mejor de {options["repeat"]} repeticiones')
+        self.stdout.write(f'{"filas":>8} {"páginas":>8} {"por página":>12} {"ms/fila":>8} {"tabla única":>12} {"x":>6}')
+        with override_settings(REPORT_PDF_MAX_ROWS=max(options['rows'])):
+            for rows in sorted(options['rows']):
+                data = self.synthetic_rows(rows, columns)
+                timings = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    output = ReportExporter.to_pdf(data, 'benchmark', {'title': 'Benchmark', 'user': 'benchmark'}, chart_data)
+                    timings.append(time.perf_counter() - start)
+                best = min(timings)
+                pages = len(PAGE_MARKER.findall(output.getvalue()))
+
+                legacy = ''
+                if rows <= options['legacy_max_rows']:
+                    legacy_best = min(self.timed(lambda: self.legacy_pdf(data)) for _ in range(options['repeat']))
+                    legacy = f'{legacy_best * 1000:10.0f} ms {legacy_best / best:5.1f}'
+                self.stdout.write(self.style.SUCCESS(
+                    f'  ✓ {rows:>4} {pages:>8} {best * 1000:9.0f} ms {best * 1000 / rows:8.2f} {legacy}'
+                ))
+
+    @staticmethod
+    def timed(run):
+        start = time.perf_counter()
+        run()
+        return time.perf_counter() - start
+
+    @staticmethod
+    def synthetic_rows(rows, columns):
+        """Filas con los tipos que devuelven las consultas de reportes (texto, enteros, decimales, fechas)"""
+        base = datetime(2025, 1, 1, 9, 30)
+        generators = [
+            ('producto', lambda i: f'Producto de prueba {i}'),
+            ('total', lambda i: Decimal(i % 997) * Decimal('12.50')),
+            ('cantidad', lambda i: i % 37),
+            ('categoria', lambda i: f'Categoría {i % 12}'),
+            ('fecha', lambda i: base + timedelta(hours=i)),
+            ('cliente', lambda i: f'cliente{i % 300}@correo.com'),
+        ]
+        fields = [
+            (name if index < len(generators) else f'{name}_{index // len(generators)}', generate)
+            for index, (name, generate) in ((i, generators[i % len(generators)]) for i in range(columns))
+        ]
+        return [{name: generate(i) for name, generate in fields} for i in range(rows)]
+
+    @staticmethod
+    def legacy_pdf(data):
+        """Implementación previa: una sola Table con todas las filas (sin el tope de 100)"""
+        output = BytesIO()
+        columns = list(data[0].keys())
+        pagesize = landscape(A4) if len(columns) > 6 else A4
+        doc = SimpleDocTemplate(output, pagesize=pagesize, rightMargin=20, leftMargin=20, topMargin=40, bottomMargin=40)
+        table_data = [columns] + [[row[column] for column in columns] for row in data]
+        table = Table(table_data, colWidths=[(pagesize[0] - 40) / len(columns)] * len(columns), repeatRows=1)
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4a5568')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 1), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f7fafc')]),
+            ('TOPPADDING', (0, 1), (-1, -1), 5),
+            ('BOTTOMPADDING', (0, 1), (-1, -1), 5),
+        ]))
+        doc.build([table])
+        return output
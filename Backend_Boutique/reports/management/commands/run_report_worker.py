@@ -0,0 +1,84 @@
+"""
+Worker de reportes
+Ejecuta los reportes encolados en ReportLog con un pool de hilos (ver reports/job_service.py)
+y borra periódicamente los archivos y vistas previas vencidos
+"""
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+import threading
+import time
+
+from reports.handle_service import expire_report_handles
+from reports.job_service import claim_next_report_job, expire_report_artifacts, fail_stale_report_jobs, run_report_job
+
+
+class Command(BaseCommand):
+    help = 'Genera los reportes con IA encolados y borra los archivos vencidos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.REPORT_WORKERS, help='Hilos de generación (default: REPORT_WORKERS)')
+        parser.add_argument('--once', action='store_true', help='Procesar la cola actual y terminar')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Segundos entre consultas a la cola (default: 2)')
+        parser.add_argument('--expire-interval', type=float, default=600, help='Segundos entre limpiezas de archivos vencidos (default: 600)')
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        self.options = options
+        self.stdout.write(self.style.SUCCESS(f"🚀 Worker de reportes iniciado ({options['workers']} hilos)"))
+        self._housekeeping()
+        next_expiry = time.monotonic() + options['expire_interval']
+        with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='report') as pool:
+            loops = [pool.submit(self._loop) for _ in range(options['workers'])]
+            try:
+                while not all(loop.done() for loop in loops):
+                    time.sleep(0.5)
+                    if time.monotonic() >= next_expiry:
+                        next_expiry = time.monotonic() + options['expire_interval']
+                        self._housekeeping()
+            except KeyboardInterrupt:
+                self.stdout.write('Deteniendo worker de reportes (se terminan los reportes en curso)...')
+                self.stop.set()
+        processed = sum(loop.result() for loop in loops if not loop.cancelled() and loop.exception() is None)
+        self.stdout.write(self.style.SUCCESS(f'✅ Reportes procesados: {processed}'))
+
+    def _loop(self):
+        """Un hilo del pool: toma reportes de la cola hasta que se vacíe (--once) o se detenga"""
+        processed = 0
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                job = claim_next_report_job()
+                if job is None:
+                    if self.options['once']:
+                        break
+                    self.stop.wait(self.options['poll_interval'])
+                    continue
+
+                self.stdout.write(f'Generando reporte {job.id}...')
+                job = run_report_job(job)
+                processed += 1
+                if job.status == 'completed':
+                    self.stdout.write(self.style.SUCCESS(
+                        f'  ✓ Reporte {job.id}: {job.results_count} filas en {job.execution_time:.1f}s {job.stage_timings}'
+                    ))
+                elif job.status == 'canceled':
+                    self.stdout.write(self.style.WARNING(f'  - Reporte {job.id} cancelado'))
+                else:
+                    self.stdout.write(self.style.ERROR(f'  ✗ Reporte {job.id} falló: {job.error_message}'))
+        finally:
+            connection.close()
+        return processed
+
+    def _housekeeping(self):
+        close_old_connections()
+        stale = fail_stale_report_jobs()
+        if stale:
+            self.stdout.write(self.style.WARNING(f'  ! {stale} reporte(s) sin progreso marcados como fallidos'))
+        expired = expire_report_artifacts()
+        if expired:
+            self.stdout.write(f'  - {expired} archivo(s) de reportes vencidos borrados')
+        handles = expire_report_handles()
+        if handles:
+            self.stdout.write(f'  - {handles} vista(s) previa(s) vencida(s) borrada(s)')
@@ -0,0 +1,53 @@
+"""
+Siembra la caché de planes SQL de los reportes con IA
+Importa los reportes exitosos del historial y, opcionalmente, genera los planes de los
+prompts sugeridos para que ni siquiera la primera consulta espere al LLM
+"""
+from django.core.management.base import BaseCommand
+
+from reports.ai_service import AIReportService
+from reports.models import PromptPlan
+from reports.prompt_cache import import_report_history, normalize_prompt, probe_sql
+from reports.views import REPORT_SUGGESTIONS
+
+
+class Command(BaseCommand):
+    help = 'Siembra la caché de planes SQL con el historial de reportes y los prompts sugeridos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help='Días de historial a importar (default: 90)')
+        parser.add_argument('--suggestions', action='store_true', help='Generar con el LLM los planes de los prompts sugeridos que falten')
+        parser.add_argument('--purge-stale', action='store_true', help='Borrar los planes de versiones de schema anteriores')
+
+    def handle(self, *args, **options):
+        ai_service = AIReportService()
+        self.stdout.write(f"Versión de schema: {ai_service.schema_version}")
+
+        if options['purge_stale']:
+            deleted, _ = PromptPlan.objects.exclude(schema_version=ai_service.schema_version).delete()
+            self.stdout.write(self.style.SUCCESS(f"  ✓ Planes de versiones anteriores borrados: {deleted}"))
+
+        imported, skipped = import_report_history(ai_service, days=options['days'])
+        self.stdout.write(self.style.SUCCESS(f"  ✓ Historial: {imported} planes importados, {skipped} descartados"))
+
+        if options['suggestions']:
+            generated, failed = 0, 0
+            for prompts in REPORT_SUGGESTIONS.values():
+                for prompt in prompts:
+                    if PromptPlan.objects.filter(
+                        schema_version=ai_service.schema_version, normalized_prompt=normalize_prompt(prompt)
+                    ).exists():
+                        continue
+                    try:
+                        ai_response = ai_service.interpret_prompt(prompt)
+                        probe_sql(ai_service, ai_response['sql_query'])
+                    except Exception as e:
+                        failed += 1
+                        self.stdout.write(self.style.WARNING(f"  ⚠ {prompt}: {str(e)}"))
+                        continue
+                    ai_service.remember_plan(prompt, ai_response)
+                    generated += 1
+            self.stdout.write(self.style.SUCCESS(f"  ✓ Sugerencias: {generated} planes generados, {failed} con error"))
+
+        total = PromptPlan.objects.filter(schema_version=ai_service.schema_version).count()
+        self.stdout.write(self.style.SUCCESS(f"✅ Planes en caché: {total}"))
@@ -0,0 +1,372 @@
+"""
+Consultas de los reportes manuales (filtros tradicionales, sin IA)
+Cada tipo de reporte es una plantilla SQL sobre las tablas reales (los nombres salen de
+``Model._meta.db_table``) y los filtros se agregan como condiciones con parámetros:
+ningún valor del usuario se concatena en el SQL. Las fechas se filtran por rango
+(``columna >= desde AND columna < hasta``, en hora local) para que se use el índice en
+lugar de calcular EXTRACT(...) en cada fila.
+
+El texto SQL depende solo de la "forma" del pedido (tipo de reporte y qué filtros
+vienen), no de sus valores: se compila una vez por forma y se reutiliza, y la BD recibe
+siempre la misma sentencia (SQLite reutiliza la sentencia ya compilada de su caché por
+conexión; en PostgreSQL se agrupan en pg_stat_statements y se pueden preparar).
+"""
+from datetime import date, datetime, time as dt_time, timedelta
+from functools import lru_cache
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.utils import timezone
+
+from inventory.models import Category, Product
+from orders.models import CustomerStats, Order, PaymentMethod
+
+# Formas distintas que se guardan compiladas (tipo de reporte × filtros presentes)
+STATEMENT_CACHE_SIZE = 256
+
+QUARTER_MONTHS = {
+    'Q1': 1,
+    'Q2': 4,
+    'Q3': 7,
+    'Q4': 10,
+}
+# Estados "de negocio" aceptados además de los códigos de Order.STATUS_CHOICES
+STATUS_ALIASES = {
+    'pending': ('PENDING_PAYMENT',),
+    'completed': Order.SALE_STATUSES,
+    'cancelled': ('CANCELED',),
+    'canceled': ('CANCELED',),
+    'refunded': ('REFUNDED',),
+}
+STAFF_USER_TYPES = ('admin', 'owner', 'seller')
+
+
+def _tables():
+    return {
+        'order': Order._meta.db_table,
+        'payment_method': PaymentMethod._meta.db_table,
+        'customer_stats': CustomerStats._meta.db_table,
+        'product': Product._meta.db_table,
+        'category': Category._meta.db_table,
+        'user': get_user_model()._meta.db_table,
+    }
+
+
+# Plantillas: ``{where}`` recibe las condiciones de los filtros ("AND ...")
+REPORTS = {
+    'sales': {
+        'sql': """
+            SELECT
+                o.id as order_id,
+                o.created_at as fecha,
+                u.first_name || ' ' || u.last_name as cliente,
+                o.grand_total as total,
+                o.status as estado,
+                pm.name as metodo_pago,
+                o.total_items as articulos
+            FROM {order} o
+            LEFT JOIN {user} u ON o.user_id = u.id
+            LEFT JOIN {payment_method} pm ON o.payment_method_id = pm.id
+            WHERE 1=1{where}
+            ORDER BY o.created_at DESC
+        """,
+        'date_column': 'o.created_at',
+        'filters': {'status': 'o.status'},
+    },
+    'products': {
+        'sql': """
+            SELECT
+                p.id,
+                p.name as nombre,
+                p.sku,
+                p.price as precio,
+                p.stock,
+                c.name as categoria,
+                p.is_active as activo
+            FROM {product} p
+            LEFT JOIN {category} c ON p.category_id = c.id
+            WHERE 1=1{where}
+            ORDER BY p.name
+        """,
+        'filters': {'category': 'p.category_id', 'min_stock': 'p.stock', 'max_stock': 'p.stock'},
+    },
+    'inventory': {
+        'sql': """
+            SELECT
+                p.id,
+                p.name as nombre,
+                p.sku,
+                p.stock,
+                p.price as precio_unitario,
+                (p.stock * p.price) as valor_total,
+                c.name as categoria,
+                CASE
+                    WHEN p.stock = 0 THEN 'Sin stock'
+                    WHEN p.stock < 10 THEN 'Stock bajo'
+                    WHEN p.stock < 50 THEN 'Stock medio'
+                    ELSE 'Stock alto'
+                END as nivel_stock
+            FROM {product} p
+            LEFT JOIN {category} c ON p.category_id = c.id
+            WHERE p.is_active = %s{where}
+            ORDER BY p.stock ASC
+        """,
+        'fixed_params': [True],
+        'filters': {'category': 'p.category_id', 'min_stock': 'p.stock', 'max_stock': 'p.stock'},
+    },
+    'categories': {
+        'sql': """
+            SELECT
+                c.id,
+                c.name as nombre,
+                c.description as descripcion,
+                COUNT(p.id) as total_productos,
+                SUM(p.stock) as stock_total,
+                c.is_active as activa
+            FROM {category} c
+            LEFT JOIN {product} p ON c.id = p.category_id
+            WHERE 1=1{where}
+            GROUP BY c.id, c.name, c.description, c.is_active
+            ORDER BY total_productos DESC
+        """,
+        'filters': {},
+    },
+    # No hay modelo de facturas: cada orden cobrada es un comprobante, fechado al pago
+    'invoices': {
+        'sql': """
+            SELECT
+                o.id,
+                o.id as numero_factura,
+                o.paid_at as fecha,
+                u.first_name || ' ' || u.last_name as cliente,
+                o.grand_total as total,
+                o.status as estado,
+                pm.name as metodo_pago
+            FROM {order} o
+            LEFT JOIN {user} u ON o.user_id = u.id
+            LEFT JOIN {payment_method} pm ON o.payment_method_id = pm.id
+            WHERE o.paid_at IS NOT NULL{where}
+            ORDER BY o.paid_at DESC
+        """,
+        'date_column': 'o.paid_at',
+        'filters': {'status': 'o.status'},
+    },
+    # No hay modelo de empleados: son los usuarios internos (admin, dueño, vendedor)
+    'employees': {
+        'sql': """
+            SELECT
+                u.id,
+                u.first_name || ' ' || u.last_name as nombre_completo,
+                u.email,
+                u.user_type as puesto,
+                u.date_joined as fecha_contratacion,
+                u.is_active as activo
+            FROM {user} u
+            WHERE u.user_type IN (%s, %s, %s){where}
+            ORDER BY u.date_joined DESC
+        """,
+        'fixed_params': list(STAFF_USER_TYPES),
+        'filters': {},
+    },
+    # Lee la proyección orders_customerstats
+    'customers': {
+        'sql': """
+            SELECT
+                u.id,
+                u.first_name || ' ' || u.last_name as nombre_completo,
+                u.email,
+                u.phone as telefono,
+                u.date_joined as fecha_registro,
+                COALESCE(cs.order_count, 0) as total_ordenes,
+                COALESCE(cs.total_spent, 0) as total_gastado,
+                cs.last_order_at as ultima_compra,
+                u.is_active as activo
+            FROM {user} u
+            LEFT JOIN {customer_stats} cs ON cs.user_id = u.id
+            WHERE u.user_type = %s{where}
+            ORDER BY total_gastado DESC
+        """,
+        'fixed_params': ['customer'],
+        'filters': {},
+    },
+}
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def compile_statement(report_type, shape):
+    """
+    SQL de un reporte para una forma de filtros: tupla de (filtro, cantidad de valores)
+    en el orden en que se pasan los parámetros
+    """
+    report = REPORTS[report_type]
+    conditions = []
+    for name, count in shape:
+        if name == 'date_from':
+            conditions.append(f"{report['date_column']} >= %s")
+        elif name == 'date_to':
+            conditions.append(f"{report['date_column']} < %s")
+        elif name == 'min_stock':
+            conditions.append(f"{report['filters'][name]} >= %s")
+        elif name == 'max_stock':
+            conditions.append(f"{report['filters'][name]} <= %s")
+        elif count == 1:
+            conditions.append(f"{report['filters'][name]} = %s")
+        else:
+            conditions.append(f"{report['filters'][name]} IN ({', '.join(['%s'] * count)})")
+    where = ''.join(f" AND {condition}" for condition in conditions)
+    return report['sql'].format(where=where, **_tables())
+
+
+def _int(params, name, minimum=None, maximum=None):
+    value = params.get(name)
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Filtro inválido: {name}={value!r}")
+    if (minimum is not None and number < minimum) or (maximum is not None and number > maximum):
+        raise ValueError(f"Filtro fuera de rango: {name}={value!r}")
+    return number
+
+
+def _date(params, name):
+    value = params.get(name)
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Fecha inválida: {name}={value!r} (formato YYYY-MM-DD)")
+
+
+def _local_midnight(day):
+    # SQL crudo: el valor se adapta como lo guarda el ORM (en SQLite, texto en UTC)
+    return connection.ops.adapt_datetimefield_value(timezone.make_aware(datetime.combine(day, dt_time.min)))
+
+
+def _next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def date_range(params):
+    """
+    (desde, hasta) del periodo pedido (medianoche local, listos para la BD), con ``hasta``
+    excluido. year/month/quarter y start_date/end_date se intersectan; None si no hay límite.
+    """
+    lower = upper = None
+    if params.get('year'):
+        year = _int(params, 'year', 1, 9998)
+        if params.get('month'):
+            lower = date(year, _int(params, 'month', 1, 12), 1)
+            upper = _next_month(lower)
+        elif params.get('quarter') in QUARTER_MONTHS:
+            lower = date(year, QUARTER_MONTHS[params['quarter']], 1)
+            upper = _next_month(_next_month(_next_month(lower)))
+        else:
+            lower, upper = date(year, 1, 1), date(year + 1, 1, 1)
+    if params.get('start_date'):
+        start = _date(params, 'start_date')
+        lower = max(lower, start) if lower else start
+    if params.get('end_date'):
+        end = _date(params, 'end_date') + timedelta(days=1)
+        upper = min(upper, end) if upper else end
+    return (
+        _local_midnight(lower) if lower else None,
+        _local_midnight(upper) if upper else None,
+    )
+
+
+def _statuses(value):
+    statuses = STATUS_ALIASES.get(value.lower())
+    if statuses is None:
+        code = value.upper()
+        if code not in dict(Order.STATUS_CHOICES):
+            raise ValueError(f"Estado no soportado: {value}")
+        statuses = (code,)
+    return list(statuses)
+
+
+class ManualReportQueryBuilder:
+    """
+    Construye queries SQL seguras para reportes manuales basados en filtros
+    """
+
+    def build_query(self, report_type, params):
+        """(sql, parámetros) según tipo de reporte y filtros"""
+        if report_type not in REPORTS:
+            raise ValueError(f"Tipo de reporte no soportado: {report_type}")
+        report = REPORTS[report_type]
+
+        filters = []
+        if 'date_column' in report:
+            date_from, date_to = date_range(params)
+            if date_from:
+                filters.append(('date_from', [date_from]))
+            if date_to:
+                filters.append(('date_to', [date_to]))
+
+        supported = report['filters']
+        status = params.get('status')
+        if 'status' in supported and status and status != 'all':
+            filters.append(('status', _statuses(status)))
+
+        category = params.get('category')
+        if 'category' in supported and category and category != 'all':
+            filters.append(('category', [_int(params, 'category')]))
+
+        for name in ('min_stock', 'max_stock'):
+            if name in supported and params.get(name):
+                filters.append((name, [_int(params, name)]))
+
+        sql_query = compile_statement(report_type, tuple((name, len(values)) for name, values in filters))
+        sql_params = list(report.get('fixed_params', []))
+        for _, values in filters:
+            sql_params.extend(values)
+        return sql_query, sql_params
+
+    def generate_summary(self, report_type, results, params):
+        """Generar resumen del reporte"""
+        if not results:
+            return "No se encontraron resultados con los filtros aplicados."
+
+        count = len(results)
+
+        if report_type == 'sales':
+            total = sum(float(r.get('total') or 0) for r in results)
+            return f"Se encontraron {count} ventas con un total de ${total:,.2f}"
+
+        elif report_type == 'products':
+            total_stock = sum(int(r.get('stock') or 0) for r in results)
+            return f"Se encontraron {count} productos con un stock total de {total_stock} unidades"
+
+        elif report_type == 'inventory':
+            total_value = sum(float(r.get('valor_total') or 0) for r in results)
+            return f"Inventario de {count} productos con un valor total de ${total_value:,.2f}"
+
+        elif report_type == 'customers':
+            total_spent = sum(float(r.get('total_gastado') or 0) for r in results)
+            return f"Se encontraron {count} clientes con un gasto total de ${total_spent:,.2f}"
+
+        else:
+            return f"Se encontraron {count} registros"
+
+    def get_applied_filters(self, params):
+        """Obtener lista de filtros aplicados"""
+        filters = []
+
+        if params.get('year'):
+            filters.append(f"Año: {params['year']}")
+        if params.get('month'):
+            filters.append(f"Mes: {params['month']}")
+        if params.get('quarter'):
+            filters.append(f"Trimestre: {params['quarter']}")
+        if params.get('start_date'):
+            filters.append(f"Desde: {params['start_date']}")
+        if params.get('end_date'):
+            filters.append(f"Hasta: {params['end_date']}")
+        if params.get('category') and params['category'] != 'all':
+            filters.append(f"Categoría: {params['category']}")
+        if params.get('status') and params['status'] != 'all':
+            filters.append(f"Estado: {params['status']}")
+        if params.get('min_stock'):
+            filters.append(f"Stock mínimo: {params['min_stock']}")
+        if params.get('max_stock'):
+            filters.append(f"Stock máximo: {params['max_stock']}")
+
+        return filters if filters else ['Sin filtros aplicados']
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportlog',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reportlog',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reportlog',
+            name='content_type',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='reportlog',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, help_text='Fecha desde la cual el archivo se borra', null=True),
+        ),
+        migrations.AddField(
+            model_name='reportlog',
+            name='file_name',
+            field=models.CharField(blank=True, help_text='Nombre de descarga del archivo generado', max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='reportlog',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reportlog',
+            name='parameters',
+            field=models.JSONField(blank=True, default=dict, help_text='Opciones del trabajo (p. ej. include_chart)'),
+        ),
+        migrations.AddField(
+            model_name='reportlog',
+            name='stage',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='reportlog',
+            name='stage_timings',
+            field=models.JSONField(blank=True, default=dict, help_text='Segundos por etapa'),
+        ),
+        migrations.AddField(
+            model_name='reportlog',
+            name='status',
+            field=models.CharField(choices=[('pending', 'En cola'), ('running', 'Generando'), ('completed', 'Completado'), ('failed', 'Fallido'), ('canceled', 'Cancelado'), ('expired', 'Archivo vencido')], db_index=True, default='completed', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='reportlog',
+            name='execution_time',
+            field=models.FloatField(default=0, help_text='Tiempo de ejecución en segundos'),
+        ),
+        migrations.AddIndex(
+            model_name='reportlog',
+            index=models.Index(fields=['status', 'created_at'], name='reports_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0002_report_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PromptPlan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('normalized_prompt', models.CharField(max_length=500)),
+                ('schema_version', models.CharField(max_length=16)),
+                ('plan', models.JSONField(help_text='report_type, sql_query, explanation, suggested_chart_type, filters_applied')),
+                ('source', models.CharField(choices=[('llm', 'Generado por la IA'), ('history', 'Importado del historial')], default='llm', max_length=10)),
+                ('example_prompt', models.TextField(help_text='Prompt original con el que se generó')),
+                ('hits', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-hits', '-created_at'],
+                'constraints': [models.UniqueConstraint(fields=('schema_version', 'normalized_prompt'), name='reports_prompt_plan_unique')],
+            },
+        ),
+    ]
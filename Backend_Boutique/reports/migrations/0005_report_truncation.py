@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0004_report_handles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reporthandle',
+            name='truncated',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='reportlog',
+            name='truncated',
+            field=models.BooleanField(default=False, help_text='El resultado se cortó en REPORT_MAX_ROWS filas'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0005_report_truncation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reportlog',
+            name='export_format',
+            field=models.CharField(choices=[('pdf', 'PDF'), ('excel', 'Excel'), ('json', 'JSON'), ('csv', 'CSV'), ('ndjson', 'NDJSON'), ('parquet', 'Parquet')], max_length=10),
+        ),
+    ]
@@ -27,8 +27,24 @@ class ReportLog(models.Model):
         ('pdf', 'PDF'),
         ('excel', 'Excel'),
         ('json', 'JSON'),
+        ('csv', 'CSV'),
+        ('ndjson', 'NDJSON'),
+        ('parquet', 'Parquet'),
     ]
     
+    # Los reportes síncronos se registran ya terminados ('completed'); los trabajos
+    # encolados pasan por pending -> running -> completed/failed/canceled, y su archivo
+    # pasa a 'expired' cuando se borra al vencer (ver reports/job_service.py)
+    STATUS_CHOICES = [
+        ('pending', 'En cola'),
+        ('running', 'Generando'),
+        ('completed', 'Completado'),
+        ('failed', 'Fallido'),
+        ('canceled', 'Cancelado'),
+        ('expired', 'Archivo vencido'),
+    ]
+    ACTIVE_STATUSES = ('pending', 'running')
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='generated_reports')
     report_type = models.CharField(max_length=20, choices=REPORT_TYPES)
@@ -45,11 +61,24 @@ class ReportLog(models.Model):
     
     # Resultados
     results_count = models.IntegerField(default=0)
+    truncated = models.BooleanField(default=False, help_text="El resultado se cortó en REPORT_MAX_ROWS filas")
     export_format = models.CharField(max_length=10, choices=EXPORT_FORMATS)
     file_path = models.CharField(max_length=500, null=True, blank=True)
+    file_name = models.CharField(max_length=255, null=True, blank=True, help_text="Nombre de descarga del archivo generado")
+    content_type = models.CharField(max_length=100, null=True, blank=True)
+    
+    # Trabajo asíncrono
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='completed', db_index=True)
+    stage = models.CharField(max_length=50, blank=True, default='')
+    stage_timings = models.JSONField(default=dict, blank=True, help_text="Segundos por etapa")
+    parameters = models.JSONField(default=dict, blank=True, help_text="Opciones del trabajo (p. ej. include_chart)")
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True, help_text="Fecha desde la cual el archivo se borra")
     
     # Metadata
-    execution_time = models.FloatField(help_text="Tiempo de ejecución en segundos")
+    execution_time = models.FloatField(default=0, help_text="Tiempo de ejecución en segundos")
     tokens_used = models.IntegerField(default=0, help_text="Tokens consumidos en la IA")
     success = models.BooleanField(default=True)
     error_message = models.TextField(null=True, blank=True)
@@ -61,7 +90,62 @@ class ReportLog(models.Model):
         indexes = [
             models.Index(fields=['user', 'created_at']),
             models.Index(fields=['report_type']),
+            models.Index(fields=['status', 'created_at'], name='reports_status_created_idx'),
         ]
     
     def __str__(self):
         return f"{self.user.email} - {self.report_type} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+
+
+class ReportHandle(models.Model):
+    """
+    Resultado de una vista previa listo para exportar
+    Guarda el plan y las filas consultadas (archivo JSON en el storage) para que la
+    exportación no repita el LLM ni la consulta; solo lo usa quien lo generó y vence
+    a los REPORT_HANDLE_TTL_MINUTES minutos (ver reports/handle_service.py)
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='report_handles')
+    prompt = models.TextField()
+    plan = models.JSONField(help_text="report_type, sql_query, explanation, suggested_chart_type, filters_applied")
+    results_path = models.CharField(max_length=500)
+    results_count = models.IntegerField(default=0)
+    truncated = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.user} - {self.prompt[:50]}"
+
+
+class PromptPlan(models.Model):
+    """
+    Plan SQL ya validado para un prompt normalizado (caché de interpret_prompt)
+    La clave incluye la versión del schema/instrucciones que ve el LLM: si cambian,
+    los planes anteriores dejan de usarse (ver reports/prompt_cache.py)
+    """
+    SOURCES = [
+        ('llm', 'Generado por la IA'),
+        ('history', 'Importado del historial'),
+    ]
+    
+    normalized_prompt = models.CharField(max_length=500)
+    schema_version = models.CharField(max_length=16)
+    plan = models.JSONField(help_text="report_type, sql_query, explanation, suggested_chart_type, filters_applied")
+    source = models.CharField(max_length=10, choices=SOURCES, default='llm')
+    example_prompt = models.TextField(help_text="Prompt original con el que se generó")
+    hits = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-hits', '-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['schema_version', 'normalized_prompt'], name='reports_prompt_plan_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.normalized_prompt} ({self.schema_version})"
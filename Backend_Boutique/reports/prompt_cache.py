@@ -0,0 +1,241 @@
+"""
+Caché de planes SQL para los reportes con IA
+El mismo pedido escrito de otra forma ("Ventas del último trimestre", "ventas ultimo
+trimestre", "ventas de los últimos tres meses"...) se reduce a una clave normalizada: minúsculas, sin
+tildes ni signos, sin muletillas y con las fechas relativas en forma canónica. La clave
+se guarda junto a la versión del schema/instrucciones que ve el LLM, de modo que al
+cambiar el schema los planes anteriores dejan de servirse.
+
+Solo se guardan planes que se ejecutaron bien y cuyo SQL usa fechas relativas
+(NOW() - INTERVAL ...): un plan con fechas literales quedaría desfasado.
+Los resúmenes narrativos también se reutilizan mientras los resultados sean los mismos.
+"""
+import hashlib
+import re
+import unicodedata
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import PromptPlan, ReportLog
+import logging
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'reports:prompt_plan'
+PLAN_FIELDS = ('report_type', 'sql_query', 'parameters', 'explanation', 'suggested_chart_type', 'filters_applied')
+MAX_PROMPT_LENGTH = 500
+
+# Fechas o años literales: el plan depende del día en que se generó
+LITERAL_DATE = re.compile(r"'\d{4}-\d{2}(?:-\d{2})?|\b(?:19|20)\d{2}\b")
+
+NUMBER_WORDS = {
+    'dos': 2, 'tres': 3, 'cuatro': 4, 'cinco': 5, 'seis': 6, 'siete': 7, 'ocho': 8,
+    'nueve': 9, 'diez': 10, 'once': 11, 'doce': 12, 'quince': 15, 'veinte': 20,
+    'treinta': 30, 'cincuenta': 50, 'cien': 100,
+}
+# Unidad de periodo -> (unidad canónica, factor): semanas en días, trimestres y años en meses
+PERIOD_UNITS = {
+    'dia': ('dias', 1), 'dias': ('dias', 1),
+    'semana': ('dias', 7), 'semanas': ('dias', 7),
+    'mes': ('meses', 1), 'meses': ('meses', 1),
+    'trimestre': ('meses', 3), 'trimestres': ('meses', 3),
+    'ano': ('meses', 12), 'anos': ('meses', 12),
+}
+_UNIT = r'(dias?|semanas?|mes(?:es)?|trimestres?|anos?)'
+_LAST_N = re.compile(r'\bultim[oa]s (\d+) ' + _UNIT + r'\b')
+_LAST_ONE = re.compile(r'\bultim[oa] ' + _UNIT + r'\b')
+_CURRENT = re.compile(r'\b(?:est[ea] ' + _UNIT + r'|' + _UNIT + r' (?:actual|en curso))\b')
+_PREVIOUS = re.compile(r'\b(?:' + _UNIT + r' (?:pasad[oa]|anterior)|anterior ' + _UNIT + r')\b')
+# Palabras que no cambian la consulta ("por", "con", "sin", "no" sí la cambian)
+STOPWORDS = {
+    'el', 'la', 'los', 'las', 'lo', 'un', 'una', 'unos', 'unas', 'de', 'del', 'al', 'a', 'en',
+    'me', 'mi', 'mis', 'nos', 'favor', 'dame', 'muestra', 'muestrame', 'mostrar', 'ver', 'quiero',
+    'necesito', 'genera', 'generar', 'reporte', 'informe', 'listado', 'lista', 'listar',
+    'cuales', 'cual', 'son', 'hay',
+}
+
+
+def _canonical_last(count, unit):
+    canonical, factor = PERIOD_UNITS[unit]
+    return f'ultimos_{count * factor}_{canonical}'
+
+
+def _canonical_period(prefix, unit):
+    canonical = {'dias': 'dia', 'semanas': 'semana', 'meses': 'mes', 'trimestres': 'trimestre', 'anos': 'ano'}
+    return f'{prefix}_{canonical.get(unit, unit)}'
+
+
+def normalize_prompt(prompt):
+    """Clave del prompt: '' si está vacío o es demasiado largo para guardarse"""
+    text = unicodedata.normalize('NFKD', prompt or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    text = re.sub(r'[^a-z0-9<>=%]+', ' ', text)
+    text = ' '.join(str(NUMBER_WORDS.get(word, word)) for word in text.split())
+
+    text = _LAST_N.sub(lambda m: _canonical_last(int(m.group(1)), m.group(2)), text)
+    text = _LAST_ONE.sub(lambda m: _canonical_last(1, m.group(1)), text)
+    text = _CURRENT.sub(lambda m: _canonical_period('periodo_actual', m.group(1) or m.group(2)), text)
+    text = _PREVIOUS.sub(lambda m: _canonical_period('periodo_anterior', m.group(1) or m.group(2)), text)
+    text = re.sub(r'\bhoy\b', 'periodo_actual_dia', text)
+    text = re.sub(r'\bayer\b', 'periodo_anterior_dia', text)
+
+    normalized = ' '.join(word for word in text.split() if word not in STOPWORDS)
+    return normalized if len(normalized) <= MAX_PROMPT_LENGTH else ''
+
+
+def schema_version(*parts):
+    """Huella del schema, instrucciones y modelo con los que el LLM genera el SQL"""
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def _count(event):
+    """Contadores de aciertos/fallos del proceso (en la caché de Django)"""
+    key = f'{CACHE_PREFIX}:{event}'
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+def is_cacheable(plan):
+    sql_query = plan.get('sql_query') or ''
+    return bool(sql_query) and not LITERAL_DATE.search(sql_query)
+
+
+def get_plan(prompt, version):
+    """Plan guardado para el prompt (dict con PLAN_FIELDS) o None"""
+    normalized = normalize_prompt(prompt)
+    entry = PromptPlan.objects.filter(
+        schema_version=version, normalized_prompt=normalized
+    ).only('id', 'plan').first() if normalized else None
+    if entry is None:
+        _count('misses')
+        return None
+    PromptPlan.objects.filter(id=entry.id).update(hits=F('hits') + 1, last_used_at=timezone.now())
+    _count('hits')
+    return dict(entry.plan)
+
+
+def store_plan(prompt, version, plan, source='llm'):
+    """Guarda un plan ya ejecutado con éxito; si la clave ya existe se conserva el anterior"""
+    normalized = normalize_prompt(prompt)
+    if not normalized or not is_cacheable(plan):
+        return None
+    try:
+        entry, _ = PromptPlan.objects.get_or_create(
+            schema_version=version,
+            normalized_prompt=normalized,
+            defaults={
+                'plan': {field: plan.get(field) for field in PLAN_FIELDS},
+                'source': source,
+                'example_prompt': prompt,
+            }
+        )
+    except IntegrityError:
+        # Otro proceso guardó la misma clave entretanto
+        return None
+    return entry
+
+
+def forget_plan(prompt, version):
+    """Descarta el plan de un prompt (p. ej. si dejó de ejecutarse tras una migración)"""
+    normalized = normalize_prompt(prompt)
+    if normalized:
+        PromptPlan.objects.filter(schema_version=version, normalized_prompt=normalized).delete()
+
+
+def _summary_key(version, prompt, payload):
+    digest = hashlib.sha256(f'{version}\n{normalize_prompt(prompt)}\n{payload}'.encode('utf-8')).hexdigest()
+    return f'{CACHE_PREFIX}:summary:{digest}'
+
+
+def get_summary(version, prompt, payload):
+    """Resumen ya generado para los mismos resultados (``payload`` es lo que se envía al LLM)"""
+    return cache.get(_summary_key(version, prompt, payload))
+
+
+def store_summary(version, prompt, payload, summary):
+    cache.set(_summary_key(version, prompt, payload), summary, timeout=settings.REPORT_SUMMARY_CACHE_TTL)
+
+
+def probe_sql(ai_service, sql_query):
+    """Valida el SQL y lo prueba contra el schema actual sin traer filas"""
+    ai_service.validate_sql_safety(sql_query)
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT * FROM ({sql_query.strip().rstrip(';')}) AS plan_check LIMIT 0")
+
+
+def import_report_history(ai_service, days=90):
+    """
+    Siembra la caché con los reportes con IA exitosos del historial (ReportLog.generated_sql).
+    Cada SQL se vuelve a validar y se prueba contra el schema actual (probe_sql).
+    Devuelve (importados, descartados).
+    """
+    logs = ReportLog.objects.filter(
+        success=True,
+        status='completed',
+        input_type__in=['text', 'audio'],
+        created_at__gte=timezone.now() - timedelta(days=days),
+    ).exclude(generated_sql='').order_by('-created_at').values_list(
+        'original_prompt', 'transcription', 'report_type', 'generated_sql'
+    )
+    imported, skipped = 0, 0
+    seen = set(PromptPlan.objects.filter(schema_version=ai_service.schema_version).values_list('normalized_prompt', flat=True))
+    for original_prompt, transcription, report_type, sql_query in logs.iterator():
+        prompt = transcription or original_prompt
+        normalized = normalize_prompt(prompt)
+        if not normalized or normalized in seen:
+            continue
+        seen.add(normalized)
+        plan = {
+            'report_type': report_type,
+            'sql_query': sql_query,
+            'parameters': {},
+            'explanation': prompt,
+            'suggested_chart_type': 'bar',
+            'filters_applied': [],
+        }
+        try:
+            probe_sql(ai_service, sql_query)
+        except Exception as e:
+            logger.info(f"Reporte del historial descartado ({prompt!r}): {str(e)}")
+            skipped += 1
+            continue
+        if store_plan(prompt, ai_service.schema_version, plan, source='history'):
+            imported += 1
+        else:
+            skipped += 1
+    return imported, skipped
+
+
+def cache_stats(version):
+    """Aciertos/fallos del proceso y uso acumulado de los planes de la versión actual"""
+    hits = cache.get(f'{CACHE_PREFIX}:hits', 0)
+    misses = cache.get(f'{CACHE_PREFIX}:misses', 0)
+    plans = PromptPlan.objects.filter(schema_version=version)
+    return {
+        'schema_version': version,
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+        'plans': plans.count(),
+        'plan_hits_total': plans.aggregate(total=Sum('hits'))['total'] or 0,
+        'stale_plans': PromptPlan.objects.exclude(schema_version=version).count(),
+        'top_plans': [
+            {
+                'normalized_prompt': normalized_prompt,
+                'example_prompt': example_prompt,
+                'source': source,
+                'hits': plan_hits,
+                'last_used_at': last_used_at,
+            }
+            for normalized_prompt, example_prompt, source, plan_hits, last_used_at in plans.order_by('-hits')[:10].values_list(
+                'normalized_prompt', 'example_prompt', 'source', 'hits', 'last_used_at'
+            )
+        ],
+    }
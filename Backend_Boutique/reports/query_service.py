@@ -0,0 +1,194 @@
+"""
+Ejecución acotada de las consultas de reportes
+Las consultas (SQL del LLM o del constructor manual) se leen por lotes con fetchmany
+desde un cursor del lado del servidor (cursor con nombre en PostgreSQL), con un tiempo
+máximo por consulta y un tope de filas: al llegar al tope se deja de leer y el
+resultado se marca como truncado. Una consulta sin LIMIT ya no carga toda la tabla
+en memoria; ReportQueryStream ni siquiera junta las filas (CSV, NDJSON, Parquet).
+"""
+import re
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Cada cuántas instrucciones de la VM de SQLite se revisa el tiempo límite
+SQLITE_PROGRESS_STEPS = 10000
+
+
+class ReportQueryTimeout(Exception):
+    """La consulta del reporte superó REPORT_QUERY_TIMEOUT"""
+
+
+class ReportQueryResult:
+    """Columnas, filas (tuplas) y si se cortó al llegar al tope"""
+    __slots__ = ('columns', 'rows', 'truncated')
+
+    def __init__(self, columns, rows, truncated):
+        self.columns = columns
+        self.rows = rows
+        self.truncated = truncated
+
+    @property
+    def count(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def close(self):
+        pass
+
+    def as_dicts(self, limit=None):
+        rows = self.rows if limit is None else self.rows[:limit]
+        return [dict(zip(self.columns, row)) for row in rows]
+
+
+@contextmanager
+def _statement_timeout(seconds):
+    """
+    Tiempo máximo por sentencia; debe usarse dentro de una transacción.
+    Entrega ``rearm()``, que reinicia el plazo antes de cada lectura cuando el motor no
+    lo hace solo (en PostgreSQL cada FETCH es una sentencia con su propio plazo).
+    """
+    if not seconds:
+        yield lambda: None
+        return
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f"SET LOCAL statement_timeout = {int(seconds * 1000)}")
+        yield lambda: None
+    elif connection.vendor == 'sqlite':
+        # SQLite no tiene statement_timeout: el progress handler interrumpe la consulta
+        connection.ensure_connection()
+        deadline = [time.monotonic() + seconds]
+
+        def rearm():
+            deadline[0] = time.monotonic() + seconds
+
+        connection.connection.set_progress_handler(lambda: time.monotonic() > deadline[0], SQLITE_PROGRESS_STEPS)
+        try:
+            yield rearm
+        finally:
+            connection.connection.set_progress_handler(None, SQLITE_PROGRESS_STEPS)
+    else:
+        yield lambda: None
+
+
+def _timeout_error(sql_query, timeout):
+    logger.warning(f"Consulta de reporte cancelada tras {timeout}s: {sql_query[:200]}")
+    return ReportQueryTimeout(
+        f"La consulta superó el tiempo máximo de {timeout} segundos; acota el periodo o los filtros"
+    )
+
+
+def _with_limit(sql_query, limit):
+    """Agrega LIMIT a una consulta que no lo tiene (el motor puede cortar antes, p. ej. en un ORDER BY)"""
+    sql_query = sql_query.strip().rstrip(';')
+    if re.search(r'\bLIMIT\b', sql_query, re.IGNORECASE):
+        return sql_query
+    return f"{sql_query} LIMIT {int(limit)}"
+
+
+def run_report_query(sql_query, params=None, max_rows=None, timeout=None, batch_size=None):
+    """
+    Ejecuta la consulta y devuelve a lo sumo ``max_rows`` filas (REPORT_MAX_ROWS).
+    Se pide una fila de más para saber si el resultado quedó truncado.
+    Lanza ReportQueryTimeout si supera ``timeout`` segundos (REPORT_QUERY_TIMEOUT).
+    """
+    max_rows = settings.REPORT_MAX_ROWS if max_rows is None else max_rows
+    timeout = settings.REPORT_QUERY_TIMEOUT if timeout is None else timeout
+    batch_size = batch_size or settings.REPORT_FETCH_BATCH
+    started = time.monotonic()
+    rows, truncated = [], False
+    try:
+        with transaction.atomic(), _statement_timeout(timeout):
+            cursor = connection.chunked_cursor()
+            try:
+                cursor.execute(_with_limit(sql_query, max_rows + 1), params)
+                while True:
+                    batch = cursor.fetchmany(min(batch_size, max_rows + 1 - len(rows)))
+                    rows.extend(batch)
+                    if len(rows) > max_rows:
+                        del rows[max_rows:]
+                        truncated = True
+                        break
+                    if not batch:
+                        break
+                    if timeout and time.monotonic() - started > timeout:
+                        raise OperationalError("statement timeout")
+                # En un cursor con nombre la descripción se conoce recién tras el primer fetch
+                columns = [col[0] for col in cursor.description]
+            finally:
+                cursor.close()
+    except OperationalError as e:
+        if timeout and time.monotonic() - started >= timeout:
+            raise _timeout_error(sql_query, timeout) from e
+        raise
+    if truncated:
+        logger.info(f"Resultado de reporte truncado a {max_rows} filas")
+    return ReportQueryResult(columns, rows, truncated)
+
+
+class ReportQueryStream:
+    """
+    Consulta leída por lotes a medida que se consume (exportaciones en streaming).
+    Al crearla se ejecuta la consulta y se trae el primer lote: las columnas y los
+    errores se conocen antes de empezar a responder. El tiempo máximo aplica a cada
+    lectura y no al total, que incluye lo que tarda el cliente en descargar.
+    Mantiene abierta una transacción hasta agotarse o hasta ``close()``.
+    """
+
+    def __init__(self, sql_query, params=None, max_rows=None, timeout=None, batch_size=None):
+        self.max_rows = settings.REPORT_MAX_ROWS if max_rows is None else max_rows
+        self.columns = None
+        self.count = 0
+        self.truncated = False
+        self._batches = self._read(
+            sql_query,
+            params,
+            settings.REPORT_QUERY_TIMEOUT if timeout is None else timeout,
+            batch_size or settings.REPORT_FETCH_BATCH,
+        )
+        self._first = next(self._batches)
+
+    def _read(self, sql_query, params, timeout, batch_size):
+        started = time.monotonic()
+        try:
+            with transaction.atomic(), _statement_timeout(timeout) as rearm:
+                cursor = connection.chunked_cursor()
+                try:
+                    cursor.execute(_with_limit(sql_query, self.max_rows + 1), params)
+                    while True:
+                        rearm()
+                        started = time.monotonic()
+                        batch = cursor.fetchmany(min(batch_size, self.max_rows + 1 - self.count))
+                        if self.columns is None:
+                            self.columns = [col[0] for col in cursor.description]
+                        if self.count + len(batch) > self.max_rows:
+                            batch = batch[:self.max_rows - self.count]
+                            self.truncated = True
+                        self.count += len(batch)
+                        yield batch
+                        if self.truncated or not batch:
+                            break
+                finally:
+                    cursor.close()
+        except OperationalError as e:
+            if timeout and time.monotonic() - started >= timeout:
+                raise _timeout_error(sql_query, timeout) from e
+            raise
+
+    def __iter__(self):
+        first, self._first = self._first, None
+        if first:
+            yield from first
+        for batch in self._batches:
+            yield from batch
+
+    def close(self):
+        """Cierra el cursor y la transacción aunque no se haya leído todo"""
+        self._batches.close()
@@ -22,6 +22,11 @@ class ReportLogSerializer(serializers.ModelSerializer):
             'tokens_used',
             'success',
             'error_message',
+            'status',
+            'stage',
+            'stage_timings',
+            'completed_at',
+            'expires_at',
             'created_at',
         ]
         read_only_fields = ['id', 'created_at']
@@ -0,0 +1,223 @@
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from openpyxl import load_workbook
+from rest_framework.test import APIClient
+
+from orders.models import Order, PaymentMethod
+
+from .export_service import EXCEL_SAMPLE_ROWS, ReportExporter
+from .handle_service import HANDLE_EXPIRE_BATCH, ReportHandleRows, create_report_handle
+from .manual_service import ManualReportQueryBuilder, date_range
+from .models import ReportHandle
+from .query_service import ReportQueryResult
+
+User = get_user_model()
+
+
+def local_midnight(year, month, day):
+    """Medianoche local adaptada como la compara el SQL crudo (en SQLite, texto en UTC)"""
+    return connection.ops.adapt_datetimefield_value(timezone.make_aware(datetime(year, month, day)))
+
+
+class DateRangeTests(SimpleTestCase):
+
+    def test_month_is_half_open(self):
+        self.assertEqual(
+            date_range({'year': '2025', 'month': '3'}),
+            (local_midnight(2025, 3, 1), local_midnight(2025, 4, 1)),
+        )
+        self.assertEqual(
+            date_range({'year': '2025', 'month': '12'}),
+            (local_midnight(2025, 12, 1), local_midnight(2026, 1, 1)),
+        )
+
+    def test_quarter_and_year(self):
+        self.assertEqual(
+            date_range({'year': '2025', 'quarter': 'Q2'}),
+            (local_midnight(2025, 4, 1), local_midnight(2025, 7, 1)),
+        )
+        self.assertEqual(
+            date_range({'year': '2025', 'quarter': 'Q4'}),
+            (local_midnight(2025, 10, 1), local_midnight(2026, 1, 1)),
+        )
+        self.assertEqual(
+            date_range({'year': '2025'}),
+            (local_midnight(2025, 1, 1), local_midnight(2026, 1, 1)),
+        )
+
+    def test_start_and_end_dates_intersect_period(self):
+        # end_date es inclusivo: el límite superior es la medianoche del día siguiente
+        self.assertEqual(
+            date_range({'year': '2025', 'month': '3', 'start_date': '2025-03-10', 'end_date': '2025-04-20'}),
+            (local_midnight(2025, 3, 10), local_midnight(2025, 4, 1)),
+        )
+        self.assertEqual(
+            date_range({'year': '2025', 'quarter': 'Q1', 'start_date': '2024-12-01', 'end_date': '2025-02-14'}),
+            (local_midnight(2025, 1, 1), local_midnight(2025, 2, 15)),
+        )
+        self.assertEqual(date_range({'end_date': '2025-05-31'}), (None, local_midnight(2025, 6, 1)))
+        self.assertEqual(date_range({}), (None, None))
+
+    def test_invalid_values_raise(self):
+        for params in (
+            {'year': 'abc'}, {'year': '2025', 'month': '13'}, {'year': '2025', 'month': '0'},
+            {'start_date': '2025-02-30'}, {'end_date': '31/12/2025'},
+        ):
+            with self.subTest(params=params), self.assertRaises(ValueError):
+                date_range(params)
+
+
+class ManualReportQueryBuilderTests(SimpleTestCase):
+
+    def setUp(self):
+        self.builder = ManualReportQueryBuilder()
+
+    def test_filters_are_bound_parameters(self):
+        sql, params = self.builder.build_query('sales', {'year': '2025', 'month': '3', 'status': 'paid'})
+        self.assertEqual(params, [local_midnight(2025, 3, 1), local_midnight(2025, 4, 1), 'PAID'])
+        self.assertIn('o.created_at >= %s AND o.created_at < %s AND o.status = %s', sql)
+        self.assertNotIn('PAID', sql)
+        self.assertNotIn('2025', sql)
+
+    def test_status_aliases(self):
+        sql, params = self.builder.build_query('sales', {'status': 'completed'})
+        self.assertEqual(params, list(Order.SALE_STATUSES))
+        self.assertIn(f"o.status IN ({', '.join(['%s'] * len(Order.SALE_STATUSES))})", sql)
+
+        for alias, expected in (('pending', ['PENDING_PAYMENT']), ('cancelled', ['CANCELED']), ('canceled', ['CANCELED'])):
+            with self.subTest(alias=alias):
+                self.assertEqual(self.builder.build_query('invoices', {'status': alias})[1], expected)
+        self.assertEqual(self.builder.build_query('sales', {'status': 'all'})[1], [])
+
+    def test_fixed_params_precede_filters(self):
+        _, params = self.builder.build_query('inventory', {'category': '3', 'min_stock': '2', 'max_stock': '40'})
+        self.assertEqual(params, [True, 3, 2, 40])
+        _, params = self.builder.build_query('employees', {'year': '2025'})
+        self.assertEqual(params, ['admin', 'owner', 'seller'])
+
+    def test_same_shape_reuses_statement(self):
+        first, _ = self.builder.build_query('sales', {'year': '2024', 'status': 'PAID'})
+        second, _ = self.builder.build_query('sales', {'year': '2025', 'quarter': 'Q3', 'status': 'SHIPPED'})
+        self.assertIs(first, second)
+
+    def test_invalid_filters_raise(self):
+        for report_type, params in (
+            ('unknown', {}),
+            ('sales', {'status': "PAID' OR 1=1 --"}),
+            ('products', {'category': 'camisas'}),
+            ('inventory', {'min_stock': '-'}),
+        ):
+            with self.subTest(report_type=report_type, params=params), self.assertRaises(ValueError):
+                self.builder.build_query(report_type, params)
+
+
+class ManualReportViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', identification_number='A1', user_type='admin')
+        cls.customer = User.objects.create(username='cliente', identification_number='C1')
+        cash = PaymentMethod.objects.create(code='cash', name='Efectivo')
+        # Bordes del mes en hora local: solo las dos primeras caen en marzo
+        cls.orders = {}
+        for label, moment in (
+            ('first', datetime(2025, 3, 1, 0, 0)),
+            ('last', datetime(2025, 3, 31, 23, 59)),
+            ('next', datetime(2025, 4, 1, 0, 0)),
+            ('previous', datetime(2025, 2, 28, 23, 59)),
+        ):
+            order = Order.objects.create(user=cls.customer, status='PAID', payment_method=cash, grand_total=Decimal('10'))
+            Order.objects.filter(pk=order.pk).update(created_at=timezone.make_aware(moment))
+            cls.orders[label] = order.pk
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_preview_filters_local_month(self):
+        response = self.client.get('/api/reports/manual/preview/', {
+            'report_type': 'sales', 'year': '2025', 'month': '3', 'status': 'completed',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {row['order_id'] for row in response.json()['results']},
+            {self.orders['first'], self.orders['last']},
+        )
+
+    def test_invalid_filters_return_400(self):
+        for params in (
+            {'report_type': 'sales', 'year': '2025', 'month': '13'},
+            {'report_type': 'sales', 'status': 'lost'},
+            {'report_type': 'sales', 'start_date': 'ayer'},
+            {'report_type': 'products', 'category': 'x'},
+            {'report_type': 'unknown'},
+        ):
+            for url in ('/api/reports/manual/preview/', '/api/reports/manual/generate/'):
+                with self.subTest(url=url, params=params):
+                    response = self.client.get(url, params)
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn('error', response.json())
+
+    def test_customers_cannot_preview(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.get('/api/reports/manual/preview/', {'report_type': 'sales'})
+        self.assertEqual(response.status_code, 403)
+
+
+class ExcelExportTests(SimpleTestCase):
+
+    def test_aware_datetimes_after_sample_are_made_local(self):
+        moment = timezone.make_aware(datetime(2025, 3, 1, 10, 30))
+        rows = [[index, None] for index in range(EXCEL_SAMPLE_ROWS + 50)] + [[0, moment]]
+        output = ReportExporter.rows_to_excel(['id', 'last_order_at'], rows, 'clientes')
+
+        output.seek(0)
+        sheet = load_workbook(output)['Datos']
+        self.assertEqual(sheet.cell(row=sheet.max_row, column=2).value, datetime(2025, 3, 1, 10, 30))
+
+
+class ReportHandleTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='admin', identification_number='A1', user_type='admin')
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def create_handle(self, rows):
+        source = ReportQueryResult(['producto', 'total'], rows, False)
+        return create_report_handle(self.user, 'ventas', {'report_type': 'sales'}, source, preview_rows=1)
+
+    def test_rows_round_trip(self):
+        rows = [('Camisa', Decimal('10.50')), ('Pantalón', None)]
+        handle, first_rows = self.create_handle(rows)
+        self.assertEqual(first_rows, rows[:1])
+
+        stored = ReportHandleRows(handle)
+        self.assertEqual((stored.columns, stored.count), (['producto', 'total'], 2))
+        self.assertEqual([tuple(row) for row in stored], rows)
+        stored.close()
+
+    def test_preview_deletes_expired_handles(self):
+        expired = [self.create_handle([('Camisa', 1)])[0] for _ in range(HANDLE_EXPIRE_BATCH + 2)]
+        ReportHandle.objects.filter(pk__in=[handle.pk for handle in expired]).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+
+        fresh, _ = self.create_handle([('Camisa', 1)])
+        self.assertEqual(ReportHandle.objects.filter(expires_at__lte=timezone.now()).count(), 2)
+        self.assertEqual(sum(default_storage.exists(handle.results_path) for handle in expired), 2)
+        self.assertTrue(default_storage.exists(fresh.results_path))
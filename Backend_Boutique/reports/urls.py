@@ -9,6 +9,12 @@ urlpatterns = [
     # Generar reporte completo (con exportación)
     path('generate/', views.generate_report, name='generate_report'),
     
+    # Generación en segundo plano: encolar, consultar estado, cancelar y descargar
+    path('jobs/', views.submit_report, name='submit_report'),
+    path('jobs/<uuid:job_id>/', views.report_job_status, name='report_job_status'),
+    path('jobs/<uuid:job_id>/cancel/', views.cancel_report, name='cancel_report'),
+    path('jobs/<uuid:job_id>/download/', views.download_report, name='download_report'),
+    
     # Vista previa (solo JSON, sin exportar)
     path('preview/', views.preview_report, name='preview_report'),
     
@@ -18,6 +24,9 @@ urlpatterns = [
     # Sugerencias de reportes
     path('suggestions/', views.report_suggestions, name='report_suggestions'),
     
+    # Caché de planes SQL (aciertos/fallos)
+    path('plan-cache/', views.plan_cache_stats, name='plan_cache_stats'),
+    
     # Reportes Manuales (con filtros tradicionales)
     path('manual/preview/', views.manual_report_preview, name='manual_report_preview'),
     path('manual/generate/', views.manual_report_generate, name='manual_report_generate'),
@@ -6,8 +6,9 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.db import connection
-from django.http import HttpResponse
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, StreamingHttpResponse
 from django.utils import timezone
 import time
 import json
@@ -15,10 +16,73 @@ import json
 from .ai_service import AIReportService
 # from .whisper_service import WhisperTranscriptionService
 from .export_service import ReportExporter
+from .handle_service import ReportHandleExpired, create_report_handle, get_report_handle
+from .job_service import (
+    CONTENT_TYPES, EXTENSIONS, STREAMING_FORMATS,
+    render_ai_report, open_report_stream, submit_report_job, cancel_report_job,
+)
+from .manual_service import ManualReportQueryBuilder
+from .prompt_cache import cache_stats
+from .query_service import ReportQueryStream, ReportQueryTimeout, run_report_query
 from .models import ReportLog
 from .serializers import ReportLogSerializer
 
 
+def _resolve_report_handle(request):
+    """
+    (handle, respuesta de error) según el ``report_handle`` del body; (None, None) si no vino.
+    Solo el usuario que generó la vista previa puede exportarla.
+    """
+    handle_id = request.data.get('report_handle')
+    if not handle_id:
+        return None, None
+    try:
+        handle = get_report_handle(request.user, handle_id)
+    except ReportHandleExpired as e:
+        return None, Response({'error': str(e)}, status=status.HTTP_410_GONE)
+    if handle is None:
+        return None, Response({'error': 'Vista previa no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+    return handle, None
+
+
+def _stream_and_log(chunks, source, start_time, log_fields):
+    """
+    Entrega los bloques del archivo y al terminar guarda el ReportLog (cantidad de filas
+    y truncado se conocen recién entonces). Si el cliente corta la descarga, Django
+    cierra el generador: se libera el cursor y queda registrado como interrumpido.
+    """
+    error = None
+    try:
+        yield from chunks
+    except GeneratorExit:
+        error = 'Descarga interrumpida'
+        raise
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        source.close()
+        ReportLog.objects.create(
+            **log_fields,
+            results_count=source.count,
+            truncated=source.truncated,
+            execution_time=time.time() - start_time,
+            success=error is None,
+            error_message=error,
+        )
+
+
+def _streaming_report_response(chunks, source, filename, content_type, start_time, log_fields):
+    """Descarga csv/ndjson/parquet que empieza antes de terminar la consulta"""
+    response = StreamingHttpResponse(
+        _stream_and_log(chunks, source, start_time, log_fields), content_type=content_type
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # Que los proxies no junten la respuesta antes de reenviarla
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def generate_report(request):
@@ -27,11 +91,15 @@ def generate_report(request):
     
     Body:
         {
-            "prompt": "string (opcional si hay audio)",
+            "prompt": "string (opcional si hay audio o report_handle)",
             "audio": "file (opcional)",
-            "export_format": "pdf|excel",
+            "report_handle": "uuid (opcional, de /preview/: exporta esas filas sin repetir la consulta)",
+            "export_format": "pdf|excel|csv|ndjson|parquet",
             "include_chart": boolean (default: true)
         }
+    
+    csv, ndjson y parquet se envían en streaming a medida que se leen las filas (sin
+    resumen ni gráfico); la cantidad de filas queda en el historial al terminar.
     """
     
     user = request.user
@@ -55,6 +123,12 @@ def generate_report(request):
         transcription = None
         input_type = 'text'
         
+        handle, error_response = _resolve_report_handle(request)
+        if error_response is not None:
+            return error_response
+        if handle is not None:
+            prompt = handle.prompt
+        
         # Si hay audio, transcribir primero (TODO: Implementar Whisper)
         if audio_file:
             return Response(
@@ -73,88 +147,57 @@ def generate_report(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # 2. Interpretar prompt con IA
-        ai_service = AIReportService()
-        ai_response = ai_service.interpret_prompt(prompt)
+        if export_format in STREAMING_FORMATS:
+            # 2-4. Interpretar, validar y abrir la consulta; el archivo se arma al enviarlo
+            report = open_report_stream(prompt, export_format, handle=handle)
+            response = _streaming_report_response(
+                report['chunks'], report['source'], report['filename'], report['content_type'], start_time,
+                {
+                    'user': user,
+                    'report_type': report['report_type'],
+                    'input_type': input_type,
+                    'original_prompt': prompt,
+                    'transcription': transcription,
+                    'generated_sql': report['sql_query'],
+                    'export_format': export_format,
+                    'tokens_used': report['tokens_used'],
+                },
+            )
+            response['X-Plan-Cached'] = str(report['plan_cached']).lower()
+            return response
         
-        sql_query = ai_response['sql_query']
-        report_type = ai_response['report_type']
-        explanation = ai_response['explanation']
-        suggested_chart = ai_response.get('suggested_chart_type', 'bar')
-        tokens_used = ai_response.get('tokens_used', 0)
-        
-        # 3. Validar seguridad SQL
-        ai_service.validate_sql_safety(sql_query)
-        
-        # 4. Ejecutar query
-        with connection.cursor() as cursor:
-            cursor.execute(sql_query)
-            columns = [col[0] for col in cursor.description]
-            results = [
-                dict(zip(columns, row))
-                for row in cursor.fetchall()
-            ]
-        
-        # 5. Generar resumen con IA
-        summary = ai_service.generate_report_summary(prompt, results)
-        
-        # 6. Preparar metadata
-        report_metadata = {
-            'title': f"Reporte de {report_type.title()}",
-            'user': user.get_full_name() or user.email,
-            'prompt': prompt,
-            'explanation': explanation,
-            'summary': summary,
-            'generated_at': timezone.now().isoformat(),
-        }
-        
-        # 7. Exportar según formato
-        if export_format == 'excel':
-            file_content = ReportExporter.to_excel(results, 'reporte', report_metadata)
-            content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            filename = f'reporte_{report_type}_{timezone.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-        else:  # PDF
-            chart_data = None
-            if include_chart and len(results) > 0 and suggested_chart != 'none':
-                # Intentar detectar campos para gráfico
-                numeric_fields = [k for k, v in results[0].items() if isinstance(v, (int, float))]
-                text_fields = [k for k, v in results[0].items() if isinstance(v, str)]
-                
-                if numeric_fields and text_fields:
-                    chart_data = {
-                        'type': suggested_chart,
-                        'x_field': text_fields[0],
-                        'y_field': numeric_fields[0],
-                        'title': explanation
-                    }
-            
-            file_content = ReportExporter.to_pdf(results, 'reporte', report_metadata, chart_data)
-            content_type = 'application/pdf'
-            filename = f'reporte_{report_type}_{timezone.now().strftime("%Y%m%d_%H%M%S")}.pdf'
+        # 2-7. Interpretar, validar y ejecutar SQL, resumir y exportar
+        report = render_ai_report(prompt, export_format, include_chart, user, handle=handle)
+        file_content = report['file_content']
+        content_type = report['content_type']
+        filename = report['filename']
+        results_count = report['results_count']
         
         # 8. Guardar log
         execution_time = time.time() - start_time
         
         report_log = ReportLog.objects.create(
             user=user,
-            report_type=report_type,
+            report_type=report['report_type'],
             input_type=input_type,
             original_prompt=prompt,
             transcription=transcription,
-            generated_sql=sql_query,
-            results_count=len(results),
+            generated_sql=report['sql_query'],
+            results_count=results_count,
+            truncated=report['truncated'],
             export_format=export_format,
             execution_time=execution_time,
-            tokens_used=tokens_used,
+            tokens_used=report['tokens_used'],
             success=True
         )
         
-        # 9. Devolver archivo
-        response = HttpResponse(file_content.read(), content_type=content_type)
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        # 9. Devolver archivo (por bloques, sin cargarlo entero en memoria)
+        response = FileResponse(file_content, as_attachment=True, filename=filename, content_type=content_type)
         response['X-Report-Id'] = str(report_log.id)
         response['X-Execution-Time'] = str(execution_time)
-        response['X-Results-Count'] = str(len(results))
+        response['X-Results-Count'] = str(results_count)
+        response['X-Plan-Cached'] = str(report['plan_cached']).lower()
+        response['X-Results-Truncated'] = str(report['truncated']).lower()
         
         return response
         
@@ -185,6 +228,141 @@ def generate_report(request):
         )
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def submit_report(request):
+    """
+    Encola un reporte con IA para generarlo en segundo plano (run_report_worker)
+    
+    Body:
+        {
+            "prompt": "string (opcional si hay report_handle)",
+            "report_handle": "uuid (opcional, de /preview/)",
+            "export_format": "pdf|excel|csv|ndjson|parquet",
+            "include_chart": boolean (default: true)
+        }
+    
+    Respuesta 202 con el id del trabajo; su estado se consulta en /reports/jobs/<id>/
+    y el archivo se descarga de /reports/jobs/<id>/download/
+    """
+    
+    user = request.user
+    
+    if not user.is_superuser and user.user_type not in ['admin', 'seller']:
+        return Response(
+            {'error': 'No tienes permisos para generar reportes'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    prompt = request.data.get('prompt')
+    export_format = request.data.get('export_format', 'pdf')
+    include_chart = str(request.data.get('include_chart', True)).lower() not in ('false', '0')
+    
+    handle, error_response = _resolve_report_handle(request)
+    if error_response is not None:
+        return error_response
+    if handle is not None:
+        prompt = handle.prompt
+    
+    if not prompt:
+        return Response(
+            {'error': 'Debes proporcionar un prompt'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if export_format not in CONTENT_TYPES:
+        return Response(
+            {'error': f'Formato no soportado: {export_format}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    job = submit_report_job(user, prompt, export_format=export_format, include_chart=include_chart, handle=handle)
+    return Response(_job_as_dict(job), status=status.HTTP_202_ACCEPTED)
+
+
+def _get_report_job(request, job_id):
+    """Reporte del usuario (los admin ven todos, como en el historial) o None"""
+    user = request.user
+    jobs = ReportLog.objects.all()
+    if not (user.is_superuser or user.user_type == 'admin'):
+        jobs = jobs.filter(user=user)
+    return jobs.filter(id=job_id).first()
+
+
+def _job_as_dict(job):
+    return {
+        'id': str(job.id),
+        'status': job.status,
+        'stage': job.stage,
+        'stage_timings': job.stage_timings,
+        'report_type': job.report_type,
+        'export_format': job.export_format,
+        'results_count': job.results_count,
+        'truncated': job.truncated,
+        'execution_time': job.execution_time,
+        'error_message': job.error_message,
+        'created_at': job.created_at,
+        'completed_at': job.completed_at,
+        'expires_at': job.expires_at,
+        'download_available': job.status == 'completed' and bool(job.file_path),
+    }
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def report_job_status(request, job_id):
+    """
+    Estado de un reporte encolado: pending, running (con la etapa actual),
+    completed, failed, canceled o expired
+    """
+    job = _get_report_job(request, job_id)
+    if job is None:
+        return Response({'error': 'Reporte no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(_job_as_dict(job))
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def cancel_report(request, job_id):
+    """Cancela un reporte en cola o en curso"""
+    job = _get_report_job(request, job_id)
+    if job is None:
+        return Response({'error': 'Reporte no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+    if not cancel_report_job(job):
+        return Response(
+            {'error': f'El reporte ya no está en curso ({job.status})'},
+            status=status.HTTP_409_CONFLICT
+        )
+    job.refresh_from_db()
+    return Response(_job_as_dict(job))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def download_report(request, job_id):
+    """Descarga el archivo de un reporte terminado mientras no haya vencido"""
+    job = _get_report_job(request, job_id)
+    if job is None:
+        return Response({'error': 'Reporte no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+    if job.status == 'expired' or (job.expires_at and job.expires_at <= timezone.now()):
+        return Response({'error': 'El archivo del reporte ya venció'}, status=status.HTTP_410_GONE)
+    if job.status != 'completed' or not job.file_path:
+        return Response(
+            {'error': f'El reporte no está listo ({job.status})'},
+            status=status.HTTP_409_CONFLICT
+        )
+    
+    response = FileResponse(
+        default_storage.open(job.file_path, 'rb'),
+        as_attachment=True,
+        filename=job.file_name,
+        content_type=job.content_type
+    )
+    response['X-Report-Id'] = str(job.id)
+    response['X-Execution-Time'] = str(job.execution_time)
+    response['X-Results-Count'] = str(job.results_count)
+    return response
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def preview_report(request):
@@ -196,6 +374,11 @@ def preview_report(request):
             "prompt": "string",
             "limit": integer (default: 50)
         }
+    
+    Devuelve las primeras ``limit`` filas y un ``report_handle``: la consulta completa
+    queda guardada y /generate/ o /jobs/ la exportan sin repetir el LLM ni la consulta.
+    Con más de REPORT_HANDLE_MAX_ROWS filas no se guarda (``report_handle`` es null y
+    ``truncated`` indica que hay más filas que ``results_count``).
     """
     
     user = request.user
@@ -208,7 +391,7 @@ def preview_report(request):
     
     try:
         prompt = request.data.get('prompt')
-        limit = request.data.get('limit', 50)
+        limit = int(request.data.get('limit', 50))
         if not prompt:
             return Response(
                 {'error': 'Debes proporcionar un prompt'},
@@ -221,30 +404,40 @@ def preview_report(request):
         
         sql_query = ai_response['sql_query']
         
-        # Agregar LIMIT si no lo tiene
-        if 'LIMIT' not in sql_query.upper():
-            sql_query += f' LIMIT {limit}'
-        
-        # Validar y ejecutar
-        ai_service.validate_sql_safety(sql_query)
-        
-        with connection.cursor() as cursor:
-            cursor.execute(sql_query)
-            columns = [col[0] for col in cursor.description]
-            results = [
-                dict(zip(columns, row))
-                for row in cursor.fetchall()
-            ]
+        # Validar y ejecutar (hasta el tope del handle): las filas se guardan para exportarlas
+        try:
+            ai_service.validate_sql_safety(sql_query)
+            source = ReportQueryStream(
+                sql_query, max_rows=min(settings.REPORT_HANDLE_MAX_ROWS, settings.REPORT_MAX_ROWS)
+            )
+        except ReportQueryTimeout as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception:
+            ai_service.forget_plan(prompt, ai_response)
+            raise
+        ai_service.remember_plan(prompt, ai_response)
+        
+        try:
+            handle, rows = create_report_handle(user, prompt, ai_response, source, preview_rows=limit)
+        except ReportQueryTimeout as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        finally:
+            source.close()
+        results = [dict(zip(source.columns, row)) for row in rows]
         
         return Response({
             'success': True,
+            'report_handle': str(handle.id) if handle else None,
+            'report_handle_expires_at': handle.expires_at if handle else None,
             'report_type': ai_response['report_type'],
             'explanation': ai_response['explanation'],
             'sql_query': sql_query,
-            'results_count': len(results),
+            'results_count': source.count,
+            'truncated': source.truncated,
             'results': results,
             'suggested_chart_type': ai_response.get('suggested_chart_type'),
-            'filters_applied': ai_response.get('filters_applied', [])
+            'filters_applied': ai_response.get('filters_applied', []),
+            'plan_cached': ai_response.get('cached', False)
         })
         
     except Exception as e:
@@ -303,6 +496,33 @@ def report_history(request):
     })
 
 
+# Prompts sugeridos (warm_report_plans --suggestions los deja en la caché de planes)
+REPORT_SUGGESTIONS = {
+    'sales': [
+        'Ventas del último mes',
+        'Productos más vendidos esta semana',
+        'Comparar ventas online vs tienda física del último trimestre',
+        'Top 5 clientes con mayor gasto este año',
+        'Ventas por día de la semana del último mes',
+    ],
+    'inventory': [
+        'Productos con stock bajo (menos de 10 unidades)',
+        'Productos sin ventas en el último mes',
+        'Valor total del inventario actual',
+    ],
+    'financial': [
+        'Ingresos totales del último mes',
+        'Comparar ingresos mes a mes del último año',
+        'Métodos de pago más usados',
+    ],
+    'customers': [
+        'Nuevos clientes este mes',
+        'Clientes con más pedidos',
+        'Clientes inactivos (sin compras en 3 meses)',
+    ]
+}
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def report_suggestions(request):
@@ -312,30 +532,7 @@ def report_suggestions(request):
     
     user = request.user
     
-    suggestions = {
-        'sales': [
-            'Ventas del último mes',
-            'Productos más vendidos esta semana',
-            'Comparar ventas online vs tienda física del último trimestre',
-            'Top 5 clientes con mayor gasto este año',
-            'Ventas por día de la semana del último mes',
-        ],
-        'inventory': [
-            'Productos con stock bajo (menos de 10 unidades)',
-            'Productos sin ventas en el último mes',
-            'Valor total del inventario actual',
-        ],
-        'financial': [
-            'Ingresos totales del último mes',
-            'Comparar ingresos mes a mes del último año',
-            'Métodos de pago más usados',
-        ],
-        'customers': [
-            'Nuevos clientes este mes',
-            'Clientes con más pedidos',
-            'Clientes inactivos (sin compras en 3 meses)',
-        ]
-    }
+    suggestions = REPORT_SUGGESTIONS
     
     # Si es vendedor, limitar sugerencias (superuser no se limita)
     if not user.is_superuser and user.user_type == 'seller':
@@ -350,6 +547,27 @@ def report_suggestions(request):
     })
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def plan_cache_stats(request):
+    """
+    Aciertos y fallos de la caché de planes SQL (solo admin)
+    """
+    
+    user = request.user
+    
+    if not (user.is_superuser or user.user_type == 'admin'):
+        return Response(
+            {'error': 'No tienes permisos para ver la caché de reportes'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    return Response({
+        'success': True,
+        **cache_stats(AIReportService().schema_version)
+    })
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def manual_report_preview(request):
@@ -364,10 +582,13 @@ def manual_report_preview(request):
         - start_date: YYYY-MM-DD
         - end_date: YYYY-MM-DD
         - category: ID de categoría
-        - status: pending|completed|cancelled
+        - status: pending|completed|cancelled o un estado de la orden (PAID, SHIPPED...)
         - min_stock: número
         - max_stock: número
         - limit: número (default: 50)
+    
+    Los filtros inválidos devuelven 400. invoices son las órdenes cobradas (por fecha de
+    pago) y employees los usuarios internos (admin, owner, seller).
     """
     
     user = request.user
@@ -382,22 +603,16 @@ def manual_report_preview(request):
         report_type = request.query_params.get('report_type', 'sales')
         limit = int(request.query_params.get('limit', 50))
         
-        # Construir query según tipo de reporte
+        # Construir query según tipo de reporte (los filtros van como parámetros)
         query_builder = ManualReportQueryBuilder()
-        sql_query = query_builder.build_query(report_type, request.query_params)
+        try:
+            sql_query, sql_params = query_builder.build_query(report_type, request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Agregar LIMIT
-        if 'LIMIT' not in sql_query.upper():
-            sql_query += f' LIMIT {limit}'
-        
-        # Ejecutar query
-        with connection.cursor() as cursor:
-            cursor.execute(sql_query)
-            columns = [col[0] for col in cursor.description]
-            results = [
-                dict(zip(columns, row))
-                for row in cursor.fetchall()
-            ]
+        # Ejecutar query (se cortan en ``limit`` filas)
+        result = run_report_query(sql_query, sql_params, max_rows=limit)
+        results = result.as_dicts()
         
         # Generar resumen
         summary = query_builder.generate_summary(report_type, results, request.query_params)
@@ -406,6 +621,7 @@ def manual_report_preview(request):
             'success': True,
             'report_type': report_type,
             'total': len(results),
+            'truncated': result.truncated,
             'results': results,
             'summary': summary,
             'filters_applied': query_builder.get_applied_filters(request.query_params)
@@ -427,7 +643,7 @@ def manual_report_generate(request):
     """
     Generar y descargar reporte manual con filtros
     
-    Query params: (iguales que preview + export_format)
+    Query params: (iguales que preview + export_format: pdf|excel|csv|ndjson|parquet)
     """
     
     user = request.user
@@ -444,18 +660,38 @@ def manual_report_generate(request):
         report_type = request.query_params.get('report_type', 'sales')
         export_format = request.query_params.get('export_format', 'pdf')
         
-        # Construir query
+        # Construir query (los filtros van como parámetros)
         query_builder = ManualReportQueryBuilder()
-        sql_query = query_builder.build_query(report_type, request.query_params)
+        try:
+            sql_query, sql_params = query_builder.build_query(report_type, request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if export_format in STREAMING_FORMATS:
+            source = ReportQueryStream(sql_query, sql_params)
+            try:
+                chunks = ReportExporter.stream(export_format, source.columns, source)
+            except Exception:
+                source.close()
+                raise
+            return _streaming_report_response(
+                chunks, source,
+                f'reporte_{report_type}_{timezone.now().strftime("%Y%m%d_%H%M%S")}.{EXTENSIONS[export_format]}',
+                CONTENT_TYPES[export_format], start_time,
+                {
+                    'user': user,
+                    'report_type': report_type,
+                    'input_type': 'manual',
+                    'original_prompt': f"Reporte manual: {report_type}",
+                    'generated_sql': sql_query,
+                    'export_format': export_format,
+                    'tokens_used': 0,
+                },
+            )
         
         # Ejecutar query
-        with connection.cursor() as cursor:
-            cursor.execute(sql_query)
-            columns = [col[0] for col in cursor.description]
-            results = [
-                dict(zip(columns, row))
-                for row in cursor.fetchall()
-            ]
+        result = run_report_query(sql_query, sql_params)
+        results = result.as_dicts()
         
         # Generar resumen
         summary = query_builder.generate_summary(report_type, results, request.query_params)
@@ -467,6 +703,7 @@ def manual_report_generate(request):
             'generated_at': timezone.now().isoformat(),
             'filters': query_builder.get_applied_filters(request.query_params),
             'summary': summary,
+            'truncated': result.truncated,
         }
         
         # Exportar según formato
@@ -489,17 +726,18 @@ def manual_report_generate(request):
             original_prompt=f"Reporte manual: {report_type}",
             generated_sql=sql_query,
             results_count=len(results),
+            truncated=result.truncated,
             export_format=export_format,
             execution_time=execution_time,
             tokens_used=0,
             success=True
         )
         
-        # Devolver archivo
-        response = HttpResponse(file_content.read(), content_type=content_type)
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        # Devolver archivo (por bloques, sin cargarlo entero en memoria)
+        response = FileResponse(file_content, as_attachment=True, filename=filename, content_type=content_type)
         response['X-Execution-Time'] = str(execution_time)
         response['X-Results-Count'] = str(len(results))
+        response['X-Results-Truncated'] = str(result.truncated).lower()
         
         return response
         
@@ -527,286 +765,3 @@ def manual_report_generate(request):
             },
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
-
-
-# Helper class para construir queries de reportes manuales
-class ManualReportQueryBuilder:
-    """
-    Construye queries SQL seguras para reportes manuales basados en filtros
-    """
-    
-    def build_query(self, report_type, params):
-        """Construir query según tipo de reporte y parámetros"""
-        
-        if report_type == 'sales':
-            return self._build_sales_query(params)
-        elif report_type == 'products':
-            return self._build_products_query(params)
-        elif report_type == 'inventory':
-            return self._build_inventory_query(params)
-        elif report_type == 'categories':
-            return self._build_categories_query(params)
-        elif report_type == 'invoices':
-            return self._build_invoices_query(params)
-        elif report_type == 'employees':
-            return self._build_employees_query(params)
-        elif report_type == 'customers':
-            return self._build_customers_query(params)
-        else:
-            raise ValueError(f"Tipo de reporte no soportado: {report_type}")
-    
-    def _build_sales_query(self, params):
-        """Query para reportes de ventas"""
-        query = """
-            SELECT 
-                o.id as order_id,
-                o.created_at as fecha,
-                CONCAT(u.first_name, ' ', u.last_name) as cliente,
-                o.total,
-                o.status as estado,
-                o.payment_method as metodo_pago
-            FROM orders_order o
-            LEFT JOIN authentication_user u ON o.user_id = u.id
-            WHERE 1=1
-        """
-        query += self._add_date_filters(params, 'o.created_at')
-        
-        status = params.get('status')
-        if status and status != 'all':
-            query += f" AND o.status = '{status}'"
-        
-        query += " ORDER BY o.created_at DESC"
-        return query
-    
-    def _build_products_query(self, params):
-        """Query para reportes de productos"""
-        query = """
-            SELECT 
-                p.id,
-                p.name as nombre,
-                p.sku,
-                p.price as precio,
-                p.stock,
-                c.name as categoria,
-                p.is_active as activo
-            FROM products_product p
-            LEFT JOIN products_category c ON p.category_id = c.id
-            WHERE 1=1
-        """
-        
-        category = params.get('category')
-        if category and category != 'all':
-            query += f" AND p.category_id = {category}"
-        
-        min_stock = params.get('min_stock')
-        if min_stock:
-            query += f" AND p.stock >= {min_stock}"
-        
-        max_stock = params.get('max_stock')
-        if max_stock:
-            query += f" AND p.stock <= {max_stock}"
-        
-        query += " ORDER BY p.name"
-        return query
-    
-    def _build_inventory_query(self, params):
-        """Query para reportes de inventario"""
-        query = """
-            SELECT 
-                p.id,
-                p.name as nombre,
-                p.sku,
-                p.stock,
-                p.price as precio_unitario,
-                (p.stock * p.price) as valor_total,
-                c.name as categoria,
-                CASE 
-                    WHEN p.stock = 0 THEN 'Sin stock'
-                    WHEN p.stock < 10 THEN 'Stock bajo'
-                    WHEN p.stock < 50 THEN 'Stock medio'
-                    ELSE 'Stock alto'
-                END as nivel_stock
-            FROM products_product p
-            LEFT JOIN products_category c ON p.category_id = c.id
-            WHERE p.is_active = TRUE
-        """
-        
-        category = params.get('category')
-        if category and category != 'all':
-            query += f" AND p.category_id = {category}"
-        
-        min_stock = params.get('min_stock')
-        if min_stock:
-            query += f" AND p.stock >= {min_stock}"
-        
-        max_stock = params.get('max_stock')
-        if max_stock:
-            query += f" AND p.stock <= {max_stock}"
-        
-        query += " ORDER BY p.stock ASC"
-        return query
-    
-    def _build_categories_query(self, params):
-        """Query para reportes de categorías"""
-        query = """
-            SELECT 
-                c.id,
-                c.name as nombre,
-                c.description as descripcion,
-                COUNT(p.id) as total_productos,
-                SUM(p.stock) as stock_total,
-                c.is_active as activa
-            FROM products_category c
-            LEFT JOIN products_product p ON c.id = p.category_id
-            WHERE 1=1
-            GROUP BY c.id, c.name, c.description, c.is_active
-            ORDER BY total_productos DESC
-        """
-        return query
-    
-    def _build_invoices_query(self, params):
-        """Query para reportes de facturas"""
-        query = """
-            SELECT 
-                i.id,
-                i.invoice_number as numero_factura,
-                i.created_at as fecha,
-                CONCAT(u.first_name, ' ', u.last_name) as cliente,
-                i.total,
-                i.status as estado,
-                i.payment_method as metodo_pago
-            FROM orders_invoice i
-            LEFT JOIN authentication_user u ON i.user_id = u.id
-            WHERE 1=1
-        """
-        query += self._add_date_filters(params, 'i.created_at')
-        
-        status = params.get('status')
-        if status and status != 'all':
-            query += f" AND i.status = '{status}'"
-        
-        query += " ORDER BY i.created_at DESC"
-        return query
-    
-    def _build_employees_query(self, params):
-        """Query para reportes de empleados"""
-        query = """
-            SELECT 
-                e.id,
-                CONCAT(u.first_name, ' ', u.last_name) as nombre_completo,
-                u.email,
-                e.position as puesto,
-                e.hire_date as fecha_contratacion,
-                e.salary as salario,
-                e.is_active as activo
-            FROM employees_employee e
-            LEFT JOIN authentication_user u ON e.user_id = u.id
-            WHERE 1=1
-        """
-        query += " ORDER BY e.hire_date DESC"
-        return query
-    
-    def _build_customers_query(self, params):
-        """Query para reportes de clientes"""
-        query = """
-            SELECT 
-                u.id,
-                CONCAT(u.first_name, ' ', u.last_name) as nombre_completo,
-                u.email,
-                u.phone as telefono,
-                u.date_joined as fecha_registro,
-                COUNT(DISTINCT o.id) as total_ordenes,
-                COALESCE(SUM(o.total), 0) as total_gastado,
-                u.is_active as activo
-            FROM authentication_user u
-            LEFT JOIN orders_order o ON u.id = o.user_id
-            WHERE u.role = 'customer'
-            GROUP BY u.id, u.first_name, u.last_name, u.email, u.phone, u.date_joined, u.is_active
-            ORDER BY total_gastado DESC
-        """
-        return query
-    
-    def _add_date_filters(self, params, date_field):
-        """Agregar filtros de fecha a la query"""
-        filters = ""
-        
-        year = params.get('year')
-        month = params.get('month')
-        quarter = params.get('quarter')
-        start_date = params.get('start_date')
-        end_date = params.get('end_date')
-        
-        if year:
-            filters += f" AND EXTRACT(YEAR FROM {date_field}) = {year}"
-            
-            if month:
-                filters += f" AND EXTRACT(MONTH FROM {date_field}) = {month}"
-            elif quarter:
-                quarter_months = {
-                    'Q1': (1, 3),
-                    'Q2': (4, 6),
-                    'Q3': (7, 9),
-                    'Q4': (10, 12)
-                }
-                if quarter in quarter_months:
-                    start_m, end_m = quarter_months[quarter]
-                    filters += f" AND EXTRACT(MONTH FROM {date_field}) BETWEEN {start_m} AND {end_m}"
-        
-        if start_date:
-            filters += f" AND {date_field}::date >= '{start_date}'"
-        
-        if end_date:
-            filters += f" AND {date_field}::date <= '{end_date}'"
-        
-        return filters
-    
-    def generate_summary(self, report_type, results, params):
-        """Generar resumen del reporte"""
-        if not results:
-            return "No se encontraron resultados con los filtros aplicados."
-        
-        count = len(results)
-        
-        if report_type == 'sales':
-            total = sum(float(r.get('total', 0)) for r in results)
-            return f"Se encontraron {count} ventas con un total de ${total:,.2f}"
-        
-        elif report_type == 'products':
-            total_stock = sum(int(r.get('stock', 0)) for r in results)
-            return f"Se encontraron {count} productos con un stock total de {total_stock} unidades"
-        
-        elif report_type == 'inventory':
-            total_value = sum(float(r.get('valor_total', 0)) for r in results)
-            return f"Inventario de {count} productos con un valor total de ${total_value:,.2f}"
-        
-        elif report_type == 'customers':
-            total_spent = sum(float(r.get('total_gastado', 0)) for r in results)
-            return f"Se encontraron {count} clientes con un gasto total de ${total_spent:,.2f}"
-        
-        else:
-            return f"Se encontraron {count} registros"
-    
-    def get_applied_filters(self, params):
-        """Obtener lista de filtros aplicados"""
-        filters = []
-        
-        if params.get('year'):
-            filters.append(f"Año: {params['year']}")
-        if params.get('month'):
-            filters.append(f"Mes: {params['month']}")
-        if params.get('quarter'):
-            filters.append(f"Trimestre: {params['quarter']}")
-        if params.get('start_date'):
-            filters.append(f"Desde: {params['start_date']}")
-        if params.get('end_date'):
-            filters.append(f"Hasta: {params['end_date']}")
-        if params.get('category') and params['category'] != 'all':
-            filters.append(f"Categoría: {params['category']}")
-        if params.get('status') and params['status'] != 'all':
-            filters.append(f"Estado: {params['status']}")
-        if params.get('min_stock'):
-            filters.append(f"Stock mínimo: {params['min_stock']}")
-        if params.get('max_stock'):
-            filters.append(f"Stock máximo: {params['max_stock']}")
-        
-        return filters if filters else ['Sin filtros aplicados']
@@ -6,6 +6,7 @@ from django.utils import timezone
 from django.db.models import Q
 
 from orders.models import Order, OrderStatusHistory
+from orders.signals import order_status_changed
 from django.contrib.auth import get_user_model
 from inventory.models import Product
 from .serializers import SalesOrderSerializer
@@ -150,6 +151,7 @@ class SalesOrderViewSet(viewsets.ViewSet):
         OrderStatusHistory.objects.create(order=order, old_status=old_status, new_status=new_status, changed_by=request.user, reason=reason)
         order.status = new_status
         order.save(update_fields=['status','inventory_deducted','paid_at','inventory_restored'])
+        order_status_changed.send(sender=Order, order=order, old_status=old_status, new_status=new_status)
         return Response(SalesOrderSerializer(order, context={'request': request}).data)
 
     @action(detail=False, methods=['get'], url_path='users')
@@ -157,7 +159,8 @@ class SalesOrderViewSet(viewsets.ViewSet):
         User = get_user_model()
         q = request.query_params.get('q')
         include_all = request.query_params.get('all') in ('1','true','True')
-        users_qs = User.objects.all() if include_all else User.objects.filter(orders__isnull=False).distinct()
+        # Clientes con órdenes confirmadas: se lee la proyección CustomerStats (indexada) en vez de un DISTINCT sobre órdenes
+        users_qs = User.objects.all() if include_all else User.objects.filter(customer_stats__isnull=False)
         if q:
             users_qs = users_qs.filter(
                 Q(username__icontains=q) |
@@ -165,6 +168,11 @@ class SalesOrderViewSet(viewsets.ViewSet):
                 Q(first_name__icontains=q) |
                 Q(last_name__icontains=q)
             )
+        # ?order=recent|top para listar por última compra o por gasto total
+        ordering = {
+            'recent': ('-customer_stats__last_order_at', 'username'),
+            'top': ('-customer_stats__total_spent', 'username'),
+        }.get(request.query_params.get('order'), ('username',))
         data = [
             {
                 'id': u.id,
@@ -174,6 +182,6 @@ class SalesOrderViewSet(viewsets.ViewSet):
                 'last_name': u.last_name,
                 'name': f"{u.first_name} {u.last_name}".strip() or u.username
             }
-            for u in users_qs.order_by('username')[:200]
+            for u in users_qs.order_by(*ordering)[:200]
         ]
         return Response(data)
@@ -30,12 +30,18 @@ ChartJS.register(
   Filler
 );
 
+// Tiempo máximo en cola sin que el worker ML tome el entrenamiento
+const TRAINING_PENDING_TIMEOUT_MS = 60000;
+// Tiempo máximo total de consulta del estado del entrenamiento
+const TRAINING_POLL_TIMEOUT_MS = 15 * 60 * 1000;
+
 const MLPredictions = () => {
   const { user } = useAuth();
   const navigate = useNavigate();
   
   const [loading, setLoading] = useState(false);
   const [trainingLoading, setTrainingLoading] = useState(false);
+  const [trainingProgress, setTrainingProgress] = useState(null);
   const [predictions, setPredictions] = useState(null);
   const [summary, setSummary] = useState(null);
   const [analytics, setAnalytics] = useState(null);
@@ -72,29 +78,65 @@ const MLPredictions = () => {
     }
   };
 
+  const waitForTrainingJob = async (jobId) => {
+    // El entrenamiento corre en el worker; se consulta su avance hasta que termine
+    const startedAt = Date.now();
+    while (true) {
+      const response = await api.get(`/ml/training-jobs/${jobId}/`);
+      const job = response.data.job;
+      setTrainingProgress(job.progress);
+      if (['completed', 'failed', 'canceled'].includes(job.status)) {
+        return job;
+      }
+      const waited = Date.now() - startedAt;
+      if (job.status === 'pending' && waited > TRAINING_PENDING_TIMEOUT_MS) {
+        // Sin worker ML activo el trabajo queda en cola hasta que se ejecute run_ml_worker
+        return { ...job, error_message: 'El entrenamiento sigue en cola: no hay un worker ML activo' };
+      }
+      if (waited > TRAINING_POLL_TIMEOUT_MS) {
+        return { ...job, error_message: 'El entrenamiento sigue en curso; revisa su estado más tarde' };
+      }
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+    }
+  };
+
   const handleTrainModel = async () => {
     setTrainingLoading(true);
+    setTrainingProgress(0);
     setError('');
     try {
-  const response = await api.post('/ml/train-sales-forecast/', {
-        model_type: 'random_forest'
-      });
+      let jobId;
+      try {
+        const response = await api.post('/ml/train-sales-forecast/', {
+          model_type: 'auto'
+        });
+        jobId = response.data.job_id;
+      } catch (err) {
+        // 409: ya hay un entrenamiento en curso, se sigue ese mismo
+        if (err.response?.status !== 409 || !err.response.data.job_id) throw err;
+        jobId = err.response.data.job_id;
+      }
       
-      if (response.data.success) {
+      const job = await waitForTrainingJob(jobId);
+      if (job.status === 'completed') {
         setActiveModel({
-          id: response.data.model_id,
-          name: 'Pronóstico de Ventas random_forest',
-          accuracy_score: response.data.metrics.test_r2,
-          metrics: response.data.metrics
+          id: job.model_saved,
+          name: job.model_name || 'Pronóstico de Ventas',
+          accuracy_score: job.metrics?.test_r2,
+          metrics: job.metrics
         });
         fetchDashboardSummary();
         alert('✅ Modelo entrenado exitosamente!');
+      } else {
+        setError(job.error_message || 'Error entrenando modelo');
+        alert('❌ Error: ' + (job.error_message || 'Error entrenando modelo'));
       }
     } catch (err) {
       setError(err.response?.data?.error || 'Error entrenando modelo');
       alert('❌ Error: ' + (err.response?.data?.error || 'Error entrenando modelo'));
     } finally {
       setTrainingLoading(false);
+      setTrainingProgress(null);
     }
   };
 
@@ -140,7 +182,29 @@ const MLPredictions = () => {
         backgroundColor: 'rgba(220, 38, 38, 0.1)',
         fill: true,
         tension: 0.4,
-      }
+      },
+      // Intervalo de predicción: banda entre el límite superior y el inferior
+      ...(predictions.some(p => p.upper_bound != null) ? [
+        {
+          label: `Intervalo ${Math.round((summary?.interval_level || 0.8) * 100)}%`,
+          data: predictions.map(p => p.upper_bound),
+          borderColor: 'rgba(220, 38, 38, 0.25)',
+          backgroundColor: 'rgba(220, 38, 38, 0.08)',
+          borderDash: [4, 4],
+          pointRadius: 0,
+          fill: '+1',
+          tension: 0.4,
+        },
+        {
+          label: 'Límite inferior',
+          data: predictions.map(p => p.lower_bound),
+          borderColor: 'rgba(220, 38, 38, 0.25)',
+          borderDash: [4, 4],
+          pointRadius: 0,
+          fill: false,
+          tension: 0.4,
+        }
+      ] : [])
     ]
   } : null;
 
@@ -221,7 +285,7 @@ const MLPredictions = () => {
                   disabled={trainingLoading}
                   className="btn-outline-slim"
                 >
-                  {trainingLoading ? 'Entrenando...' : '🧠 Entrenar Modelo'}
+                  {trainingLoading ? `Entrenando... ${trainingProgress ?? 0}%` : '🧠 Entrenar Modelo'}
                 </button>
               </div>
             </div>
@@ -388,7 +452,8 @@ const MLPredictions = () => {
                             'bg-yellow-100 text-yellow-800'
                           }`}>
                             {log.status === 'completed' ? 'Completado' :
-                             log.status === 'failed' ? 'Fallido' : 'Entrenando'}
+                             log.status === 'failed' ? 'Fallido' :
+                             log.status === 'pending' ? 'En cola' : 'Entrenando'}
                           </span>
                         </td>
                         <td className="px-4 py-3 text-sm text-gray-900">{log.records_processed}</td>
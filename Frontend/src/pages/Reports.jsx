@@ -140,7 +140,7 @@ export default function Reports() {
       setLoading(true);
       setPreviewData(null);
       const data = await reportsService.preview(prompt);
-      setPreviewData(data);
+      setPreviewData({ ...data, prompt });
       setShowSuggestions(false);
       toast.success(`Vista previa generada: ${data.results_count} resultados`);
     } catch (error) {
@@ -159,14 +159,16 @@ export default function Reports() {
 
     try {
       setLoading(true);
-      const metadata = await reportsService.generate(prompt, exportFormat, includeChart);
+      // Si la vista previa es del mismo prompt, se exportan sus filas
+      const reportHandle = previewData?.prompt === prompt ? previewData.report_handle : null;
+      const metadata = await reportsService.generate(prompt, exportFormat, includeChart, null, reportHandle);
       toast.success(`Reporte descargado exitosamente (${metadata.resultsCount} registros)`);
       // Recargar historial
       if (activeTab === 'history') {
         loadHistory();
       }
     } catch (error) {
-      toast.error(error.error || 'Error al generar reporte');
+      toast.error(error.detail ? `${error.error || 'Error al generar reporte'}: ${error.detail}` : (error.error || 'Error al generar reporte'));
       console.error('Generate error:', error);
     } finally {
       setLoading(false);
@@ -305,6 +307,9 @@ export default function Reports() {
                   >
                     <option value="pdf">PDF</option>
                     <option value="excel">Excel</option>
+                    <option value="csv">CSV</option>
+                    <option value="ndjson">NDJSON</option>
+                    <option value="parquet">Parquet</option>
                   </select>
                 </div>
 
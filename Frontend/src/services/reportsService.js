@@ -3,6 +3,39 @@
  */
 import axiosInstance from './axiosConfig.js';
 
+// Extensión por formato de exportación (si la respuesta no trae Content-Disposition)
+const FILE_EXTENSIONS = {
+  pdf: 'pdf',
+  excel: 'xlsx',
+  csv: 'csv',
+  ndjson: 'ndjson',
+  parquet: 'parquet',
+};
+
+// Tiempo máximo en cola sin que un worker tome el trabajo antes de generarlo en la petición
+const REPORT_PENDING_TIMEOUT_MS = 20000;
+// Tiempo máximo total de consulta del estado antes de cancelar el trabajo
+const REPORT_POLL_TIMEOUT_MS = 10 * 60 * 1000;
+
+// Descargar el archivo de una respuesta blob
+const downloadResponse = (response, exportFormat) => {
+  const contentDisposition = response.headers['content-disposition'];
+  let filename = `reporte_${Date.now()}.${FILE_EXTENSIONS[exportFormat] || 'pdf'}`;
+  if (contentDisposition) {
+    const match = contentDisposition.match(/filename="?([^"]+)"?/);
+    if (match) filename = match[1];
+  }
+
+  const url = window.URL.createObjectURL(response.data);
+  const link = document.createElement('a');
+  link.href = url;
+  link.download = filename;
+  document.body.appendChild(link);
+  link.click();
+  link.remove();
+  window.URL.revokeObjectURL(url);
+};
+
 const reportsService = {
   /**
    * Vista previa de reporte (JSON) sin descargar archivo
@@ -24,53 +57,125 @@ const reportsService = {
   },
 
   /**
-   * Generar y descargar reporte completo (PDF o Excel)
+   * Generar y descargar reporte completo (PDF, Excel, CSV, NDJSON o Parquet)
+   * Encola el reporte, consulta su estado hasta que termine y descarga el archivo.
+   * Si ningún worker lo toma a tiempo se genera en la misma petición; si tarda
+   * demasiado se cancela
    * @param {string} prompt - Prompt en lenguaje natural
-   * @param {string} exportFormat - 'pdf' o 'excel'
+   * @param {string} exportFormat - 'pdf', 'excel', 'csv', 'ndjson' o 'parquet'
    * @param {boolean} includeChart - Incluir gráfico en PDF
-   * @returns {Promise<Blob>} Archivo descargable
+   * @param {Function} onProgress - Callback opcional con el estado del trabajo
+   * @param {string} reportHandle - Handle de la vista previa (exporta sus filas sin repetir la consulta)
+   * @returns {Promise<Object>} Metadata del reporte descargado
    */
-  generate: async (prompt, exportFormat = 'pdf', includeChart = true) => {
+  generate: async (prompt, exportFormat = 'pdf', includeChart = true, onProgress = null, reportHandle = null) => {
     try {
-      const formData = new FormData();
-      formData.append('prompt', prompt);
-      formData.append('export_format', exportFormat);
-      formData.append('include_chart', includeChart ? 'true' : 'false');
+      const body = {
+        prompt,
+        export_format: exportFormat,
+        include_chart: includeChart,
+      };
+      let submitted;
+      try {
+        ({ data: submitted } = await axiosInstance.post('/reports/jobs/', {
+          ...body,
+          ...(reportHandle ? { report_handle: reportHandle } : {}),
+        }));
+      } catch (error) {
+        // Vista previa vencida o inexistente: se genera desde el prompt
+        if (!reportHandle || ![404, 410].includes(error.response?.status)) throw error;
+        ({ data: submitted } = await axiosInstance.post('/reports/jobs/', body));
+      }
+
+      let job = submitted;
+      const startedAt = Date.now();
+      while (job.status === 'pending' || job.status === 'running') {
+        if (onProgress) onProgress(job);
+        const waited = Date.now() - startedAt;
+        if (job.status === 'pending' && waited > REPORT_PENDING_TIMEOUT_MS) {
+          // Ningún worker tomó el trabajo: se cancela y se genera en la misma petición
+          await reportsService.cancel(job.id).catch(() => null);
+          return await reportsService.generateSync(body, reportHandle, exportFormat);
+        }
+        if (waited > REPORT_POLL_TIMEOUT_MS) {
+          await reportsService.cancel(job.id).catch(() => null);
+          throw { error: 'Error al generar reporte', detail: 'El reporte tardó demasiado y fue cancelado' };
+        }
+        await new Promise((resolve) => setTimeout(resolve, 1500));
+        const { data } = await axiosInstance.get(`/reports/jobs/${submitted.id}/`);
+        job = data;
+      }
+      if (onProgress) onProgress(job);
+      if (job.status !== 'completed') {
+        throw { error: 'Error al generar reporte', detail: job.error_message || job.status };
+      }
 
-      const response = await axiosInstance.post('/reports/generate/', formData, {
+      const response = await axiosInstance.get(`/reports/jobs/${job.id}/download/`, {
         responseType: 'blob',
-        headers: {
-          'Content-Type': 'multipart/form-data',
-        },
       });
+      downloadResponse(response, exportFormat);
 
-      // Extraer metadata de headers
-      const metadata = {
-        reportId: response.headers['x-report-id'],
-        executionTime: response.headers['x-execution-time'],
-        resultsCount: response.headers['x-results-count'],
+      return {
+        reportId: job.id,
+        executionTime: job.execution_time,
+        resultsCount: job.results_count,
       };
+    } catch (error) {
+      console.error('Error generating report:', error);
+      throw error.response?.data || error;
+    }
+  },
 
-      // Descargar archivo
-      const contentDisposition = response.headers['content-disposition'];
-      let filename = `reporte_${Date.now()}.${exportFormat === 'excel' ? 'xlsx' : 'pdf'}`;
-      if (contentDisposition) {
-        const match = contentDisposition.match(/filename="?([^"]+)"?/);
-        if (match) filename = match[1];
+  /**
+   * Generar y descargar el reporte en la misma petición (/reports/generate/)
+   * Se usa cuando no hay un worker de reportes tomando los trabajos encolados
+   * @param {Object} body - prompt, export_format e include_chart
+   * @param {string} reportHandle - Handle de la vista previa (opcional)
+   * @param {string} exportFormat - Formato de exportación
+   * @returns {Promise<Object>} Metadata del reporte descargado
+   */
+  generateSync: async (body, reportHandle = null, exportFormat = 'pdf') => {
+    const post = (data) => axiosInstance.post('/reports/generate/', data, { responseType: 'blob' });
+    let response;
+    try {
+      try {
+        response = await post({ ...body, ...(reportHandle ? { report_handle: reportHandle } : {}) });
+      } catch (error) {
+        if (!reportHandle || ![404, 410].includes(error.response?.status)) throw error;
+        response = await post(body);
       }
+    } catch (error) {
+      // Con responseType blob el error JSON del backend llega como Blob
+      const data = error.response?.data;
+      if (data instanceof Blob) {
+        const text = await data.text();
+        try {
+          error.response.data = JSON.parse(text);
+        } catch {
+          error.response.data = { error: 'Error al generar reporte', detail: text };
+        }
+      }
+      throw error;
+    }
+    downloadResponse(response, exportFormat);
+    return {
+      reportId: response.headers['x-report-id'],
+      executionTime: response.headers['x-execution-time'],
+      resultsCount: response.headers['x-results-count'],
+    };
+  },
 
-      const url = window.URL.createObjectURL(response.data);
-      const link = document.createElement('a');
-      link.href = url;
-      link.download = filename;
-      document.body.appendChild(link);
-      link.click();
-      link.remove();
-      window.URL.revokeObjectURL(url);
-
-      return metadata;
+  /**
+   * Cancelar un reporte en cola o en curso
+   * @param {string} jobId - Id del trabajo
+   * @returns {Promise<Object>} Estado del trabajo
+   */
+  cancel: async (jobId) => {
+    try {
+      const response = await axiosInstance.post(`/reports/jobs/${jobId}/cancel/`);
+      return response.data;
     } catch (error) {
-      console.error('Error generating report:', error);
+      console.error('Error canceling report:', error);
       throw error.response?.data || error;
     }
   },
@@ -140,7 +245,7 @@ const reportsService = {
 
       // Descargar archivo
       const contentDisposition = response.headers['content-disposition'];
-      let filename = `reporte_manual_${Date.now()}.${params.export_format === 'excel' ? 'xlsx' : 'pdf'}`;
+      let filename = `reporte_manual_${Date.now()}.${FILE_EXTENSIONS[params.export_format] || 'pdf'}`;
       if (contentDisposition) {
         const match = contentDisposition.match(/filename="?([^"]+)"?/);
         if (match) filename = match[1];